@@ -27,7 +27,9 @@ import pecan
 import six
 import webob
 
+from refstack.api import compliance
 from refstack.api import exceptions as api_exc
+from refstack.api import guidelines
 from refstack.api import utils as api_utils
 from refstack import db
 
@@ -196,6 +198,10 @@ def setup_app(config):
     log.setup(CONF, 'refstack')
     CONF.log_opt_values(LOG, logging.DEBUG)
 
+    # Scan local capability files once at startup, if they are configured.
+    guidelines.get_local_guidelines()
+    compliance.start_background_check()
+
     template_path = CONF.api.template_path % {'project_root': PROJECT_ROOT}
     static_root = CONF.api.static_root % {'project_root': PROJECT_ROOT}
 
@@ -0,0 +1,175 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Content-addressed store of blobs.
+
+Raw payloads of uploaded test runs and large metadata values are kept
+out of database. Blobs are addressed by SHA-256 digest of their content,
+so equal blobs are stored once, and only digests are saved in database.
+Blobs are stored compressed and read in chunks on demand.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+from oslo_config import cfg
+
+BLOBS_OPTS = [
+    cfg.StrOpt('blob_backend',
+               default='file',
+               help='Backend of the blob store keeping raw uploads and '
+                    'large metadata values. "file" stores compressed '
+                    'blobs in blob_dir.'),
+    cfg.StrOpt('blob_dir',
+               default='/var/lib/refstack/blobs',
+               help='Directory for blobs of the "file" blob backend.'),
+    cfg.IntOpt('blob_meta_threshold',
+               default=4096,
+               help='Metadata values longer than this number of bytes '
+                    'are kept in the blob store. Their values are read '
+                    'from /v1/results/<test_id>/meta/<key> only.'),
+    cfg.BoolOpt('store_raw_uploads',
+                default=True,
+                help='Keep raw payloads of uploaded test runs in the blob '
+                     'store. The owner of a test run downloads it from '
+                     '/v1/results/<test_id>/upload.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(BLOBS_OPTS, group='api')
+
+# Size of chunks blobs are read in.
+CHUNK_SIZE = 64 * 1024
+
+_DIGEST_RE = re.compile('^[0-9a-f]{64}$')
+
+
+class BlobNotFound(Exception):
+    """Raise if blob with requested digest is not stored."""
+
+    pass
+
+
+def get_digest(data):
+    """Return SHA-256 hex digest of blob content."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class FileBackend(object):
+    """Blob backend keeping gzip compressed blobs in files.
+
+    Blobs are spread over subdirectories by the first digits of their
+    digest, so no directory grows too large.
+    """
+
+    def __init__(self):
+        """Init."""
+        self.path = CONF.api.blob_dir
+
+    def _get_file_name(self, digest):
+        if not _DIGEST_RE.match(digest):
+            raise BlobNotFound('Invalid blob digest: %s' % digest)
+        return os.path.join(self.path, digest[:2], digest[2:4],
+                            digest + '.gz')
+
+    def exists(self, digest):
+        """Check whether blob is stored."""
+        return os.path.exists(self._get_file_name(digest))
+
+    def put(self, digest, data):
+        """Store blob atomically unless it is already stored."""
+        file_name = self._get_file_name(digest)
+        if os.path.exists(file_name):
+            return
+        dir_name = os.path.dirname(file_name)
+        if not os.path.isdir(dir_name):
+            try:
+                os.makedirs(dir_name)
+            except OSError:
+                # Directory could be created by another worker.
+                if not os.path.isdir(dir_name):
+                    raise
+        fd, tmp_name = tempfile.mkstemp(dir=dir_name)
+        try:
+            with os.fdopen(fd, 'wb') as blob_file:
+                with gzip.GzipFile(fileobj=blob_file, mode='wb') as gz:
+                    gz.write(data)
+            os.rename(tmp_name, file_name)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+
+    def open(self, digest):
+        """Return file object reading decompressed blob."""
+        try:
+            return gzip.open(self._get_file_name(digest), 'rb')
+        except (IOError, OSError):
+            raise BlobNotFound('Blob %s not found' % digest)
+
+
+_BACKEND_MAPPING = {'file': FileBackend}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return blob backend created on first use, after config is parsed."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            backend_name = CONF.api.blob_backend
+            if backend_name not in _BACKEND_MAPPING:
+                raise ValueError('Invalid blob backend: %s' % backend_name)
+            _backend = _BACKEND_MAPPING[backend_name]()
+        return _backend
+
+
+def put(data):
+    """Store blob and return its digest.
+
+    :param data: Content of blob, text is stored UTF-8 encoded.
+    """
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    digest = get_digest(data)
+    get_backend().put(digest, data)
+    return digest
+
+
+def iter_blob(digest, chunk_size=CHUNK_SIZE):
+    """Generate decompressed content of blob in chunks.
+
+    Blob is opened before the first chunk is requested, so a missing blob
+    is reported by the call itself.
+
+    :raises BlobNotFound: If blob is not stored.
+    """
+    blob_file = get_backend().open(digest)
+
+    def iter_chunks():
+        with blob_file:
+            while True:
+                chunk = blob_file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    return iter_chunks()
@@ -0,0 +1,386 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Server-side cache for serialized API documents."""
+
+import collections
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+import six
+
+LOG = log.getLogger(__name__)
+
+CACHE_OPTS = [
+    cfg.StrOpt('cache_backend',
+               default='memory',
+               help='Shared backend of the server-side cache. '
+                    '"memory" keeps entries only in the in-process LRU of '
+                    'each worker. "file" additionally stores entries in '
+                    'cache_dir, so they are shared by all workers of '
+                    'the host.'),
+    cfg.IntOpt('cache_size',
+               default=1000,
+               help='Maximum number of entries in the in-process LRU of '
+                    'every cache, and in cache_dir of every cache of "file" '
+                    'backend.'),
+    cfg.StrOpt('cache_dir',
+               default=os.path.join(tempfile.gettempdir(), 'refstack-cache'),
+               help='Directory for entries of the "file" cache backend. '
+                    'Generation counters of caches, which invalidate '
+                    'entries of all workers at once, are kept in it '
+                    'whatever the backend is.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(CACHE_OPTS, group='api')
+
+# Entry files are named by SHA-1 digests of keys.
+_ENTRY_NAME_RE = re.compile(r'^[0-9a-f]{40}$')
+
+_CACHES = {}
+_CACHES_LOCK = threading.Lock()
+
+
+class LRUDict(object):
+    """Thread safe dictionary bounded by the number of items."""
+
+    def __init__(self, size):
+        """Init."""
+        self.size = size
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get item and mark it as recently used."""
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return default
+            self._items[key] = value
+            return value
+
+    def set(self, key, value):
+        """Set item and drop the least recently used ones."""
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        """Delete item if it exists."""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def values(self):
+        """Get list of all values."""
+        with self._lock:
+            return list(self._items.values())
+
+    def clear(self):
+        """Delete all items."""
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        """Number of items."""
+        return len(self._items)
+
+
+def _makedirs(path):
+    """Create directory unless it exists."""
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            # Directory could be created by another worker.
+            if not os.path.isdir(path):
+                raise
+
+
+class GenerationCounter(object):
+    """Generation counter of namespace shared by all workers of the host.
+
+    Counter is kept in a locked file in cache_dir whatever the backend
+    of entries is, so entries of older generations are served by no
+    worker once the counter is bumped.
+    """
+
+    def __init__(self, namespace):
+        """Init."""
+        self.namespace = namespace
+
+    @property
+    def file_name(self):
+        """Name of counter file, resolved after config is parsed."""
+        return os.path.join(CONF.api.cache_dir, self.namespace,
+                            'generation')
+
+    def get(self):
+        """Get counter."""
+        try:
+            with open(self.file_name) as generation_file:
+                return int(generation_file.read() or 0)
+        except (IOError, OSError, ValueError):
+            return 0
+
+    def bump(self):
+        """Increment counter.
+
+        Counter file is locked, so concurrent increments from
+        different workers are never lost.
+        """
+        file_name = self.file_name
+        try:
+            _makedirs(os.path.dirname(file_name))
+            fd = os.open(file_name, os.O_RDWR | os.O_CREAT)
+        except OSError as e:
+            LOG.error('Unable to bump generation of cache %s: %s'
+                      % (self.namespace, e))
+            return None
+        with os.fdopen(fd, 'r+') as generation_file:
+            fcntl.flock(generation_file, fcntl.LOCK_EX)
+            try:
+                generation = int(generation_file.read() or 0) + 1
+            except ValueError:
+                generation = 1
+            generation_file.seek(0)
+            generation_file.truncate()
+            generation_file.write(str(generation))
+            generation_file.flush()
+            fcntl.flock(generation_file, fcntl.LOCK_UN)
+        return generation
+
+
+class MemoryBackend(object):
+    """Shared backend that shares nothing.
+
+    Entries live only in the in-process LRU of the cache.
+    """
+
+    def __init__(self, namespace):
+        """Init."""
+        self.namespace = namespace
+
+    def get(self, key):
+        """Get entry."""
+        return None
+
+    def set(self, key, entry):
+        """Store entry."""
+        pass
+
+    def delete(self, key):
+        """Delete entry."""
+        pass
+
+
+class FileBackend(object):
+    """Shared backend keeping JSON serialized entries in files.
+
+    Number of entry files is bounded by cache_size, files stored the
+    longest ago are deleted first.
+    """
+
+    def __init__(self, namespace):
+        """Init."""
+        self.path = os.path.join(CONF.api.cache_dir, namespace)
+        _makedirs(self.path)
+
+    def _prune(self):
+        """Delete entries stored the longest ago beyond cache_size."""
+        try:
+            names = [name for name in os.listdir(self.path)
+                     if _ENTRY_NAME_RE.match(name)]
+        except OSError:
+            return
+        excess = len(names) - CONF.api.cache_size
+        if excess <= 0:
+            return
+        stored = []
+        for name in names:
+            file_name = os.path.join(self.path, name)
+            try:
+                stored.append((os.path.getmtime(file_name), file_name))
+            except OSError:
+                # Entry could be deleted by another worker.
+                pass
+        for _mtime, file_name in sorted(stored)[:excess]:
+            try:
+                os.unlink(file_name)
+            except OSError:
+                pass
+
+    def _get_file_name(self, key):
+        digest = hashlib.sha1(six.text_type(key).encode('utf-8'))
+        return os.path.join(self.path, digest.hexdigest())
+
+    def get(self, key):
+        """Get entry."""
+        try:
+            with open(self._get_file_name(key)) as entry_file:
+                return json.load(entry_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def set(self, key, entry):
+        """Store entry atomically."""
+        fd, tmp_name = tempfile.mkstemp(dir=self.path)
+        try:
+            with os.fdopen(fd, 'w') as entry_file:
+                json.dump(entry, entry_file, default=six.text_type)
+            os.rename(tmp_name, self._get_file_name(key))
+        except (IOError, OSError, TypeError, ValueError) as e:
+            LOG.warning('Unable to store cache entry %s: %s' % (key, e))
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            return
+        self._prune()
+
+    def delete(self, key):
+        """Delete entry."""
+        try:
+            os.unlink(self._get_file_name(key))
+        except OSError:
+            pass
+
+
+_BACKEND_MAPPING = {'memory': MemoryBackend,
+                    'file': FileBackend}
+
+
+class Cache(object):
+    """Cache of API documents.
+
+    Every entry may be stored with a version. Entry is returned only when
+    the requested version matches the stored one, so stale entries left
+    in other workers are never served.
+    """
+
+    def __init__(self, namespace):
+        """Init."""
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._lru = None
+        self._backend = None
+        self._generation = GenerationCounter(namespace)
+
+    @property
+    def lru(self):
+        """In-process LRU created lazily, after config is parsed."""
+        if self._lru is None:
+            self._lru = LRUDict(CONF.api.cache_size)
+        return self._lru
+
+    @property
+    def backend(self):
+        """Shared backend created lazily, after config is parsed."""
+        if self._backend is None:
+            backend_name = CONF.api.cache_backend
+            if backend_name not in _BACKEND_MAPPING:
+                raise ValueError('Invalid cache backend: %s' % backend_name)
+            self._backend = _BACKEND_MAPPING[backend_name](self.namespace)
+        return self._backend
+
+    @staticmethod
+    def _is_valid(entry, version):
+        return (entry is not None and entry['version'] == version and
+                (entry.get('expires_at') is None or
+                 entry['expires_at'] > time.time()))
+
+    def get(self, key, version=None):
+        """Get cached value or None.
+
+        Expired entry or entry of other version is deleted from shared
+        backend.
+        """
+        entry = self.lru.get(key)
+        if not self._is_valid(entry, version):
+            entry = self.backend.get(key)
+            if self._is_valid(entry, version):
+                self.lru.set(key, entry)
+            elif entry is not None:
+                self.backend.delete(key)
+        if self._is_valid(entry, version):
+            self.hits += 1
+            return entry['value']
+        self.misses += 1
+        return None
+
+    def set(self, key, value, version=None, ttl=None):
+        """Store value.
+
+        :param version: Version value should be requested with.
+        :param ttl: Number of seconds value is valid for.
+        """
+        entry = {'version': version, 'value': value,
+                 'expires_at': time.time() + ttl if ttl else None}
+        self.lru.set(key, entry)
+        self.backend.set(key, entry)
+
+    def delete(self, key):
+        """Invalidate cached value."""
+        self.lru.delete(key)
+        self.backend.delete(key)
+
+    def get_generation(self):
+        """Get generation counter of cache namespace.
+
+        Use it as entry version to invalidate all entries at once.
+        """
+        return self._generation.get()
+
+    def bump_generation(self):
+        """Increment generation counter of cache namespace."""
+        return self._generation.bump()
+
+    def clear(self):
+        """Drop entries of in-process LRU and reset metrics."""
+        self.lru.clear()
+        self.hits = self.misses = 0
+
+    def stats(self):
+        """Return hit-rate metrics of cache in current process."""
+        requests = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / requests if requests else 0.0,
+                'size': len(self.lru)}
+
+
+def get_cache(namespace):
+    """Return cache for given namespace."""
+    with _CACHES_LOCK:
+        if namespace not in _CACHES:
+            _CACHES[namespace] = Cache(namespace)
+        return _CACHES[namespace]
+
+
+def set_stats_headers(response, cache, hit):
+    """Add cache hit and hit-rate metrics to response headers."""
+    stats = cache.stats()
+    response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+    response.headers['X-Cache-Hit-Rate'] = '%.3f' % stats['hit_rate']
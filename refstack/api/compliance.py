@@ -0,0 +1,201 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Evaluation of test runs compliance with guidelines.
+
+Uploaded test runs are evaluated by a periodic background check, which
+runs in one worker of the host only.
+"""
+
+import fcntl
+import os
+import tempfile
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+
+from refstack.api import cache
+from refstack.api import constants as const
+from refstack.api import exceptions as api_exc
+from refstack.api import guidelines
+from refstack import db
+
+LOG = log.getLogger(__name__)
+
+COMPLIANCE_OPTS = [
+    cfg.IntOpt('compliance_check_interval',
+               default=60,
+               help='Number of seconds between checks for test runs which '
+                    'are not evaluated against a known guideline yet, such '
+                    'as new uploaded test runs or runs predating a new '
+                    'guideline. They are evaluated in background. Zero '
+                    'value disables the checks.'),
+    cfg.StrOpt('compliance_check_lock_file',
+               default=os.path.join(tempfile.gettempdir(),
+                                    'refstack-compliance.lock'),
+               help='File locked by the worker running compliance checks, '
+                    'so other workers of the host do not run them.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(COMPLIANCE_OPTS, group='api')
+
+# Number of test runs evaluated in one background batch.
+BATCH_SIZE = 100
+
+# Pages of test runs listing, which may be filtered by compliance.
+listing_cache = cache.get_cache('test_runs_listing')
+
+
+def evaluate(guideline, version, results):
+    """Return compliance records of results for every guideline target.
+
+    Compliance with target without required tests is not applicable,
+    it is neither passed nor failed.
+
+    :param guideline: Parsed guideline file.
+    :param version: Guideline version.
+    :param results: Names of tests passed in test run.
+    """
+    results = set(results)
+    targets = list(guideline.get('components', {})) + [const.PLATFORM_TARGET]
+    records = []
+    for target in targets:
+        report = guidelines.build_report(guideline, results, target)
+        records.append({
+            'guideline': version,
+            'target': target,
+            'required_pass_percent': report['required_pass_percent'],
+            'non_flag_pass_percent': report['non_flag_required_pass_percent'],
+            'passed': (report['non_flag_pass_count'] ==
+                       report['total_non_flag_count']
+                       if report['required_pass_percent'] is not None
+                       else None)
+        })
+    return records
+
+
+def evaluate_test(test_id, results=None, versions=None):
+    """Evaluate test run against guidelines and store compliance records.
+
+    Guidelines which can't be retrieved or parsed are skipped, so test
+    run is evaluated against them by background check later.
+
+    :param test_id: The ID of the test.
+    :param results: Names of tests passed in test run. They are loaded
+                    from database if not specified.
+    :param versions: Guideline versions. All known guidelines are used
+                     if not specified.
+    :returns: Stored compliance records.
+    """
+    if versions is None:
+        try:
+            versions = guidelines.list_guidelines()
+        except api_exc.GuidelineUnavailable as e:
+            LOG.warning('Unable to evaluate compliance of test run %s: %s'
+                        % (test_id, e))
+            return []
+    if results is None:
+        results = [test_dict['name']
+                   for test_dict in db.get_test_results(test_id)]
+
+    records = []
+    for version in versions:
+        try:
+            guideline = guidelines.get_guideline(version)
+            records.extend(evaluate(guideline, version, results))
+        except (api_exc.GuidelineUnavailable, ValueError) as e:
+            LOG.warning('Unable to evaluate compliance of test run %s '
+                        'with guideline %s: %s' % (test_id, version, e))
+    db.save_test_compliance(test_id, records)
+    return records
+
+
+def evaluate_new_guidelines():
+    """Evaluate test runs not evaluated against known guidelines yet.
+
+    Cached listing pages are invalidated after every evaluated batch.
+    """
+    for version in guidelines.list_guidelines():
+        try:
+            guidelines.get_guideline(version)
+        except (api_exc.GuidelineUnavailable, ValueError) as e:
+            LOG.debug('Skipping compliance check of guideline %s: %s'
+                      % (version, e))
+            continue
+        while True:
+            test_ids = db.get_test_ids_without_compliance(version,
+                                                          BATCH_SIZE)
+            if not test_ids:
+                break
+            LOG.info('Evaluating %s test runs against guideline %s'
+                     % (len(test_ids), version))
+            try:
+                for test_id in test_ids:
+                    if not evaluate_test(test_id, versions=[version]):
+                        # Guideline became unavailable, retry on next
+                        # check.
+                        return
+            finally:
+                listing_cache.bump_generation()
+
+
+def _lock_checks():
+    """Lock compliance checks for current process.
+
+    :returns: Locked file, which is kept open while process runs checks,
+              or None if checks are locked by another process.
+    """
+    try:
+        lock_file = open(CONF.api.compliance_check_lock_file, 'a')
+    except (IOError, OSError) as e:
+        LOG.warning('Unable to open compliance check lock file: %s' % e)
+        return None
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except (IOError, OSError):
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def _check_guidelines():
+    lock_file = None
+    while True:
+        if lock_file is None:
+            # Lock is released when its holder exits, so checks are
+            # taken over by another worker.
+            lock_file = _lock_checks()
+        if lock_file is not None:
+            try:
+                evaluate_new_guidelines()
+            except Exception:
+                LOG.exception('Background compliance check failed')
+        time.sleep(CONF.api.compliance_check_interval)
+
+
+def start_background_check():
+    """Start periodic compliance check of test runs in background.
+
+    Check runs in every worker, but evaluates test runs only in the one
+    holding the lock of compliance checks.
+    """
+    if CONF.api.compliance_check_interval <= 0:
+        return
+    thread = threading.Thread(target=_check_guidelines)
+    thread.daemon = True
+    thread.start()
@@ -19,9 +19,35 @@ START_DATE = 'start_date'
 END_DATE = 'end_date'
 CPID = 'cpid'
 PAGE = 'page'
+PER_PAGE = 'per_page'
+FIELDS = 'fields'
+CURSOR = 'cursor'
+SINCE = 'since'
+LIMIT = 'limit'
+WITH_RESULTS = 'with_results'
+STATUS = 'status'
 SIGNED = 'signed'
+COMPLIANT = 'compliant'
+SORT = 'sort'
 OPENID = 'openid'
 USER_PUBKEYS = 'pubkeys'
+GUIDELINE = 'guideline'
+TARGET = 'target'
+TEST_ID = 'test_id'
+TEST_IDS = 'test_ids'
+COLUMNS = 'columns'
+FORMAT = 'format'
+PERIOD = 'period'
+SIMILAR_COUNT = 'k'
+NAME_PREFIX = 'name_prefix'
+CONTAINS = 'contains'
+
+# Guideline target comprised of several components
+PLATFORM_TARGET = 'platform'
+
+# Listing of test runs compliant with guideline is sorted by compliance
+# with sort=compliance.
+SORT_COMPLIANCE = 'compliance'
 
 # OpenID parameters
 OPENID_MODE = 'openid.mode'
@@ -44,6 +70,28 @@ USER_OPENID = 'user_openid'
 PUBLIC_KEY = 'public_key'
 SHARED_TEST_RUN = 'shared'
 
+# Key of metadata value kept in blob store, which maps it to blob digest
+# in documents of test runs.
+META_BLOB = 'blob'
+
+# Periods of upload activity buckets
+PERIOD_HOUR = 'hour'
+PERIOD_DAY = 'day'
+PERIOD_WEEK = 'week'
+PERIODS = (PERIOD_HOUR, PERIOD_DAY, PERIOD_WEEK)
+
+# Visibility of test runs
+VISIBILITY_PUBLIC = 'public'
+VISIBILITY_SIGNED = 'signed'
+
+# Operations of change log
+CHANGE_CREATE = 'create'
+CHANGE_UPDATE = 'update'
+CHANGE_DELETE = 'delete'
+
+# Events of server-sent events streams
+UPLOAD_EVENT = 'upload'
+
 # Roles
 ROLE_USER = 'user'
 ROLE_OWNER = 'owner'
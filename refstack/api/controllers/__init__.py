@@ -23,6 +23,72 @@ CTRLS_OPTS = [
     cfg.IntOpt('results_per_page',
                default=20,
                help='Number of results for one page'),
+    cfg.IntOpt('results_max_per_page',
+               default=100,
+               help='Maximum number of results for one page requested '
+                    'with %(per_page)s parameter' % {
+                        'per_page': const.PER_PAGE
+                    }),
+    cfg.IntOpt('results_listing_cache_ttl',
+               default=30,
+               help='Number of seconds pages of test results listing '
+                    'and slowest tests requested without %(signed)s '
+                    'parameter are cached for. '
+                    'Cached pages are also invalidated when test results '
+                    'are uploaded or deleted, or their metadata changes. '
+                    'Zero value disables caching.' % {
+                        'signed': const.SIGNED
+                    }),
+    cfg.IntOpt('matrix_max_runs',
+               default=500,
+               help='Maximum number of test runs in interoperability '
+                    'matrix.'),
+    cfg.IntOpt('slowest_tests_max_runs',
+               default=500,
+               help='Maximum number of the most recent test runs durations '
+                    'of slowest tests are aggregated across.'),
+    cfg.IntOpt('slowest_tests_default_days',
+               default=30,
+               help='Number of days before the end date slowest tests are '
+                    'aggregated across when %(start)s parameter is not '
+                    'given.' % {'start': const.START_DATE}),
+    cfg.IntOpt('results_batch_max_size',
+               default=100,
+               help='Maximum number of test runs requested with a single '
+                    'batch request.'),
+    cfg.IntOpt('changes_max_limit',
+               default=1000,
+               help='Maximum number of changes returned by a single '
+                    'request of change feed.'),
+    cfg.IntOpt('changes_settle_seconds',
+               default=5,
+               help='Changes of test runs are listed in change feed this '
+                    'number of seconds after they are logged. Concurrent '
+                    'transactions may commit changes out of order, so '
+                    'the most recent changes are held back until earlier '
+                    'ones are committed. This is best-effort only, a '
+                    'change committed later than this after it was '
+                    'logged is missed by readers of later changes.'),
+    cfg.IntOpt('similar_max_count',
+               default=100,
+               help='Maximum number of similar test runs returned for a '
+                    'test run.'),
+    cfg.IntOpt('similar_max_candidates',
+               default=1000,
+               help='Maximum number of test runs compared with a test run '
+                    'when similar test runs are searched.'),
+    cfg.IntOpt('core_test_risk_threshold',
+               default=50,
+               help='Core tests passed by a lower percent of clouds are '
+                    'reported as at risk.'),
+    cfg.IntOpt('non_core_test_candidate_threshold',
+               default=80,
+               help='Non-core tests passed by a higher percent of clouds '
+                    'are reported as candidates for core tests.'),
+    cfg.IntOpt('upload_activity_max_buckets',
+               default=1000,
+               help='Maximum number of periods in upload activity '
+                    'statistics.'),
     cfg.StrOpt('input_date_format',
                default='%Y-%m-%d %H:%M:%S',
                help='The format for %(start)s and %(end)s parameters' % {
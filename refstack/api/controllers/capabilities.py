@@ -15,49 +15,73 @@
 
 """Defcore capabilities controller."""
 
+import json
+
 from oslo_config import cfg
 from oslo_log import log
 import pecan
 from pecan import rest
-import re
 import requests
-import requests_cache
+
+from refstack.api import exceptions as api_exc
+from refstack.api import guidelines
 
 CONF = cfg.CONF
 LOG = log.getLogger(__name__)
 
-# Cached requests will expire after 10 minutes.
-requests_cache.install_cache(cache_name='github_cache',
-                             backend='memory',
-                             expire_after=600)
+
+class TestIndexController(rest.RestController):
+    """/v1/capabilities/<version>/index handler.
+
+    Maps each test of the guideline to the capabilities it belongs to.
+    """
+
+    @pecan.expose('json')
+    def get(self, version):
+        """Get test index of guideline."""
+        try:
+            return guidelines.get_test_index(version)
+        except api_exc.GuidelineUnavailable as e:
+            pecan.abort(e.status_code)
+        except ValueError as e:
+            pecan.abort(400, str(e))
 
 
 class CapabilitiesController(rest.RestController):
     """/v1/capabilities handler.
 
     This acts as a proxy for retrieving capability files
-    from the openstack/defcore Github repository.
+    from the openstack/defcore Github repository. Retrieved files
+    are cached in a store shared by all API workers.
+    If local capabilities directory is configured, files are
+    served from it instead.
     """
 
+    index = TestIndexController()
+
     @pecan.expose('json')
     def get(self):
         """Get a list of all available capabilities."""
+        local_guidelines = guidelines.get_local_guidelines()
+        if local_guidelines:
+            return local_guidelines.list_files()
         try:
-            response = requests.get(CONF.api.github_api_capabilities_url)
-            LOG.debug("Response Status: %s / Used Requests Cache: %s" %
-                      (response.status_code,
-                       getattr(response, 'from_cache', False)))
-            if response.status_code == 200:
-                regex = re.compile('^[0-9]{4}\.[0-9]{2}\.json$')
+            result = guidelines.capabilities_store.fetch(
+                CONF.api.github_api_capabilities_url)
+            guidelines.set_fetch_headers(pecan.response, result)
+            LOG.debug("Response Status: %s / Cache: %s" %
+                      (result.status_code, result.cache_state))
+            if result.status_code == 200:
+                regex = guidelines.CAPABILITY_FILE_REGEX
                 capability_files = []
-                for rfile in response.json():
+                for rfile in json.loads(result.body.decode('utf-8')):
                     if rfile["type"] == "file" and regex.search(rfile["name"]):
                         capability_files.append(rfile["name"])
                 return capability_files
             else:
                 LOG.warning('Github returned non-success HTTP '
-                            'code: %s' % response.status_code)
-                pecan.abort(response.status_code)
+                            'code: %s' % result.status_code)
+                pecan.abort(result.status_code)
 
         except requests.exceptions.RequestException as e:
             LOG.warning('An error occurred trying to get GitHub '
@@ -67,19 +91,27 @@ class CapabilitiesController(rest.RestController):
     @pecan.expose('json')
     def get_one(self, file_name):
         """Handler for getting contents of specific capability file."""
-        github_url = ''.join((CONF.api.github_raw_base_url.rstrip('/'),
-                              '/', file_name, ".json"))
+        local_guidelines = guidelines.get_local_guidelines()
+        if local_guidelines:
+            body = local_guidelines.get_file_bytes(file_name + '.json')
+            if body is None:
+                pecan.abort(404)
+            pecan.response.content_type = 'application/json'
+            pecan.response.body = body
+            return pecan.response
+
+        github_url = guidelines.get_guideline_url(file_name)
         try:
-            response = requests.get(github_url)
-            LOG.debug("Response Status: %s / Used Requests Cache: %s" %
-                      (response.status_code,
-                       getattr(response, 'from_cache', False)))
-            if response.status_code == 200:
-                return response.json()
+            result = guidelines.capabilities_store.fetch(github_url)
+            guidelines.set_fetch_headers(pecan.response, result)
+            LOG.debug("Response Status: %s / Cache: %s" %
+                      (result.status_code, result.cache_state))
+            if result.status_code == 200:
+                return json.loads(result.body.decode('utf-8'))
             else:
                 LOG.warning('Github returned non-success HTTP '
-                            'code: %s' % response.status_code)
-                pecan.abort(response.status_code)
+                            'code: %s' % result.status_code)
+                pecan.abort(result.status_code)
         except requests.exceptions.RequestException as e:
             LOG.warning('An error occurred trying to get GitHub '
                         'capability file contents: %s' % e)
@@ -0,0 +1,67 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Change feed controller."""
+
+import datetime
+
+from oslo_config import cfg
+from oslo_utils import timeutils
+import pecan
+from pecan import rest
+
+from refstack.api import constants as const
+from refstack import db
+
+CONF = cfg.CONF
+
+DEFAULT_LIMIT = 100
+
+
+class ChangesController(rest.RestController):
+    """/v1/changes handler."""
+
+    @pecan.expose('json')
+    def get(self):
+        """Get changes of test runs in order they were logged.
+
+        Test run is created, updated when its metadata is changed, or
+        deleted. Only changes of public test runs are listed, a run made
+        public is listed as created and a run made private as deleted.
+        Cursor of the last received change
+        is passed to get the following changes, for example:
+            /v1/changes?since=<cursor>&limit=100
+        """
+        params = pecan.request.GET
+        try:
+            since = int(params.get(const.SINCE, 0))
+            limit = int(params.get(const.LIMIT, DEFAULT_LIMIT))
+        except ValueError:
+            pecan.abort(400, 'Parameters %s and %s must be integers.'
+                        % (const.SINCE, const.LIMIT))
+        if since < 0:
+            pecan.abort(400, 'Parameter %s must not be negative.'
+                        % const.SINCE)
+        if not 0 < limit <= CONF.api.changes_max_limit:
+            pecan.abort(400, 'Parameter %s must be between 1 and %s.'
+                        % (const.LIMIT, CONF.api.changes_max_limit))
+
+        until = None
+        if CONF.api.changes_settle_seconds > 0:
+            until = timeutils.utcnow() - datetime.timedelta(
+                seconds=CONF.api.changes_settle_seconds)
+        changes = db.get_changes(since, limit, until)
+        return {'changes': changes,
+                'cursor': changes[-1]['cursor'] if changes else since}
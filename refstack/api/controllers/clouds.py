@@ -0,0 +1,80 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Clouds controller."""
+
+import pecan
+from pecan import rest
+
+from refstack.api import constants as const
+from refstack.api import exceptions as api_exc
+from refstack.api import guidelines
+from refstack.api import utils as api_utils
+from refstack import db
+
+# Test runs filters supported by clouds handlers.
+RUNS_FILTERS = [const.START_DATE, const.END_DATE, const.SIGNED]
+
+
+class TrendController(rest.RestController):
+    """/v1/clouds/<cpid>/trend handler."""
+
+    @pecan.expose('json')
+    def get(self, cpid):
+        """Get history of cloud test runs.
+
+        Every test run is summarized by number of passed tests. If
+        guideline is specified, compliance of test runs with guideline
+        target is added. Public test runs are used by default, and signed
+        test runs of current user with signed=true.
+        For example:
+            /v1/clouds/<cpid>/trend?guideline=2015.07&target=platform
+        """
+        filters = api_utils.parse_input_params(RUNS_FILTERS)
+        version = pecan.request.GET.get(const.GUIDELINE)
+        target = pecan.request.GET.get(const.TARGET, const.PLATFORM_TARGET)
+        if version:
+            try:
+                guideline = guidelines.get_guideline(version)
+            except api_exc.GuidelineUnavailable as e:
+                pecan.abort(e.status_code)
+            except ValueError as e:
+                pecan.abort(400, str(e))
+            if (target != const.PLATFORM_TARGET and
+                    target not in guideline.get('components', {})):
+                pecan.abort(400, 'Unknown target: %s' % target)
+
+        trend = {'cpid': cpid,
+                 'runs': db.get_cloud_trend(cpid, filters, version, target)}
+        if version:
+            trend.update({'guideline': version, 'target': target})
+        api_utils.check_not_modified(api_utils.get_content_etag(trend))
+        return trend
+
+
+class CloudsController(rest.RestController):
+    """/v1/clouds handler."""
+
+    trend = TrendController()
+
+    @pecan.expose('json')
+    def get_one(self, cpid):
+        """Get number of cloud test runs."""
+        filters = api_utils.parse_input_params(RUNS_FILTERS)
+        filters[const.CPID] = cpid
+        runs_count = db.get_test_records_count(filters)
+        if not runs_count:
+            pecan.abort(404, 'No test runs of cloud %s found.' % cpid)
+        return {'cpid': cpid, 'runs': runs_count}
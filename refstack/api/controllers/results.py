@@ -15,14 +15,32 @@
 
 """Test results controller."""
 
+import datetime
+import itertools
+import json
+
 from oslo_config import cfg
 from oslo_log import log
+from oslo_utils import strutils
+from oslo_utils import timeutils
 import pecan
 from pecan import rest
+import six
 from six.moves.urllib import parse
 
 from refstack import db
+from refstack.api import blobs
+from refstack.api import cache
+from refstack.api import events
 from refstack.api import constants as const
+from refstack.api import exceptions as api_exc
+from refstack.api import export as results_export
+from refstack.api import guidelines
+from refstack.api import matrix as interop_matrix
+from refstack.api import name_index
+from refstack.api import outcomes
+from refstack.api import similarity
+from refstack.api import subunit
 from refstack.api import utils as api_utils
 from refstack.api import validators
 from refstack.api.controllers import validation
@@ -31,6 +49,35 @@ LOG = log.getLogger(__name__)
 
 CONF = cfg.CONF
 
+# Test run documents without the per-viewer 'user_role' field.
+test_runs_cache = cache.get_cache('test_runs')
+# Pages of test runs listing versioned by results generation counter.
+listing_cache = cache.get_cache('test_runs_listing')
+# Compliance reports versioned by digest of guideline file.
+reports_cache = cache.get_cache('test_run_reports')
+# Diffs of test runs, results of test runs never change.
+diffs_cache = cache.get_cache('test_run_diffs')
+# Slowest tests versioned by results generation counter.
+slowest_cache = cache.get_cache('slowest_tests')
+
+# Maximum size of metadata value column in bytes.
+META_VALUE_MAX_SIZE = 65535
+
+SLOWEST_TESTS_DEFAULT_LIMIT = 20
+SLOWEST_TESTS_MAX_LIMIT = 1000
+
+
+def _stream_blob(digest, content_type):
+    """Stream content of blob as response."""
+    try:
+        app_iter = blobs.iter_blob(digest)
+    except blobs.BlobNotFound as e:
+        LOG.error('Blob store is inconsistent with database: %s' % e)
+        pecan.abort(404, 'Content is not available.')
+    pecan.response.content_type = content_type
+    pecan.response.app_iter = app_iter
+    return pecan.response
+
 
 @api_utils.check_permissions(level=const.ROLE_USER)
 class MetadataController(rest.RestController):
@@ -40,20 +87,55 @@ class MetadataController(rest.RestController):
 
     @pecan.expose('json')
     def get(self, test_id):
-        """Get test run metadata."""
+        """Get test run metadata.
+
+        Value kept in blob store is given by digest of the blob as
+        {"blob": "<digest>"}, the value itself is got by its key.
+        """
+        test_version = db.get_test_version(test_id)
+        api_utils.check_not_modified(
+            api_utils.get_test_run_etag(test_version),
+            test_version['updated_at'] or test_version['created_at'])
         test_info = db.get_test(test_id)
         return test_info['meta']
 
     @pecan.expose('json')
     def get_one(self, test_id, key):
-        """Get value for key from test run metadata."""
+        """Get value for key from test run metadata.
+
+        Value kept in blob store is streamed as is.
+        """
+        digest = db.get_test_meta_blob_digest(test_id, key)
+        if digest:
+            return _stream_blob(digest, 'application/octet-stream')
         return db.get_test_meta_key(test_id, key)
 
     @api_utils.check_permissions(level=const.ROLE_OWNER)
     @pecan.expose('json')
     def post(self, test_id, key):
-        """Save value for key in test run metadata."""
-        db.save_test_meta_item(test_id, key, pecan.request.body)
+        """Save value for key in test run metadata.
+
+        Values longer than blob_meta_threshold are kept in blob store,
+        or in the database if blob store is unavailable.
+        """
+        value = pecan.request.body
+        blob_digest = None
+        if len(value) > CONF.api.blob_meta_threshold:
+            try:
+                blob_digest = blobs.put(value)
+            except (IOError, OSError) as e:
+                LOG.warning('Metadata value is stored in the database, '
+                            'blob store is unavailable: %s' % e)
+                if len(value) > META_VALUE_MAX_SIZE:
+                    pecan.abort(503, 'Blob store is unavailable.')
+        if blob_digest:
+            db.save_test_meta_item(test_id, key, None,
+                                   blob_digest=blob_digest)
+        else:
+            db.save_test_meta_item(test_id, key, value)
+        test_runs_cache.delete(test_id)
+        # Listed test runs embed their metadata.
+        listing_cache.bump_generation()
         pecan.response.status = 201
 
     @api_utils.check_permissions(level=const.ROLE_OWNER)
@@ -61,33 +143,298 @@ class MetadataController(rest.RestController):
     def delete(self, test_id, key):
         """Delete key from test run metadata."""
         db.delete_test_meta_item(test_id, key)
+        test_runs_cache.delete(test_id)
+        listing_cache.bump_generation()
         pecan.response.status = 204
 
 
+class UploadController(rest.RestController):
+    """/v1/results/<test_id>/upload handler."""
+
+    @api_utils.check_permissions(level=const.ROLE_OWNER)
+    @pecan.expose()
+    def get(self, test_id):
+        """Stream raw payload of uploaded test run."""
+        digest = db.get_test_upload_digest(test_id)
+        if not digest:
+            pecan.abort(404, 'Raw upload of test run %s '
+                             'is not stored.' % test_id)
+        response = _stream_blob(digest, 'application/json')
+        # Test run is uploaded either as JSON or as subunit stream.
+        first_chunk = next(response.app_iter, b'')
+        if subunit.is_stream(first_chunk):
+            response.content_type = subunit.CONTENT_TYPE
+        response.app_iter = itertools.chain([first_chunk], response.app_iter)
+        return response
+
+
+@api_utils.check_permissions(level=const.ROLE_USER)
+class OutcomesController(rest.RestController):
+    """/v1/results/<test_id>/outcomes handler."""
+
+    @pecan.expose('json')
+    def get(self, test_id):
+        """Get outcomes of all tests of test run with their durations.
+
+        Outcomes may be filtered by status, for example:
+            /v1/results/<test_id>/outcomes?status=fail
+        Durations are in seconds, null if unknown.
+        """
+        status = pecan.request.GET.get(const.STATUS)
+        if status is not None and status not in outcomes.STATUSES:
+            pecan.abort(400, 'Parameter %s must be one of: %s.'
+                        % (const.STATUS, ', '.join(outcomes.STATUSES)))
+        db.get_test_version(test_id)
+        return {'outcomes': db.get_test_outcomes(test_id, status)}
+
+
+@api_utils.check_permissions(level=const.ROLE_USER)
+class ReportController(rest.RestController):
+    """/v1/results/<test_id>/report handler."""
+
+    @pecan.expose('json')
+    def get(self, test_id):
+        """Get compliance report of test run against guideline.
+
+        For example:
+            /v1/results/<test_id>/report?guideline=2015.07&target=platform
+        Target is set to platform if it is not specified.
+        """
+        version = pecan.request.GET.get(const.GUIDELINE)
+        target = pecan.request.GET.get(const.TARGET,
+                                       const.PLATFORM_TARGET)
+        if not version:
+            pecan.abort(400, 'Guideline is not specified.')
+        db.get_test_version(test_id)
+        try:
+            parsed = guidelines.get_parsed_guideline(version)
+        except api_exc.GuidelineUnavailable as e:
+            pecan.abort(e.status_code)
+        except ValueError as e:
+            pecan.abort(400, str(e))
+
+        cache_key = json.dumps([test_id, version, target])
+        report = reports_cache.get(cache_key, version=parsed['digest'])
+        cache.set_stats_headers(pecan.response, reports_cache,
+                                hit=report is not None)
+        if report is None:
+            results = [test_dict['name']
+                       for test_dict in db.get_test_results(test_id)]
+            try:
+                report = guidelines.build_report(parsed['guideline'],
+                                                 results, target)
+            except ValueError as e:
+                pecan.abort(400, str(e))
+            reports_cache.set(cache_key, report, version=parsed['digest'])
+        return report
+
+
+@api_utils.check_permissions(level=const.ROLE_USER)
+class DiffController(rest.RestController):
+    """/v1/results/<test_id>/diff/<other_test_id> handler."""
+
+    @pecan.expose('json')
+    def get_one(self, test_id, other_test_id):
+        """Get tests added and removed in other test run.
+
+        If guideline is specified, added and removed tests are
+        attributed to capabilities of the guideline.
+        For example:
+            /v1/results/<test_id>/diff/<other_test_id>?guideline=2015.07
+        """
+        api_utils.enforce_permissions(other_test_id, const.ROLE_USER)
+        db.get_test_version(test_id)
+        db.get_test_version(other_test_id)
+        version = pecan.request.GET.get(const.GUIDELINE)
+        digest = None
+        if version:
+            try:
+                parsed = guidelines.get_parsed_guideline(version)
+            except api_exc.GuidelineUnavailable as e:
+                pecan.abort(e.status_code)
+            except ValueError as e:
+                pecan.abort(400, str(e))
+            digest = parsed['digest']
+
+        cache_key = json.dumps([test_id, other_test_id, version])
+        diff = diffs_cache.get(cache_key, version=digest)
+        cache.set_stats_headers(pecan.response, diffs_cache,
+                                hit=diff is not None)
+        if diff is None:
+            results = set(test_dict['name'] for test_dict
+                          in db.get_test_results(test_id))
+            other_results = set(test_dict['name'] for test_dict
+                                in db.get_test_results(other_test_id))
+            diff = {'added': sorted(other_results - results),
+                    'removed': sorted(results - other_results),
+                    'common': sorted(results & other_results)}
+            if version:
+                diff['capabilities'] = {
+                    'added': guidelines.get_test_capabilities(
+                        parsed['index'], diff['added']),
+                    'removed': guidelines.get_test_capabilities(
+                        parsed['index'], diff['removed'])}
+            diffs_cache.set(cache_key, diff, version=digest)
+        return diff
+
+
+@api_utils.check_permissions(level=const.ROLE_USER)
+class SimilarController(rest.RestController):
+    """/v1/results/<test_id>/similar handler."""
+
+    @pecan.expose('json')
+    def get(self, test_id):
+        """Get test runs with the most similar passed tests.
+
+        Similarity is Jaccard similarity of passed tests estimated by
+        MinHash signatures. Public test runs are searched by default,
+        and signed test runs of current user with signed=true.
+        For example:
+            /v1/results/<test_id>/similar?k=10
+        """
+        try:
+            count = int(pecan.request.GET.get(const.SIMILAR_COUNT, 10))
+        except ValueError:
+            count = 0
+        if not 0 < count <= CONF.api.similar_max_count:
+            pecan.abort(400, 'Parameter %s must be between 1 and %s.'
+                        % (const.SIMILAR_COUNT, CONF.api.similar_max_count))
+        filters = api_utils.parse_input_params([const.SIGNED])
+        db.get_test_version(test_id)
+        similar_runs = similarity.find_similar(
+            test_id, count, filters, CONF.api.similar_max_candidates)
+        for run in similar_runs:
+            run['url'] = parse.urljoin(
+                CONF.ui_url, CONF.api.test_results_url) % run['id']
+        return {'test_id': test_id, 'similar': similar_runs}
+
+
 class ResultsController(validation.BaseRestControllerWithValidation):
     """/v1/results handler."""
 
+    # Fields of test run which may be requested with fields parameter.
+    TEST_RUN_FIELDS = ('id', 'cpid', 'created_at', 'duration_seconds',
+                       'meta', 'results', 'user_role')
+    # Fields of listed test runs which may be requested.
+    LISTING_FIELDS = ('id', 'created_at', 'duration_seconds', 'meta', 'url')
+
     __validator__ = validators.TestResultValidator
 
+    _custom_actions = dict(
+        validation.BaseRestControllerWithValidation._custom_actions,
+        matrix=['GET'],
+        latest=['GET'],
+        batch=['POST'],
+        export=['GET'],
+        stream=['GET'],
+        slowest=['GET'])
+
     meta = MetadataController()
+    report = ReportController()
+    diff = DiffController()
+    similar = SimilarController()
+    upload = UploadController()
+    outcomes = OutcomesController()
 
     @pecan.expose('json')
     @api_utils.check_permissions(level=const.ROLE_USER)
     def get_one(self, test_id):
-        """Handler for getting item."""
-        if api_utils.get_user_role(test_id) == const.ROLE_OWNER:
-            test_info = db.get_test(
-                test_id, allowed_keys=['id', 'cpid', 'created_at',
-                                       'duration_seconds', 'meta']
-            )
+        """Handler for getting item.
+
+        Passed tests may be filtered by name, for example:
+            /v1/results/<test_id>?name_prefix=tempest.api.compute
+            /v1/results/<test_id>?contains=volume
+        Only some fields of test run are returned with, for example:
+            /v1/results/<test_id>?fields=id,created_at
+        """
+        fields = api_utils.get_fields(self.TEST_RUN_FIELDS)
+        name_prefix = pecan.request.GET.get(const.NAME_PREFIX)
+        contains = pecan.request.GET.get(const.CONTAINS)
+        if (contains and not name_prefix and
+                len(contains) < name_index.TRIGRAM_LENGTH):
+            # Search of short substring would scan all known names.
+            pecan.abort(400, 'Parameter %s must be at least %s characters '
+                             'long unless %s is given.'
+                        % (const.CONTAINS, name_index.TRIGRAM_LENGTH,
+                           const.NAME_PREFIX))
+        user_role = api_utils.get_user_role(test_id)
+        test_version = db.get_test_version(test_id)
+        api_utils.check_not_modified(
+            api_utils.get_test_run_etag(test_version, user_role),
+            test_version['updated_at'] or test_version['created_at'])
+        prefix_filtered = False
+        if fields is not None and 'results' not in fields:
+            # Results are neither loaded nor cached.
+            test_info = db.get_test_fields(
+                test_id, [field for field in fields if field != 'user_role'])
         else:
-            test_info = db.get_test(test_id)
-        test_list = db.get_test_results(test_id)
-        test_name_list = [test_dict['name'] for test_dict in test_list]
-        test_info.update({'results': test_name_list,
-                          'user_role': api_utils.get_user_role(test_id)})
+            test_info, prefix_filtered = self._get_test_info(
+                test_id, test_version['meta_version'], name_prefix)
+        test_info = dict(test_info)
+        if prefix_filtered:
+            test_info['results'] = sorted(
+                name for name in test_info['results']
+                if not contains or contains in name)
+        elif 'results' in test_info and (name_prefix or contains):
+            test_info['results'] = name_index.filter_tests(
+                test_id, test_info['results'], name_prefix, contains)
+        if user_role != const.ROLE_OWNER:
+            test_info.pop('cpid', None)
+        test_info['user_role'] = user_role
+        if fields is not None:
+            test_info = dict((field, test_info[field]) for field in fields
+                             if field in test_info)
         return test_info
 
+    def _get_test_info(self, test_id, meta_version, name_prefix=None):
+        """Get all fields of test run with passed tests.
+
+        Passed tests of test run missing in cache are filtered by name
+        prefix in the database, and the test run is not cached then.
+        :returns: Tuple of test run and whether its passed tests are
+                  filtered by name prefix.
+        """
+        test_info = test_runs_cache.get(test_id, meta_version)
+        cache.set_stats_headers(pecan.response, test_runs_cache,
+                                hit=test_info is not None)
+        if test_info is not None:
+            return test_info, False
+        test_info = db.get_test(
+            test_id, allowed_keys=['id', 'cpid', 'created_at',
+                                   'duration_seconds', 'meta']
+        )
+        test_list = db.get_test_results(test_id, name_prefix)
+        test_info['results'] = [test_dict['name']
+                                for test_dict in test_list]
+        if not name_prefix:
+            test_runs_cache.set(test_id, test_info, meta_version)
+        return test_info, bool(name_prefix)
+
+    @pecan.expose('json')
+    def post(self):
+        """Upload test run.
+
+        Test run is uploaded as JSON document, or as subunit v2 stream
+        with Content-Type: application/x-subunit. Cloud id of subunit
+        stream is given in cpid parameter, for example:
+            /v1/results?cpid=1234
+        Signature of subunit stream is the signature of the stream itself.
+        """
+        if pecan.request.content_type != subunit.CONTENT_TYPE:
+            return super(ResultsController, self).post()
+        cpid = pecan.request.GET.get(const.CPID)
+        if not cpid:
+            pecan.abort(400, 'Cloud id is not specified.')
+        try:
+            test = subunit.parse_results(pecan.request.body_file_seekable)
+        except ValueError as e:
+            raise api_exc.ValidationError('Malformed subunit stream', e)
+        test['cpid'] = cpid
+        self.validator.validate_subunit(pecan.request, test)
+        item_id = self.store_item(test)
+        pecan.response.status = 201
+        return item_id
+
     def store_item(self, test):
         """Handler for storing item. Should return new item id."""
         test_ = test.copy()
@@ -96,17 +443,46 @@ class ResultsController(validation.BaseRestControllerWithValidation):
                 test_['meta'] = {}
             test_['meta'][const.PUBLIC_KEY] = \
                 pecan.request.headers.get('X-Public-Key')
+        if CONF.api.store_raw_uploads:
+            try:
+                test_['upload_digest'] = blobs.put(pecan.request.body)
+            except (IOError, OSError) as e:
+                LOG.warning('Raw upload is not stored: %s' % e)
         test_id = db.store_results(test_)
+        listing_cache.bump_generation()
+        passed = [result['name'] for result in test_.get('results', [])
+                  if outcomes.is_passed(result)]
+        # Compliance of test run is evaluated by background check, as
+        # guidelines may have to be fetched from GitHub.
+        try:
+            similarity.index_test(test_id, passed)
+        except Exception as e:
+            # Signature is stored on first search of similar test runs.
+            LOG.warning('Similarity indexing of test run %s '
+                        'failed: %s' % (test_id, e))
+        url = parse.urljoin(CONF.ui_url, CONF.api.test_results_url) % test_id
+        if const.PUBLIC_KEY not in test_.get('meta', {}):
+            # Signed test runs are not visible to stream clients.
+            try:
+                test_version = db.get_test_version(test_id)
+                events.publish(const.UPLOAD_EVENT, {
+                    'id': test_id,
+                    'created_at': test_version['created_at'],
+                    'duration_seconds': test_.get('duration_seconds'),
+                    'url': url})
+            except Exception as e:
+                LOG.warning('Upload event of test run %s was not '
+                            'published: %s' % (test_id, e))
         LOG.debug(test_)
-        return {'test_id': test_id,
-                'url': parse.urljoin(CONF.ui_url,
-                                     CONF.api.test_results_url) % test_id}
+        return {'test_id': test_id, 'url': url}
 
     @pecan.expose('json')
     @api_utils.check_permissions(level=const.ROLE_OWNER)
     def delete(self, test_id):
         """Delete test run."""
         db.delete_test(test_id)
+        test_runs_cache.delete(test_id)
+        listing_cache.bump_generation()
         pecan.response.status = 204
 
     @pecan.expose('json')
@@ -118,29 +494,316 @@ class ResultsController(validation.BaseRestControllerWithValidation):
         input parameters for filtering.
         For example:
             /v1/results?page=<page number>&cpid=1234.
+        Runs compliant with a guideline target are listed with
+            /v1/results?compliant=2015.07:platform.
+        and sorted by their required pass percent with
+            /v1/results?compliant=2015.07:platform&sort=compliance.
         By default, page is set to page number 1,
         if the page parameter is not specified.
+        Number of results for one page and fields of results may be
+        requested, for example:
+            /v1/results?per_page=100&fields=id,created_at
         """
         expected_input_params = [
             const.START_DATE,
             const.END_DATE,
             const.CPID,
-            const.SIGNED
+            const.SIGNED,
+            const.COMPLIANT,
+            const.SORT
         ]
 
         filters = api_utils.parse_input_params(expected_input_params)
-        records_count = db.get_test_records_count(filters)
+        per_page = api_utils.get_per_page()
+        fields = api_utils.get_fields(self.LISTING_FIELDS)
+        cache_ttl = CONF.api.results_listing_cache_ttl
+        if const.SIGNED in filters or cache_ttl <= 0:
+            page = self._get_results_page(filters, per_page, fields)
+        else:
+            # Results generation is read before the page is built, so
+            # changes made in the meantime invalidate the cached page.
+            generation = listing_cache.get_generation()
+            cache_key = json.dumps(
+                [sorted(filters.items()), pecan.request.GET.get(const.PAGE),
+                 per_page, fields],
+                default=six.text_type)
+            page = listing_cache.get(cache_key, version=generation)
+            cache.set_stats_headers(pecan.response, listing_cache,
+                                    hit=page is not None)
+            if page is None:
+                page = self._get_results_page(filters, per_page, fields)
+                listing_cache.set(cache_key, page, version=generation,
+                                  ttl=cache_ttl)
+
+        api_utils.check_not_modified(api_utils.get_content_etag(page))
+        return page
+
+    @pecan.expose('json')
+    def matrix(self):
+        """Get interoperability matrix of test runs.
+
+        Rows are test runs given by test_id parameters, or the latest
+        test runs of all clouds if they are not specified. Columns are
+        either capabilities of guideline target or tests.
+        For example:
+            /v1/results/matrix?guideline=2015.07&target=platform
+            /v1/results/matrix?test_id=<id>&test_id=<id>&columns=tests
+        Matrix is returned as JSON unless format=csv is given. If there
+        are more clouds than matrix_max_runs, only their most recent
+        test runs are included and the matrix is marked as truncated.
+        """
+        params = pecan.request.GET
+        test_ids = params.getall(const.TEST_ID)
+        truncated = False
+        if test_ids:
+            if len(test_ids) > CONF.api.matrix_max_runs:
+                pecan.abort(400, 'Matrix is limited to %s test runs.'
+                            % CONF.api.matrix_max_runs)
+            for test_id in test_ids:
+                api_utils.enforce_permissions(test_id, const.ROLE_USER)
+        else:
+            test_ids = db.get_latest_test_ids({})
+            truncated = len(test_ids) > CONF.api.matrix_max_runs
+            test_ids = test_ids[:CONF.api.matrix_max_runs]
+
+        guideline = None
+        version = params.get(const.GUIDELINE)
+        if version:
+            try:
+                guideline = guidelines.get_guideline(version)
+            except api_exc.GuidelineUnavailable as e:
+                pecan.abort(e.status_code)
+            except ValueError as e:
+                pecan.abort(400, str(e))
+
+        results = db.get_results_of_tests(test_ids)
+        try:
+            run_matrix = interop_matrix.build_matrix(
+                [(test_id, results[test_id]) for test_id in test_ids],
+                guideline,
+                columns=params.get(const.COLUMNS,
+                                   interop_matrix.CAPABILITIES),
+                target=params.get(const.TARGET, const.PLATFORM_TARGET))
+        except ValueError as e:
+            pecan.abort(400, str(e))
+
+        if params.get(const.FORMAT) == 'csv':
+            pecan.response.content_type = 'text/csv'
+            pecan.response.headers['X-Matrix-Truncated'] = \
+                str(truncated).lower()
+            pecan.response.text = six.text_type(
+                interop_matrix.to_csv(run_matrix))
+            return pecan.response
+        run_matrix['truncated'] = truncated
+        return run_matrix
+
+    @pecan.expose('json')
+    def batch(self):
+        """Get several test runs with a single request.
+
+        Ids of test runs are posted as JSON, for example:
+            POST /v1/results/batch {"test_ids": ["<id>", "<id>"]}
+        Test runs are returned in requested order. Ids of test runs
+        which do not exist or may not be accessed by current user are
+        listed as unavailable. Fields may be requested as in get_one.
+        """
+        try:
+            test_ids = json.loads(pecan.request.body)[const.TEST_IDS]
+        except (ValueError, KeyError, TypeError):
+            pecan.abort(400, 'List of %s is expected.' % const.TEST_IDS)
+        if (not isinstance(test_ids, list) or not
+                all(isinstance(test_id, six.string_types)
+                    for test_id in test_ids)):
+            pecan.abort(400, 'List of %s is expected.' % const.TEST_IDS)
+        if len(test_ids) > CONF.api.results_batch_max_size:
+            pecan.abort(400, 'Batch is limited to %s test runs.'
+                        % CONF.api.results_batch_max_size)
+        fields = api_utils.get_fields(self.TEST_RUN_FIELDS)
+        if fields is None:
+            fields = list(self.TEST_RUN_FIELDS)
+
+        # Metadata is always loaded as permissions depend on it.
+        tests = db.get_test_fields_of_tests(
+            test_ids, ['id', 'cpid', 'created_at', 'duration_seconds',
+                       'meta'])
+        roles = api_utils.get_user_roles(
+            dict((test_id, test['meta'])
+                 for test_id, test in six.iteritems(tests)))
+        permitted_ids = set(test_id for test_id in tests if roles[test_id])
+        results = {}
+        if 'results' in fields:
+            results = db.get_results_of_tests(list(permitted_ids))
+
+        test_runs = []
+        unavailable = []
+        for test_id in test_ids:
+            if test_id not in permitted_ids:
+                unavailable.append(test_id)
+                continue
+            test_info = dict(tests[test_id])
+            test_info['results'] = results.get(test_id)
+            test_info['user_role'] = roles[test_id]
+            if roles[test_id] != const.ROLE_OWNER:
+                test_info.pop('cpid')
+            test_runs.append(dict((field, test_info[field])
+                                  for field in fields
+                                  if field in test_info))
+        return {'results': test_runs, 'unavailable': unavailable}
+
+    @pecan.expose('json')
+    def export(self):
+        """Stream all test runs visible to user in chronological order.
+
+        Runs are exported as newline delimited JSON or CSV, passed tests
+        are included with with_results=true. Filters of listing apply.
+        For example:
+            /v1/results/export?format=csv&cpid=1234
+        Export is resumed after a run given its cursor, for example:
+            /v1/results/export?cursor=<cursor of the last received run>
+        """
+        expected_input_params = [
+            const.START_DATE,
+            const.END_DATE,
+            const.CPID,
+            const.SIGNED,
+            const.COMPLIANT
+        ]
+        filters = api_utils.parse_input_params(expected_input_params)
+        params = pecan.request.GET
+        export_format = params.get(const.FORMAT, results_export.NDJSON)
+        with_results = strutils.bool_from_string(
+            params.get(const.WITH_RESULTS))
+        try:
+            app_iter = results_export.iter_export(
+                filters, export_format, params.get(const.CURSOR),
+                with_results)
+        except ValueError as e:
+            pecan.abort(400, str(e))
+        pecan.response.content_type = \
+            results_export.CONTENT_TYPES[export_format]
+        pecan.response.app_iter = app_iter
+        return pecan.response
+
+    @pecan.expose('json')
+    def stream(self):
+        """Stream headers of public test runs as they are uploaded.
+
+        Stream is in text/event-stream format of server-sent events.
+        Client reconnecting with Last-Event-ID header receives events
+        published since the last received one first. Stream is closed
+        after events_stream_max_seconds, the client resumes it by
+        reconnecting.
+        """
+        if events.is_stream_limit_reached():
+            pecan.abort(503, 'Too many clients are streaming events, '
+                             'retry later.')
+        pecan.response.content_type = 'text/event-stream'
+        pecan.response.headers['Cache-Control'] = 'no-cache'
+        pecan.response.app_iter = events.iter_stream(
+            pecan.request.headers.get('Last-Event-ID'))
+        return pecan.response
+
+    @pecan.expose('json')
+    def slowest(self):
+        """Get tests with the longest mean duration across test runs.
+
+        Durations of tests of the most recent test runs visible to user
+        are aggregated, filters of listing apply. Without start_date,
+        test runs of slowest_tests_default_days days before the end date
+        are aggregated. For example:
+            /v1/results/slowest?limit=20&start_date=2015-08-01
+        """
+        expected_input_params = [
+            const.START_DATE,
+            const.END_DATE,
+            const.CPID,
+            const.SIGNED
+        ]
+        filters = api_utils.parse_input_params(expected_input_params)
+        try:
+            limit = int(pecan.request.GET.get(const.LIMIT,
+                                              SLOWEST_TESTS_DEFAULT_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= SLOWEST_TESTS_MAX_LIMIT:
+            pecan.abort(400, 'Parameter %s must be between 1 and %s.'
+                        % (const.LIMIT, SLOWEST_TESTS_MAX_LIMIT))
+        if const.START_DATE not in filters:
+            end_date = filters.get(const.END_DATE) or timeutils.utcnow()
+            start_date = end_date - datetime.timedelta(
+                days=CONF.api.slowest_tests_default_days)
+            # Day granularity keeps the filters stable for caching.
+            filters[const.START_DATE] = start_date.replace(
+                hour=0, minute=0, second=0, microsecond=0)
+        max_runs = CONF.api.slowest_tests_max_runs
+        cache_ttl = CONF.api.results_listing_cache_ttl
+        if const.SIGNED in filters or cache_ttl <= 0:
+            tests = db.get_slowest_tests(filters, limit, max_runs)
+        else:
+            generation = listing_cache.get_generation()
+            cache_key = json.dumps([sorted(filters.items()), limit],
+                                   default=six.text_type)
+            tests = slowest_cache.get(cache_key, version=generation)
+            cache.set_stats_headers(pecan.response, slowest_cache,
+                                    hit=tests is not None)
+            if tests is None:
+                tests = db.get_slowest_tests(filters, limit, max_runs)
+                slowest_cache.set(cache_key, tests, version=generation,
+                                  ttl=cache_ttl)
+        return {'tests': tests}
+
+    @pecan.expose('json')
+    def latest(self):
+        """Get the latest test run of each cloud.
+
+        Runs are listed in descending chronological order. Only the
+        latest public run of every cloud is listed by default, and the
+        latest signed run with signed=true.
+        For example:
+            /v1/results/latest?page=<page number>
+        """
+        filters = api_utils.parse_input_params([const.SIGNED])
+        records_count = db.get_latest_test_records_count(filters)
         page_number, total_pages_number = \
             api_utils.get_page_number(records_count)
 
+        per_page = CONF.api.results_per_page
+        results = db.get_latest_test_records(page_number, per_page, filters)
+        for result in results:
+            result.update({'url': parse.urljoin(
+                CONF.ui_url, CONF.api.test_results_url
+            ) % result['id']})
+        page = {'results': results,
+                'pagination': {
+                    'current_page': page_number,
+                    'total_pages': total_pages_number
+                }}
+        api_utils.check_not_modified(api_utils.get_content_etag(page))
+        return page
+
+    def _get_results_page(self, filters, per_page, fields=None):
+        """Get page of test results listing."""
+        records_count = db.get_test_records_count(filters)
+        page_number, total_pages_number = \
+            api_utils.get_page_number(records_count, per_page)
+
+        db_fields = None
+        if fields is not None:
+            db_fields = [field for field in fields if field != 'url']
+            if 'url' in fields and 'id' not in fields:
+                db_fields.append('id')
         try:
-            per_page = CONF.api.results_per_page
-            results = db.get_test_records(page_number, per_page, filters)
+            results = db.get_test_records(page_number, per_page, filters,
+                                          db_fields)
 
-            for result in results:
-                result.update({'url': parse.urljoin(
-                    CONF.ui_url, CONF.api.test_results_url
-                ) % result['id']})
+            if fields is None or 'url' in fields:
+                for result in results:
+                    result.update({'url': parse.urljoin(
+                        CONF.ui_url, CONF.api.test_results_url
+                    ) % result['id']})
+            if fields is not None and 'id' not in fields:
+                for result in results:
+                    result.pop('id', None)
 
             page = {'results': results,
                     'pagination': {
@@ -0,0 +1,126 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Community statistics controller."""
+
+import datetime
+
+from oslo_config import cfg
+from oslo_utils import timeutils
+import pecan
+from pecan import rest
+
+from refstack.api import constants as const
+from refstack.api import exceptions as api_exc
+from refstack.api import guidelines
+from refstack.api import utils as api_utils
+from refstack import db
+
+CONF = cfg.CONF
+
+
+class TestPassRatesController(rest.RestController):
+    """/v1/stats/tests handler."""
+
+    @pecan.expose('json')
+    def get(self):
+        """Get percent of clouds passing each test.
+
+        If guideline is specified, required tests of guideline target
+        are reported as core tests. Core tests with low pass rate are
+        marked as at risk, non-core tests with high pass rate are marked
+        as candidates for core tests.
+        For example:
+            /v1/stats/tests?guideline=2015.07&target=platform
+        """
+        version = pecan.request.GET.get(const.GUIDELINE)
+        core_tests = None
+        if version:
+            target = pecan.request.GET.get(const.TARGET,
+                                           const.PLATFORM_TARGET)
+            try:
+                core_tests = guidelines.get_target_tests(
+                    guidelines.get_guideline(version), target, 'required')
+            except api_exc.GuidelineUnavailable as e:
+                pecan.abort(e.status_code)
+            except ValueError as e:
+                pecan.abort(400, str(e))
+
+        population = db.get_population()
+        rates = dict((rate['name'], rate) for rate in db.get_test_pass_rates())
+        for name in core_tests or ():
+            rates.setdefault(name, {'name': name, 'pass_count': 0,
+                                    'cpid_count': 0})
+        tests = []
+        for name in sorted(rates):
+            rate = dict(rates[name])
+            rate['pass_rate'] = (rate['cpid_count'] * 100.0 /
+                                 population['clouds']
+                                 if population['clouds'] else 0.0)
+            if core_tests is not None:
+                rate['core'] = name in core_tests
+                rate['at_risk'] = (rate['core'] and rate['pass_rate'] <
+                                   CONF.api.core_test_risk_threshold)
+                rate['candidate'] = (
+                    not rate['core'] and rate['pass_rate'] >
+                    CONF.api.non_core_test_candidate_threshold)
+            tests.append(rate)
+        return {'runs': population['runs'],
+                'clouds': population['clouds'],
+                'tests': tests}
+
+
+class UploadsController(rest.RestController):
+    """/v1/stats/uploads handler."""
+
+    # Number of periods reported if start date is not specified.
+    DEFAULT_BUCKETS = 30
+
+    @pecan.expose('json')
+    def get(self):
+        """Get numbers of signed and unsigned test runs uploaded in periods.
+
+        Period is hour, day (default) or week. Test runs of all clouds are
+        counted unless cpid is specified.
+        For example:
+            /v1/stats/uploads?period=week&start_date=2015-01-01 00:00:00
+            /v1/stats/uploads?period=hour&cpid=<cpid>
+        """
+        period = pecan.request.GET.get(const.PERIOD, const.PERIOD_DAY)
+        if period not in const.PERIODS:
+            pecan.abort(400, 'Invalid %s value: %s' % (const.PERIOD,
+                                                       period))
+        period_length = datetime.timedelta(**{period + 's': 1})
+        filters = api_utils.parse_input_params([const.START_DATE,
+                                                const.END_DATE,
+                                                const.CPID])
+        end_date = filters.get(const.END_DATE) or timeutils.utcnow()
+        start_date = filters.get(const.START_DATE) or (
+            end_date - period_length * (self.DEFAULT_BUCKETS - 1))
+        if (end_date - start_date) // period_length >= \
+                CONF.api.upload_activity_max_buckets:
+            pecan.abort(400, 'Upload activity is limited to %s periods.'
+                        % CONF.api.upload_activity_max_buckets)
+        return {'period': period,
+                'cpid': filters.get(const.CPID),
+                'uploads': db.get_upload_activity(
+                    period, start_date, end_date, filters.get(const.CPID))}
+
+
+class StatsController(object):
+    """/v1/stats handler."""
+
+    tests = TestPassRatesController()
+    uploads = UploadsController()
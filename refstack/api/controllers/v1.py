@@ -17,7 +17,10 @@
 
 from refstack.api.controllers import auth
 from refstack.api.controllers import capabilities
+from refstack.api.controllers import changes
+from refstack.api.controllers import clouds
 from refstack.api.controllers import results
+from refstack.api.controllers import stats
 from refstack.api.controllers import user
 
 
@@ -28,3 +31,6 @@ class V1Controller(object):
     capabilities = capabilities.CapabilitiesController()
     auth = auth.AuthController()
     profile = user.ProfileController()
+    stats = stats.StatsController()
+    clouds = clouds.CloudsController()
+    changes = changes.ChangesController()
@@ -0,0 +1,418 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Publish-subscribe of events for server-sent events streams.
+
+Events are delivered to subscribers of the current process by a bus.
+Relay assigns ids to published events and passes them to buses of all
+processes which may stream them: "memory" relay passes them to the bus
+of the publishing process only, "file" relay appends them to a file
+tailed by every worker of the host. The file is truncated once it grows
+too large, and its tailers start over at its beginning then.
+
+Every stream holds a connection of its worker open, so the API is meant
+to be run with asynchronous workers, for example
+"refstack-api -k eventlet". Streams are closed after
+events_stream_max_seconds, and clients resume them by reconnecting.
+"""
+
+import collections
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+import six
+from six.moves import queue
+
+LOG = log.getLogger(__name__)
+
+EVENTS_OPTS = [
+    cfg.StrOpt('events_backend',
+               default='file',
+               help='Relay of events streamed to clients. "file" appends '
+                    'events to events_file, which is tailed by all workers '
+                    'of the host. "memory" streams events to clients of '
+                    'the worker which published them only, so it drops '
+                    'events of other workers and suits a single worker '
+                    'only.'),
+    cfg.StrOpt('events_file',
+               default=os.path.join(tempfile.gettempdir(),
+                                    'refstack-events.log'),
+               help='File relaying events between workers of "file" '
+                    'events backend.'),
+    cfg.IntOpt('events_file_max_size',
+               default=10 * 1024 * 1024,
+               help='Size of events file in bytes which makes it truncated '
+                    'by the next published event. Events appended shortly '
+                    'before the truncation may be missed by workers, and '
+                    'streams can\'t be resumed from events published '
+                    'before it.'),
+    cfg.IntOpt('events_buffer_size',
+               default=1000,
+               help='Number of events queued for a streaming client. Slow '
+                    'client is disconnected when its queue is full, and '
+                    'resumes the stream when it reconnects. With "memory" '
+                    'backend, it is also the number of recent events '
+                    'kept for resumed streams.'),
+    cfg.IntOpt('events_stream_max_seconds',
+               default=300,
+               help='Number of seconds after which a stream of events is '
+                    'closed. Clients reconnect with Last-Event-ID header '
+                    'and resume the stream. Every stream holds a connection '
+                    'of its worker open, so the API should be run with '
+                    'asynchronous workers, for example with '
+                    '"refstack-api -k eventlet"; synchronous workers are '
+                    'blocked by a single stream.'),
+    cfg.IntOpt('events_max_subscribers',
+               default=100,
+               help='Maximum number of clients streaming events from a '
+                    'single worker. Further clients are refused until '
+                    'some stream is closed.'),
+    cfg.IntOpt('events_heartbeat_seconds',
+               default=15,
+               help='Interval of heartbeat comments sent to streaming '
+                    'clients when there are no events.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(EVENTS_OPTS, group='api')
+
+# Interval in seconds events file is checked for new events.
+POLL_INTERVAL = 0.5
+
+
+class Event(object):
+    """Event with id and JSON serializable data."""
+
+    def __init__(self, event_id, name, data):
+        """Init."""
+        self.id = event_id
+        self.name = name
+        self.data = data
+
+    def to_sse(self):
+        """Serialize event to text/event-stream format."""
+        return ('id: %s\nevent: %s\ndata: %s\n\n' % (
+            self.id, self.name,
+            json.dumps(self.data, default=six.text_type))).encode('utf-8')
+
+
+class Subscription(object):
+    """Queue of events for a single subscriber."""
+
+    def __init__(self, size):
+        """Init."""
+        self.queue = queue.Queue(size)
+        self.closed = False
+
+    def get(self, timeout):
+        """Get next event or None if there is none within timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus(object):
+    """Delivers events to subscribers of current process."""
+
+    def __init__(self, buffer_size, max_subscribers=None):
+        """Init."""
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.recent = collections.deque(maxlen=buffer_size)
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def _is_full(self):
+        return (self.max_subscribers is not None and
+                len(self._subscriptions) >= self.max_subscribers)
+
+    def is_full(self):
+        """Check if there are as many subscribers as allowed."""
+        with self._lock:
+            return self._is_full()
+
+    def subscribe(self):
+        """Return new subscription or None if there are too many."""
+        subscription = Subscription(self.buffer_size)
+        with self._lock:
+            if self._is_full():
+                return None
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop delivery of events to subscription."""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def deliver(self, event):
+        """Put event to queues of all subscribers.
+
+        Subscriber whose queue is full is dropped, so a slow client
+        never blocks delivery to the others.
+        """
+        with self._lock:
+            self.recent.append(event)
+            for subscription in list(self._subscriptions):
+                try:
+                    subscription.queue.put_nowait(event)
+                except queue.Full:
+                    subscription.closed = True
+                    self._subscriptions.discard(subscription)
+
+
+class MemoryRelay(object):
+    """Relay of events published by current process.
+
+    Ids are sequence numbers, which start over when process restarts.
+    """
+
+    def __init__(self, bus):
+        """Init."""
+        self.bus = bus
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def publish(self, name, data):
+        """Publish event."""
+        with self._lock:
+            self._last_id += 1
+            self.bus.deliver(Event(self._last_id, name, data))
+
+    def start(self):
+        """Start delivery of events to bus."""
+        pass
+
+    def replay(self, last_id):
+        """Return recent events published after event with given id.
+
+        None is returned if the id was assigned before restart.
+        """
+        if last_id > self._last_id:
+            return None
+        return [event for event in list(self.bus.recent)
+                if event.id > last_id]
+
+
+def _read_header(events_file):
+    """Read base id and length of header line of events file.
+
+    File without header, written before files were truncated, has base
+    id 0.
+    """
+    events_file.seek(0)
+    line = events_file.readline()
+    if line.endswith(b'\n'):
+        try:
+            record = json.loads(line.decode('utf-8'))
+        except ValueError:
+            record = None
+        if isinstance(record, dict) and 'base' in record:
+            return record['base'], len(line)
+    return 0, 0
+
+
+class FileRelay(object):
+    """Relay of events published by all workers of the host.
+
+    Events are appended to a file as JSON lines. Id of event is the file
+    offset right after its line plus the base id of the file, so resumed
+    stream is read from the file starting at the id of the last received
+    event. File grown past max_size is truncated, and its new base id is
+    the id right after its old end, so ids never repeat.
+    """
+
+    def __init__(self, bus, path, max_size):
+        """Init."""
+        self.bus = bus
+        self.path = path
+        self.max_size = max_size
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def publish(self, name, data):
+        """Append event to events file, truncate the file if too large."""
+        line = json.dumps({'name': name, 'data': data},
+                          default=six.text_type) + '\n'
+        with open(self.path, 'ab+') as events_file:
+            fcntl.flock(events_file, fcntl.LOCK_EX)
+            try:
+                events_file.seek(0, os.SEEK_END)
+                size = events_file.tell()
+                if not size or size > self.max_size:
+                    base = _read_header(events_file)[0] + size
+                    events_file.truncate(0)
+                    events_file.write(
+                        (json.dumps({'base': base}) + '\n').encode('utf-8'))
+                events_file.write(line.encode('utf-8'))
+                events_file.flush()
+            finally:
+                fcntl.flock(events_file, fcntl.LOCK_UN)
+
+    def read(self, last_id):
+        """Return events appended after event with given id.
+
+        None is returned if the event is not in the file, that is the
+        file was truncated after the event was read.
+        """
+        events = []
+        try:
+            with open(self.path, 'rb') as events_file:
+                base, start = _read_header(events_file)
+                position = last_id - base
+                if not base:
+                    # No event was truncated yet.
+                    position = max(position, start)
+                events_file.seek(0, os.SEEK_END)
+                if not start <= position <= events_file.tell():
+                    return None
+                events_file.seek(position)
+                for line in events_file:
+                    if not line.endswith(b'\n'):
+                        # Line is still being written.
+                        break
+                    position += len(line)
+                    try:
+                        record = json.loads(line.decode('utf-8'))
+                    except ValueError:
+                        LOG.warning('Malformed event at %s is skipped'
+                                    % position)
+                        continue
+                    events.append(Event(base + position, record['name'],
+                                        record['data']))
+        except (IOError, OSError):
+            pass
+        return events
+
+    def _get_ids(self):
+        """Get ids of the start and the end of events file."""
+        try:
+            with open(self.path, 'rb') as events_file:
+                base, start = _read_header(events_file)
+                events_file.seek(0, os.SEEK_END)
+                return base + start, base + events_file.tell()
+        except (IOError, OSError):
+            return 0, 0
+
+    def _tail(self, last_id):
+        while True:
+            events = self.read(last_id)
+            if events is None:
+                # File was truncated, events are read from its start.
+                last_id = self._get_ids()[0]
+                continue
+            for event in events:
+                last_id = event.id
+                self.bus.deliver(event)
+            time.sleep(POLL_INTERVAL)
+
+    def start(self):
+        """Start thread delivering events appended to file to bus."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._tail, args=(self._get_ids()[1],))
+                self._thread.daemon = True
+                self._thread.start()
+
+    def replay(self, last_id):
+        """Return events published after event with given id.
+
+        None is returned if the id is not valid for current file.
+        """
+        return self.read(last_id)
+
+
+_relay = None
+_relay_lock = threading.Lock()
+
+
+def get_relay():
+    """Return relay of current process created on first use."""
+    global _relay
+    with _relay_lock:
+        if _relay is None:
+            bus = EventBus(CONF.api.events_buffer_size,
+                           CONF.api.events_max_subscribers)
+            backend = CONF.api.events_backend
+            if backend == 'memory':
+                _relay = MemoryRelay(bus)
+            elif backend == 'file':
+                _relay = FileRelay(bus, CONF.api.events_file,
+                                   CONF.api.events_file_max_size)
+            else:
+                raise ValueError('Invalid events backend: %s' % backend)
+        return _relay
+
+
+def publish(name, data):
+    """Publish event to streams of all workers."""
+    get_relay().publish(name, data)
+
+
+def is_stream_limit_reached():
+    """Check if the worker streams events to as many clients as allowed."""
+    return get_relay().bus.is_full()
+
+
+def iter_stream(last_event_id=None):
+    """Generate text/event-stream of published events.
+
+    Events published after the event with given id are sent first.
+    Heartbeat comments keep connection open when there are no events.
+    Stream ends after events_stream_max_seconds, or right away if there
+    are too many streams already.
+    """
+    relay = get_relay()
+    relay.start()
+    # Subscription is created before replay, so no event is missed.
+    # Events both replayed and delivered are sent once.
+    subscription = relay.bus.subscribe()
+    if subscription is None:
+        return
+    heartbeat = CONF.api.events_heartbeat_seconds
+    deadline = time.time() + CONF.api.events_stream_max_seconds
+    try:
+        yield b'retry: 3000\n\n'
+        last_id = None
+        try:
+            replayed = relay.replay(int(last_event_id))
+        except (TypeError, ValueError):
+            replayed = None
+        if replayed is not None:
+            last_id = int(last_event_id)
+            for event in replayed:
+                last_id = event.id
+                yield event.to_sse()
+        while not subscription.closed or not subscription.queue.empty():
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            event = subscription.get(min(heartbeat, timeout))
+            if event is None:
+                yield b': heartbeat\n\n'
+            elif last_id is None or event.id > last_id:
+                # Only events queued during replay may be sent twice.
+                last_id = None
+                yield event.to_sse()
+    finally:
+        relay.bus.unsubscribe(subscription)
@@ -22,6 +22,16 @@ class ParseInputsError(Exception):
     pass
 
 
+class GuidelineUnavailable(Exception):
+    """Raise if guideline (capability) file can't be retrieved."""
+
+    def __init__(self, status_code):
+        """Init."""
+        super(GuidelineUnavailable, self).__init__(
+            'Guideline is unavailable (HTTP %s)' % status_code)
+        self.status_code = status_code
+
+
 class ValidationError(Exception):
     """Raise if request doesn't pass trough validation process."""
 
@@ -0,0 +1,120 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Streaming export of test runs.
+
+Test runs are exported in chronological order as newline delimited JSON
+or CSV. Every exported run carries a cursor, export given the cursor of
+the last received run is resumed right after it.
+"""
+
+import base64
+import csv
+import datetime
+import json
+
+import six
+
+from refstack import db
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+FORMATS = (NDJSON, CSV)
+
+CONTENT_TYPES = {NDJSON: 'application/x-ndjson',
+                 CSV: 'text/csv'}
+
+# Number of test runs loaded from database at once.
+BATCH_SIZE = 500
+
+_CURSOR_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def encode_cursor(test):
+    """Return opaque cursor pointing right after test run."""
+    position = [test['created_at'].strftime(_CURSOR_TIME_FORMAT),
+                test['id']]
+    return base64.urlsafe_b64encode(
+        json.dumps(position).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Return creation time and id of test run the cursor points to.
+
+    :raises ValueError: If cursor is malformed.
+    """
+    try:
+        created_at, test_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return (datetime.datetime.strptime(created_at, _CURSOR_TIME_FORMAT),
+                six.text_type(test_id))
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor: %s' % cursor)
+
+
+def _iter_ndjson(tests):
+    for test in tests:
+        yield (json.dumps(test, default=six.text_type) + '\n').encode('utf-8')
+
+
+def _to_csv_line(row):
+    output = six.StringIO()
+    csv.writer(output).writerow(row)
+    return output.getvalue().encode('utf-8')
+
+
+def _iter_csv(tests, with_results, with_cpid):
+    header = ['id', 'created_at', 'duration_seconds', 'meta']
+    if with_cpid:
+        header.insert(1, 'cpid')
+    if with_results:
+        header.append('results')
+    yield _to_csv_line(header + ['cursor'])
+    for test in tests:
+        row = [test['id'], test['created_at'], test['duration_seconds'],
+               json.dumps(test['meta'], sort_keys=True)]
+        if with_cpid:
+            row.insert(1, test['cpid'])
+        if with_results:
+            row.append(' '.join(test['results']))
+        yield _to_csv_line(row + [test['cursor']])
+
+
+def iter_export(filters, export_format=NDJSON, cursor=None,
+                with_results=False, with_cpid=False):
+    """Generate lines of exported test runs encoded to bytes.
+
+    :param filters: (Dict) Filters that will be applied for test runs.
+    :param cursor: Cursor of the last test run exported before.
+    :param with_results: Whether passed tests of test runs are exported.
+    :param with_cpid: Whether cloud ids of test runs are exported. They
+                      are needed to import test runs to other instance.
+    :raises ValueError: If format or cursor is invalid.
+    """
+    if export_format not in FORMATS:
+        raise ValueError('Unknown format: %s' % export_format)
+    after = decode_cursor(cursor) if cursor else None
+
+    def iter_tests():
+        for test in db.iter_test_records(filters, after, with_results,
+                                         BATCH_SIZE):
+            if not with_cpid:
+                del test['cpid']
+            test['cursor'] = encode_cursor(test)
+            yield test
+
+    if export_format == CSV:
+        return _iter_csv(iter_tests(), with_results, with_cpid)
+    return _iter_ndjson(iter_tests())
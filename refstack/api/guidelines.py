@@ -0,0 +1,592 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Retrieval of DefCore guideline (capability) files."""
+
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log
+import requests
+
+from refstack.api import cache
+from refstack.api import constants as const
+from refstack.api import exceptions as api_exc
+
+LOG = log.getLogger(__name__)
+
+GUIDELINES_OPTS = [
+    cfg.IntOpt('capabilities_cache_ttl',
+               default=600,
+               help='Number of seconds capability files fetched from '
+                    'GitHub are considered fresh. Older files are still '
+                    'served while they are refreshed in background.'),
+    cfg.IntOpt('capabilities_cache_max_stale',
+               default=86400,
+               help='Number of seconds after which a cached capability '
+                    'file has to be refreshed before it is served. Cached '
+                    'files of any age are served if GitHub is unavailable.'),
+    cfg.IntOpt('capabilities_fetch_timeout',
+               default=10,
+               help='Number of seconds to wait for GitHub to respond to '
+                    'a request for a capability file. A request timing '
+                    'out fails like any other unavailable request.'),
+    cfg.StrOpt('capabilities_dir',
+               help='Local directory (for example, a git checkout of the '
+                    'openstack/defcore repository) to serve capability '
+                    'files from. If it is set, GitHub is never contacted.'),
+    cfg.IntOpt('capabilities_dir_poll_interval',
+               default=10,
+               help='Number of seconds between checks of capabilities_dir '
+                    'for changed capability files.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(GUIDELINES_OPTS, group='api')
+CONF.import_opt('cache_dir', 'refstack.api.cache', group='api')
+
+# Background refresh claimed by a worker is retried after this timeout,
+# it exceeds capabilities_fetch_timeout of any sane configuration.
+REFRESH_TIMEOUT = 60
+
+HIT = 'HIT'
+MISS = 'MISS'
+STALE = 'STALE'
+
+CAPABILITY_FILE_REGEX = re.compile(r'^[0-9]{4}\.[0-9]{2}\.json$')
+
+SUPPORTED_SCHEMAS = ('1.2', '1.3')
+
+# Capability statuses ordered by priority, the most important first.
+STATUSES = ('required', 'advisory', 'deprecated', 'removed')
+
+# Number of guideline versions kept parsed in memory.
+PARSED_GUIDELINES_SIZE = 32
+
+
+class FetchResult(object):
+    """Response of upstream or cached copy of it."""
+
+    def __init__(self, status_code, body=None, cache_state=MISS, age=0):
+        """Init."""
+        self.status_code = status_code
+        self.body = body
+        self.cache_state = cache_state
+        self.age = age
+
+
+class CapabilitiesStore(object):
+    """Cache of capability files shared by all workers.
+
+    Files are kept in SQLite database located in cache_dir.
+    """
+
+    def __init__(self):
+        """Init."""
+        self.hits = 0
+        self.misses = 0
+        self._path = None
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        """SQLite database path, created lazily after config is parsed."""
+        if self._path is None:
+            cache_dir = CONF.api.cache_dir
+            if not os.path.isdir(cache_dir):
+                try:
+                    os.makedirs(cache_dir)
+                except OSError:
+                    if not os.path.isdir(cache_dir):
+                        raise
+            path = os.path.join(cache_dir, 'capabilities.sqlite')
+            conn = sqlite3.connect(path, timeout=10)
+            try:
+                with conn:
+                    conn.execute('CREATE TABLE IF NOT EXISTS capabilities '
+                                 '(url TEXT PRIMARY KEY, body BLOB, '
+                                 'fetched_at REAL, refresh_started_at REAL)')
+            finally:
+                conn.close()
+            self._path = path
+        return self._path
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open connection and commit changes made within the context."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, url):
+        """Get cached body and the time it was fetched at."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT body, fetched_at FROM capabilities '
+                               'WHERE url = ?', (url,)).fetchone()
+        return (bytes(row[0]), row[1]) if row else (None, None)
+
+    def put(self, url, body):
+        """Store body fetched from url."""
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO capabilities '
+                         '(url, body, fetched_at, refresh_started_at) '
+                         'VALUES (?, ?, ?, NULL)',
+                         (url, sqlite3.Binary(body), time.time()))
+
+    def _claim_refresh(self, url):
+        """Claim background refresh of url, so only one worker does it."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE capabilities SET refresh_started_at = ? '
+                'WHERE url = ? AND (refresh_started_at IS NULL '
+                'OR refresh_started_at < ?)',
+                (now, url, now - REFRESH_TIMEOUT))
+            return cursor.rowcount == 1
+
+    def _refresh(self, url):
+        try:
+            response = requests.get(
+                url, timeout=CONF.api.capabilities_fetch_timeout)
+            if response.status_code == 200:
+                self.put(url, response.content)
+            else:
+                LOG.warning('Github returned non-success HTTP code %s '
+                            'on refresh of %s' % (response.status_code, url))
+        except requests.exceptions.RequestException as e:
+            LOG.warning('An error occurred trying to refresh %s: %s'
+                        % (url, e))
+        finally:
+            with self._lock:
+                self._refreshing.discard(url)
+
+    def _refresh_in_background(self, url):
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+        if not self._claim_refresh(url):
+            with self._lock:
+                self._refreshing.discard(url)
+            return
+        thread = threading.Thread(target=self._refresh, args=(url,))
+        thread.daemon = True
+        thread.start()
+
+    def fetch(self, url):
+        """Get url contents, using cached copy where possible.
+
+        :raises requests.exceptions.RequestException: if upstream is
+            unavailable and there is no cached copy of url.
+        """
+        body, fetched_at = self.get(url)
+        age = time.time() - fetched_at if body is not None else None
+        if body is not None and age < CONF.api.capabilities_cache_max_stale:
+            self.hits += 1
+            if age < CONF.api.capabilities_cache_ttl:
+                return FetchResult(200, body, HIT, age)
+            self._refresh_in_background(url)
+            return FetchResult(200, body, STALE, age)
+
+        self.misses += 1
+        try:
+            response = requests.get(
+                url, timeout=CONF.api.capabilities_fetch_timeout)
+        except requests.exceptions.RequestException as e:
+            if body is None:
+                raise
+            LOG.warning('Serving stale copy of %s: %s' % (url, e))
+            return FetchResult(200, body, STALE, age)
+
+        LOG.debug('Response Status: %s' % response.status_code)
+        if response.status_code == 200:
+            self.put(url, response.content)
+            return FetchResult(200, response.content)
+        if body is not None:
+            LOG.warning('Serving stale copy of %s: Github returned '
+                        'HTTP code %s' % (url, response.status_code))
+            return FetchResult(200, body, STALE, age)
+        return FetchResult(response.status_code)
+
+    def stats(self):
+        """Return hit-rate metrics of store in current process."""
+        requests_count = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (float(self.hits) / requests_count
+                             if requests_count else 0.0)}
+
+
+capabilities_store = CapabilitiesStore()
+
+
+def set_fetch_headers(response, result):
+    """Add cache state, age and hit-rate metrics to response headers."""
+    response.headers['X-Cache'] = result.cache_state
+    response.headers['Age'] = str(int(result.age or 0))
+    response.headers['X-Cache-Hit-Rate'] = \
+        '%.3f' % capabilities_store.stats()['hit_rate']
+
+
+class LocalGuidelines(object):
+    """Capability files served from a local directory.
+
+    Directory is scanned once, file contents are kept in memory both
+    as raw bytes and as parsed JSON. Background thread polls directory
+    and rescans it when files are added, changed or removed.
+    """
+
+    def __init__(self, path, poll_interval=None):
+        """Init."""
+        self.path = path
+        self.poll_interval = poll_interval
+        self._files = {}
+        self._signature = None
+        self._lock = threading.Lock()
+        self.scan()
+        if poll_interval:
+            thread = threading.Thread(target=self._watch)
+            thread.daemon = True
+            thread.start()
+
+    def _get_signature(self):
+        """Return names, sizes and modification times of capability files."""
+        signature = {}
+        for name in os.listdir(self.path):
+            if CAPABILITY_FILE_REGEX.search(name):
+                stat = os.stat(os.path.join(self.path, name))
+                signature[name] = (stat.st_mtime, stat.st_size)
+        return signature
+
+    def scan(self):
+        """Load changed capability files from directory."""
+        signature = self._get_signature()
+        if signature == self._signature:
+            return False
+        files = {}
+        for name, file_signature in signature.items():
+            old_file = self._files.get(name)
+            if (old_file is not None and
+                    self._signature.get(name) == file_signature):
+                files[name] = old_file
+                continue
+            with open(os.path.join(self.path, name), 'rb') as cap_file:
+                body = cap_file.read()
+            try:
+                files[name] = (body, json.loads(body.decode('utf-8')))
+            except ValueError as e:
+                LOG.warning('Skipping malformed capability file %s: %s'
+                            % (name, e))
+        with self._lock:
+            self._files = files
+            self._signature = signature
+        LOG.debug('Loaded %s capability files from %s'
+                  % (len(files), self.path))
+        return True
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.scan()
+            except (IOError, OSError) as e:
+                LOG.warning('Unable to scan capabilities directory %s: %s'
+                            % (self.path, e))
+
+    def list_files(self):
+        """Return sorted names of capability files."""
+        return sorted(self._files)
+
+    def get_file_bytes(self, name):
+        """Return encoded contents of capability file or None."""
+        cap_file = self._files.get(name)
+        return cap_file[0] if cap_file else None
+
+    def get_file_json(self, name):
+        """Return parsed contents of capability file or None."""
+        cap_file = self._files.get(name)
+        return cap_file[1] if cap_file else None
+
+
+_local_guidelines = None
+_local_guidelines_lock = threading.Lock()
+
+
+def get_local_guidelines():
+    """Return local capability files if capabilities_dir is configured."""
+    global _local_guidelines
+    if not CONF.api.capabilities_dir:
+        return None
+    with _local_guidelines_lock:
+        if (_local_guidelines is None or
+                _local_guidelines.path != CONF.api.capabilities_dir):
+            _local_guidelines = LocalGuidelines(
+                CONF.api.capabilities_dir,
+                CONF.api.capabilities_dir_poll_interval)
+        return _local_guidelines
+
+
+def list_guidelines():
+    """Return sorted versions of all known guidelines.
+
+    :raises api_exc.GuidelineUnavailable: if list can't be retrieved.
+    """
+    local_guidelines = get_local_guidelines()
+    if local_guidelines:
+        files = local_guidelines.list_files()
+    else:
+        try:
+            result = capabilities_store.fetch(
+                CONF.api.github_api_capabilities_url)
+        except requests.exceptions.RequestException as e:
+            LOG.warning('An error occurred trying to get GitHub '
+                        'repository contents: %s' % e)
+            raise api_exc.GuidelineUnavailable(500)
+        if result.status_code != 200:
+            raise api_exc.GuidelineUnavailable(result.status_code)
+        files = [rfile['name']
+                 for rfile in json.loads(result.body.decode('utf-8'))
+                 if rfile['type'] == 'file' and
+                 CAPABILITY_FILE_REGEX.search(rfile['name'])]
+    return sorted(name[:-len('.json')] for name in files)
+
+
+def get_guideline_url(version):
+    """Return URL of guideline file in openstack/defcore repository."""
+    return ''.join((CONF.api.github_raw_base_url.rstrip('/'),
+                    '/', version, '.json'))
+
+
+def _get_guideline_body(version):
+    """Return encoded guideline file.
+
+    :raises api_exc.GuidelineUnavailable: if file can't be retrieved.
+    """
+    local_guidelines = get_local_guidelines()
+    if local_guidelines:
+        body = local_guidelines.get_file_bytes(version + '.json')
+        if body is None:
+            raise api_exc.GuidelineUnavailable(404)
+        return body
+
+    try:
+        result = capabilities_store.fetch(get_guideline_url(version))
+    except requests.exceptions.RequestException as e:
+        LOG.warning('An error occurred trying to get GitHub '
+                    'capability file contents: %s' % e)
+        raise api_exc.GuidelineUnavailable(500)
+    if result.status_code != 200:
+        raise api_exc.GuidelineUnavailable(result.status_code)
+    return result.body
+
+
+_parsed_guidelines = cache.LRUDict(PARSED_GUIDELINES_SIZE)
+
+
+def get_parsed_guideline(version):
+    """Return guideline file parsed along with its test index.
+
+    Parsed file is kept while contents of the file are unchanged.
+    Returned dict has 'guideline', 'index' and 'digest' keys, the last
+    one is SHA1 of file contents and may be used as its version.
+
+    :raises api_exc.GuidelineUnavailable: if file can't be retrieved.
+    :raises ValueError: if schema of guideline file is not supported.
+    """
+    body = _get_guideline_body(version)
+    digest = hashlib.sha1(body).hexdigest()
+    parsed = _parsed_guidelines.get(version)
+    if parsed is None or parsed['digest'] != digest:
+        guideline = json.loads(body.decode('utf-8'))
+        parsed = {'digest': digest,
+                  'guideline': guideline,
+                  'index': build_test_index(guideline, version)}
+        _parsed_guidelines.set(version, parsed)
+    return parsed
+
+
+def get_guideline(version):
+    """Return parsed guideline file.
+
+    Returned object is shared, so it must not be modified.
+
+    :raises api_exc.GuidelineUnavailable: if file can't be retrieved.
+    :raises ValueError: if schema of guideline file is not supported.
+    """
+    return get_parsed_guideline(version)['guideline']
+
+
+def get_test_index(version):
+    """Return test index of guideline.
+
+    See build_test_index for index format. Returned object is shared,
+    so it must not be modified.
+
+    :raises api_exc.GuidelineUnavailable: if file can't be retrieved.
+    :raises ValueError: if schema of guideline file is not supported.
+    """
+    return get_parsed_guideline(version)['index']
+
+
+def get_target_capabilities(guideline, target):
+    """Return capabilities of target with their statuses.
+
+    The platform target is comprised of several components. If a
+    capability belongs to a few of them, its most important status
+    is used.
+    """
+    components = guideline.get('components', {})
+    if target == const.PLATFORM_TARGET:
+        target_components = guideline.get(const.PLATFORM_TARGET,
+                                          {}).get('required', [])
+    else:
+        target_components = [target]
+
+    target_caps = {}
+    for component in target_components:
+        for status, caps in components.get(component, {}).items():
+            if status not in STATUSES:
+                continue
+            for cap in caps:
+                if (cap not in target_caps or STATUSES.index(status) <
+                        STATUSES.index(target_caps[cap])):
+                    target_caps[cap] = status
+    return target_caps
+
+
+def get_capability_tests(guideline, capability):
+    """Return list of (test id, flagged) pairs of capability."""
+    details = guideline['capabilities'][capability]
+    if guideline.get('schema') == '1.2':
+        flagged = set(details.get('flagged', []))
+        return [(test, test in flagged) for test in details.get('tests', [])]
+    return [(test, 'flagged' in test_details)
+            for test, test_details in details.get('tests', {}).items()]
+
+
+def get_target_tests(guideline, target, status):
+    """Return tests of target capabilities having given status."""
+    return set(test
+               for cap, cap_status in get_target_capabilities(
+                   guideline, target).items()
+               if cap_status == status
+               for test, flagged in get_capability_tests(guideline, cap))
+
+
+def build_test_index(guideline, version):
+    """Build inverted index of guideline tests.
+
+    Index maps each test id to a list of capabilities the test belongs
+    to. Every item of the list is a dict with 'capability', 'guideline'
+    and 'flagged' keys. Its 'status' key maps every target (components
+    and the platform) including the capability to capability status.
+
+    :raises ValueError: if schema of guideline file is not supported.
+    """
+    schema = guideline.get('schema')
+    if schema not in SUPPORTED_SCHEMAS:
+        raise ValueError('The schema version for the capabilities file '
+                         '(%s) is currently not supported.' % schema)
+
+    targets = list(guideline.get('components', {})) + [const.PLATFORM_TARGET]
+    target_caps = dict((target, get_target_capabilities(guideline, target))
+                       for target in targets)
+    index = {}
+    for capability in guideline.get('capabilities', {}):
+        status = dict((target, caps[capability])
+                      for target, caps in target_caps.items()
+                      if capability in caps)
+        for test, flagged in get_capability_tests(guideline, capability):
+            index.setdefault(test, []).append({'capability': capability,
+                                               'guideline': version,
+                                               'flagged': flagged,
+                                               'status': status})
+    return index
+
+
+def get_test_capabilities(index, tests):
+    """Map each of tests present in test index to its capabilities."""
+    return dict((test, sorted(set(entry['capability']
+                                  for entry in index[test])))
+                for test in tests if test in index)
+
+
+def build_report(guideline, results, target=const.PLATFORM_TARGET):
+    """Build compliance report of test run against guideline.
+
+    :param guideline: Parsed guideline file.
+    :param results: Names of tests passed in test run.
+    :param target: Guideline component or platform.
+    :raises ValueError: if schema of guideline or target is not supported.
+    """
+    if guideline.get('schema') not in SUPPORTED_SCHEMAS:
+        raise ValueError('The schema version for the capabilities file '
+                         '(%s) is currently not supported.'
+                         % guideline.get('schema'))
+    if (target != const.PLATFORM_TARGET and
+            target not in guideline.get('components', {})):
+        raise ValueError('Unknown target: %s' % target)
+
+    results = set(results)
+    report = dict((status, {'caps': [], 'count': 0, 'passed_count': 0,
+                            'flag_pass_count': 0, 'flag_fail_count': 0})
+                  for status in STATUSES)
+    target_caps = get_target_capabilities(guideline, target)
+    for capability, status in sorted(target_caps.items()):
+        cap_tests = get_capability_tests(guideline, capability)
+        tests = set(test for test, flagged in cap_tests)
+        flagged = set(test for test, flagged in cap_tests if flagged)
+        passed = tests & results
+        not_passed = tests - results
+        cap = {'id': capability,
+               'passed_tests': sorted(passed),
+               'not_passed_tests': sorted(not_passed),
+               'passed_flagged': sorted(passed & flagged),
+               'not_passed_flagged': sorted(not_passed & flagged)}
+        report[status]['count'] += len(tests)
+        report[status]['passed_count'] += len(passed)
+        report[status]['flag_pass_count'] += len(cap['passed_flagged'])
+        report[status]['flag_fail_count'] += len(cap['not_passed_flagged'])
+        report[status]['caps'].append(cap)
+
+    required = report['required']
+    required_fail_count = required['count'] - required['passed_count']
+    required_flag_count = (required['flag_fail_count'] +
+                           required['flag_pass_count'])
+    non_flag_count = required['count'] - required_flag_count
+    non_flag_pass_count = non_flag_count - (required_fail_count -
+                                            required['flag_fail_count'])
+    return {'caps': report,
+            'required_pass_percent': (
+                required['passed_count'] * 100.0 / required['count']
+                if required['count'] else None),
+            'total_required_fail_count': required_fail_count,
+            'total_required_flag_count': required_flag_count,
+            'total_non_flag_count': non_flag_count,
+            'non_flag_pass_count': non_flag_pass_count,
+            'non_flag_required_pass_percent': (
+                non_flag_pass_count * 100.0 / non_flag_count
+                if non_flag_count else None)}
@@ -0,0 +1,221 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Bulk import of test runs.
+
+Runs are read from a directory of JSON documents or from a newline
+delimited JSON file, such as one written by export. Batches of runs are
+validated and stored by a pool of worker processes. Position of the last
+stored batch is saved in a checkpoint file, so an interrupted import is
+restarted right after it.
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import time
+import uuid
+
+from oslo_log import log
+from oslo_utils import timeutils
+import six
+
+from refstack import db
+from refstack.api import constants as api_const
+from refstack.api import exceptions as api_exc
+from refstack.api import validators
+
+LOG = log.getLogger(__name__)
+
+# Namespace of ids generated for runs without id. Ids depend only on
+# content of runs, so runs imported again are skipped as duplicates.
+_ID_NAMESPACE = uuid.UUID('5b8f1c8a-2d43-4e6b-9a1e-3f3c2a7d9e51')
+
+_BLOB_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+_validator = None
+
+
+class _Upload(object):
+    """Unsigned upload of test run in the form validators expect."""
+
+    def __init__(self, body):
+        """Init."""
+        self.body = body
+        self.headers = {}
+
+
+def _get_validator():
+    global _validator
+    if _validator is None:
+        _validator = validators.TestResultValidator()
+    return _validator
+
+
+def _is_meta_value(value):
+    """Check that value is a string or a digest of blob with the value."""
+    if isinstance(value, dict):
+        return (list(value) == [api_const.META_BLOB] and
+                isinstance(value[api_const.META_BLOB], six.string_types) and
+                _BLOB_DIGEST_RE.match(value[api_const.META_BLOB]) is not None)
+    return isinstance(value, six.string_types)
+
+
+def parse_run(text):
+    """Parse and validate test run.
+
+    Uploaded documents and records of export are accepted. Passed tests
+    of records are names only. Metadata value kept in blob store is given
+    by digest of the blob, which is expected in blob store of this
+    instance.
+
+    :raises ValidationError: If test run is invalid.
+    """
+    try:
+        record = json.loads(text)
+    except ValueError as e:
+        raise api_exc.ValidationError('Malformed test run', e)
+    if not isinstance(record, dict):
+        raise api_exc.ValidationError('Test run must be an object')
+    results = [{'name': result} if isinstance(result, six.string_types)
+               else result for result in record.get('results', [])]
+    upload = {'cpid': record.get('cpid'),
+              'duration_seconds': record.get('duration_seconds'),
+              'results': results}
+    body = json.dumps(upload, sort_keys=True)
+    _get_validator().validate(_Upload(body))
+
+    meta = record.get('meta') or {}
+    if not (isinstance(meta, dict) and
+            all(_is_meta_value(value) for value in meta.values())):
+        raise api_exc.ValidationError('Metadata must map keys to strings '
+                                      'or digests of blobs')
+    test_id = record.get('id') or str(uuid.uuid5(
+        _ID_NAMESPACE, body + json.dumps(meta, sort_keys=True)))
+    if not validators.is_uuid(test_id):
+        raise api_exc.ValidationError('Invalid test run id: %s' % test_id)
+    created_at = record.get('created_at')
+    try:
+        created_at = (timeutils.normalize_time(
+            timeutils.parse_isotime(created_at))
+            if created_at else timeutils.utcnow())
+    except ValueError as e:
+        raise api_exc.ValidationError('Invalid creation time', e)
+    return dict(upload, id=test_id, meta=meta, created_at=created_at)
+
+
+def read_runs(path):
+    """Generate positions and documents of test runs in input."""
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path)
+                       if name.endswith('.json'))
+        for position, name in enumerate(names):
+            with open(os.path.join(path, name)) as run_file:
+                yield position, run_file.read()
+    else:
+        with open(path) as runs_file:
+            for position, line in enumerate(runs_file):
+                if line.strip():
+                    yield position, line
+
+
+def _iter_batches(runs, batch_size):
+    batch = []
+    for run in runs:
+        batch.append(run)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_batch(batch):
+    """Validate and store batch of test runs.
+
+    :param batch: List of positions and documents of test runs.
+    :returns: Position of the last run and counts of stored, duplicate
+              and invalid runs.
+    """
+    runs = []
+    invalid = 0
+    for position, text in batch:
+        try:
+            runs.append(parse_run(text))
+        except api_exc.ValidationError as e:
+            LOG.warning('Test run %s is skipped: %s' % (position, e))
+            invalid += 1
+    stored = len(db.store_results_batch(runs)) if runs else 0
+    return {'position': batch[-1][0],
+            'stored': stored,
+            'duplicates': len(runs) - stored,
+            'invalid': invalid}
+
+
+def read_checkpoint(checkpoint):
+    """Return position of the last imported run or None."""
+    try:
+        with open(checkpoint) as checkpoint_file:
+            return int(checkpoint_file.read())
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def write_checkpoint(checkpoint, position):
+    """Save position of the last imported run atomically."""
+    tmp_name = checkpoint + '.tmp'
+    with open(tmp_name, 'w') as checkpoint_file:
+        checkpoint_file.write(str(position))
+    os.rename(tmp_name, checkpoint)
+
+
+def import_runs(path, workers=1, batch_size=100, checkpoint=None):
+    """Import test runs with a pool of worker processes.
+
+    Batches are stored concurrently, but checkpoint is advanced in input
+    order, so no run before the checkpoint is left unimported.
+
+    :returns: Counts of stored, duplicate and invalid runs, elapsed time
+              and throughput in stored runs per second.
+    """
+    last_position = read_checkpoint(checkpoint) if checkpoint else None
+    runs = read_runs(path)
+    if last_position is not None:
+        LOG.info('Import is resumed after test run %s' % last_position)
+        runs = (run for run in runs if run[0] > last_position)
+    totals = {'stored': 0, 'duplicates': 0, 'invalid': 0}
+    started_at = time.time()
+    pool = multiprocessing.Pool(workers, initializer=db.reset_engine)
+    try:
+        for counts in pool.imap(import_batch,
+                                _iter_batches(runs, batch_size)):
+            for key in totals:
+                totals[key] += counts[key]
+            if checkpoint:
+                write_checkpoint(checkpoint, counts['position'])
+            LOG.info('Imported test runs up to %s: %s runs/s' % (
+                counts['position'],
+                totals['stored'] / max(time.time() - started_at, 1e-6)))
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    elapsed = time.time() - started_at
+    totals['seconds'] = elapsed
+    totals['runs_per_second'] = totals['stored'] / elapsed if elapsed else 0
+    return totals
@@ -0,0 +1,128 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Interoperability matrix of test runs.
+
+Passed tests of every run are converted to a bitset over a test catalog
+shared by all runs. A run passes a capability if its bitset contains
+the bitset of capability tests, so each capability cell is a single AND.
+Test cells are set from bit positions of passed tests, so building a
+row costs linear time in the number of tests.
+"""
+
+import binascii
+import csv
+
+import six
+
+from refstack.api import constants as const
+from refstack.api import guidelines
+
+CAPABILITIES = 'capabilities'
+TESTS = 'tests'
+COLUMN_TYPES = (CAPABILITIES, TESTS)
+
+
+class TestCatalog(object):
+    """Catalog assigning bit positions to test names."""
+
+    def __init__(self, tests):
+        """Init."""
+        self.tests = sorted(set(tests))
+        self.positions = dict((test, position)
+                              for position, test in enumerate(self.tests))
+
+    def to_positions(self, tests):
+        """Return bit positions of tests, unknown tests are ignored."""
+        return set(self.positions[test] for test in tests
+                   if test in self.positions)
+
+    def to_bits(self, tests):
+        """Return bitset of tests, unknown tests are ignored.
+
+        Bits are set in a byte array, which is converted to a number at
+        once, as setting bits of a number one by one copies it each time.
+        """
+        octets = bytearray(len(self.tests) // 8 + 1)
+        for position in self.to_positions(tests):
+            octets[-1 - position // 8] |= 1 << position % 8
+        return int(binascii.hexlify(bytes(octets)), 16)
+
+
+def build_matrix(runs, guideline=None, columns=CAPABILITIES,
+                 target=const.PLATFORM_TARGET):
+    """Build runs x capabilities or runs x tests pass matrix.
+
+    A run passes a capability if it passes all its non-flagged tests.
+
+    :param runs: List of (test run id, names of passed tests) pairs.
+    :param guideline: Parsed guideline file. Required for capability
+                      columns. For test columns, tests of all runs are
+                      used if it is not specified.
+    :param columns: Either CAPABILITIES or TESTS.
+    :param target: Guideline target capabilities are taken from.
+    :raises ValueError: if columns can't be built.
+    """
+    if columns not in COLUMN_TYPES:
+        raise ValueError('Unknown column type: %s' % columns)
+    if guideline is None and columns == CAPABILITIES:
+        raise ValueError('Guideline is required for capability columns')
+
+    if guideline is not None:
+        if (target != const.PLATFORM_TARGET and
+                target not in guideline.get('components', {})):
+            raise ValueError('Unknown target: %s' % target)
+        target_caps = sorted(
+            guidelines.get_target_capabilities(guideline, target))
+        cap_tests = dict((cap, guidelines.get_capability_tests(guideline,
+                                                               cap))
+                         for cap in target_caps)
+        catalog = TestCatalog(test for tests in cap_tests.values()
+                              for test, flagged in tests)
+    else:
+        catalog = TestCatalog(test for run_id, tests in runs
+                              for test in tests)
+
+    matrix = []
+    if columns == CAPABILITIES:
+        column_names = target_caps
+        masks = [catalog.to_bits(test for test, flagged in cap_tests[cap]
+                                 if not flagged)
+                 for cap in target_caps]
+        for run_id, tests in runs:
+            bits = catalog.to_bits(tests)
+            matrix.append([bits & mask == mask for mask in masks])
+    else:
+        column_names = catalog.tests
+        for run_id, tests in runs:
+            row = [False] * len(column_names)
+            for position in catalog.to_positions(tests):
+                row[position] = True
+            matrix.append(row)
+    return {'runs': [run_id for run_id, tests in runs],
+            'columns': column_names,
+            'matrix': matrix,
+            'pass_counts': [sum(column) for column in zip(*matrix)]
+            if matrix else [0] * len(column_names)}
+
+
+def to_csv(matrix):
+    """Serialize matrix to CSV with a row per run."""
+    output = six.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['test_id'] + matrix['columns'])
+    for run_id, row in zip(matrix['runs'], matrix['matrix']):
+        writer.writerow([run_id] + [int(cell) for cell in row])
+    return output.getvalue()
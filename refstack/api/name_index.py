@@ -0,0 +1,143 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Search of tests passed in test runs by name.
+
+Names of tests of all requested runs are kept in one catalog shared by
+all runs. Prefix search is a binary search in the sorted catalog and
+substring search intersects trigram postings of the catalog, so only
+matching names are checked against the run. The catalog is rebuilt from
+names of cached runs once it grows too large, so names of runs dropped
+from the cache don't stay in memory.
+"""
+
+import bisect
+import collections
+import threading
+
+from refstack.api import cache
+
+# Number of test runs whose test names are kept in memory.
+RUN_NAMES_CACHE_SIZE = 100
+
+# Number of names in catalog which makes it rebuilt from cached runs.
+CATALOG_MAX_SIZE = 50000
+
+TRIGRAM_LENGTH = 3
+
+
+def _get_trigrams(value):
+    return set(value[i:i + TRIGRAM_LENGTH]
+               for i in range(len(value) - TRIGRAM_LENGTH + 1))
+
+
+class NameIndex(object):
+    """Catalog of test names searchable by prefix and substring."""
+
+    def __init__(self, names=()):
+        """Init."""
+        self._names = []
+        self._known = set()
+        self._trigrams = collections.defaultdict(set)
+        self._lock = threading.Lock()
+        self.add(names)
+
+    def __len__(self):
+        """Number of names in catalog."""
+        return len(self._names)
+
+    def add(self, names):
+        """Add names to catalog."""
+        new_names = set(names) - self._known
+        if not new_names:
+            return
+        with self._lock:
+            new_names -= self._known
+            for name in new_names:
+                for trigram in _get_trigrams(name):
+                    self._trigrams[trigram].add(name)
+            self._known |= new_names
+            # Sorted list is replaced, so searches never see it changing.
+            self._names = sorted(self._names + list(new_names))
+
+    def find_by_prefix(self, prefix):
+        """Return sorted names starting with prefix."""
+        names = self._names
+        start = bisect.bisect_left(names, prefix)
+        end = start
+        while end < len(names) and names[end].startswith(prefix):
+            end += 1
+        return names[start:end]
+
+    def find_containing(self, substring):
+        """Return names containing substring, in arbitrary order.
+
+        Substring shorter than trigrams is refused with ValueError, as
+        its search would scan the whole catalog.
+        """
+        if len(substring) < TRIGRAM_LENGTH:
+            raise ValueError('Substring is shorter than %s characters.'
+                             % TRIGRAM_LENGTH)
+        with self._lock:
+            postings = sorted((self._trigrams.get(trigram, set())
+                               for trigram in _get_trigrams(substring)),
+                              key=len)
+            candidates = postings[0].intersection(*postings[1:])
+        return [name for name in candidates if substring in name]
+
+
+_INDEX = NameIndex()
+_INDEX_LOCK = threading.Lock()
+_RUN_NAMES = cache.LRUDict(RUN_NAMES_CACHE_SIZE)
+
+
+def _add_run_names(test_id, tests):
+    """Cache names of tests of test run and add them to catalog."""
+    global _INDEX
+    run_names = frozenset(tests)
+    with _INDEX_LOCK:
+        _RUN_NAMES.set(test_id, run_names)
+        if len(_INDEX) + len(run_names) > CATALOG_MAX_SIZE:
+            names = set()
+            for cached_names in _RUN_NAMES.values():
+                names |= cached_names
+            _INDEX = NameIndex(names)
+        else:
+            _INDEX.add(run_names)
+    return run_names
+
+
+def filter_tests(test_id, tests, name_prefix=None, contains=None):
+    """Return sorted tests of test run matching name filters.
+
+    :param test_id: The ID of the test. Names of its tests are kept
+                    in memory, so later searches don't scan them.
+    :param tests: Names of tests passed in test run.
+    :param name_prefix: Prefix of returned test names.
+    :param contains: Substring of returned test names, at least
+                     TRIGRAM_LENGTH characters long unless name_prefix
+                     is given.
+    """
+    run_names = _RUN_NAMES.get(test_id)
+    if run_names is None:
+        run_names = _add_run_names(test_id, tests)
+    index = _INDEX
+    if name_prefix:
+        matches = index.find_by_prefix(name_prefix)
+        if contains:
+            matches = [name for name in matches if contains in name]
+    else:
+        matches = sorted(index.find_containing(contains))
+    return [name for name in matches if name in run_names]
@@ -0,0 +1,81 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Columnar encoding of outcomes of all tests of a test run.
+
+Passed tests are stored as rows of results, as before. Outcomes of all
+tests, including failed and skipped ones, are stored as one record per
+test run: ids of tests in the catalog of test names packed as unsigned
+32-bit integers, statuses as one byte per test and durations as 32-bit
+floats, all in the same order. Unknown duration is stored as NaN.
+"""
+
+import math
+import struct
+
+PASS = 'pass'
+FAIL = 'fail'
+SKIP = 'skip'
+STATUSES = (PASS, FAIL, SKIP)
+
+_STATUS_CODES = dict((status, code) for code, status in enumerate(STATUSES))
+
+
+def get_status(result):
+    """Return status of uploaded test result, passed by default."""
+    return result.get('status', PASS)
+
+
+def is_passed(result):
+    """Check whether uploaded test result is passed."""
+    return get_status(result) == PASS
+
+
+def has_outcomes(results):
+    """Check whether uploaded results carry statuses or durations.
+
+    Results of passed tests only, with names and uuids, have no outcomes
+    beyond the rows of results.
+    """
+    return any('status' in result or 'duration' in result
+               for result in results)
+
+
+def encode(outcomes):
+    """Encode outcomes to columns.
+
+    :param outcomes: List of catalog ids, statuses and durations of tests.
+    :returns: Packed catalog ids, statuses and durations.
+    """
+    count = len(outcomes)
+    name_ids = struct.pack('<%dI' % count,
+                           *[name_id for name_id, _s, _d in outcomes])
+    statuses = bytes(bytearray(_STATUS_CODES[status]
+                               for _n, status, _d in outcomes))
+    durations = struct.pack('<%df' % count,
+                            *[float('nan') if duration is None else duration
+                              for _n, _s, duration in outcomes])
+    return name_ids, statuses, durations
+
+
+def decode(name_ids, statuses, durations):
+    """Decode columns to list of catalog ids, statuses and durations."""
+    count = len(statuses)
+    return [(name_id, STATUSES[status],
+             None if math.isnan(duration) else duration)
+            for name_id, status, duration in zip(
+                struct.unpack('<%dI' % count, name_ids),
+                bytearray(statuses),
+                struct.unpack('<%df' % count, durations))]
@@ -0,0 +1,147 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Similarity index of test runs.
+
+Passed tests of every run are reduced to a MinHash signature, whose
+matching positions estimate Jaccard similarity of two runs. Signature is
+split into bands and runs sharing a hash of any band are candidates for
+similar runs (locality-sensitive hashing), so a run is compared only with
+a small number of stored runs.
+"""
+
+import hashlib
+import random
+import struct
+
+from oslo_log import log
+
+from refstack import db
+
+LOG = log.getLogger(__name__)
+
+# Runs sharing at least a half of passed tests are likely to share a band.
+NUM_BANDS = 16
+BAND_ROWS = 4
+NUM_HASHES = NUM_BANDS * BAND_ROWS
+
+# Mersenne prime greater than 32-bit hashes of test names.
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Coefficients of universal hash functions. They are fixed, because
+# signatures of all runs must be computed with the same functions.
+_random = random.Random(20150825)
+_HASH_FUNCTIONS = [(_random.randint(1, _PRIME - 1),
+                    _random.randint(0, _PRIME - 1))
+                   for _i in range(NUM_HASHES)]
+del _random
+
+# Number of test runs indexed in one batch of backfill.
+BATCH_SIZE = 100
+
+
+def _hash_name(name):
+    digest = hashlib.md5(name.encode('utf-8')).digest()
+    return struct.unpack('<I', digest[:4])[0]
+
+
+def get_signature(tests):
+    """Return MinHash signature of passed tests, empty if none passed."""
+    hashes = set(_hash_name(test) for test in tests)
+    if not hashes:
+        return []
+    return [min((a * value + b) % _PRIME for value in hashes) & _MAX_HASH
+            for a, b in _HASH_FUNCTIONS]
+
+
+def get_buckets(signature):
+    """Return LSH buckets of signature, one for every band."""
+    buckets = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * BAND_ROWS:(band + 1) * BAND_ROWS]
+        digest = hashlib.md5(
+            ','.join(str(value) for value in rows).encode('ascii'))
+        buckets.append('%02d%s' % (band, digest.hexdigest()[:16]))
+    return buckets
+
+
+def estimate_similarity(signature, other_signature):
+    """Estimate Jaccard similarity of two runs by their signatures."""
+    matches = sum(1 for value, other_value
+                  in zip(signature, other_signature)
+                  if value == other_value)
+    return float(matches) / NUM_HASHES
+
+
+def index_test(test_id, tests=None):
+    """Store signature of test run.
+
+    :param test_id: The ID of the test.
+    :param tests: Names of tests passed in test run. They are loaded
+                  from database if not specified.
+    :returns: Signature of test run.
+    """
+    if tests is None:
+        tests = [test_dict['name']
+                 for test_dict in db.get_test_results(test_id)]
+    signature = get_signature(tests)
+    db.save_test_signature(test_id, signature,
+                           get_buckets(signature) if signature else [])
+    return signature
+
+
+def index_new_tests():
+    """Store signatures of test runs uploaded before index was created.
+
+    :returns: Number of indexed test runs.
+    """
+    indexed = 0
+    while True:
+        test_ids = db.get_test_ids_without_signature(BATCH_SIZE)
+        if not test_ids:
+            return indexed
+        LOG.info('Indexing signatures of %s test runs' % len(test_ids))
+        for test_id in test_ids:
+            index_test(test_id)
+        indexed += len(test_ids)
+
+
+def find_similar(test_id, count, filters, max_candidates):
+    """Find test runs with the most similar passed tests.
+
+    :param test_id: The ID of the test.
+    :param count: Number of returned runs.
+    :param filters: Filters of candidate runs, as for listing of runs.
+    :param max_candidates: Maximum number of compared runs.
+    :returns: List of dicts with id, created_at and similarity of runs
+              in descending order of similarity.
+    """
+    signature = db.get_test_signature(test_id)
+    if signature is None:
+        signature = index_test(test_id)
+    if not signature:
+        return []
+    candidates = db.get_similar_test_candidates(
+        test_id, get_buckets(signature), filters, max_candidates)
+    similar = []
+    for candidate in candidates:
+        similar.append({
+            'id': candidate['id'],
+            'created_at': candidate['created_at'],
+            'similarity': estimate_similarity(signature,
+                                              candidate['signature'])})
+    similar.sort(key=lambda run: run['similarity'], reverse=True)
+    return similar[:count]
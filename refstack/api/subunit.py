@@ -0,0 +1,230 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Parser of subunit v2 streams of test results.
+
+Stream is read packet by packet, so only the packet being parsed is held
+in memory. Attachments, such as logs of tests, are skipped.
+"""
+
+import collections
+import re
+import struct
+import zlib
+
+from refstack.api import outcomes
+
+CONTENT_TYPE = 'application/x-subunit'
+
+SIGNATURE = 0xb3
+VERSION = 0x2000
+
+FLAG_VERSION = 0xf000
+FLAG_TEST_ID = 0x0800
+FLAG_ROUTE_CODE = 0x0400
+FLAG_TIMESTAMP = 0x0200
+FLAG_TAGS = 0x0080
+FLAG_FILE_CONTENT = 0x0040
+FLAG_MIME_TYPE = 0x0020
+FLAG_STATUS = 0x0007
+
+STATUS_INPROGRESS = 2
+STATUS_SUCCESS = 3
+STATUS_UXSUCCESS = 4
+STATUS_SKIP = 5
+STATUS_FAIL = 6
+
+# Outcomes of final test statuses.
+_OUTCOMES = {STATUS_SUCCESS: outcomes.PASS,
+             STATUS_UXSUCCESS: outcomes.FAIL,
+             STATUS_SKIP: outcomes.SKIP,
+             STATUS_FAIL: outcomes.FAIL}
+
+# Packets are limited to 4 MiB by subunit v2 protocol.
+MAX_PACKET_SIZE = 4 * 1024 * 1024
+
+_UUID_ATTR_RE = re.compile(r'^id-([0-9a-fA-F-]{36})$')
+
+
+class Packet(object):
+    """Test event of subunit stream.
+
+    Timestamp is number of seconds since epoch or None.
+    """
+
+    def __init__(self, test_id, status, timestamp):
+        """Init."""
+        self.test_id = test_id
+        self.status = status
+        self.timestamp = timestamp
+
+
+def _read(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError('Stream is truncated')
+    return data
+
+
+def _get_number(data, offset):
+    """Decode variable length number, return it and next offset."""
+    first = bytearray(data[offset:offset + 1])
+    if not first:
+        raise ValueError('Packet is truncated')
+    size = (first[0] >> 6) + 1
+    chunk = bytearray(data[offset:offset + size])
+    if len(chunk) != size:
+        raise ValueError('Packet is truncated')
+    value = chunk[0] & 0x3f
+    for byte in chunk[1:]:
+        value = (value << 8) | byte
+    return value, offset + size
+
+
+def _get_bytes(data, offset):
+    size, offset = _get_number(data, offset)
+    if offset + size > len(data):
+        raise ValueError('Packet is truncated')
+    return data[offset:offset + size], offset + size
+
+
+def _get_string(data, offset):
+    value, offset = _get_bytes(data, offset)
+    try:
+        return value.decode('utf-8'), offset
+    except UnicodeError:
+        raise ValueError('Malformed string')
+
+
+def _parse_packet(data):
+    """Parse packet without its CRC."""
+    flags, = struct.unpack('>H', data[1:3])
+    if flags & FLAG_VERSION != VERSION:
+        raise ValueError('Unsupported subunit version')
+    _length, offset = _get_number(data, 3)
+    timestamp = test_id = None
+    if flags & FLAG_TIMESTAMP:
+        if offset + 4 > len(data):
+            raise ValueError('Packet is truncated')
+        seconds, = struct.unpack('>I', data[offset:offset + 4])
+        nanoseconds, offset = _get_number(data, offset + 4)
+        timestamp = seconds + nanoseconds / 1e9
+    if flags & FLAG_TEST_ID:
+        test_id, offset = _get_string(data, offset)
+    if flags & FLAG_TAGS:
+        count, offset = _get_number(data, offset)
+        for _i in range(count):
+            _tag, offset = _get_string(data, offset)
+    if flags & FLAG_MIME_TYPE:
+        _mime_type, offset = _get_string(data, offset)
+    if flags & FLAG_FILE_CONTENT:
+        _file_name, offset = _get_string(data, offset)
+        _content, offset = _get_bytes(data, offset)
+    if flags & FLAG_ROUTE_CODE:
+        _route_code, offset = _get_string(data, offset)
+    if offset != len(data):
+        raise ValueError('Packet length mismatch')
+    return Packet(test_id, flags & FLAG_STATUS, timestamp)
+
+
+def iter_packets(stream):
+    """Generate packets read from file-like subunit v2 stream.
+
+    :raises ValueError: If stream is malformed.
+    """
+    while True:
+        header = stream.read(4)
+        if not header:
+            return
+        if len(header) != 4:
+            raise ValueError('Stream is truncated')
+        if bytearray(header)[0] != SIGNATURE:
+            raise ValueError('Invalid packet signature')
+        extra = bytearray(header)[3] >> 6
+        header += _read(stream, extra)
+        length, _offset = _get_number(header, 3)
+        if length > MAX_PACKET_SIZE or length < len(header) + 4:
+            raise ValueError('Invalid packet length: %s' % length)
+        data = header + _read(stream, length - len(header))
+        crc, = struct.unpack('>I', data[-4:])
+        if zlib.crc32(data[:-4]) & 0xffffffff != crc:
+            raise ValueError('Packet checksum mismatch')
+        yield _parse_packet(data[:-4])
+
+
+def is_stream(data):
+    """Check whether data starts like subunit v2 stream."""
+    return bytearray(data[:1]) == bytearray([SIGNATURE])
+
+
+def split_test_id(test_id):
+    """Split test id to test name and uuid.
+
+    Attributes of tempest tests are given in brackets after test name,
+    for example: tempest.api.test_a[id-<uuid>,smoke]. Uuid is None if
+    there is no id attribute.
+    """
+    name, _sep, attrs = test_id.partition('[')
+    for attr in attrs.rstrip(']').split(','):
+        match = _UUID_ATTR_RE.match(attr.strip())
+        if match:
+            return name, match.group(1)
+    return name, None
+
+
+def parse_results(stream):
+    """Parse test results from subunit v2 stream.
+
+    Passed, failed and skipped tests are collected with durations between
+    their in-progress and final events. Expected failures are not
+    recorded. Duration of test run spans from the first to the last
+    timestamp of the stream.
+
+    :returns: Dict with duration_seconds and results with names, uuids,
+              statuses and durations of tests.
+    :raises ValueError: If stream is malformed.
+    """
+    results = collections.OrderedDict()
+    started = {}
+    started_at = finished_at = None
+    for packet in iter_packets(stream):
+        if packet.timestamp is not None:
+            if started_at is None:
+                started_at = finished_at = packet.timestamp
+            started_at = min(started_at, packet.timestamp)
+            finished_at = max(finished_at, packet.timestamp)
+        if not packet.test_id:
+            continue
+        if packet.status == STATUS_INPROGRESS:
+            started[packet.test_id] = packet.timestamp
+            continue
+        status = _OUTCOMES.get(packet.status)
+        if status is None:
+            continue
+        name, test_uuid = split_test_id(packet.test_id)
+        previous = results.get(name)
+        if previous and outcomes.is_passed(previous):
+            # Test may be reported again, for example, after retry.
+            continue
+        result = {'name': name, 'status': status}
+        if test_uuid:
+            result['uuid'] = test_uuid
+        start = started.pop(packet.test_id, None)
+        if start is not None and packet.timestamp is not None:
+            result['duration'] = max(packet.timestamp - start, 0)
+        results[name] = result
+    duration = (int(round(finished_at - started_at))
+                if started_at is not None else 0)
+    return {'duration_seconds': duration, 'results': list(results.values())}
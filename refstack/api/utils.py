@@ -14,8 +14,12 @@
 #    under the License.
 
 """Refstack API's utils."""
+import calendar
 import copy
+from email import utils as email_utils
 import functools
+import hashlib
+import json
 import random
 import requests
 import string
@@ -81,6 +85,23 @@ def parse_input_params(expected_input_params):
             raise api_exc.ParseInputsError(
                 'Invalid dates: %(start)s more than %(end)s'
                 '' % {'start': const.START_DATE, 'end': const.END_DATE})
+    if const.COMPLIANT in filters:
+        guideline, _sep, target = filters[const.COMPLIANT].partition(':')
+        if not guideline:
+            raise api_exc.ParseInputsError(
+                'Invalid %(compliant)s value: guideline is not specified'
+                '' % {'compliant': const.COMPLIANT})
+        filters[const.COMPLIANT] = (guideline,
+                                    target or const.PLATFORM_TARGET)
+    if const.SORT in filters:
+        if filters[const.SORT] != const.SORT_COMPLIANCE:
+            raise api_exc.ParseInputsError(
+                'Invalid %(sort)s value: %(value)s'
+                '' % {'sort': const.SORT, 'value': filters[const.SORT]})
+        if const.COMPLIANT not in filters:
+            raise api_exc.ParseInputsError(
+                'Sorting by compliance requires %(compliant)s parameter'
+                '' % {'compliant': const.COMPLIANT})
     if const.SIGNED in filters:
         if is_authenticated():
             filters[const.OPENID] = get_user_id()
@@ -106,13 +127,53 @@ def _calculate_pages_number(per_page, records_count):
     return quotient
 
 
-def get_page_number(records_count):
+def get_per_page():
+    """Get number of results for one page from request."""
+    per_page = pecan.request.GET.get(const.PER_PAGE)
+    if per_page is None:
+        return CONF.api.results_per_page
+    try:
+        per_page = int(per_page)
+    except (ValueError, TypeError):
+        raise api_exc.ParseInputsError(
+            'Invalid %(per_page)s value: It can not be converted to '
+            'an integer' % {'per_page': const.PER_PAGE})
+    if not 0 < per_page <= CONF.api.results_max_per_page:
+        raise api_exc.ParseInputsError(
+            'Invalid %(per_page)s value: It must be between 1 and '
+            '%(max)s' % {'per_page': const.PER_PAGE,
+                         'max': CONF.api.results_max_per_page})
+    return per_page
+
+
+def get_fields(allowed_fields):
+    """Get list of fields requested with fields parameter.
+
+    :param allowed_fields: Fields which may be requested.
+    :returns: List of fields or None if all fields are requested.
+    """
+    fields = pecan.request.GET.get(const.FIELDS)
+    if not fields:
+        return None
+    fields = [field.strip() for field in fields.split(',')
+              if field.strip()]
+    unknown_fields = set(fields) - set(allowed_fields)
+    if unknown_fields:
+        raise api_exc.ParseInputsError(
+            'Invalid %(fields)s value: Unknown fields %(unknown)s' % {
+                'fields': const.FIELDS,
+                'unknown': ', '.join(sorted(unknown_fields))})
+    return fields
+
+
+def get_page_number(records_count, per_page=None):
     """Get page number from request.
 
     :param records_count: (int) total records count.
+    :param per_page: (int) results number for one page.
     """
     page_number = pecan.request.GET.get(const.PAGE)
-    per_page = CONF.api.results_per_page
+    per_page = per_page or CONF.api.results_per_page
 
     total_pages = _calculate_pages_number(per_page, records_count)
     # The first page exists in any case
@@ -140,6 +201,67 @@ def get_page_number(records_count):
     return (page_number, total_pages)
 
 
+def get_test_run_etag(test_version, role=None):
+    """Return strong ETag for test run state as seen by given role.
+
+    :param test_version: (dict) Test run version info from db.
+    :param role: User role for the test run if representation depends on it.
+    """
+    etag = '%s-%s' % (test_version['id'], test_version['meta_version'])
+    if role:
+        etag = '%s-%s' % (etag, role)
+    return etag
+
+
+def get_content_etag(content):
+    """Return strong ETag for JSON serializable content."""
+    serialized = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+
+def _format_http_date(value):
+    """Format naive UTC datetime as HTTP date."""
+    return email_utils.formatdate(calendar.timegm(value.timetuple()),
+                                  usegmt=True)
+
+
+def _parse_http_date(value):
+    """Parse HTTP date into UTC timestamp. Return None if it is invalid."""
+    parsed = email_utils.parsedate_tz(value)
+    if parsed is None:
+        return
+    return email_utils.mktime_tz(parsed)
+
+
+def check_not_modified(etag, last_modified=None):
+    """Set cache validators for response and handle conditional GET.
+
+    Response is aborted with 304 status if the validators sent in request
+    match the current state of resource.
+
+    :param etag: (str) Strong entity tag of resource.
+    :param last_modified: (datetime) Time of the last resource change (UTC).
+    """
+    headers = {'ETag': '"%s"' % etag, 'Vary': 'Cookie'}
+    if last_modified:
+        headers['Last-Modified'] = _format_http_date(last_modified)
+    pecan.response.headers.update(headers)
+
+    if_none_match = pecan.request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        tags = [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+        if '*' in tags or headers['ETag'] in tags:
+            pecan.abort(304, headers=headers)
+    elif last_modified:
+        if_modified_since = _parse_http_date(
+            pecan.request.headers.get('If-Modified-Since') or '')
+        if (if_modified_since is not None and
+                calendar.timegm(last_modified.timetuple()) <=
+                if_modified_since):
+            pecan.abort(304, headers=headers)
+
+
 def set_query_params(url, params):
     """Set params in given query."""
     url_parts = parse.urlparse(url)
@@ -226,6 +348,30 @@ def get_user_role(test_id):
     return
 
 
+def get_user_roles(tests_meta):
+    """Return user roles for current user and several test runs.
+
+    Public keys of user are loaded once for all test runs.
+
+    :param tests_meta: Dict mapping test run id to its metadata.
+    :returns: Dict mapping test run id to user role or None.
+    """
+    user_pubkeys = []
+    if is_authenticated():
+        user_pubkeys = [' '.join((pk['format'], pk['pubkey']))
+                        for pk in get_user_public_keys()]
+    roles = {}
+    for test_id, meta in six.iteritems(tests_meta):
+        test_pubkey = meta.get(const.PUBLIC_KEY)
+        if test_pubkey and test_pubkey in user_pubkeys:
+            roles[test_id] = const.ROLE_OWNER
+        elif not test_pubkey or meta.get(const.SHARED_TEST_RUN):
+            roles[test_id] = const.ROLE_USER
+        else:
+            roles[test_id] = None
+    return roles
+
+
 def _check_user(test_id):
     """Check that user has access to shared test run."""
     test_pubkey = db.get_test_meta_key(test_id, const.PUBLIC_KEY)
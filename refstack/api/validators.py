@@ -25,6 +25,7 @@ from Crypto.PublicKey import RSA
 from Crypto.Signature import PKCS1_v1_5
 
 from refstack.api import exceptions as api_exc
+from refstack.api import outcomes
 
 ext_format_checker = jsonschema.FormatChecker()
 
@@ -85,17 +86,19 @@ class TestResultValidator(BaseValidator):
             'duration_seconds': {'type': 'integer'},
             'results': {
                 'type': 'array',
-                'items': [{
+                'items': {
                     'type': 'object',
                     'properties': {
                         'name': {'type': 'string'},
                         'uuid': {
                             'type': 'string',
                             'format': 'uuid_hex'
-                        }
-                    }
-                }]
-
+                        },
+                        'status': {'enum': list(outcomes.STATUSES)},
+                        'duration': {'type': 'number', 'minimum': 0}
+                    },
+                    'required': ['name']
+                }
             }
         },
         'required': ['cpid', 'duration_seconds', 'results'],
@@ -105,6 +108,29 @@ class TestResultValidator(BaseValidator):
     def validate(self, request):
         """Validate uploaded test results."""
         super(TestResultValidator, self).validate(request)
+        self._validate_signature(request, request.body.encode('utf-8'))
+        if self._is_empty_result(request):
+            raise api_exc.ValidationError('Uploaded results must contain at '
+                                          'least one passing test.')
+
+    def validate_subunit(self, request, test):
+        """Validate test results parsed from uploaded subunit stream.
+
+        Signature is verified against the stream itself.
+        """
+        try:
+            jsonschema.validate(test, self.schema)
+        except jsonschema.ValidationError as e:
+            raise api_exc.ValidationError(
+                'Request doesn''t correspond to schema', e)
+        self._validate_signature(request, request.body)
+        if not any(outcomes.is_passed(result)
+                   for result in test['results']):
+            raise api_exc.ValidationError('Uploaded results must contain at '
+                                          'least one passing test.')
+
+    def _validate_signature(self, request, data):
+        """Verify signature of uploaded data if it is signed."""
         if request.headers.get('X-Signature') or \
                 request.headers.get('X-Public-Key'):
             try:
@@ -118,19 +144,15 @@ class TestResultValidator(BaseValidator):
                 raise api_exc.ValidationError('Malformed public key', e)
             signer = PKCS1_v1_5.new(key)
             data_hash = SHA256.new()
-            data_hash.update(request.body.encode('utf-8'))
+            data_hash.update(data)
             if not signer.verify(data_hash, sign):
                 raise api_exc.ValidationError('Signature verification failed')
-        if self._is_empty_result(request):
-            raise api_exc.ValidationError('Uploaded results must contain at '
-                                          'least one passing test.')
 
     def _is_empty_result(self, request):
-        """Check if the test results list is empty."""
+        """Check if the test results list has no passed tests."""
         body = json.loads(request.body)
-        if len(body['results']) != 0:
-            return False
-        return True
+        return not any(outcomes.is_passed(result)
+                       for result in body['results'])
 
     @staticmethod
     def assert_id(_id):
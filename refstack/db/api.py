@@ -40,6 +40,11 @@ NotFound = IMPL.NotFound
 Duplication = IMPL.Duplication
 
 
+def reset_engine():
+    """Drop DB engine inherited from parent process."""
+    return IMPL.reset_engine()
+
+
 def store_results(results):
     """Storing results into database.
 
@@ -48,6 +53,20 @@ def store_results(results):
     return IMPL.store_results(results)
 
 
+def store_results_batch(runs):
+    """Store several test runs in one transaction.
+
+    Runs whose ids are already stored are skipped. Test runs are stored
+    without compliance reports and similarity signatures, they are
+    created later by background jobs.
+
+    :param runs: List of dicts with id, cpid, created_at,
+                 duration_seconds, meta and results of test runs.
+    :returns: Ids of stored test runs.
+    """
+    return IMPL.store_results_batch(runs)
+
+
 def get_test(test_id, allowed_keys=None):
     """Get test run information from the database.
 
@@ -56,6 +75,26 @@ def get_test(test_id, allowed_keys=None):
     return IMPL.get_test(test_id, allowed_keys=allowed_keys)
 
 
+def get_test_version(test_id):
+    """Get meta version counter and timestamps of test run.
+
+    Test results never change after upload, so these values
+    identify the state of a test run without loading its results.
+
+    :param test_id: The ID of the test.
+    """
+    return IMPL.get_test_version(test_id)
+
+
+def get_test_upload_digest(test_id):
+    """Get digest of blob holding raw upload of test run.
+
+    :param test_id: The ID of the test.
+    :returns: Digest or None if raw upload was not stored.
+    """
+    return IMPL.get_test_upload_digest(test_id)
+
+
 def delete_test(test_id):
     """Delete test run information from the database.
 
@@ -64,12 +103,34 @@ def delete_test(test_id):
     return IMPL.delete_test(test_id)
 
 
-def get_test_results(test_id):
+def get_test_results(test_id, name_prefix=None):
     """Get all passed tempest tests for a specified test run.
 
     :param test_id: The ID of the test.
+    :param name_prefix: Prefix of names of returned tests, all tests
+                        are returned if None.
+    """
+    return IMPL.get_test_results(test_id, name_prefix)
+
+
+def get_test_outcomes(test_id, status=None):
+    """Get outcomes of all tests of test run with their durations.
+
+    :param test_id: The ID of the test.
+    :param status: Status of returned outcomes, all are returned if None.
+    """
+    return IMPL.get_test_outcomes(test_id, status)
+
+
+def get_slowest_tests(filters, limit, max_runs):
+    """Get tests with the longest mean duration across test runs.
+
+    :param filters: (Dict) Filters that will be applied for test runs.
+    :param limit: Maximum number of returned tests.
+    :param max_runs: Maximum number of the most recent test runs
+                     durations are aggregated across.
     """
-    return IMPL.get_test_results(test_id)
+    return IMPL.get_slowest_tests(filters, limit, max_runs)
 
 
 def get_test_meta_key(test_id, key, default=None):
@@ -83,14 +144,26 @@ def get_test_meta_key(test_id, key, default=None):
     return IMPL.get_test_meta_key(test_id, key, default)
 
 
-def save_test_meta_item(test_id, key, value):
+def get_test_meta_blob_digest(test_id, key):
+    """Get digest of blob holding metadata value of test run.
+
+    :param test_id: The ID of the test.
+    :param key: Metadata key
+    :returns: Digest or None if the value is kept in database.
+    """
+    return IMPL.get_test_meta_blob_digest(test_id, key)
+
+
+def save_test_meta_item(test_id, key, value, blob_digest=None):
     """Store or update item value related to specified test run.
 
     :param test_id: The ID of the test.
     :param key: Metadata key
+    :param blob_digest: Digest of blob holding the value, which is not
+                        saved in database then.
 
     """
-    return IMPL.save_test_meta_item(test_id, key, value)
+    return IMPL.save_test_meta_item(test_id, key, value, blob_digest)
 
 
 def delete_test_meta_item(test_id, key):
@@ -105,14 +178,227 @@ def delete_test_meta_item(test_id, key):
     return IMPL.delete_test_meta_item(test_id, key)
 
 
-def get_test_records(page_number, per_page, filters):
+def get_results_of_tests(test_ids):
+    """Get passed tests of several test runs with a single query.
+
+    :param test_ids: The IDs of the tests.
+    :returns: Dict mapping test id to list of passed test names.
+    """
+    return IMPL.get_results_of_tests(test_ids)
+
+
+def get_latest_test_ids(filters):
+    """Get ids of the latest test run of each cloud.
+
+    :param filters: (Dict) Only the signed filter is supported. Public
+                    test runs are used if it is not set.
+    """
+    return IMPL.get_latest_test_ids(filters)
+
+
+def get_latest_test_records(page_number, per_page, filters):
+    """Get page with the latest test run of each cloud.
+
+    :param page_number: The number of page.
+    :param per_page: The number of results for one page.
+    :param filters: (Dict) Only the signed filter is supported. Public
+                    test runs are listed if it is not set.
+    """
+    return IMPL.get_latest_test_records(page_number, per_page, filters)
+
+
+def get_latest_test_records_count(filters):
+    """Get number of clouds having test runs.
+
+    :param filters: (Dict) Only the signed filter is supported.
+    """
+    return IMPL.get_latest_test_records_count(filters)
+
+
+def get_test_pass_rates():
+    """Get community pass counts of all tests.
+
+    Each item has name, pass_count (number of passing test runs) and
+    cpid_count (number of clouds with passing test runs) keys.
+    """
+    return IMPL.get_test_pass_rates()
+
+
+def get_population():
+    """Get total number of test runs and clouds which uploaded them."""
+    return IMPL.get_population()
+
+
+def rebuild_test_pass_rates():
+    """Recalculate pass counts of all tests from test results.
+
+    Pass counts are maintained on upload and deletion of test runs,
+    rebuild is needed only to repair them.
+    """
+    return IMPL.rebuild_test_pass_rates()
+
+
+def save_test_compliance(test_id, records):
+    """Replace compliance records of test run for given guidelines.
+
+    :param test_id: The ID of the test.
+    :param records: List of dicts with guideline, target,
+                    required_pass_percent, non_flag_pass_percent and
+                    passed keys. Existing records of every guideline
+                    present in the list are replaced.
+    """
+    return IMPL.save_test_compliance(test_id, records)
+
+
+def get_test_compliance(test_id):
+    """Get compliance records of test run.
+
+    :param test_id: The ID of the test.
+    """
+    return IMPL.get_test_compliance(test_id)
+
+
+def get_test_ids_without_compliance(guideline, limit):
+    """Get ids of test runs which are not evaluated against guideline.
+
+    :param guideline: Guideline version.
+    :param limit: Maximum number of ids returned.
+    """
+    return IMPL.get_test_ids_without_compliance(guideline, limit)
+
+
+def save_test_signature(test_id, signature, buckets):
+    """Store similarity signature of test run.
+
+    :param test_id: The ID of the test.
+    :param signature: List of signature values.
+    :param buckets: Locality-sensitive hashing buckets of signature.
+    """
+    return IMPL.save_test_signature(test_id, signature, buckets)
+
+
+def get_test_signature(test_id):
+    """Get similarity signature of test run or None if not stored.
+
+    :param test_id: The ID of the test.
+    """
+    return IMPL.get_test_signature(test_id)
+
+
+def get_similar_test_candidates(test_id, buckets, filters, limit):
+    """Get test runs sharing a signature bucket with test run.
+
+    Test runs sharing the most buckets with test run are returned first.
+
+    :param test_id: The ID of the test, excluded from candidates.
+    :param buckets: Signature buckets of test run.
+    :param filters: (Dict) Filters that will be applied for test runs.
+    :param limit: Maximum number of returned test runs.
+    """
+    return IMPL.get_similar_test_candidates(test_id, buckets, filters, limit)
+
+
+def get_test_ids_without_signature(limit):
+    """Get ids of test runs without similarity signature.
+
+    :param limit: Maximum number of returned ids.
+    """
+    return IMPL.get_test_ids_without_signature(limit)
+
+
+def rebuild_upload_rollups():
+    """Recalculate upload activity rollups from all test runs.
+
+    :returns: Number of counted test runs.
+    """
+    return IMPL.rebuild_upload_rollups()
+
+
+def get_upload_activity(period, start_date, end_date, cpid=None):
+    """Get numbers of signed and unsigned test runs uploaded in periods.
+
+    :param period: Length of periods: hour, day or week.
+    :param start_date: Start of time range.
+    :param end_date: End of time range.
+    :param cpid: Cloud provider ID. Test runs of all clouds are counted
+                 if not specified.
+    """
+    return IMPL.get_upload_activity(period, start_date, end_date, cpid)
+
+
+def get_cloud_trend(cpid, filters, guideline=None, target=None):
+    """Get summaries of cloud test runs in chronological order.
+
+    :param cpid: Cloud provider ID.
+    :param filters: (Dict) Filters that will be applied for test runs.
+    :param guideline: Guideline version. Compliance of test runs with it
+                      is added to summaries if specified.
+    :param target: Guideline target.
+    """
+    return IMPL.get_cloud_trend(cpid, filters, guideline, target)
+
+
+def get_test_records(page_number, per_page, filters, fields=None):
     """Get page with applied filters for uploaded test records.
 
     :param page_number: The number of page.
     :param per_page: The number of results for one page.
     :param filters: (Dict) Filters that will be applied for records.
+    :param fields: Fields of returned records: id, cpid, created_at,
+                   duration_seconds and meta. Only requested columns
+                   and relations are loaded. Default fields of test
+                   runs are returned if not specified.
+    """
+    return IMPL.get_test_records(page_number, per_page, filters, fields)
+
+
+def get_test_fields(test_id, fields):
+    """Get requested fields of test run.
+
+    :param test_id: The ID of the test.
+    :param fields: Fields of test run: id, cpid, created_at,
+                   duration_seconds and meta.
+    """
+    return IMPL.get_test_fields(test_id, fields)
+
+
+def get_test_fields_of_tests(test_ids, fields):
+    """Get requested fields of several test runs with IN queries.
+
+    :param test_ids: The IDs of the tests.
+    :param fields: Fields of test runs: id, cpid, created_at,
+                   duration_seconds and meta.
+    :returns: Dict mapping id of existing test run to its fields.
+    """
+    return IMPL.get_test_fields_of_tests(test_ids, fields)
+
+
+def iter_test_records(filters, after=None, with_results=False,
+                      batch_size=1000):
+    """Iterate over test records in chronological order.
+
+    :param filters: (Dict) Filters that will be applied for records.
+    :param after: Pair of creation time and id of the last test run
+                  returned before. Iteration is resumed after it.
+    :param with_results: Whether passed tests of test runs are loaded.
+    :param batch_size: The number of test runs loaded at once.
+    """
+    return IMPL.iter_test_records(filters, after, with_results, batch_size)
+
+
+def get_changes(since, limit, until=None):
+    """Get changes of public test runs in order they were logged.
+
+    Change of test run is public if the run is public before or after
+    the change.
+
+    :param since: Cursor of the last change read before.
+    :param limit: Maximum number of changes.
+    :param until: Changes logged after this time are not returned.
+    :returns: List of dicts with cursor, test_id, operation and
+              created_at of changes.
     """
-    return IMPL.get_test_records(page_number, per_page, filters)
+    return IMPL.get_changes(since, limit, until)
 
 
 def get_test_records_count(filters):
@@ -0,0 +1,26 @@
+"""Add meta version counter to test table.
+
+Revision ID: 1a3b5e1c0f2d
+Revises: 534e20be9964
+Create Date: 2015-08-04 11:02:17.512843
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1a3b5e1c0f2d'
+down_revision = '534e20be9964'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.add_column('test', sa.Column('meta_version', sa.Integer(),
+                                    nullable=False, server_default='0'))
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_column('test', 'meta_version')
@@ -0,0 +1,27 @@
+"""Add digests of blobs to test and meta tables.
+
+Revision ID: 2d7e4b9a6c58
+Revises: 6c3d8a1f4e25
+Create Date: 2015-08-31 15:42:09.118364
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2d7e4b9a6c58'
+down_revision = '6c3d8a1f4e25'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.add_column('test', sa.Column('upload_digest', sa.String(length=64)))
+    op.add_column('meta', sa.Column('blob_digest', sa.String(length=64)))
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_column('meta', 'blob_digest')
+    op.drop_column('test', 'upload_digest')
@@ -0,0 +1,45 @@
+"""Create test run compliance table.
+
+Revision ID: 3c62ba4d1e5f
+Revises: 1a3b5e1c0f2d
+Create Date: 2015-08-11 15:42:05.127364
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3c62ba4d1e5f'
+down_revision = '1a3b5e1c0f2d'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.create_table(
+        'compliance',
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('deleted_at', sa.DateTime()),
+        sa.Column('deleted', sa.Integer, default=0),
+        sa.Column('_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('test_id', sa.String(length=36), nullable=False),
+        sa.Column('guideline', sa.String(length=32), nullable=False),
+        sa.Column('target', sa.String(length=64), nullable=False),
+        sa.Column('required_pass_percent', sa.Float()),
+        sa.Column('non_flag_pass_percent', sa.Float()),
+        sa.Column('passed', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ),
+        sa.PrimaryKeyConstraint('_id'),
+        sa.UniqueConstraint('test_id', 'guideline', 'target'),
+        mysql_charset=MYSQL_CHARSET
+    )
+    op.create_index('ix_compliance_test_id', 'compliance', ['test_id'])
+    op.create_index('indx_compliance_guideline_target', 'compliance',
+                    ['guideline', 'target', 'passed'])
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_table('compliance')
@@ -0,0 +1,59 @@
+"""Create tables of test outcomes and catalog of test names.
+
+Revision ID: 3e9a1c7f5b64
+Revises: 2d7e4b9a6c58
+Create Date: 2015-09-02 13:27:45.630912
+
+Existing test runs have passed tests only, so they have no outcomes.
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3e9a1c7f5b64'
+down_revision = '2d7e4b9a6c58'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.create_table(
+        'test_names',
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('deleted_at', sa.DateTime()),
+        sa.Column('deleted', sa.Integer, default=0),
+        sa.Column('_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('name', sa.String(length=512,
+                                    collation='latin1_swedish_ci'),
+                  nullable=False),
+        sa.PrimaryKeyConstraint('_id'),
+        sa.UniqueConstraint('name'),
+        mysql_charset=MYSQL_CHARSET
+    )
+    op.create_table(
+        'test_outcomes',
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('deleted_at', sa.DateTime()),
+        sa.Column('deleted', sa.Integer, default=0),
+        sa.Column('_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('test_id', sa.String(length=36), nullable=False),
+        sa.Column('name_ids', sa.LargeBinary(length=2 ** 24),
+                  nullable=False),
+        sa.Column('statuses', sa.LargeBinary(length=2 ** 24),
+                  nullable=False),
+        sa.Column('durations', sa.LargeBinary(length=2 ** 24),
+                  nullable=False),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ),
+        sa.PrimaryKeyConstraint('_id'),
+        sa.UniqueConstraint('test_id'),
+        mysql_charset=MYSQL_CHARSET
+    )
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_table('test_outcomes')
+    op.drop_table('test_names')
@@ -0,0 +1,80 @@
+"""Create table of upload activity rollups.
+
+Revision ID: 4e2a7b9c1d30
+Revises: 9b1f3c2d8e47
+Create Date: 2015-08-24 16:12:09.371245
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4e2a7b9c1d30'
+down_revision = '9b1f3c2d8e47'
+MYSQL_CHARSET = 'utf8'
+
+import collections
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import column
+from sqlalchemy.sql import table
+
+
+def _get_buckets(created_at):
+    """Get hourly and daily buckets of upload time."""
+    hour = created_at.replace(minute=0, second=0, microsecond=0)
+    return (('hour', hour), ('day', hour.replace(hour=0)))
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.create_index('ix_test_created_at', 'test', ['created_at'])
+    op.create_table(
+        'upload_rollups',
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('deleted_at', sa.DateTime()),
+        sa.Column('deleted', sa.Integer, default=0),
+        sa.Column('_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('period', sa.String(length=16), nullable=False),
+        sa.Column('cpid', sa.String(length=128), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('signed', sa.Boolean(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('_id'),
+        sa.UniqueConstraint('period', 'cpid', 'bucket', 'signed'),
+        mysql_charset=MYSQL_CHARSET
+    )
+
+    # Empty cloud id stands for rollups of all clouds.
+    counts = collections.Counter()
+    runs = op.get_bind().execute(sa.text(
+        "SELECT test.cpid, test.created_at, meta.test_id FROM test "
+        "LEFT OUTER JOIN meta ON meta.test_id = test.id "
+        "AND meta.meta_key = 'public_key'"))
+    for cpid, created_at, signed in runs:
+        for period, bucket in _get_buckets(created_at):
+            for rollup_cpid in (cpid, ''):
+                counts[(period, rollup_cpid, bucket,
+                        signed is not None)] += 1
+    # Table object returned by op.create_table is not available in
+    # older alembic releases, so the inserted columns are listed here.
+    rollups = table('upload_rollups',
+                    column('created_at', sa.DateTime()),
+                    column('deleted', sa.Integer()),
+                    column('period', sa.String()),
+                    column('cpid', sa.String()),
+                    column('bucket', sa.DateTime()),
+                    column('signed', sa.Boolean()),
+                    column('count', sa.Integer()))
+    now = datetime.datetime.utcnow()
+    op.bulk_insert(rollups, [
+        {'period': period, 'cpid': cpid, 'bucket': bucket, 'signed': signed,
+         'count': count, 'created_at': now, 'deleted': 0}
+        for (period, cpid, bucket, signed), count in counts.items()])
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_table('upload_rollups')
+    op.drop_index('ix_test_created_at', 'test')
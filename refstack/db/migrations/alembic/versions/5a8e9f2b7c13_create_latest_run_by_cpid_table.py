@@ -0,0 +1,68 @@
+"""Create table of latest test runs of clouds.
+
+Revision ID: 5a8e9f2b7c13
+Revises: 7d4c0e4a5b91
+Create Date: 2015-08-18 10:05:37.481920
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5a8e9f2b7c13'
+down_revision = '7d4c0e4a5b91'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+SIGNED_RUNS = "SELECT test_id FROM meta WHERE meta_key = 'public_key'"
+SHARED_RUNS = "SELECT test_id FROM meta WHERE meta_key = 'shared'"
+VISIBILITY_CONDITIONS = {
+    'public': ('(id NOT IN (%s) OR id IN (%s))'
+               % (SIGNED_RUNS, SHARED_RUNS)),
+    'signed': 'id IN (%s)' % SIGNED_RUNS,
+}
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.create_table(
+        'latest_run_by_cpid',
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('deleted_at', sa.DateTime()),
+        sa.Column('deleted', sa.Integer, default=0),
+        sa.Column('_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('cpid', sa.String(length=128), nullable=False),
+        sa.Column('visibility', sa.String(length=16), nullable=False),
+        sa.Column('test_id', sa.String(length=36), nullable=False),
+        sa.Column('run_created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ),
+        sa.PrimaryKeyConstraint('_id'),
+        sa.UniqueConstraint('cpid', 'visibility'),
+        mysql_charset=MYSQL_CHARSET
+    )
+    op.create_index('indx_latest_run_visibility_created_at',
+                    'latest_run_by_cpid', ['visibility', 'run_created_at'])
+
+    conn = op.get_bind()
+    cpids = [cpid for cpid, in conn.execute(
+        sa.text('SELECT DISTINCT cpid FROM test'))]
+    for cpid in cpids:
+        for visibility, condition in VISIBILITY_CONDITIONS.items():
+            run = conn.execute(sa.text(
+                'SELECT id, created_at FROM test WHERE cpid = :cpid AND %s '
+                'ORDER BY created_at DESC LIMIT 1' % condition),
+                cpid=cpid).first()
+            if run:
+                conn.execute(sa.text(
+                    'INSERT INTO latest_run_by_cpid '
+                    '(created_at, cpid, visibility, test_id, run_created_at) '
+                    'VALUES (NOW(), :cpid, :visibility, :test_id, '
+                    ':run_created_at)'),
+                    cpid=cpid, visibility=visibility, test_id=run[0],
+                    run_created_at=run[1])
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_table('latest_run_by_cpid')
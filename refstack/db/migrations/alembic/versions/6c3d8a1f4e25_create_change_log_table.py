@@ -0,0 +1,42 @@
+"""Create change log of test runs.
+
+Revision ID: 6c3d8a1f4e25
+Revises: 8f5d2e6a3b17
+Create Date: 2015-08-27 10:14:52.301847
+
+Existing test runs are logged as created in chronological order, so
+consumers of change feed start with all of them.
+"""
+
+# revision identifiers, used by Alembic.
+revision = '6c3d8a1f4e25'
+down_revision = '8f5d2e6a3b17'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.create_table(
+        'change_log',
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('deleted_at', sa.DateTime()),
+        sa.Column('deleted', sa.Integer, default=0),
+        sa.Column('_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('test_id', sa.String(length=36), nullable=False),
+        sa.Column('operation', sa.String(length=16), nullable=False),
+        sa.PrimaryKeyConstraint('_id'),
+        mysql_charset=MYSQL_CHARSET
+    )
+    op.create_index('ix_change_log_test_id', 'change_log', ['test_id'])
+    op.execute("INSERT INTO change_log (created_at, test_id, operation, "
+               "deleted) SELECT created_at, id, 'create', 0 FROM test "
+               "ORDER BY created_at, id")
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_table('change_log')
@@ -0,0 +1,68 @@
+"""Create tables of test pass counts.
+
+Revision ID: 7d4c0e4a5b91
+Revises: 3c62ba4d1e5f
+Create Date: 2015-08-14 12:20:44.901275
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '7d4c0e4a5b91'
+down_revision = '3c62ba4d1e5f'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.create_table(
+        'test_cloud_pass_counts',
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('deleted_at', sa.DateTime()),
+        sa.Column('deleted', sa.Integer, default=0),
+        sa.Column('_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('name', sa.String(length=512,
+                                    collation='latin1_swedish_ci'),
+                  nullable=False),
+        sa.Column('cpid', sa.String(length=128,
+                                    collation='latin1_swedish_ci'),
+                  nullable=False),
+        sa.Column('pass_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('_id'),
+        sa.UniqueConstraint('name', 'cpid'),
+        mysql_charset=MYSQL_CHARSET
+    )
+    op.create_table(
+        'test_pass_rates',
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('deleted_at', sa.DateTime()),
+        sa.Column('deleted', sa.Integer, default=0),
+        sa.Column('_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('name', sa.String(length=512,
+                                    collation='latin1_swedish_ci'),
+                  nullable=False),
+        sa.Column('pass_count', sa.Integer(), nullable=False),
+        sa.Column('cpid_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('_id'),
+        sa.UniqueConstraint('name'),
+        mysql_charset=MYSQL_CHARSET
+    )
+    op.execute('INSERT INTO test_cloud_pass_counts '
+               '(created_at, name, cpid, pass_count) '
+               'SELECT NOW(), results.name, test.cpid, COUNT(*) '
+               'FROM results JOIN test ON results.test_id = test.id '
+               'GROUP BY results.name, test.cpid')
+    op.execute('INSERT INTO test_pass_rates '
+               '(created_at, name, pass_count, cpid_count) '
+               'SELECT NOW(), name, SUM(pass_count), COUNT(*) '
+               'FROM test_cloud_pass_counts GROUP BY name')
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_table('test_pass_rates')
+    op.drop_table('test_cloud_pass_counts')
@@ -0,0 +1,58 @@
+"""Create tables of test run similarity signatures.
+
+Revision ID: 8f5d2e6a3b17
+Revises: 4e2a7b9c1d30
+Create Date: 2015-08-25 11:48:30.214576
+
+Signatures of existing test runs are stored by
+'refstack-manage index_similarity'.
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8f5d2e6a3b17'
+down_revision = '4e2a7b9c1d30'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.create_table(
+        'test_signatures',
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('deleted_at', sa.DateTime()),
+        sa.Column('deleted', sa.Integer, default=0),
+        sa.Column('_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('test_id', sa.String(length=36), nullable=False),
+        sa.Column('signature', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ),
+        sa.PrimaryKeyConstraint('_id'),
+        sa.UniqueConstraint('test_id'),
+        mysql_charset=MYSQL_CHARSET
+    )
+    op.create_table(
+        'test_signature_buckets',
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('deleted_at', sa.DateTime()),
+        sa.Column('deleted', sa.Integer, default=0),
+        sa.Column('_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('test_id', sa.String(length=36), nullable=False),
+        sa.Column('bucket', sa.String(length=32), nullable=False),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ),
+        sa.PrimaryKeyConstraint('_id'),
+        mysql_charset=MYSQL_CHARSET
+    )
+    op.create_index('ix_test_signature_buckets_test_id',
+                    'test_signature_buckets', ['test_id'])
+    op.create_index('ix_test_signature_buckets_bucket',
+                    'test_signature_buckets', ['bucket'])
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_table('test_signature_buckets')
+    op.drop_table('test_signatures')
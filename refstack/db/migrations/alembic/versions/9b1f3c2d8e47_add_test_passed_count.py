@@ -0,0 +1,28 @@
+"""Add passed tests counter to test table.
+
+Revision ID: 9b1f3c2d8e47
+Revises: 5a8e9f2b7c13
+Create Date: 2015-08-20 12:31:44.905126
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '9b1f3c2d8e47'
+down_revision = '5a8e9f2b7c13'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.add_column('test', sa.Column('passed_count', sa.Integer()))
+    op.execute('UPDATE test SET passed_count = '
+               '(SELECT COUNT(*) FROM results '
+               'WHERE results.test_id = test.id)')
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_column('test', 'passed_count')
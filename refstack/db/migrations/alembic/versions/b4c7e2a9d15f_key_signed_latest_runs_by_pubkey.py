@@ -0,0 +1,107 @@
+"""Keep latest signed test runs of clouds per public key.
+
+Revision ID: b4c7e2a9d15f
+Revises: 3e9a1c7f5b64
+Create Date: 2015-09-08 11:42:19.305417
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b4c7e2a9d15f'
+down_revision = '3e9a1c7f5b64'
+MYSQL_CHARSET = 'utf8'
+
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+SIGNED_RUNS = "SELECT test_id FROM meta WHERE meta_key = 'public_key'"
+SHARED_RUNS = "SELECT test_id FROM meta WHERE meta_key = 'shared'"
+PUBLIC_CONDITION = ('(id NOT IN (%s) OR id IN (%s))'
+                    % (SIGNED_RUNS, SHARED_RUNS))
+SIGNED_CONDITION = 'id IN (%s)' % SIGNED_RUNS
+INSERT_LATEST_RUN = (
+    'INSERT INTO latest_run_by_cpid '
+    '(created_at, cpid, visibility, %s test_id, run_created_at) '
+    'VALUES (NOW(), :cpid, :visibility, %s :test_id, :run_created_at)')
+
+
+def _create_table(unique_columns, *columns):
+    """Create table of latest test runs of clouds."""
+    op.create_table(
+        'latest_run_by_cpid',
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('deleted_at', sa.DateTime()),
+        sa.Column('deleted', sa.Integer, default=0),
+        sa.Column('_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('cpid', sa.String(length=128), nullable=False),
+        sa.Column('visibility', sa.String(length=16), nullable=False),
+        sa.Column('test_id', sa.String(length=36), nullable=False),
+        sa.Column('run_created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['test_id'], ['test.id'], ),
+        sa.PrimaryKeyConstraint('_id'),
+        sa.UniqueConstraint(*unique_columns),
+        *columns,
+        mysql_charset=MYSQL_CHARSET
+    )
+    op.create_index('indx_latest_run_visibility_created_at',
+                    'latest_run_by_cpid', ['visibility', 'run_created_at'])
+
+
+def _get_latest_run(conn, cpid, condition):
+    """Get latest test run of cloud matching condition."""
+    return conn.execute(sa.text(
+        'SELECT id, created_at FROM test WHERE cpid = :cpid AND %s '
+        'ORDER BY created_at DESC LIMIT 1' % condition),
+        cpid=cpid).first()
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.drop_table('latest_run_by_cpid')
+    _create_table(('cpid', 'visibility', 'pubkey_hash'),
+                  sa.Column('pubkey_hash', sa.String(length=32),
+                            nullable=False, server_default=''))
+
+    conn = op.get_bind()
+    insert = sa.text(INSERT_LATEST_RUN % ('pubkey_hash,', ':pubkey_hash,'))
+    cpids = [cpid for cpid, in conn.execute(
+        sa.text('SELECT DISTINCT cpid FROM test'))]
+    for cpid in cpids:
+        run = _get_latest_run(conn, cpid, PUBLIC_CONDITION)
+        if run:
+            conn.execute(insert, cpid=cpid, visibility='public',
+                         pubkey_hash='', test_id=run[0],
+                         run_created_at=run[1])
+        latest_runs = {}
+        for test_id, created_at, pubkey in conn.execute(sa.text(
+                'SELECT test.id, test.created_at, meta.value FROM test '
+                'JOIN meta ON meta.test_id = test.id '
+                "WHERE test.cpid = :cpid AND meta.meta_key = 'public_key' "
+                'ORDER BY test.created_at DESC'), cpid=cpid):
+            pubkey_hash = hashlib.md5(pubkey.encode('utf-8')).hexdigest()
+            latest_runs.setdefault(pubkey_hash, (test_id, created_at))
+        for pubkey_hash, (test_id, created_at) in latest_runs.items():
+            conn.execute(insert, cpid=cpid, visibility='signed',
+                         pubkey_hash=pubkey_hash, test_id=test_id,
+                         run_created_at=created_at)
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_table('latest_run_by_cpid')
+    _create_table(('cpid', 'visibility'))
+
+    conn = op.get_bind()
+    insert = sa.text(INSERT_LATEST_RUN % ('', ''))
+    cpids = [cpid for cpid, in conn.execute(
+        sa.text('SELECT DISTINCT cpid FROM test'))]
+    for cpid in cpids:
+        for visibility, condition in (('public', PUBLIC_CONDITION),
+                                      ('signed', SIGNED_CONDITION)):
+            run = _get_latest_run(conn, cpid, condition)
+            if run:
+                conn.execute(insert, cpid=cpid, visibility=visibility,
+                             test_id=run[0], run_created_at=run[1])
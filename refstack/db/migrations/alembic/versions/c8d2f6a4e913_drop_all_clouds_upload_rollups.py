@@ -0,0 +1,34 @@
+"""Drop upload activity rollups of all clouds.
+
+Revision ID: c8d2f6a4e913
+Revises: b4c7e2a9d15f
+Create Date: 2015-09-09 16:20:51.774038
+
+Rollups of all clouds were updated by every upload, they are summed from
+rollups of clouds on reading now.
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'c8d2f6a4e913'
+down_revision = 'b4c7e2a9d15f'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.execute(sa.text("DELETE FROM upload_rollups WHERE cpid = ''"))
+    op.create_index('indx_upload_rollups_period_bucket', 'upload_rollups',
+                    ['period', 'bucket'])
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_index('indx_upload_rollups_period_bucket', 'upload_rollups')
+    op.execute(sa.text(
+        "INSERT INTO upload_rollups "
+        "(created_at, deleted, period, cpid, bucket, signed, count) "
+        "SELECT NOW(), 0, period, '', bucket, signed, SUM(count) "
+        "FROM upload_rollups GROUP BY period, bucket, signed"))
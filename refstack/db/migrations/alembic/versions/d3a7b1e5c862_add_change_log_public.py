@@ -0,0 +1,33 @@
+"""Add visibility of changes of test runs.
+
+Revision ID: d3a7b1e5c862
+Revises: c8d2f6a4e913
+Create Date: 2015-09-10 09:37:26.148390
+
+Visibility of logged changes of existing test runs is the current
+visibility of the runs. Changes of deleted runs are public.
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'd3a7b1e5c862'
+down_revision = 'c8d2f6a4e913'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.add_column('change_log', sa.Column('public', sa.Boolean(),
+                                          nullable=False,
+                                          server_default=sa.true()))
+    op.execute("UPDATE change_log SET public = 0 WHERE test_id IN "
+               "(SELECT test_id FROM meta WHERE meta_key = 'public_key') "
+               "AND test_id NOT IN "
+               "(SELECT test_id FROM meta WHERE meta_key = 'shared')")
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.drop_column('change_log', 'public')
@@ -0,0 +1,32 @@
+"""Allow compliance not applicable to test runs.
+
+Revision ID: e5b9c3d7a281
+Revises: d3a7b1e5c862
+Create Date: 2015-09-14 11:02:47.519863
+
+Compliance with guideline target without required tests is neither
+passed nor failed. Such records, stored as passed before, are deleted,
+so test runs are evaluated against their guidelines again.
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9c3d7a281'
+down_revision = 'd3a7b1e5c862'
+MYSQL_CHARSET = 'utf8'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    """Upgrade DB."""
+    op.alter_column('compliance', 'passed', existing_type=sa.Boolean(),
+                    nullable=True)
+    op.execute('DELETE FROM compliance WHERE required_pass_percent IS NULL')
+
+
+def downgrade():
+    """Downgrade DB."""
+    op.execute('DELETE FROM compliance WHERE passed IS NULL')
+    op.alter_column('compliance', 'passed', existing_type=sa.Boolean(),
+                    nullable=False)
@@ -16,16 +16,23 @@
 """Implementation of SQLAlchemy backend."""
 
 import base64
+import collections
+import datetime
 import hashlib
+import heapq
 import sys
 import uuid
 
 from oslo_config import cfg
+from oslo_db import exception as db_exc
 from oslo_db import options as db_options
 from oslo_db.sqlalchemy import session as db_session
 import six
+import sqlalchemy as sa
+from sqlalchemy import orm
 
 from refstack.api import constants as api_const
+from refstack.api import outcomes as api_outcomes
 from refstack.db.sqlalchemy import models
 
 
@@ -35,6 +42,17 @@ _FACADE = None
 
 db_options.set_defaults(cfg.CONF)
 
+# Periods of stored upload activity rollups. Weekly activity is summed
+# from daily rollups.
+ROLLUP_PERIODS = (api_const.PERIOD_HOUR, api_const.PERIOD_DAY)
+
+# Transactions are retried after a conflict with a concurrent one, e.g.
+# on insertion of pass rate of the same test.
+BATCH_RETRIES = 3
+
+# Number of test names or catalog ids looked up with one query.
+NAME_CHUNK_SIZE = 500
+
 
 class NotFound(Exception):
     """Raise if item not found in db."""
@@ -68,11 +86,34 @@ def get_session(**kwargs):
     return facade.get_session(**kwargs)
 
 
+def reset_engine():
+    """Drop DB engine, a new one is created on demand.
+
+    Forked processes must not use connections of their parent.
+    """
+    global _FACADE
+    _FACADE = None
+
+
 def get_backend():
     """The backend is this module itself."""
     return sys.modules[__name__]
 
 
+def _retry_on_conflict(func, *args):
+    """Call function running a transaction, retry it after a conflict.
+
+    Rows inserted by a concurrent transaction are found by the retried
+    one, so it updates them instead.
+    """
+    for attempt in range(BATCH_RETRIES + 1):
+        try:
+            return func(*args)
+        except (db_exc.DBDuplicateEntry, db_exc.DBDeadlock):
+            if attempt == BATCH_RETRIES:
+                raise
+
+
 def _to_dict(sqlalchemy_object, allowed_keys=None):
     if isinstance(sqlalchemy_object, list):
         return [_to_dict(obj) for obj in sqlalchemy_object]
@@ -106,16 +147,326 @@ def _to_dict(sqlalchemy_object, allowed_keys=None):
     return sqlalchemy_object
 
 
-def store_results(results):
-    """Store test results."""
+def _get_meta_columns(value):
+    """Get value and blob digest columns of metadata value of document.
+
+    Value kept in blob store is given by its digest.
+    """
+    if isinstance(value, dict):
+        return None, value[api_const.META_BLOB]
+    return value, None
+
+
+def _get_meta_value(value, blob_digest):
+    """Get metadata value of document from value and digest columns."""
+    if blob_digest:
+        return {api_const.META_BLOB: blob_digest}
+    return value
+
+
+def _filter_by_visibility(query, visibility):
+    """Filter test runs with given visibility.
+
+    Public test runs are unsigned or shared ones.
+    """
+    signed_results = (query.session
+                      .query(models.TestMeta.test_id)
+                      .filter_by(meta_key=api_const.PUBLIC_KEY))
+    if visibility == api_const.VISIBILITY_SIGNED:
+        return query.filter(models.Test.id.in_(signed_results))
+    shared_results = (query.session
+                      .query(models.TestMeta.test_id)
+                      .filter_by(meta_key=api_const.SHARED_TEST_RUN))
+    return query.filter(sa.or_(models.Test.id.notin_(signed_results),
+                               models.Test.id.in_(shared_results)))
+
+
+def _get_pubkey_hash(pubkey):
+    """Get hash of public key signing test runs."""
+    return hashlib.md5(pubkey.encode('utf-8')).hexdigest()
+
+
+def _get_run_pubkeys(meta):
+    """Get public keys signing test run with given metadata."""
+    if api_const.PUBLIC_KEY in meta:
+        return [meta[api_const.PUBLIC_KEY]]
+    return []
+
+
+def _save_latest_run(session, cpid, visibility, pubkey_hash, run):
+    """Save or delete latest test run of cloud with given visibility."""
+    latest = (session.query(models.LatestRun)
+              .filter_by(cpid=cpid, visibility=visibility,
+                         pubkey_hash=pubkey_hash)
+              .first())
+    if run is None:
+        if latest is not None:
+            session.delete(latest)
+        return
+    if latest is None:
+        latest = models.LatestRun()
+        latest.cpid = cpid
+        latest.visibility = visibility
+        latest.pubkey_hash = pubkey_hash
+    latest.test_id, latest.run_created_at = run
+    latest.save(session)
+
+
+def _refresh_latest_runs(session, cpid, pubkeys=()):
+    """Update latest test runs of cloud after its test runs changed.
+
+    Latest public run of cloud is kept once, latest signed run of cloud
+    is kept for each public key, so runs signed by other users never
+    hide runs of the user.
+
+    :param pubkeys: Public keys of signed runs which changed.
+    """
+    query = (session.query(models.Test.id, models.Test.created_at)
+             .filter_by(cpid=cpid))
+    run = (_filter_by_visibility(query, api_const.VISIBILITY_PUBLIC)
+           .order_by(models.Test.created_at.desc())
+           .first())
+    _save_latest_run(session, cpid, api_const.VISIBILITY_PUBLIC, '', run)
+    for pubkey in set(pubkeys):
+        run = (query
+               .join(models.TestMeta,
+                     models.TestMeta.test_id == models.Test.id)
+               .filter(models.TestMeta.meta_key == api_const.PUBLIC_KEY)
+               .filter(models.TestMeta.value == pubkey)
+               .order_by(models.Test.created_at.desc())
+               .first())
+        _save_latest_run(session, cpid, api_const.VISIBILITY_SIGNED,
+                         _get_pubkey_hash(pubkey), run)
+
+
+def _get_period_length(period):
+    """Get length of upload activity period."""
+    return datetime.timedelta(**{period + 's': 1})
+
+
+def _get_bucket(created_at, period):
+    """Get start of upload activity period containing given time."""
+    bucket = created_at.replace(minute=0, second=0, microsecond=0)
+    if period != api_const.PERIOD_HOUR:
+        bucket = bucket.replace(hour=0)
+    if period == api_const.PERIOD_WEEK:
+        bucket -= datetime.timedelta(days=bucket.weekday())
+    return bucket
+
+
+def _update_upload_rollups(session, cpid, created_at, signed, delta):
+    """Add or subtract test run to/from upload activity rollups.
+
+    Rollups are kept per cloud only, so concurrent uploads of different
+    clouds never update the same rows. A rollup inserted concurrently
+    by an upload of the same cloud fails the transaction with
+    DBDuplicateEntry, and callers retry it.
+
+    :param delta: 1 on upload of test run, -1 on its deletion.
+    """
+    rollups = models.UploadRollup
+    for period in ROLLUP_PERIODS:
+        bucket = _get_bucket(created_at, period)
+        updated = (session.query(rollups)
+                   .filter_by(period=period, cpid=cpid,
+                              bucket=bucket, signed=signed)
+                   .update({rollups.count: rollups.count + delta},
+                           synchronize_session=False))
+        if not updated and delta > 0:
+            session.add(rollups(period=period, cpid=cpid,
+                                bucket=bucket, signed=signed,
+                                count=delta))
+
+
+def _is_public_meta(meta_keys):
+    """Check whether test run with given metadata keys is public."""
+    return (api_const.PUBLIC_KEY not in meta_keys
+            or api_const.SHARED_TEST_RUN in meta_keys)
+
+
+def _is_public(session, test_id):
+    """Check whether stored test run is public."""
+    return _is_public_meta(set(
+        key for key, in session.query(models.TestMeta.meta_key)
+        .filter_by(test_id=test_id)
+        .filter(models.TestMeta.meta_key.in_([api_const.PUBLIC_KEY,
+                                              api_const.SHARED_TEST_RUN]))))
+
+
+def _log_change(session, test_id, operation, public):
+    """Append change of test run to change log.
+
+    Change is logged as the last statement of its transaction, so the
+    time between its logging and commit is as short as possible.
+
+    :param public: Whether test run is public before or after change.
+    """
+    change = models.TestChange()
+    change.test_id = test_id
+    change.operation = operation
+    change.public = public
+    session.add(change)
+    session.flush()
+
+
+def _log_meta_change(session, test_id, was_public):
+    """Append change of test run metadata to change log.
+
+    Test run which leaves or enters the public runs is deleted or
+    created for readers of public changes, and updated for its owner.
+
+    :param was_public: Whether test run was public before change.
+    """
+    public = _is_public(session, test_id)
+    if public == was_public:
+        _log_change(session, test_id, api_const.CHANGE_UPDATE, public)
+        return
+    _log_change(session, test_id, api_const.CHANGE_UPDATE, False)
+    _log_change(session, test_id,
+                api_const.CHANGE_DELETE if was_public
+                else api_const.CHANGE_CREATE, True)
+
+
+def _update_test_pass_counts(session, cpid, names, delta):
+    """Add or subtract test run passed tests to/from pass counts.
+
+    Counts of new tests are inserted, so a concurrent insertion of the
+    same test fails the transaction, which is retried then. Tests without
+    counts are skipped on deletion.
+
+    :param delta: 1 on upload of test run, -1 on its deletion.
+    """
+    names = set(names)
+    if not names:
+        return
+    cloud_counts = models.TestCloudPassCount
+    rates = models.TestPassRate
+    counts = dict(session.query(cloud_counts.name, cloud_counts.pass_count)
+                  .filter_by(cpid=cpid)
+                  .filter(cloud_counts.name.in_(names)))
+    if delta > 0:
+        # Tests passed by the cloud for the first time.
+        cloud_changed = names - set(counts)
+        updated = set(counts)
+        for name in sorted(cloud_changed):
+            session.add(cloud_counts(name=name, cpid=cpid, pass_count=1))
+    else:
+        # Tests not passed by any remaining test run of the cloud.
+        names = set(counts)
+        cloud_changed = set(name for name, count in counts.items()
+                            if count <= 1)
+        updated = names - cloud_changed
+        if cloud_changed:
+            (session.query(cloud_counts)
+             .filter_by(cpid=cpid)
+             .filter(cloud_counts.name.in_(cloud_changed))
+             .delete(synchronize_session=False))
+    if updated:
+        (session.query(cloud_counts)
+         .filter_by(cpid=cpid)
+         .filter(cloud_counts.name.in_(updated))
+         .update({cloud_counts.pass_count: cloud_counts.pass_count + delta},
+                 synchronize_session=False))
+    if not names:
+        return
+
+    existing = set(name for name, in session.query(rates.name)
+                   .filter(rates.name.in_(names)))
+    if delta > 0:
+        for name in sorted(names - existing):
+            session.add(rates(name=name, pass_count=1, cpid_count=1))
+    if existing:
+        (session.query(rates)
+         .filter(rates.name.in_(existing))
+         .update({rates.pass_count: rates.pass_count + delta},
+                 synchronize_session=False))
+    if existing & cloud_changed:
+        (session.query(rates)
+         .filter(rates.name.in_(existing & cloud_changed))
+         .update({rates.cpid_count: rates.cpid_count + delta},
+                 synchronize_session=False))
+    if delta < 0:
+        (session.query(rates)
+         .filter(rates.name.in_(names))
+         .filter(rates.pass_count <= 0)
+         .delete(synchronize_session=False))
+
+
+def _iter_chunks(values, size=NAME_CHUNK_SIZE):
+    values = sorted(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _get_test_name_ids(names):
+    """Get catalog ids of test names, adding missing names to catalog.
+
+    Names are added in a separate transaction and never removed, so ids
+    of names are stable.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    session = get_session()
+    for attempt in range(BATCH_RETRIES):
+        ids = {}
+        try:
+            with session.begin():
+                for chunk in _iter_chunks(names):
+                    ids.update(session.query(models.TestName.name,
+                                             models.TestName._id)
+                               .filter(models.TestName.name.in_(chunk)))
+                missing = names - set(ids)
+                if missing:
+                    session.execute(models.TestName.__table__.insert(),
+                                    [{'name': name}
+                                     for name in sorted(missing)])
+            break
+        except db_exc.DBDuplicateEntry:
+            # Names were added by concurrent upload, they are read again.
+            if attempt == BATCH_RETRIES - 1:
+                raise
+    if missing:
+        for chunk in _iter_chunks(missing):
+            ids.update(session.query(models.TestName.name,
+                                     models.TestName._id)
+                       .filter(models.TestName.name.in_(chunk)))
+    return ids
+
+
+def _get_test_names_of_ids(session, name_ids):
+    """Get test names of catalog ids."""
+    names = {}
+    for chunk in _iter_chunks(set(name_ids)):
+        names.update(session.query(models.TestName._id,
+                                   models.TestName.name)
+                     .filter(models.TestName._id.in_(chunk)))
+    return names
+
+
+def _get_outcome_columns(results, name_ids):
+    """Encode outcomes of all tests of test run to columns."""
+    outcomes = dict((name_ids[result['name']],
+                     (api_outcomes.get_status(result),
+                      result.get('duration')))
+                    for result in results)
+    return api_outcomes.encode([(name_id, status, duration)
+                                for name_id, (status, duration)
+                                in sorted(outcomes.items())])
+
+
+def _store_results(results, passed, name_ids):
+    all_results = results.get('results', [])
     test = models.Test()
     test_id = str(uuid.uuid4())
     test.id = test_id
     test.cpid = results.get('cpid')
     test.duration_seconds = results.get('duration_seconds')
+    test.passed_count = len(passed)
+    test.upload_digest = results.get('upload_digest')
     session = get_session()
     with session.begin():
-        for result in results.get('results', []):
+        for result in passed:
             test_result = models.TestResults()
             test_result.test_id = test_id
             test_result.name = result['name']
@@ -123,12 +474,119 @@ def store_results(results):
             test.results.append(test_result)
         for k, v in six.iteritems(results.get('meta', {})):
             meta = models.TestMeta()
-            meta.meta_key, meta.value = k, v
+            meta.meta_key = k
+            meta.value, meta.blob_digest = _get_meta_columns(v)
             test.meta.append(meta)
         test.save(session)
+        if name_ids is not None:
+            test_outcomes = models.TestOutcomes()
+            test_outcomes.test_id = test_id
+            (test_outcomes.name_ids, test_outcomes.statuses,
+             test_outcomes.durations) = _get_outcome_columns(all_results,
+                                                             name_ids)
+            session.add(test_outcomes)
+        _refresh_latest_runs(session, test.cpid,
+                             _get_run_pubkeys(results.get('meta', {})))
+        # Rows shared by all uploads are updated last, so they are
+        # locked for as short a time as possible.
+        _update_upload_rollups(
+            session, test.cpid, test.created_at,
+            api_const.PUBLIC_KEY in results.get('meta', {}), 1)
+        _update_test_pass_counts(
+            session, test.cpid, [result['name'] for result in passed], 1)
+        _log_change(session, test_id, api_const.CHANGE_CREATE,
+                    _is_public_meta(results.get('meta', {})))
     return test_id
 
 
+def store_results(results):
+    """Store test results.
+
+    Rows of results are stored for passed tests. Outcomes of all tests
+    are stored in columnar encoding if statuses or durations are given.
+    """
+    all_results = results.get('results', [])
+    passed = [result for result in all_results
+              if api_outcomes.is_passed(result)]
+    name_ids = (_get_test_name_ids(result['name'] for result in all_results)
+                if api_outcomes.has_outcomes(all_results) else None)
+    return _retry_on_conflict(_store_results, results, passed, name_ids)
+
+
+def _store_results_batch(runs):
+    """Store several test runs in one transaction."""
+    runs = [dict(run, passed=[result for result in run['results']
+                              if api_outcomes.is_passed(result)])
+            for run in runs]
+    name_ids = _get_test_name_ids(
+        result['name'] for run in runs
+        if api_outcomes.has_outcomes(run['results'])
+        for result in run['results'])
+    session = get_session()
+    with session.begin():
+        existing = set(test_id for test_id, in session
+                       .query(models.Test.id)
+                       .filter(models.Test.id.in_([run['id']
+                                                   for run in runs])))
+        new_runs = []
+        for run in runs:
+            if run['id'] not in existing:
+                existing.add(run['id'])
+                new_runs.append(run)
+        if not new_runs:
+            return []
+        session.execute(models.Test.__table__.insert(), [
+            {'id': run['id'], 'cpid': run['cpid'],
+             'created_at': run['created_at'],
+             'duration_seconds': run['duration_seconds'],
+             'passed_count': len(run['passed'])}
+            for run in new_runs])
+        session.execute(models.TestResults.__table__.insert(), [
+            {'test_id': run['id'], 'name': result['name'],
+             'uuid': result.get('uuid')}
+            for run in new_runs for result in run['passed']])
+        test_outcomes = [
+            dict(zip(('name_ids', 'statuses', 'durations'),
+                     _get_outcome_columns(run['results'], name_ids)),
+                 test_id=run['id'])
+            for run in new_runs
+            if api_outcomes.has_outcomes(run['results'])]
+        if test_outcomes:
+            session.execute(models.TestOutcomes.__table__.insert(),
+                            test_outcomes)
+        meta = [dict(zip(('value', 'blob_digest'), _get_meta_columns(value)),
+                     test_id=run['id'], meta_key=key)
+                for run in new_runs for key, value
+                in six.iteritems(run['meta'])]
+        if meta:
+            session.execute(models.TestMeta.__table__.insert(), meta)
+        pubkeys = collections.defaultdict(set)
+        for run in new_runs:
+            pubkeys[run['cpid']].update(_get_run_pubkeys(run['meta']))
+        for cpid, cpid_pubkeys in six.iteritems(pubkeys):
+            _refresh_latest_runs(session, cpid, cpid_pubkeys)
+        for run in new_runs:
+            _update_upload_rollups(
+                session, run['cpid'], run['created_at'],
+                api_const.PUBLIC_KEY in run['meta'], 1)
+            _update_test_pass_counts(
+                session, run['cpid'],
+                [result['name'] for result in run['passed']], 1)
+        session.execute(models.TestChange.__table__.insert(), [
+            {'test_id': run['id'], 'operation': api_const.CHANGE_CREATE,
+             'public': _is_public_meta(run['meta'])}
+            for run in new_runs])
+    return [run['id'] for run in new_runs]
+
+
+def store_results_batch(runs):
+    """Store several test runs in one transaction.
+
+    Runs with already stored ids are skipped.
+    """
+    return _retry_on_conflict(_store_results_batch, runs)
+
+
 def get_test(test_id, allowed_keys=None):
     """Get test info."""
     session = get_session()
@@ -140,21 +598,88 @@ def get_test(test_id, allowed_keys=None):
     return _to_dict(test_info, allowed_keys)
 
 
-def delete_test(test_id):
-    """Delete test information from the database."""
+def get_test_version(test_id):
+    """Get meta version counter and timestamps of test run."""
+    session = get_session()
+    version = (session.query(models.Test.id,
+                             models.Test.meta_version,
+                             models.Test.created_at,
+                             models.Test.updated_at)
+               .filter_by(id=test_id)
+               .first())
+    if not version:
+        raise NotFound('Test result %s not found' % test_id)
+    return _to_dict(version)
+
+
+def get_test_upload_digest(test_id):
+    """Get digest of blob holding raw upload of test run."""
+    session = get_session()
+    row = (session.query(models.Test.upload_digest)
+           .filter_by(id=test_id)
+           .first())
+    if row is None:
+        raise NotFound('Test result %s not found' % test_id)
+    return row[0]
+
+
+def _get_test_cpid(session, test_id):
+    """Get cloud id of test run."""
+    return (session.query(models.Test.cpid)
+            .filter_by(id=test_id)
+            .scalar())
+
+
+def _bump_meta_version(session, test_id):
+    """Increment meta version counter of test run."""
+    session.query(models.Test).filter_by(id=test_id).update(
+        {models.Test.meta_version: models.Test.meta_version + 1},
+        synchronize_session=False)
+
+
+def _delete_test(test_id):
     session = get_session()
     with session.begin():
         test = session.query(models.Test).filter_by(id=test_id).first()
         if test:
+            names = [name for name, in session.query(models.TestResults.name)
+                     .filter_by(test_id=test_id)]
+            pubkey = (session.query(models.TestMeta)
+                      .filter_by(test_id=test_id,
+                                 meta_key=api_const.PUBLIC_KEY)
+                      .first())
+            pubkeys = [pubkey.value] if pubkey is not None else []
+            public = _is_public(session, test_id)
             session.query(models.TestMeta) \
                 .filter_by(test_id=test_id).delete()
             session.query(models.TestResults) \
                 .filter_by(test_id=test_id).delete()
+            session.query(models.TestCompliance) \
+                .filter_by(test_id=test_id).delete()
+            session.query(models.LatestRun) \
+                .filter_by(test_id=test_id).delete()
+            session.query(models.TestSignature) \
+                .filter_by(test_id=test_id).delete()
+            session.query(models.TestSignatureBucket) \
+                .filter_by(test_id=test_id).delete()
+            session.query(models.TestOutcomes) \
+                .filter_by(test_id=test_id).delete()
             session.delete(test)
+            session.flush()
+            _refresh_latest_runs(session, test.cpid, pubkeys)
+            _update_upload_rollups(session, test.cpid, test.created_at,
+                                   bool(pubkeys), -1)
+            _update_test_pass_counts(session, test.cpid, names, -1)
+            _log_change(session, test_id, api_const.CHANGE_DELETE, public)
         else:
             raise NotFound('Test result %s not found' % test_id)
 
 
+def delete_test(test_id):
+    """Delete test information from the database."""
+    _retry_on_conflict(_delete_test, test_id)
+
+
 def get_test_meta_key(test_id, key, default=None):
     """Get metadata value related to specified test run."""
     session = get_session()
@@ -166,43 +691,391 @@ def get_test_meta_key(test_id, key, default=None):
     return value
 
 
-def save_test_meta_item(test_id, key, value):
-    """Store or update item value related to specified test run."""
+def get_test_meta_blob_digest(test_id, key):
+    """Get digest of blob holding metadata value of test run."""
+    session = get_session()
+    return (session.query(models.TestMeta.blob_digest)
+            .filter_by(test_id=test_id)
+            .filter_by(meta_key=key)
+            .scalar())
+
+
+def _get_changed_pubkeys(key, *values):
+    """Get public keys of signed runs changed with metadata item."""
+    if key != api_const.PUBLIC_KEY:
+        return []
+    return [value for value in values if value is not None]
+
+
+def _save_test_meta_item(test_id, key, value, blob_digest):
     session = get_session()
-    meta_item = (session.query(models.TestMeta)
-                 .filter_by(test_id=test_id)
-                 .filter_by(meta_key=key).first() or models.TestMeta())
-    meta_item.test_id = test_id
-    meta_item.meta_key = key
-    meta_item.value = value
     with session.begin():
+        meta_item = (session.query(models.TestMeta)
+                     .filter_by(test_id=test_id)
+                     .filter_by(meta_key=key).first() or models.TestMeta())
+        old_value = meta_item.value
+        was_public = _is_public(session, test_id)
+        meta_item.test_id = test_id
+        meta_item.meta_key = key
+        meta_item.value = None if blob_digest else value
+        meta_item.blob_digest = blob_digest
         meta_item.save(session)
+        _bump_meta_version(session, test_id)
+        if key in (api_const.SHARED_TEST_RUN, api_const.PUBLIC_KEY):
+            _refresh_latest_runs(
+                session, _get_test_cpid(session, test_id),
+                _get_changed_pubkeys(key, old_value, meta_item.value))
+        _log_meta_change(session, test_id, was_public)
+
+
+def save_test_meta_item(test_id, key, value, blob_digest=None):
+    """Store or update item value related to specified test run.
+
+    Value kept in blob store is saved as digest of the blob only.
+    """
+    _retry_on_conflict(_save_test_meta_item, test_id, key, value,
+                       blob_digest)
+
+
+def _delete_test_meta_item(test_id, key):
+    session = get_session()
+    with session.begin():
+        meta_item = session.query(models.TestMeta). \
+            filter_by(test_id=test_id). \
+            filter_by(meta_key=key). \
+            first()
+        if not meta_item:
+            raise NotFound('Metadata key %s '
+                           'not found for test run %s' % (key, test_id))
+        was_public = _is_public(session, test_id)
+        session.delete(meta_item)
+        _bump_meta_version(session, test_id)
+        session.flush()
+        if key in (api_const.SHARED_TEST_RUN, api_const.PUBLIC_KEY):
+            _refresh_latest_runs(
+                session, _get_test_cpid(session, test_id),
+                _get_changed_pubkeys(key, meta_item.value))
+        _log_meta_change(session, test_id, was_public)
 
 
 def delete_test_meta_item(test_id, key):
     """Delete metadata item related to specified test run."""
-    session = get_session()
-    meta_item = session.query(models.TestMeta). \
-        filter_by(test_id=test_id). \
-        filter_by(meta_key=key). \
-        first()
-    if meta_item:
-        with session.begin():
-            session.delete(meta_item)
-    else:
-        raise NotFound('Metadata key %s '
-                       'not found for test run %s' % (key, test_id))
+    _retry_on_conflict(_delete_test_meta_item, test_id, key)
+
 
+def _escape_like(value):
+    """Escape wildcards of LIKE pattern, '!' is the escape character."""
+    for char in '!%_':
+        value = value.replace(char, '!' + char)
+    return value
 
-def get_test_results(test_id):
+
+def get_test_results(test_id, name_prefix=None):
     """Get test results."""
     session = get_session()
-    results = session.query(models.TestResults). \
-        filter_by(test_id=test_id). \
-        all()
+    query = session.query(models.TestResults). \
+        filter_by(test_id=test_id)
+    if name_prefix:
+        query = query.filter(models.TestResults.name.like(
+            _escape_like(name_prefix) + '%', escape='!'))
+    results = query.all()
     return [_to_dict(result) for result in results]
 
 
+def get_results_of_tests(test_ids):
+    """Get names of passed tests for each of test runs."""
+    session = get_session()
+    results = dict((test_id, []) for test_id in test_ids)
+    if not test_ids:
+        return results
+    rows = (session.query(models.TestResults.test_id,
+                          models.TestResults.name)
+            .filter(models.TestResults.test_id.in_(test_ids))
+            .all())
+    for test_id, name in rows:
+        results[test_id].append(name)
+    return results
+
+
+def _get_latest_runs_query(session, query, filters):
+    """Select latest test runs of clouds visible with given filters."""
+    signed = api_const.SIGNED in filters
+    query = (query
+             .join(models.LatestRun,
+                   models.LatestRun.test_id == models.Test.id)
+             .filter(models.LatestRun.visibility ==
+                     (api_const.VISIBILITY_SIGNED if signed
+                      else api_const.VISIBILITY_PUBLIC)))
+    if signed:
+        # A user with several public keys has a latest run of cloud for
+        # each of them, only the most recent one is selected.
+        pubkey_hashes = [_get_pubkey_hash(pubkey)
+                         for pubkey in filters[api_const.USER_PUBKEYS]]
+        newer = orm.aliased(models.LatestRun)
+        query = (query
+                 .filter(models.LatestRun.pubkey_hash.in_(pubkey_hashes))
+                 .filter(~sa.exists().where(sa.and_(
+                     newer.cpid == models.LatestRun.cpid,
+                     newer.visibility == api_const.VISIBILITY_SIGNED,
+                     newer.pubkey_hash.in_(pubkey_hashes),
+                     sa.or_(newer.run_created_at >
+                            models.LatestRun.run_created_at,
+                            sa.and_(newer.run_created_at ==
+                                    models.LatestRun.run_created_at,
+                                    newer.test_id >
+                                    models.LatestRun.test_id))))))
+    return query
+
+
+def get_latest_test_ids(filters):
+    """Get ids of the latest test run of each cloud, most recent first."""
+    session = get_session()
+    query = _get_latest_runs_query(session, session.query(models.Test.id),
+                                   filters)
+    query = query.order_by(models.LatestRun.run_created_at.desc())
+    return [test_id for test_id, in query]
+
+
+def get_latest_test_records(page, per_page, filters):
+    """Get page with the latest test runs of clouds."""
+    session = get_session()
+    query = _get_latest_runs_query(session, session.query(models.Test),
+                                   filters)
+    results = (query.order_by(models.LatestRun.run_created_at.desc())
+               .offset(per_page * (page - 1))
+               .limit(per_page)
+               .all())
+    return _to_dict(results)
+
+
+def get_latest_test_records_count(filters):
+    """Get number of clouds with latest test runs."""
+    session = get_session()
+    query = _get_latest_runs_query(session, session.query(models.Test.id),
+                                   filters)
+    return query.count()
+
+
+def get_test_pass_rates():
+    """Get community pass counts of all tests."""
+    session = get_session()
+    rates = session.query(models.TestPassRate).all()
+    return [_to_dict(rate) for rate in rates]
+
+
+def get_population():
+    """Get number of test runs and clouds which uploaded them."""
+    session = get_session()
+    runs, clouds = session.query(
+        sa.func.count(models.Test.id),
+        sa.func.count(sa.distinct(models.Test.cpid))).one()
+    return {'runs': runs, 'clouds': clouds}
+
+
+def rebuild_test_pass_rates():
+    """Recalculate pass counts of all tests from scratch."""
+    session = get_session()
+    with session.begin():
+        session.query(models.TestPassRate).delete()
+        session.query(models.TestCloudPassCount).delete()
+        counts = (session.query(models.TestResults.name,
+                                models.Test.cpid,
+                                sa.func.count(models.TestResults._id))
+                  .join(models.Test,
+                        models.Test.id == models.TestResults.test_id)
+                  .group_by(models.TestResults.name, models.Test.cpid))
+        rates = {}
+        for name, cpid, count in counts:
+            session.add(models.TestCloudPassCount(name=name, cpid=cpid,
+                                                  pass_count=count))
+            rate = rates.setdefault(name, [0, 0])
+            rate[0] += count
+            rate[1] += 1
+        for name, (pass_count, cpid_count) in six.iteritems(rates):
+            session.add(models.TestPassRate(name=name,
+                                            pass_count=pass_count,
+                                            cpid_count=cpid_count))
+    return len(rates)
+
+
+def rebuild_upload_rollups():
+    """Recalculate upload activity rollups from scratch."""
+    session = get_session()
+    with session.begin():
+        session.query(models.UploadRollup).delete()
+        runs = (session.query(models.Test.cpid, models.Test.created_at,
+                              models.TestMeta.test_id)
+                .outerjoin(models.TestMeta,
+                           sa.and_(models.TestMeta.test_id == models.Test.id,
+                                   models.TestMeta.meta_key ==
+                                   api_const.PUBLIC_KEY)))
+        counts = collections.Counter()
+        runs_count = 0
+        for cpid, created_at, signed_test_id in runs.yield_per(1000):
+            runs_count += 1
+            for period in ROLLUP_PERIODS:
+                counts[(period, cpid, _get_bucket(created_at, period),
+                        signed_test_id is not None)] += 1
+        for (period, cpid, bucket, signed), count in six.iteritems(counts):
+            session.add(models.UploadRollup(period=period, cpid=cpid,
+                                            bucket=bucket, signed=signed,
+                                            count=count))
+    return runs_count
+
+
+def get_upload_activity(period, start_date, end_date, cpid=None):
+    """Get numbers of uploaded test runs within periods of time range.
+
+    Rollups are read instead of test runs, so number of read rows
+    depends on number of periods and clouds uploading within them.
+    Rollups of all clouds are summed by the database.
+    """
+    start_bucket = _get_bucket(start_date, period)
+    activity = collections.OrderedDict()
+    bucket = start_bucket
+    while bucket <= end_date:
+        activity[bucket] = {'bucket': bucket, 'signed': 0, 'unsigned': 0}
+        bucket += _get_period_length(period)
+
+    rollups = models.UploadRollup
+    session = get_session()
+    query = (session.query(rollups.bucket, rollups.signed,
+                           sa.func.sum(rollups.count))
+             .filter_by(period=(api_const.PERIOD_DAY
+                                if period == api_const.PERIOD_WEEK
+                                else period))
+             .filter(rollups.bucket >= start_bucket)
+             .filter(rollups.bucket <= end_date))
+    if cpid:
+        query = query.filter_by(cpid=cpid)
+    query = query.group_by(rollups.bucket, rollups.signed)
+    for bucket, signed, count in query:
+        counts = activity[_get_bucket(bucket, period)]
+        counts['signed' if signed else 'unsigned'] += int(count)
+    return list(activity.values())
+
+
+def save_test_signature(test_id, signature, buckets):
+    """Replace signature of test run and its buckets."""
+    session = get_session()
+    with session.begin():
+        session.query(models.TestSignature) \
+            .filter_by(test_id=test_id).delete()
+        session.query(models.TestSignatureBucket) \
+            .filter_by(test_id=test_id).delete()
+        session.add(models.TestSignature(
+            test_id=test_id,
+            signature=','.join(str(value) for value in signature)))
+        for bucket in buckets:
+            session.add(models.TestSignatureBucket(test_id=test_id,
+                                                   bucket=bucket))
+
+
+def _parse_signature(signature):
+    return [int(value) for value in signature.split(',') if value]
+
+
+def get_test_signature(test_id):
+    """Get signature of test run or None if it is not stored."""
+    session = get_session()
+    signature = (session.query(models.TestSignature.signature)
+                 .filter_by(test_id=test_id)
+                 .scalar())
+    if signature is None:
+        return None
+    return _parse_signature(signature)
+
+
+def get_similar_test_candidates(test_id, buckets, filters, limit):
+    """Get signatures of test runs sharing any bucket with test run.
+
+    Test runs sharing the most buckets are the most similar ones, so
+    they are returned first.
+    """
+    session = get_session()
+    buckets_model = models.TestSignatureBucket
+    shared = (session.query(buckets_model.test_id.label('test_id'),
+                            sa.func.count().label('shared_count'))
+              .filter(buckets_model.bucket.in_(buckets))
+              .filter(buckets_model.test_id != test_id)
+              .group_by(buckets_model.test_id)
+              .subquery())
+    query = (session.query(models.Test.id, models.Test.created_at,
+                           models.TestSignature.signature)
+             .join(models.TestSignature,
+                   models.TestSignature.test_id == models.Test.id))
+    query = _apply_filters_for_query(query, filters)
+    # Joined after filters, so it is applied to union of filtered runs.
+    query = (query.join(shared, shared.c.test_id == models.Test.id)
+             .order_by(shared.c.shared_count.desc(), models.Test.id)
+             .limit(limit))
+    return [{'id': candidate_id, 'created_at': created_at,
+             'signature': _parse_signature(signature)}
+            for candidate_id, created_at, signature in query]
+
+
+def get_test_ids_without_signature(limit):
+    """Get ids of test runs without stored signature."""
+    session = get_session()
+    signed_ids = session.query(models.TestSignature.test_id)
+    query = (session.query(models.Test.id)
+             .filter(models.Test.id.notin_(signed_ids))
+             .limit(limit))
+    return [test_id for test_id, in query]
+
+
+def _save_test_compliance(test_id, records):
+    session = get_session()
+    guidelines = set(record['guideline'] for record in records)
+    with session.begin():
+        if guidelines:
+            (session.query(models.TestCompliance)
+             .filter_by(test_id=test_id)
+             .filter(models.TestCompliance.guideline.in_(guidelines))
+             .delete(synchronize_session=False))
+        for record in records:
+            compliance = models.TestCompliance()
+            compliance.test_id = test_id
+            compliance.guideline = record['guideline']
+            compliance.target = record['target']
+            compliance.required_pass_percent = \
+                record['required_pass_percent']
+            compliance.non_flag_pass_percent = \
+                record['non_flag_pass_percent']
+            compliance.passed = record['passed']
+            compliance.save(session)
+
+
+def save_test_compliance(test_id, records):
+    """Replace compliance records of test run for given guidelines.
+
+    Records may be saved concurrently by checks of several hosts, the
+    last saved ones are kept.
+    """
+    _retry_on_conflict(_save_test_compliance, test_id, records)
+
+
+def get_test_compliance(test_id):
+    """Get compliance records of test run."""
+    session = get_session()
+    records = (session.query(models.TestCompliance)
+               .filter_by(test_id=test_id)
+               .all())
+    return [_to_dict(record) for record in records]
+
+
+def get_test_ids_without_compliance(guideline, limit):
+    """Get ids of test runs not evaluated against guideline."""
+    session = get_session()
+    evaluated = (session.query(models.TestCompliance.test_id)
+                 .filter_by(guideline=guideline))
+    test_ids = (session.query(models.Test.id)
+                .filter(models.Test.id.notin_(evaluated))
+                .limit(limit)
+                .all())
+    return [test_id for test_id, in test_ids]
+
+
 def _apply_filters_for_query(query, filters):
     """Apply filters for DB query."""
     start_date = filters.get(api_const.START_DATE)
@@ -217,6 +1090,16 @@ def _apply_filters_for_query(query, filters):
     if cpid:
         query = query.filter(models.Test.cpid == cpid)
 
+    compliant = filters.get(api_const.COMPLIANT)
+    if compliant:
+        guideline, target = compliant
+        query = (query
+                 .join(models.TestCompliance,
+                       models.TestCompliance.test_id == models.Test.id)
+                 .filter(models.TestCompliance.guideline == guideline)
+                 .filter(models.TestCompliance.target == target)
+                 .filter(models.TestCompliance.passed.is_(True)))
+
     signed = api_const.SIGNED in filters
     if signed:
         query = (query
@@ -237,15 +1120,285 @@ def _apply_filters_for_query(query, filters):
     return query
 
 
-def get_test_records(page, per_page, filters):
+def get_test_outcomes(test_id, status=None):
+    """Get outcomes of all tests of test run sorted by test name.
+
+    Test run uploaded without outcomes has passed tests only, with
+    unknown durations.
+
+    :param status: Status of returned outcomes, all are returned if None.
+    """
+    session = get_session()
+    row = (session.query(models.TestOutcomes.name_ids,
+                         models.TestOutcomes.statuses,
+                         models.TestOutcomes.durations)
+           .filter_by(test_id=test_id)
+           .first())
+    if row is None:
+        if status not in (None, api_outcomes.PASS):
+            return []
+        return [{'name': name, 'status': api_outcomes.PASS,
+                 'duration': None}
+                for name, in session.query(models.TestResults.name)
+                .filter_by(test_id=test_id)
+                .order_by(models.TestResults.name)]
+    decoded = [outcome for outcome in api_outcomes.decode(*row)
+               if status is None or outcome[1] == status]
+    names = _get_test_names_of_ids(
+        session, [name_id for name_id, _s, _d in decoded])
+    return sorted(({'name': names[name_id], 'status': outcome_status,
+                    'duration': duration}
+                   for name_id, outcome_status, duration in decoded),
+                  key=lambda outcome: outcome['name'])
+
+
+def get_slowest_tests(filters, limit, max_runs):
+    """Get tests with the longest mean duration across test runs.
+
+    Outcomes of at most max_runs of the most recent test runs matching
+    filters are decoded in batches, only outcomes with known durations
+    are aggregated.
+    """
+    session = get_session()
+    query = _apply_filters_for_query(
+        session.query(models.Test.id, models.Test.created_at), filters)
+    test_ids = [test_id for test_id, _created_at in
+                query.order_by(models.Test.created_at.desc(),
+                               models.Test.id)
+                .limit(max_runs)]
+    if not test_ids:
+        return []
+    query = (session.query(models.TestOutcomes.name_ids,
+                           models.TestOutcomes.statuses,
+                           models.TestOutcomes.durations)
+             .filter(models.TestOutcomes.test_id.in_(test_ids)))
+    # Run count, total and maximum duration by catalog id.
+    totals = {}
+    for row in query.yield_per(100):
+        for name_id, _status, duration in api_outcomes.decode(*row):
+            if duration is None:
+                continue
+            total = totals.get(name_id)
+            if total is None:
+                totals[name_id] = [1, duration, duration]
+            else:
+                total[0] += 1
+                total[1] += duration
+                total[2] = max(total[2], duration)
+    slowest = heapq.nlargest(
+        limit, six.iteritems(totals),
+        key=lambda item: item[1][1] / item[1][0])
+    names = _get_test_names_of_ids(
+        session, [name_id for name_id, _total in slowest])
+    return [{'name': names[name_id], 'runs': count,
+             'mean_duration': total / count, 'max_duration': max_duration}
+            for name_id, (count, total, max_duration) in slowest]
+
+
+def get_cloud_trend(cpid, filters, guideline=None, target=None):
+    """Get summaries of cloud test runs in chronological order.
+
+    Summaries are stored when test runs are uploaded, so results of test
+    runs are not read.
+    """
+    session = get_session()
+    columns = [models.Test.id, models.Test.created_at,
+               models.Test.passed_count]
+    if guideline:
+        columns += [models.TestCompliance.required_pass_percent,
+                    models.TestCompliance.passed]
+    query = session.query(*columns)
+    if guideline:
+        query = query.outerjoin(
+            models.TestCompliance,
+            sa.and_(models.TestCompliance.test_id == models.Test.id,
+                    models.TestCompliance.guideline == guideline,
+                    models.TestCompliance.target == target))
+    filters = dict(filters)
+    filters[api_const.CPID] = cpid
+    query = _apply_filters_for_query(query, filters)
+    trend = []
+    for row in query.order_by(models.Test.created_at):
+        run = {'id': row[0], 'created_at': row[1], 'passed_count': row[2]}
+        if guideline:
+            run['required_pass_percent'] = row[3]
+            run['compliant'] = row[4]
+        trend.append(run)
+    return trend
+
+
+# Fields of test runs stored in test table.
+TEST_COLUMN_FIELDS = ('id', 'cpid', 'created_at', 'duration_seconds')
+
+
+def _get_test_field_columns(fields):
+    """Get names of test table columns needed for fields of test runs.
+
+    Ids and creation dates are always selected, because they are used
+    for loading of metadata and for ordering.
+    """
+    return ['id', 'created_at'] + [field for field in fields
+                                   if field in TEST_COLUMN_FIELDS and
+                                   field not in ('id', 'created_at')]
+
+
+def _get_test_fields(session, rows, columns, fields):
+    """Convert selected columns to dicts with requested fields only."""
+    tests = [dict(zip(columns, row)) for row in rows]
+    if 'meta' in fields and tests:
+        meta = dict((test['id'], {}) for test in tests)
+        meta_items = (session.query(models.TestMeta.test_id,
+                                    models.TestMeta.meta_key,
+                                    models.TestMeta.value,
+                                    models.TestMeta.blob_digest)
+                      .filter(models.TestMeta.test_id.in_(list(meta))))
+        for test_id, key, value, blob_digest in meta_items:
+            meta[test_id][key] = _get_meta_value(value, blob_digest)
+        for test in tests:
+            test['meta'] = meta[test['id']]
+    return [dict((field, test[field]) for field in fields)
+            for test in tests]
+
+
+def get_test_fields(test_id, fields):
+    """Get requested fields of test run.
+
+    Only requested columns and relations are loaded.
+    """
+    session = get_session()
+    columns = _get_test_field_columns(fields)
+    row = (session.query(*[getattr(models.Test, column)
+                           for column in columns])
+           .filter_by(id=test_id)
+           .first())
+    if row is None:
+        raise NotFound('Test result %s not found' % test_id)
+    return _get_test_fields(session, [row], columns, fields)[0]
+
+
+def get_test_fields_of_tests(test_ids, fields):
+    """Get requested fields of several test runs with IN queries."""
+    if not test_ids:
+        return {}
+    session = get_session()
+    columns = _get_test_field_columns(fields)
+    rows = (session.query(*[getattr(models.Test, column)
+                            for column in columns])
+            .filter(models.Test.id.in_(test_ids))
+            .all())
+    fields = list(fields)
+    if 'id' not in fields:
+        fields.append('id')
+    return dict((test['id'], test) for test
+                in _get_test_fields(session, rows, columns, fields))
+
+
+def get_test_records(page, per_page, filters, fields=None):
     """Get page with list of test records."""
     session = get_session()
-    query = session.query(models.Test)
+    if fields is None:
+        query = session.query(models.Test)
+    else:
+        columns = _get_test_field_columns(fields)
+        query = session.query(*[getattr(models.Test, column)
+                                for column in columns])
     query = _apply_filters_for_query(query, filters)
+    if filters.get(api_const.SORT) == api_const.SORT_COMPLIANCE:
+        # Runs are joined with compliance records after filters are
+        # applied, as visibility filter selects a union of runs.
+        guideline, target = filters[api_const.COMPLIANT]
+        compliance = orm.aliased(models.TestCompliance)
+        query = (query
+                 .join(compliance,
+                       sa.and_(compliance.test_id == models.Test.id,
+                               compliance.guideline == guideline,
+                               compliance.target == target))
+                 .order_by(compliance.required_pass_percent.desc()))
     results = query.order_by(models.Test.created_at.desc()). \
         offset(per_page * (page - 1)). \
         limit(per_page).all()
-    return _to_dict(results)
+    if fields is None:
+        return _to_dict(results)
+    return _get_test_fields(session, results, columns, fields)
+
+
+def _get_export_batch(rows, with_results):
+    """Add metadata and optionally passed tests to batch of test runs."""
+    # Rows are streamed by a server-side cursor, so the rest of data is
+    # loaded by another session.
+    session = get_session()
+    columns = ('id', 'created_at', 'duration_seconds', 'cpid')
+    fields = list(columns) + ['meta']
+    tests = _get_test_fields(session, rows, columns, fields)
+    if with_results:
+        results = get_results_of_tests([test['id'] for test in tests])
+        for test in tests:
+            test['results'] = results[test['id']]
+    return tests
+
+
+def iter_test_records(filters, after=None, with_results=False,
+                      batch_size=1000):
+    """Iterate over test records in chronological order.
+
+    Test runs are read by a server-side cursor and their metadata and
+    results are loaded for every batch of runs, so memory usage does not
+    depend on the number of exported runs.
+
+    :param after: Pair of creation time and id of the last test run
+                  returned before. Iteration is resumed after it.
+    """
+    session = get_session()
+    query = session.query(models.Test.id,
+                          models.Test.created_at,
+                          models.Test.duration_seconds,
+                          models.Test.cpid)
+    if after:
+        created_at, test_id = after
+        query = query.filter(sa.or_(
+            models.Test.created_at > created_at,
+            sa.and_(models.Test.created_at == created_at,
+                    models.Test.id > test_id)))
+    query = _apply_filters_for_query(query, filters)
+    query = (query.order_by(models.Test.created_at, models.Test.id)
+             .yield_per(batch_size))
+    rows = []
+    for row in query:
+        rows.append(row)
+        if len(rows) == batch_size:
+            for test in _get_export_batch(rows, with_results):
+                yield test
+            rows = []
+    for test in _get_export_batch(rows, with_results):
+        yield test
+
+
+def get_changes(since, limit, until=None):
+    """Get changes of public test runs logged after given change.
+
+    Changes are returned up to the first one logged after until time.
+    Transaction of such recent change may be still uncommitted, as well
+    as transactions of earlier numbered changes. Changes are logged last
+    in their transactions, so holding recent ones back is best-effort
+    only: a transaction committed later than until time after its change
+    was logged is skipped by readers past its cursor.
+    """
+    session = get_session()
+    change = models.TestChange
+    rows = (session.query(change._id, change.test_id, change.operation,
+                          change.created_at)
+            .filter(change._id > since)
+            .filter(change.public.is_(True))
+            .order_by(change._id)
+            .limit(limit)
+            .all())
+    changes = []
+    for cursor, test_id, operation, created_at in rows:
+        if until is not None and created_at > until:
+            break
+        changes.append({'cursor': cursor, 'test_id': test_id,
+                        'operation': operation, 'created_at': created_at})
+    return changes
 
 
 def get_test_records_count(filters):
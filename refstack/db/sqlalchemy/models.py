@@ -25,6 +25,8 @@ import sqlalchemy as sa
 from sqlalchemy import orm
 from sqlalchemy.ext.declarative import declarative_base
 
+from refstack.api import constants as api_const
+
 CONF = cfg.CONF
 BASE = declarative_base()
 
@@ -53,10 +55,16 @@ class Test(BASE, RefStackBase):  # pragma: no cover
     """Test."""
 
     __tablename__ = 'test'
+    __table_args__ = (
+        sa.Index('ix_test_created_at', 'created_at'),
+    )
 
     id = sa.Column(sa.String(36), primary_key=True)
     cpid = sa.Column(sa.String(128), index=True, nullable=False)
     duration_seconds = sa.Column(sa.Integer, nullable=False)
+    meta_version = sa.Column(sa.Integer, nullable=False, default=0)
+    passed_count = sa.Column(sa.Integer)
+    upload_digest = sa.Column(sa.String(64))
     results = orm.relationship('TestResults', backref='test')
     meta = orm.relationship('TestMeta', backref='test')
 
@@ -69,7 +77,7 @@ class Test(BASE, RefStackBase):  # pragma: no cover
     def metadata_keys(self):
         """Model keys with metadata structure."""
         return {'meta': {'key': 'meta_key',
-                         'value': 'value'}}
+                         'value': 'document_value'}}
 
     @property
     def default_allowed_keys(self):
@@ -112,6 +120,14 @@ class TestMeta(BASE, RefStackBase):  # pragma: no cover
                         index=True, nullable=False, unique=False)
     meta_key = sa.Column(sa.String(64), index=True, nullable=False)
     value = sa.Column(sa.Text())
+    blob_digest = sa.Column(sa.String(64))
+
+    @property
+    def document_value(self):
+        """Value in documents, value kept in blob store is its digest."""
+        if self.blob_digest:
+            return {api_const.META_BLOB: self.blob_digest}
+        return self.value
 
     @property
     def default_allowed_keys(self):
@@ -119,6 +135,202 @@ class TestMeta(BASE, RefStackBase):  # pragma: no cover
         return 'meta_key', 'value'
 
 
+class TestCompliance(BASE, RefStackBase):  # pragma: no cover
+    """Compliance of test run with guideline target."""
+
+    __tablename__ = 'compliance'
+    __table_args__ = (
+        sa.UniqueConstraint('test_id', 'guideline', 'target'),
+        sa.Index('indx_compliance_guideline_target',
+                 'guideline', 'target', 'passed'),
+    )
+    _id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    test_id = sa.Column(sa.String(36), sa.ForeignKey('test.id'),
+                        index=True, nullable=False, unique=False)
+    guideline = sa.Column(sa.String(32), nullable=False)
+    target = sa.Column(sa.String(64), nullable=False)
+    required_pass_percent = sa.Column(sa.Float)
+    non_flag_pass_percent = sa.Column(sa.Float)
+    # Null if guideline target has no required tests.
+    passed = sa.Column(sa.Boolean)
+
+    @property
+    def default_allowed_keys(self):
+        """Default keys."""
+        return ('guideline', 'target', 'required_pass_percent',
+                'non_flag_pass_percent', 'passed')
+
+
+class TestSignature(BASE, RefStackBase):  # pragma: no cover
+    """MinHash signature of tests passed in test run."""
+
+    __tablename__ = 'test_signatures'
+    _id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    test_id = sa.Column(sa.String(36), sa.ForeignKey('test.id'),
+                        nullable=False, unique=True)
+    signature = sa.Column(sa.Text(), nullable=False)
+
+    @property
+    def default_allowed_keys(self):
+        """Default keys."""
+        return 'test_id', 'signature'
+
+
+class TestSignatureBucket(BASE, RefStackBase):  # pragma: no cover
+    """Locality-sensitive hashing bucket of test run signature."""
+
+    __tablename__ = 'test_signature_buckets'
+    _id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    test_id = sa.Column(sa.String(36), sa.ForeignKey('test.id'),
+                        index=True, nullable=False)
+    bucket = sa.Column(sa.String(32), index=True, nullable=False)
+
+    @property
+    def default_allowed_keys(self):
+        """Default keys."""
+        return 'test_id', 'bucket'
+
+
+class TestName(BASE, RefStackBase):  # pragma: no cover
+    """Catalog of names of tests with outcomes, numbered in order added."""
+
+    __tablename__ = 'test_names'
+    _id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    name = sa.Column(sa.String(512, collation='latin1_swedish_ci'),
+                     nullable=False, unique=True)
+
+    @property
+    def default_allowed_keys(self):
+        """Default keys."""
+        return ('name',)
+
+
+class TestOutcomes(BASE, RefStackBase):  # pragma: no cover
+    """Outcomes of all tests of test run in columnar encoding.
+
+    Columns are aligned, n-th status and duration belong to the test with
+    n-th catalog id.
+    """
+
+    __tablename__ = 'test_outcomes'
+    _id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    test_id = sa.Column(sa.String(36), sa.ForeignKey('test.id'),
+                        nullable=False, unique=True)
+    name_ids = sa.Column(sa.LargeBinary(length=2 ** 24), nullable=False)
+    statuses = sa.Column(sa.LargeBinary(length=2 ** 24), nullable=False)
+    durations = sa.Column(sa.LargeBinary(length=2 ** 24), nullable=False)
+
+    @property
+    def default_allowed_keys(self):
+        """Default keys."""
+        return 'test_id', 'name_ids', 'statuses', 'durations'
+
+
+class TestChange(BASE, RefStackBase):  # pragma: no cover
+    """Change of test run in change log.
+
+    Changes are numbered in order they are written. Changes of deleted
+    test runs are kept as tombstones. Changes of test runs which are
+    private both before and after the change are not public.
+    """
+
+    __tablename__ = 'change_log'
+    _id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    test_id = sa.Column(sa.String(36), index=True, nullable=False)
+    operation = sa.Column(sa.String(16), nullable=False)
+    public = sa.Column(sa.Boolean, nullable=False, default=True)
+
+    @property
+    def default_allowed_keys(self):
+        """Default keys."""
+        return 'test_id', 'operation', 'created_at'
+
+
+class LatestRun(BASE, RefStackBase):  # pragma: no cover
+    """Latest test run of a cloud with given visibility.
+
+    Latest signed test runs are kept per hash of the signing public key,
+    public ones have an empty hash.
+    """
+
+    __tablename__ = 'latest_run_by_cpid'
+    __table_args__ = (
+        sa.UniqueConstraint('cpid', 'visibility', 'pubkey_hash'),
+        sa.Index('indx_latest_run_visibility_created_at',
+                 'visibility', 'run_created_at'),
+    )
+    _id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    cpid = sa.Column(sa.String(128), nullable=False)
+    visibility = sa.Column(sa.String(16), nullable=False)
+    pubkey_hash = sa.Column(sa.String(32), nullable=False, default='')
+    test_id = sa.Column(sa.String(36), sa.ForeignKey('test.id'),
+                        nullable=False)
+    run_created_at = sa.Column(sa.DateTime, nullable=False)
+    test = orm.relationship('Test')
+
+    @property
+    def default_allowed_keys(self):
+        """Default keys."""
+        return 'cpid', 'visibility', 'test_id'
+
+
+class TestCloudPassCount(BASE, RefStackBase):  # pragma: no cover
+    """Number of test runs of a cloud passing a test."""
+
+    __tablename__ = 'test_cloud_pass_counts'
+    __table_args__ = (
+        sa.UniqueConstraint('name', 'cpid'),
+    )
+    _id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    name = sa.Column(sa.String(512, collation='latin1_swedish_ci'),
+                     nullable=False)
+    cpid = sa.Column(sa.String(128, collation='latin1_swedish_ci'),
+                     nullable=False)
+    pass_count = sa.Column(sa.Integer, nullable=False, default=0)
+
+    @property
+    def default_allowed_keys(self):
+        """Default keys."""
+        return 'name', 'cpid', 'pass_count'
+
+
+class TestPassRate(BASE, RefStackBase):  # pragma: no cover
+    """Community pass counts of a test."""
+
+    __tablename__ = 'test_pass_rates'
+    _id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    name = sa.Column(sa.String(512, collation='latin1_swedish_ci'),
+                     nullable=False, unique=True)
+    pass_count = sa.Column(sa.Integer, nullable=False, default=0)
+    cpid_count = sa.Column(sa.Integer, nullable=False, default=0)
+
+    @property
+    def default_allowed_keys(self):
+        """Default keys."""
+        return 'name', 'pass_count', 'cpid_count'
+
+
+class UploadRollup(BASE, RefStackBase):  # pragma: no cover
+    """Number of test runs uploaded by a cloud within a period."""
+
+    __tablename__ = 'upload_rollups'
+    __table_args__ = (
+        sa.UniqueConstraint('period', 'cpid', 'bucket', 'signed'),
+        sa.Index('indx_upload_rollups_period_bucket', 'period', 'bucket'),
+    )
+    _id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    period = sa.Column(sa.String(16), nullable=False)
+    cpid = sa.Column(sa.String(128), nullable=False)
+    bucket = sa.Column(sa.DateTime, nullable=False)
+    signed = sa.Column(sa.Boolean, nullable=False)
+    count = sa.Column(sa.Integer, nullable=False, default=0)
+
+    @property
+    def default_allowed_keys(self):
+        """Default keys."""
+        return 'period', 'cpid', 'bucket', 'signed', 'count'
+
+
 class User(BASE, RefStackBase):  # pragma: no cover
     """User information."""
 
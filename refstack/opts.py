@@ -34,6 +34,11 @@ def list_opts():
 import itertools
 
 import refstack.api.app
+import refstack.api.blobs
+import refstack.api.cache
+import refstack.api.compliance
+import refstack.api.events
+import refstack.api.guidelines
 import refstack.api.controllers.v1
 import refstack.api.controllers.auth
 import refstack.db.api
@@ -49,6 +54,11 @@ def list_opts():
         ('DEFAULT', itertools.chain(refstack.api.app.UI_OPTS,
                                     refstack.db.api.db_opts)),
         ('api', itertools.chain(refstack.api.app.API_OPTS,
+                                refstack.api.blobs.BLOBS_OPTS,
+                                refstack.api.cache.CACHE_OPTS,
+                                refstack.api.compliance.COMPLIANCE_OPTS,
+                                refstack.api.events.EVENTS_OPTS,
+                                refstack.api.guidelines.GUIDELINES_OPTS,
                                 refstack.api.controllers.CTRLS_OPTS)),
         ('osid', refstack.api.controllers.auth.OPENID_OPTS),
     ]
@@ -15,21 +15,31 @@
 
 """Tests for API's controllers"""
 
+import datetime
 import json
+import os
 import sys
 
+import fixtures
 import httmock
 import mock
 from oslo_config import fixture as config_fixture
 import requests
 from six.moves.urllib import parse
 import webob.exc
+import webob.multidict
 
+from refstack.api import blobs
 from refstack.api import constants as const
 from refstack.api import exceptions as api_exc
+from refstack.api import guidelines
+from refstack.api import subunit
 from refstack.api.controllers import auth
 from refstack.api.controllers import capabilities
+from refstack.api.controllers import changes
+from refstack.api.controllers import clouds
 from refstack.api.controllers import results
+from refstack.api.controllers import stats
 from refstack.api.controllers import validation
 from refstack.api.controllers import user
 from refstack.tests import unit as base
@@ -48,6 +58,9 @@ class BaseControllerTestCase(base.RefstackBaseTestCase):
 
     def setUp(self):
         super(BaseControllerTestCase, self).setUp()
+        # Generation counters of caches are kept in cache_dir.
+        self.useFixture(config_fixture.Config()).config(
+            cache_dir=self.useFixture(fixtures.TempDir()).path, group='api')
         self.mock_request = self.setup_mock('pecan.request')
         self.mock_response = self.setup_mock('pecan.response')
         self.mock_abort = \
@@ -90,12 +103,29 @@ class ResultsControllerTestCase(BaseControllerTestCase):
                                self.test_results_url,
                                'api')
         self.CONF.set_override('ui_url', self.ui_url)
+        self.CONF.set_override('store_raw_uploads', False, 'api')
+        results.test_runs_cache.clear()
+        results.listing_cache.clear()
+        results.slowest_cache.clear()
+        self.mock_put_blob = self.setup_mock('refstack.api.blobs.put')
+        self.mock_index_test = self.setup_mock(
+            'refstack.api.similarity.index_test')
+        self.mock_publish = self.setup_mock('refstack.api.events.publish')
+        self.mock_request.GET = {}
 
+    @mock.patch('refstack.db.get_test_version')
     @mock.patch('refstack.db.get_test')
     @mock.patch('refstack.db.get_test_results')
-    def test_get(self, mock_get_test_res, mock_get_test):
+    def test_get(self, mock_get_test_res, mock_get_test,
+                 mock_get_test_version):
+        self.mock_request.headers = {}
+        mock_get_test_version.return_value = {
+            'id': 'fake_arg', 'meta_version': 0,
+            'created_at': datetime.datetime(2015, 8, 1), 'updated_at': None
+        }
         self.mock_get_user_role.return_value = const.ROLE_USER
-        test_info = {'created_at': 'bar',
+        test_info = {'cpid': 'foo',
+                     'created_at': 'bar',
                      'duration_seconds': 999}
         mock_get_test.return_value = test_info
 
@@ -111,12 +141,22 @@ class ResultsControllerTestCase(BaseControllerTestCase):
         }
 
         self.assertEqual(actual_result, expected_result)
-        mock_get_test_res.assert_called_once_with('fake_arg')
-        mock_get_test.assert_called_once_with('fake_arg')
+        mock_get_test_res.assert_called_once_with('fake_arg', None)
+        mock_get_test.assert_called_once_with(
+            'fake_arg', allowed_keys=['id', 'cpid', 'created_at',
+                                      'duration_seconds', 'meta']
+        )
 
+    @mock.patch('refstack.db.get_test_version')
     @mock.patch('refstack.db.get_test')
     @mock.patch('refstack.db.get_test_results')
-    def test_get_for_owner(self, mock_get_test_res, mock_get_test):
+    def test_get_for_owner(self, mock_get_test_res, mock_get_test,
+                           mock_get_test_version):
+        self.mock_request.headers = {}
+        mock_get_test_version.return_value = {
+            'id': 'fake_arg', 'meta_version': 0,
+            'created_at': datetime.datetime(2015, 8, 1), 'updated_at': None
+        }
         self.mock_get_user_role.return_value = const.ROLE_OWNER
         test_info = {'cpid': 'foo',
                      'created_at': 'bar',
@@ -136,12 +176,71 @@ class ResultsControllerTestCase(BaseControllerTestCase):
         }
 
         self.assertEqual(actual_result, expected_result)
-        mock_get_test_res.assert_called_once_with('fake_arg')
+        mock_get_test_res.assert_called_once_with('fake_arg', None)
         mock_get_test.assert_called_once_with(
             'fake_arg', allowed_keys=['id', 'cpid', 'created_at',
                                       'duration_seconds', 'meta']
         )
 
+    @mock.patch('refstack.db.get_test_version')
+    @mock.patch('refstack.db.get_test')
+    @mock.patch('refstack.db.get_test_results')
+    def test_get_cached(self, mock_get_test_res, mock_get_test,
+                        mock_get_test_version):
+        self.mock_request.headers = {}
+        self.mock_response.headers = {}
+        self.mock_get_user_role.return_value = const.ROLE_OWNER
+        mock_get_test_version.return_value = {
+            'id': 'fake_arg', 'meta_version': 0,
+            'created_at': datetime.datetime(2015, 8, 1), 'updated_at': None
+        }
+        mock_get_test.return_value = {'cpid': 'foo'}
+        mock_get_test_res.return_value = [{'name': 'test1'}]
+
+        self.assertEqual({'cpid': 'foo', 'results': ['test1'],
+                          'user_role': const.ROLE_OWNER},
+                         self.controller.get_one('fake_arg'))
+        self.assertEqual('MISS', self.mock_response.headers['X-Cache'])
+
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        self.assertEqual({'results': ['test1'],
+                          'user_role': const.ROLE_USER},
+                         self.controller.get_one('fake_arg'))
+        self.assertEqual('HIT', self.mock_response.headers['X-Cache'])
+        mock_get_test.assert_called_once_with(
+            'fake_arg', allowed_keys=mock.ANY)
+        mock_get_test_res.assert_called_once_with('fake_arg', None)
+
+        mock_get_test_version.return_value['meta_version'] = 1
+        self.controller.get_one('fake_arg')
+        self.assertEqual('MISS', self.mock_response.headers['X-Cache'])
+        self.assertEqual(2, mock_get_test.call_count)
+
+    @mock.patch('refstack.db.get_test_version')
+    @mock.patch('refstack.db.get_test')
+    @mock.patch('refstack.db.get_test_results')
+    def test_get_not_modified(self, mock_get_test_res, mock_get_test,
+                              mock_get_test_version):
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        mock_get_test_version.return_value = {
+            'id': 'fake_arg', 'meta_version': 3,
+            'created_at': datetime.datetime(2015, 8, 1), 'updated_at': None
+        }
+        self.mock_request.headers = {
+            'If-None-Match': '"fake_arg-3-%s"' % const.ROLE_USER
+        }
+        self.assertRaises(webob.exc.HTTPError,
+                          self.controller.get_one, 'fake_arg')
+        self.assertEqual(304, self.mock_abort.call_args[0][0])
+        self.assertFalse(mock_get_test.called)
+        self.assertFalse(mock_get_test_res.called)
+
+        self.mock_request.headers = {'If-None-Match': '"fake_arg-2-user"'}
+        mock_get_test.return_value = {}
+        mock_get_test_res.return_value = []
+        self.controller.get_one('fake_arg')
+        mock_get_test_res.assert_called_once_with('fake_arg', None)
+
     @mock.patch('refstack.db.store_results')
     def test_post(self, mock_store_results):
         self.mock_request.body = '{"answer": 42}'
@@ -156,6 +255,110 @@ class ResultsControllerTestCase(BaseControllerTestCase):
         )
         self.assertEqual(self.mock_response.status, 201)
         mock_store_results.assert_called_once_with({'answer': 42})
+        self.mock_index_test.assert_called_once_with('fake_test_id', [])
+
+    @mock.patch('refstack.db.store_results')
+    def test_post_store_raw_upload(self, mock_store_results):
+        self.CONF.set_override('store_raw_uploads', True, 'api')
+        self.mock_request.body = '{"answer": 42}'
+        self.mock_request.headers = {}
+        self.mock_put_blob.return_value = 'fake_digest'
+        mock_store_results.return_value = 'fake_test_id'
+        self.controller.post()
+        self.mock_put_blob.assert_called_once_with('{"answer": 42}')
+        mock_store_results.assert_called_once_with(
+            {'answer': 42, 'upload_digest': 'fake_digest'})
+
+        # Test run is stored even if blob store is unavailable.
+        mock_store_results.reset_mock()
+        self.mock_put_blob.side_effect = IOError('Disk is full')
+        result = self.controller.post()
+        self.assertEqual('fake_test_id', result['test_id'])
+        mock_store_results.assert_called_once_with({'answer': 42})
+
+    @mock.patch('refstack.api.subunit.parse_results')
+    @mock.patch('refstack.db.store_results')
+    def test_post_subunit(self, mock_store_results, mock_parse_results):
+        self.mock_request.content_type = subunit.CONTENT_TYPE
+        self.mock_request.GET = {const.CPID: 'fake_cpid'}
+        self.mock_request.headers = {}
+        mock_parse_results.return_value = {
+            'duration_seconds': 10, 'results': [{'name': 'test_a'}]}
+        mock_store_results.return_value = 'fake_test_id'
+        result = self.controller.post()
+        self.assertEqual('fake_test_id', result['test_id'])
+        self.assertEqual(201, self.mock_response.status)
+        mock_parse_results.assert_called_once_with(
+            self.mock_request.body_file_seekable)
+        test = {'cpid': 'fake_cpid', 'duration_seconds': 10,
+                'results': [{'name': 'test_a'}]}
+        self.validator.validate_subunit.assert_called_once_with(
+            self.mock_request, test)
+        mock_store_results.assert_called_once_with(test)
+        self.mock_index_test.assert_called_once_with('fake_test_id',
+                                                     ['test_a'])
+
+    @mock.patch('refstack.api.subunit.parse_results')
+    def test_post_subunit_invalid(self, mock_parse_results):
+        self.mock_request.content_type = subunit.CONTENT_TYPE
+        self.mock_request.GET = {const.CPID: 'fake_cpid'}
+        mock_parse_results.side_effect = ValueError('Stream is truncated')
+        self.assertRaises(api_exc.ValidationError, self.controller.post)
+
+        # Cloud id is required.
+        self.mock_request.GET = {}
+        self.mock_abort.side_effect = webob.exc.HTTPError()
+        self.assertRaises(webob.exc.HTTPError, self.controller.post)
+        self.mock_abort.assert_called_once_with(400, mock.ANY)
+
+    @mock.patch('refstack.db.get_test_version')
+    @mock.patch('refstack.db.store_results')
+    def test_post_publish_event(self, mock_store_results,
+                                mock_get_test_version):
+        self.mock_request.body = '{"duration_seconds": 10}'
+        self.mock_request.headers = {}
+        mock_store_results.return_value = 'fake_test_id'
+        mock_get_test_version.return_value = {'created_at': 'fake_date'}
+        self.controller.post()
+        self.mock_publish.assert_called_once_with(
+            const.UPLOAD_EVENT,
+            {'id': 'fake_test_id', 'created_at': 'fake_date',
+             'duration_seconds': 10,
+             'url': parse.urljoin(self.ui_url,
+                                  self.test_results_url) % 'fake_test_id'})
+
+        # Signed test runs are not published.
+        self.mock_publish.reset_mock()
+        self.mock_request.headers = {'X-Public-Key': 'fake-key'}
+        self.controller.post()
+        self.assertFalse(self.mock_publish.called)
+
+    @mock.patch('refstack.api.events.is_stream_limit_reached')
+    @mock.patch('refstack.api.events.iter_stream')
+    def test_stream(self, mock_iter_stream, mock_limit_reached):
+        mock_limit_reached.return_value = False
+        self.mock_request.headers = {'Last-Event-ID': '42'}
+        result = self.controller.stream()
+        self.assertEqual('text/event-stream', result.content_type)
+        self.assertEqual(mock_iter_stream.return_value, result.app_iter)
+        mock_iter_stream.assert_called_once_with('42')
+
+        mock_limit_reached.return_value = True
+        self.mock_abort.side_effect = webob.exc.HTTPError()
+        self.assertRaises(webob.exc.HTTPError, self.controller.stream)
+        self.mock_abort.assert_called_once_with(
+            503, 'Too many clients are streaming events, retry later.')
+
+    @mock.patch('refstack.db.store_results')
+    def test_post_indexing_failed(self, mock_store_results):
+        self.mock_request.body = '{"results": [{"name": "test_a"}]}'
+        self.mock_request.headers = {}
+        mock_store_results.return_value = 'fake_test_id'
+        self.mock_index_test.side_effect = Exception('DB is gone')
+        result = self.controller.post()
+        self.assertEqual('fake_test_id', result['test_id'])
+        self.mock_index_test.assert_called_once_with('fake_test_id',
+                                                     ['test_a'])
 
     @mock.patch('refstack.db.store_results')
     def test_post_with_sign(self, mock_store_results):
@@ -174,6 +377,190 @@ class ResultsControllerTestCase(BaseControllerTestCase):
             {'answer': 42, 'meta': {const.PUBLIC_KEY: 'fake-key'}}
         )
 
+    @mock.patch('refstack.db.get_results_of_tests')
+    @mock.patch('refstack.db.get_latest_test_ids')
+    def test_matrix(self, mock_get_latest_test_ids,
+                    mock_get_results_of_tests):
+        self.mock_request.GET = webob.multidict.MultiDict(
+            [(const.COLUMNS, 'tests')])
+        mock_get_latest_test_ids.return_value = ['id1', 'id2']
+        mock_get_results_of_tests.return_value = {'id1': ['test_a'],
+                                                  'id2': ['test_b']}
+        result = self.controller.matrix()
+        self.assertEqual({'runs': ['id1', 'id2'],
+                          'columns': ['test_a', 'test_b'],
+                          'matrix': [[True, False], [False, True]],
+                          'pass_counts': [1, 1],
+                          'truncated': False}, result)
+        mock_get_latest_test_ids.assert_called_once_with({})
+        mock_get_results_of_tests.assert_called_once_with(['id1', 'id2'])
+
+        self.mock_request.GET = webob.multidict.MultiDict(
+            [(const.COLUMNS, 'tests'), (const.TEST_ID, 'id2'),
+             (const.FORMAT, 'csv')])
+        self.mock_response.headers = {}
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        mock_get_results_of_tests.return_value = {'id2': ['test_b']}
+        result = self.controller.matrix()
+        self.assertEqual('text/csv', result.content_type)
+        self.assertEqual('test_id,test_b\r\nid2,1\r\n', result.text)
+        self.assertEqual('false', result.headers['X-Matrix-Truncated'])
+        self.assertEqual(1, mock_get_latest_test_ids.call_count)
+
+        # Only the most recent runs of clouds are included.
+        self.mock_request.GET = webob.multidict.MultiDict(
+            [(const.COLUMNS, 'tests')])
+        self.CONF.set_override('matrix_max_runs', 1, 'api')
+        mock_get_results_of_tests.return_value = {'id1': ['test_a']}
+        result = self.controller.matrix()
+        self.assertEqual(['id1'], result['runs'])
+        self.assertTrue(result['truncated'])
+        mock_get_results_of_tests.assert_called_with(['id1'])
+
+    @mock.patch('refstack.db.get_results_of_tests')
+    @mock.patch('refstack.db.get_test_fields_of_tests')
+    @mock.patch('refstack.api.utils.get_user_roles')
+    def test_batch(self, mock_get_user_roles, mock_get_test_fields_of_tests,
+                   mock_get_results_of_tests):
+        self.mock_request.body = json.dumps(
+            {const.TEST_IDS: ['id2', 'id3', 'id1', 'id4']}).encode('utf-8')
+        mock_get_test_fields_of_tests.return_value = {
+            'id1': {'id': 'id1', 'cpid': 'cpid1', 'meta': {}},
+            'id2': {'id': 'id2', 'cpid': 'cpid2', 'meta': {'k': 'v'}},
+            'id3': {'id': 'id3', 'cpid': 'cpid3', 'meta': {}},
+        }
+        mock_get_user_roles.return_value = {'id1': const.ROLE_USER,
+                                            'id2': const.ROLE_OWNER,
+                                            'id3': None}
+        mock_get_results_of_tests.return_value = {'id1': ['test_a'],
+                                                  'id2': []}
+
+        self.assertEqual(
+            {'results': [{'id': 'id2', 'cpid': 'cpid2', 'meta': {'k': 'v'},
+                          'results': [], 'user_role': const.ROLE_OWNER},
+                         {'id': 'id1', 'meta': {}, 'results': ['test_a'],
+                          'user_role': const.ROLE_USER}],
+             'unavailable': ['id3', 'id4']},
+            self.controller.batch())
+        mock_get_test_fields_of_tests.assert_called_once_with(
+            ['id2', 'id3', 'id1', 'id4'],
+            ['id', 'cpid', 'created_at', 'duration_seconds', 'meta'])
+        mock_get_user_roles.assert_called_once_with(
+            {'id1': {}, 'id2': {'k': 'v'}, 'id3': {}})
+        self.assertEqual(['id1', 'id2'],
+                         sorted(mock_get_results_of_tests.call_args[0][0]))
+
+        # Results are not loaded unless requested.
+        self.mock_request.GET = {const.FIELDS: 'id'}
+        mock_get_results_of_tests.reset_mock()
+        self.assertEqual([{'id': 'id2'}, {'id': 'id1'}],
+                         self.controller.batch()['results'])
+        self.assertFalse(mock_get_results_of_tests.called)
+
+    def test_batch_error(self):
+        self.CONF.set_override('results_batch_max_size', 1, 'api')
+        for body in ('{', '[]', '{"test_ids": "id1"}', '{"test_ids": [1]}'):
+            self.mock_request.body = body
+            self.assertRaises(webob.exc.HTTPError, self.controller.batch)
+            self.mock_abort.assert_called_with(
+                400, 'List of %s is expected.' % const.TEST_IDS)
+        self.mock_request.body = '{"test_ids": ["id1", "id2"]}'
+        self.assertRaises(webob.exc.HTTPError, self.controller.batch)
+        self.mock_abort.assert_called_with(
+            400, 'Batch is limited to 1 test runs.')
+
+    @mock.patch('refstack.api.export.iter_export')
+    @mock.patch('refstack.api.utils.parse_input_params')
+    def test_export(self, parse_input, mock_iter_export):
+        self.mock_request.GET = {const.FORMAT: 'csv',
+                                 const.WITH_RESULTS: 'true',
+                                 const.CURSOR: 'fake_cursor'}
+        result = self.controller.export()
+        self.assertEqual(mock_iter_export.return_value, result.app_iter)
+        self.assertEqual('text/csv', result.content_type)
+        mock_iter_export.assert_called_once_with(
+            parse_input.return_value, 'csv', 'fake_cursor', True)
+
+        self.mock_request.GET = {}
+        mock_iter_export.reset_mock()
+        result = self.controller.export()
+        self.assertEqual('application/x-ndjson', result.content_type)
+        mock_iter_export.assert_called_once_with(
+            parse_input.return_value, 'ndjson', None, False)
+
+        mock_iter_export.side_effect = ValueError('Invalid cursor: fake')
+        self.assertRaises(webob.exc.HTTPError, self.controller.export)
+        self.mock_abort.assert_called_with(400, 'Invalid cursor: fake')
+
+    @mock.patch('refstack.db.get_results_of_tests')
+    @mock.patch('refstack.db.get_latest_test_ids')
+    def test_matrix_error(self, mock_get_latest_test_ids,
+                          mock_get_results_of_tests):
+        self.mock_request.GET = webob.multidict.MultiDict(
+            [(const.TEST_ID, 'id1'), (const.TEST_ID, 'id2')])
+        self.CONF.set_override('matrix_max_runs', 1, 'api')
+        self.assertRaises(webob.exc.HTTPError, self.controller.matrix)
+        self.mock_abort.assert_called_with(
+            400, 'Matrix is limited to 1 test runs.')
+
+        self.mock_request.GET = webob.multidict.MultiDict()
+        mock_get_latest_test_ids.return_value = ['id1', 'id2']
+
+        self.CONF.set_override('matrix_max_runs', 10, 'api')
+        mock_get_results_of_tests.return_value = {'id1': [], 'id2': []}
+        self.assertRaises(webob.exc.HTTPError, self.controller.matrix)
+        self.mock_abort.assert_called_with(
+            400, 'Guideline is required for capability columns')
+
+    @mock.patch('refstack.db.get_test_version')
+    @mock.patch('refstack.db.get_test')
+    @mock.patch('refstack.db.get_test_results')
+    def test_get_filtered_by_name(self, mock_get_test_res, mock_get_test,
+                                  mock_get_test_version):
+        self.mock_request.headers = {}
+        self.mock_response.headers = {}
+        mock_get_test_version.return_value = {
+            'id': 'fake_arg', 'meta_version': 0,
+            'created_at': datetime.datetime(2015, 8, 1), 'updated_at': None
+        }
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        mock_get_test.return_value = {}
+        mock_get_test_res.return_value = [{'name': 'test2'},
+                                          {'name': 'test1'}]
+
+        # Tests of run missing in cache are filtered by prefix in DB.
+        self.mock_request.GET = {const.NAME_PREFIX: 'test',
+                                 const.CONTAINS: '1'}
+        with mock.patch('refstack.api.name_index.filter_tests') as mock_f:
+            result = self.controller.get_one('fake_arg')
+        self.assertFalse(mock_f.called)
+        mock_get_test_res.assert_called_once_with('fake_arg', 'test')
+        self.assertEqual(['test1'], result['results'])
+        self.assertEqual('MISS', self.mock_response.headers['X-Cache'])
+
+        # Tests of cached run are filtered by the name index.
+        self.mock_request.GET = {}
+        self.controller.get_one('fake_arg')
+        self.mock_request.GET = {const.NAME_PREFIX: 'test',
+                                 const.CONTAINS: '2'}
+        with mock.patch('refstack.api.name_index.filter_tests') as mock_f:
+            result = self.controller.get_one('fake_arg')
+        mock_f.assert_called_once_with('fake_arg', ['test2', 'test1'],
+                                       'test', '2')
+        self.assertEqual(mock_f.return_value, result['results'])
+        self.assertEqual('HIT', self.mock_response.headers['X-Cache'])
+
+    @mock.patch('refstack.db.get_test_version')
+    def test_get_filtered_by_short_substring(self, mock_get_test_version):
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        self.mock_request.GET = {const.CONTAINS: 'ab'}
+        self.assertRaises(webob.exc.HTTPError,
+                          self.controller.get_one, 'fake_arg')
+        self.mock_abort.assert_called_once_with(
+            400, 'Parameter contains must be at least 3 characters long '
+                 'unless name_prefix is given.')
+        self.assertFalse(mock_get_test_version.called)
+
     @mock.patch('refstack.db.get_test')
     def test_get_item_failed(self, mock_get_test):
         mock_get_test.return_value = None
@@ -238,7 +625,9 @@ class ResultsControllerTestCase(BaseControllerTestCase):
             const.START_DATE,
             const.END_DATE,
             const.CPID,
-            const.SIGNED
+            const.SIGNED,
+            const.COMPLIANT,
+            const.SORT
         ]
         page_number = 1
         total_pages_number = 10
@@ -270,15 +659,201 @@ class ResultsControllerTestCase(BaseControllerTestCase):
 
         filters = parse_input.return_value
         get_test_count.assert_called_once_with(filters)
-        get_page.assert_called_once_with(records_count)
+        get_page.assert_called_once_with(records_count, per_page)
+
+        db_get_test.assert_called_once_with(page_number, per_page, filters,
+                                            None)
+
+    @mock.patch('refstack.db.get_test_records')
+    @mock.patch('refstack.db.get_test_records_count')
+    @mock.patch('refstack.api.utils.parse_input_params')
+    def test_get_with_fields(self, parse_input, get_test_count,
+                             db_get_test):
+        self.CONF.set_override('results_listing_cache_ttl', 0, 'api')
+        self.mock_request.GET = {const.FIELDS: 'created_at,url',
+                                 const.PER_PAGE: '50'}
+        get_test_count.return_value = 120
+        db_get_test.return_value = [{'id': 111, 'created_at': '12345'}]
+
+        page = self.controller.get()
+
+        self.assertEqual(
+            [{'created_at': '12345',
+              'url': self.test_results_url % 111}],
+            page['results'])
+        self.assertEqual(3, page['pagination']['total_pages'])
+        db_get_test.assert_called_once_with(
+            1, 50, parse_input.return_value, ['created_at', 'id'])
+
+        self.mock_request.GET = {const.FIELDS: 'id,cpid'}
+        self.assertRaises(api_exc.ParseInputsError, self.controller.get)
+
+    @mock.patch('refstack.db.get_test_results')
+    @mock.patch('refstack.db.get_test_fields')
+    @mock.patch('refstack.db.get_test_version')
+    def test_get_one_with_fields(self, mock_get_test_version,
+                                 mock_get_test_fields,
+                                 mock_get_test_results):
+        self.mock_request.headers = {}
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        mock_get_test_version.return_value = {
+            'id': 'fake_id', 'meta_version': 0,
+            'created_at': datetime.datetime(2015, 8, 1), 'updated_at': None
+        }
+        mock_get_test_fields.return_value = {'id': 'fake_id',
+                                             'cpid': 'fake_cpid'}
+        self.mock_request.GET = {const.FIELDS: 'id,cpid,user_role'}
+
+        self.assertEqual({'id': 'fake_id', 'user_role': const.ROLE_USER},
+                         self.controller.get_one('fake_id'))
+        mock_get_test_fields.assert_called_once_with('fake_id',
+                                                     ['id', 'cpid'])
+        self.assertFalse(mock_get_test_results.called)
+
+    @mock.patch('oslo_utils.timeutils.utcnow')
+    @mock.patch('refstack.db.get_slowest_tests')
+    @mock.patch('refstack.api.utils.parse_input_params')
+    def test_slowest(self, parse_input, mock_get_slowest_tests,
+                     mock_utcnow):
+        self.CONF.set_override('slowest_tests_default_days', 30, 'api')
+        self.CONF.set_override('slowest_tests_max_runs', 100, 'api')
+        self.CONF.set_override('results_listing_cache_ttl', 0, 'api')
+        mock_utcnow.return_value = datetime.datetime(2015, 8, 31, 12, 30)
+        parse_input.side_effect = lambda params: {const.CPID: 'foo'}
+        mock_get_slowest_tests.return_value = [
+            {'name': 'test_a', 'runs': 2, 'mean_duration': 1.5,
+             'max_duration': 2.0}]
+        filters = {const.CPID: 'foo',
+                   const.START_DATE: datetime.datetime(2015, 8, 1)}
+        self.assertEqual({'tests': mock_get_slowest_tests.return_value},
+                         self.controller.slowest())
+        mock_get_slowest_tests.assert_called_once_with(
+            filters, results.SLOWEST_TESTS_DEFAULT_LIMIT, 100)
+
+        self.mock_request.GET = {const.LIMIT: '5'}
+        self.controller.slowest()
+        mock_get_slowest_tests.assert_called_with(filters, 5, 100)
+
+        # Default window ends at the end date if given.
+        parse_input.side_effect = lambda params: {
+            const.END_DATE: datetime.datetime(2015, 7, 31, 23)}
+        self.controller.slowest()
+        mock_get_slowest_tests.assert_called_with(
+            {const.START_DATE: datetime.datetime(2015, 7, 1),
+             const.END_DATE: datetime.datetime(2015, 7, 31, 23)}, 5, 100)
+
+        self.mock_abort.side_effect = webob.exc.HTTPError()
+        for limit in ('0', 'many', '1001'):
+            self.mock_request.GET = {const.LIMIT: limit}
+            self.assertRaises(webob.exc.HTTPError, self.controller.slowest)
+
+    @mock.patch('refstack.db.get_slowest_tests')
+    @mock.patch('refstack.api.utils.parse_input_params')
+    def test_slowest_cached(self, parse_input, mock_get_slowest_tests):
+        self.mock_request.GET = {}
+        self.mock_response.headers = {}
+        parse_input.side_effect = lambda params: {
+            const.START_DATE: datetime.datetime(2015, 8, 1)}
+        mock_get_slowest_tests.return_value = [
+            {'name': 'test_a', 'runs': 2, 'mean_duration': 1.5,
+             'max_duration': 2.0}]
+
+        tests = self.controller.slowest()
+        self.assertEqual('MISS', self.mock_response.headers['X-Cache'])
+        self.assertEqual(tests, self.controller.slowest())
+        self.assertEqual('HIT', self.mock_response.headers['X-Cache'])
+        self.assertEqual(1, mock_get_slowest_tests.call_count)
+
+        self.mock_request.GET = {const.LIMIT: '5'}
+        self.controller.slowest()
+        self.assertEqual(2, mock_get_slowest_tests.call_count)
+
+        results.listing_cache.bump_generation()
+        self.controller.slowest()
+        self.assertEqual(3, mock_get_slowest_tests.call_count)
+
+        parse_input.side_effect = lambda params: {const.SIGNED: 'true'}
+        self.controller.slowest()
+        self.controller.slowest()
+        self.assertEqual(5, mock_get_slowest_tests.call_count)
+
+    @mock.patch('refstack.db.store_results')
+    def test_post_with_outcomes(self, mock_store_results):
+        self.mock_request.body = json.dumps({'results': [
+            {'name': 'test_a', 'status': 'pass', 'duration': 1.5},
+            {'name': 'test_b', 'status': 'fail', 'duration': 2.5}]})
+        self.mock_request.headers = {}
+        mock_store_results.return_value = 'fake_test_id'
+        self.controller.post()
+        # Only passed tests are indexed.
+        self.mock_index_test.assert_called_once_with('fake_test_id',
+                                                     ['test_a'])
+
+    @mock.patch('refstack.db.get_latest_test_records')
+    @mock.patch('refstack.db.get_latest_test_records_count')
+    @mock.patch('refstack.api.utils.get_page_number')
+    @mock.patch('refstack.api.utils.parse_input_params')
+    def test_latest(self, parse_input, get_page, get_count, get_records):
+        get_count.return_value = 3
+        get_page.return_value = (1, 1)
+        record = {'id': 111, 'created_at': '12345', 'cpid': '54321'}
+        get_records.return_value = [record]
+        self.CONF.set_override('results_per_page', 5, 'api')
+
+        result = self.controller.latest()
+
+        self.assertEqual(
+            {'results': [dict(record,
+                              url=self.test_results_url % record['id'])],
+             'pagination': {'current_page': 1, 'total_pages': 1}},
+            result)
+        parse_input.assert_called_once_with([const.SIGNED])
+        filters = parse_input.return_value
+        get_count.assert_called_once_with(filters)
+        get_page.assert_called_once_with(3)
+        get_records.assert_called_once_with(1, 5, filters)
+
+    @mock.patch('refstack.db.get_test_records')
+    @mock.patch('refstack.db.get_test_records_count')
+    @mock.patch('refstack.api.utils.get_page_number')
+    @mock.patch('refstack.api.utils.parse_input_params')
+    def test_get_listing_cached(self, parse_input, get_page,
+                                get_test_count, db_get_test):
+        self.mock_request.headers = {}
+        self.mock_request.GET = {}
+        self.mock_response.headers = {}
+        parse_input.return_value = {const.CPID: 'foo'}
+        get_page.return_value = (1, 1)
+        db_get_test.return_value = [{'id': 111}]
+
+        page = self.controller.get()
+        self.assertEqual('MISS', self.mock_response.headers['X-Cache'])
+        self.assertEqual(page, self.controller.get())
+        self.assertEqual('HIT', self.mock_response.headers['X-Cache'])
+        get_test_count.assert_called_once_with({const.CPID: 'foo'})
+        self.assertEqual(1, db_get_test.call_count)
+
+        self.mock_request.GET = {const.PAGE: '2'}
+        self.controller.get()
+        self.assertEqual(2, db_get_test.call_count)
+
+        results.listing_cache.bump_generation()
+        self.mock_request.GET = {}
+        self.controller.get()
+        self.assertEqual(3, db_get_test.call_count)
 
-        db_get_test.assert_called_once_with(page_number, per_page, filters)
+        parse_input.return_value = {const.SIGNED: 'true'}
+        self.controller.get()
+        self.controller.get()
+        self.assertEqual(5, db_get_test.call_count)
 
     @mock.patch('refstack.db.delete_test')
     def test_delete(self, mock_db_delete):
         self.mock_get_user_role.return_value = const.ROLE_OWNER
+        results.test_runs_cache.set('test_id', {'foo': 'bar'})
         self.controller.delete('test_id')
         self.assertEqual(204, self.mock_response.status)
+        self.assertIsNone(results.test_runs_cache.get('test_id'))
         self.mock_get_user_role.return_value = const.ROLE_USER
         self.mock_abort.side_effect = webob.exc.HTTPError()
         self.assertRaises(webob.exc.HTTPError,
@@ -291,6 +866,13 @@ class CapabilitiesControllerTestCase(BaseControllerTestCase):
         super(CapabilitiesControllerTestCase, self).setUp()
         self.controller = capabilities.CapabilitiesController()
         self.mock_abort.side_effect = None
+        self.config_fixture = config_fixture.Config()
+        self.CONF = self.useFixture(self.config_fixture).conf
+        self.CONF.set_override('cache_dir',
+                               self.useFixture(fixtures.TempDir()).path,
+                               'api')
+        self.setup_mock('refstack.api.guidelines.capabilities_store',
+                        new=guidelines.CapabilitiesStore())
 
     def test_get_capabilities(self):
         """Test when getting a list of all capability files."""
@@ -356,6 +938,78 @@ class CapabilitiesControllerTestCase(BaseControllerTestCase):
         self.controller.get_one('2010.03')
         self.mock_abort.assert_called_with(500)
 
+    def test_get_capability_file_cached(self):
+        """Test that cached file is served when GitHub is unavailable."""
+        @httmock.all_requests
+        def github_mock(url, request):
+            content = {'foo': 'bar'}
+            return httmock.response(200, content, None, None, 5, request)
+
+        self.mock_response.headers = {}
+        with httmock.HTTMock(github_mock):
+            self.controller.get_one('2015.03')
+        self.assertEqual('MISS', self.mock_response.headers['X-Cache'])
+
+        with mock.patch('requests.get') as mock_requests_get:
+            mock_requests_get.side_effect = \
+                requests.exceptions.RequestException()
+            result = self.controller.get_one('2015.03')
+            self.assertFalse(mock_requests_get.called)
+            self.assertEqual('HIT', self.mock_response.headers['X-Cache'])
+
+            self.CONF.set_override('capabilities_cache_max_stale', 0, 'api')
+            self.assertEqual(result, self.controller.get_one('2015.03'))
+            self.assertTrue(mock_requests_get.called)
+            self.assertEqual('STALE', self.mock_response.headers['X-Cache'])
+        self.assertEqual({'foo': 'bar'}, result)
+        self.assertFalse(self.mock_abort.called)
+
+    @mock.patch('requests.get')
+    def test_get_local_capabilities(self, mock_requests_get):
+        """Test that capability files are served from local directory."""
+        path = self.useFixture(fixtures.TempDir()).path
+        with open(os.path.join(path, '2015.03.json'), 'wb') as cap_file:
+            cap_file.write(b'{"foo": "bar"}')
+        self.CONF.set_override('capabilities_dir', path, 'api')
+        self.CONF.set_override('capabilities_dir_poll_interval', 0, 'api')
+
+        self.assertEqual(['2015.03.json'], self.controller.get())
+        result = self.controller.get_one('2015.03')
+        self.assertIs(self.mock_response, result)
+        self.assertEqual(b'{"foo": "bar"}', result.body)
+        self.assertEqual('application/json', result.content_type)
+        self.assertFalse(self.mock_abort.called)
+
+        self.mock_abort.side_effect = webob.exc.HTTPError
+        self.assertRaises(webob.exc.HTTPError,
+                          self.controller.get_one, '2010.03')
+        self.mock_abort.assert_called_with(404)
+        self.assertFalse(mock_requests_get.called)
+
+
+class TestIndexControllerTestCase(BaseControllerTestCase):
+
+    def setUp(self):
+        super(TestIndexControllerTestCase, self).setUp()
+        self.controller = capabilities.TestIndexController()
+        self.mock_abort.side_effect = None
+
+    @mock.patch('refstack.api.guidelines.get_test_index')
+    def test_get(self, mock_get_test_index):
+        mock_get_test_index.return_value = {'test_a': []}
+        self.assertEqual({'test_a': []}, self.controller.get('2015.03'))
+        mock_get_test_index.assert_called_once_with('2015.03')
+
+    @mock.patch('refstack.api.guidelines.get_test_index')
+    def test_get_error(self, mock_get_test_index):
+        mock_get_test_index.side_effect = api_exc.GuidelineUnavailable(404)
+        self.controller.get('2010.03')
+        self.mock_abort.assert_called_with(404)
+
+        mock_get_test_index.side_effect = ValueError('Bad schema')
+        self.controller.get('2010.03')
+        self.mock_abort.assert_called_with(400, 'Bad schema')
+
 
 class BaseRestControllerWithValidationTestCase(BaseControllerTestCase):
 
@@ -532,31 +1186,459 @@ class AuthControllerTestCase(BaseControllerTestCase):
                          mock_request.environ['beaker.session'])
 
 
+class OutcomesControllerTestCase(BaseControllerTestCase):
+
+    def setUp(self):
+        super(OutcomesControllerTestCase, self).setUp()
+        self.controller = results.OutcomesController()
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        self.mock_request.GET = {}
+
+    @mock.patch('refstack.db.get_test_version')
+    @mock.patch('refstack.db.get_test_outcomes')
+    def test_get(self, mock_get_test_outcomes, mock_get_test_version):
+        mock_get_test_outcomes.return_value = [
+            {'name': 'test_a', 'status': 'fail', 'duration': 1.5}]
+        self.assertEqual({'outcomes': mock_get_test_outcomes.return_value},
+                         self.controller.get('test_id'))
+        mock_get_test_outcomes.assert_called_once_with('test_id', None)
+        mock_get_test_version.assert_called_once_with('test_id')
+
+        self.mock_request.GET = {const.STATUS: 'fail'}
+        self.controller.get('test_id')
+        mock_get_test_outcomes.assert_called_with('test_id', 'fail')
+
+    @mock.patch('refstack.db.get_test_outcomes')
+    def test_get_invalid_status(self, mock_get_test_outcomes):
+        self.mock_request.GET = {const.STATUS: 'broken'}
+        self.mock_abort.side_effect = webob.exc.HTTPError()
+        self.assertRaises(webob.exc.HTTPError, self.controller.get, 'test_id')
+        self.mock_abort.assert_called_once_with(400, mock.ANY)
+        self.assertFalse(mock_get_test_outcomes.called)
+
+
+class ReportControllerTestCase(BaseControllerTestCase):
+
+    def setUp(self):
+        super(ReportControllerTestCase, self).setUp()
+        self.controller = results.ReportController()
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        self.mock_response.headers = {}
+        self.mock_get_parsed_guideline = self.setup_mock(
+            'refstack.api.guidelines.get_parsed_guideline')
+        self.mock_get_parsed_guideline.return_value = {
+            'digest': 'fake_digest', 'index': {},
+            'guideline': {
+                'schema': '1.2',
+                'platform': {'required': ['compute']},
+                'components': {'compute': {'required': ['compute-servers']}},
+                'capabilities': {'compute-servers': {
+                    'tests': ['test_a', 'test_b'], 'flagged': []}}}}
+        results.reports_cache.clear()
+
+    @mock.patch('refstack.db.get_test_results')
+    @mock.patch('refstack.db.get_test_version')
+    def test_get(self, mock_get_test_version, mock_get_test_results):
+        self.mock_request.GET = {const.GUIDELINE: '2015.07'}
+        mock_get_test_results.return_value = [{'name': 'test_a'}]
+        report = self.controller.get('test_id')
+        self.assertEqual(50.0, report['required_pass_percent'])
+        self.assertEqual(['test_b'], report['caps']['required']['caps'][0]
+                         ['not_passed_tests'])
+        self.mock_get_parsed_guideline.assert_called_once_with('2015.07')
+        mock_get_test_version.assert_called_once_with('test_id')
+        self.assertEqual('MISS', self.mock_response.headers['X-Cache'])
+
+        self.assertEqual(report, self.controller.get('test_id'))
+        self.assertEqual('HIT', self.mock_response.headers['X-Cache'])
+        mock_get_test_results.assert_called_once_with('test_id')
+
+        self.mock_get_parsed_guideline.return_value = dict(
+            self.mock_get_parsed_guideline.return_value,
+            digest='new_digest')
+        self.controller.get('test_id')
+        self.assertEqual('MISS', self.mock_response.headers['X-Cache'])
+
+    @mock.patch('refstack.db.get_test_results')
+    @mock.patch('refstack.db.get_test_version')
+    def test_get_error(self, mock_get_test_version, mock_get_test_results):
+        self.mock_request.GET = {}
+        self.assertRaises(webob.exc.HTTPError, self.controller.get, 'test_id')
+        self.mock_abort.assert_called_with(400, 'Guideline is not specified.')
+
+        self.mock_request.GET = {const.GUIDELINE: '2015.07',
+                                 const.TARGET: 'network'}
+        mock_get_test_results.return_value = []
+        self.assertRaises(webob.exc.HTTPError, self.controller.get, 'test_id')
+        self.mock_abort.assert_called_with(400, 'Unknown target: network')
+
+        self.mock_get_parsed_guideline.side_effect = \
+            api_exc.GuidelineUnavailable(404)
+        self.assertRaises(webob.exc.HTTPError, self.controller.get, 'test_id')
+        self.mock_abort.assert_called_with(404)
+
+
+class DiffControllerTestCase(BaseControllerTestCase):
+
+    def setUp(self):
+        super(DiffControllerTestCase, self).setUp()
+        self.controller = results.DiffController()
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        self.mock_response.headers = {}
+        self.mock_request.GET = {}
+        self.mock_get_test_version = self.setup_mock(
+            'refstack.db.get_test_version')
+        self.mock_get_test_results = self.setup_mock(
+            'refstack.db.get_test_results')
+        self.mock_get_test_results.side_effect = lambda test_id: [
+            {'name': name} for name in
+            {'id1': ['test_a', 'test_b'], 'id2': ['test_b', 'test_c']}[test_id]
+        ]
+        results.diffs_cache.clear()
+
+    def test_get_one(self):
+        diff = self.controller.get_one('id1', 'id2')
+        self.assertEqual({'added': ['test_c'], 'removed': ['test_a'],
+                          'common': ['test_b']}, diff)
+        self.mock_get_test_version.assert_has_calls([mock.call('id1'),
+                                                     mock.call('id2')])
+        self.assertEqual('MISS', self.mock_response.headers['X-Cache'])
+
+        self.assertEqual(diff, self.controller.get_one('id1', 'id2'))
+        self.assertEqual('HIT', self.mock_response.headers['X-Cache'])
+        self.assertEqual(2, self.mock_get_test_results.call_count)
+
+    @mock.patch('refstack.api.guidelines.get_parsed_guideline')
+    def test_get_one_with_guideline(self, mock_get_parsed_guideline):
+        self.mock_request.GET = {const.GUIDELINE: '2015.07'}
+        mock_get_parsed_guideline.return_value = {
+            'digest': 'fake_digest', 'guideline': {},
+            'index': {'test_a': [{'capability': 'cap-a'}],
+                      'test_b': [{'capability': 'cap-b'}]}}
+        diff = self.controller.get_one('id1', 'id2')
+        self.assertEqual({'added': {}, 'removed': {'test_a': ['cap-a']}},
+                         diff['capabilities'])
+
+    def test_get_one_forbidden(self):
+        self.mock_get_user_role.side_effect = [const.ROLE_USER, None]
+        self.assertRaises(webob.exc.HTTPError,
+                          self.controller.get_one, 'id1', 'id2')
+        self.mock_abort.assert_called_with(401)
+        self.assertFalse(self.mock_get_test_results.called)
+
+
+class SimilarControllerTestCase(BaseControllerTestCase):
+
+    def setUp(self):
+        super(SimilarControllerTestCase, self).setUp()
+        self.controller = results.SimilarController()
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        self.config_fixture = config_fixture.Config()
+        self.CONF = self.useFixture(self.config_fixture).conf
+        self.CONF.set_override('test_results_url', '/#/results/%s', 'api')
+        self.CONF.set_override('ui_url', 'host.org')
+        self.setup_mock('refstack.db.get_test_version')
+        self.mock_parse_input = self.setup_mock(
+            'refstack.api.utils.parse_input_params', return_value={})
+        self.mock_find_similar = self.setup_mock(
+            'refstack.api.similarity.find_similar',
+            return_value=[{'id': 'id2', 'created_at': 'date',
+                           'similarity': 0.75}])
+
+    def test_get(self):
+        self.mock_request.GET = {const.SIMILAR_COUNT: '5'}
+        self.assertEqual(
+            {'test_id': 'id1',
+             'similar': [{'id': 'id2', 'created_at': 'date',
+                          'similarity': 0.75,
+                          'url': parse.urljoin('host.org',
+                                               '/#/results/id2')}]},
+            self.controller.get('id1'))
+        self.mock_parse_input.assert_called_once_with([const.SIGNED])
+        self.mock_find_similar.assert_called_once_with('id1', 5, {}, 1000)
+
+    def test_get_invalid_count(self):
+        for count in ('0', 'ten', '101'):
+            self.mock_request.GET = {const.SIMILAR_COUNT: count}
+            self.assertRaises(webob.exc.HTTPError,
+                              self.controller.get, 'id1')
+        self.assertFalse(self.mock_find_similar.called)
+
+
+class TestPassRatesControllerTestCase(BaseControllerTestCase):
+
+    def setUp(self):
+        super(TestPassRatesControllerTestCase, self).setUp()
+        self.controller = stats.TestPassRatesController()
+        self.mock_get_population = self.setup_mock(
+            'refstack.db.get_population',
+            return_value={'runs': 12, 'clouds': 10})
+        self.mock_get_test_pass_rates = self.setup_mock(
+            'refstack.db.get_test_pass_rates',
+            return_value=[
+                {'name': 'test_a', 'pass_count': 5, 'cpid_count': 4},
+                {'name': 'test_b', 'pass_count': 11, 'cpid_count': 9}])
+
+    def test_get(self):
+        self.mock_request.GET = {}
+        self.assertEqual(
+            {'runs': 12, 'clouds': 10,
+             'tests': [{'name': 'test_a', 'pass_count': 5, 'cpid_count': 4,
+                        'pass_rate': 40.0},
+                       {'name': 'test_b', 'pass_count': 11, 'cpid_count': 9,
+                        'pass_rate': 90.0}]},
+            self.controller.get())
+
+    @mock.patch('refstack.api.guidelines.get_guideline')
+    def test_get_with_guideline(self, mock_get_guideline):
+        self.mock_request.GET = {const.GUIDELINE: '2015.07'}
+        mock_get_guideline.return_value = {
+            'schema': '1.2',
+            'platform': {'required': ['compute']},
+            'components': {'compute': {'required': ['cap-a']}},
+            'capabilities': {'cap-a': {'tests': ['test_a', 'test_c'],
+                                       'flagged': []}}}
+        tests = self.controller.get()['tests']
+        self.assertEqual(['test_a', 'test_b', 'test_c'],
+                         [test['name'] for test in tests])
+        self.assertEqual([True, False, True],
+                         [test['core'] for test in tests])
+        self.assertEqual([True, False, True],
+                         [test['at_risk'] for test in tests])
+        self.assertEqual([False, True, False],
+                         [test['candidate'] for test in tests])
+        self.assertEqual(0.0, tests[2]['pass_rate'])
+
+    @mock.patch('refstack.api.guidelines.get_guideline')
+    def test_get_guideline_unavailable(self, mock_get_guideline):
+        self.mock_request.GET = {const.GUIDELINE: '2010.01'}
+        mock_get_guideline.side_effect = api_exc.GuidelineUnavailable(404)
+        self.assertRaises(webob.exc.HTTPError, self.controller.get)
+        self.mock_abort.assert_called_with(404)
+
+
+class TrendControllerTestCase(BaseControllerTestCase):
+
+    def setUp(self):
+        super(TrendControllerTestCase, self).setUp()
+        self.controller = clouds.TrendController()
+        self.mock_parse_input = self.setup_mock(
+            'refstack.api.utils.parse_input_params', return_value={})
+        self.mock_get_cloud_trend = self.setup_mock(
+            'refstack.db.get_cloud_trend',
+            return_value=[{'id': 'id1', 'created_at': 'date1',
+                           'passed_count': 10}])
+
+    def test_get(self):
+        self.mock_request.GET = {}
+        self.assertEqual(
+            {'cpid': 'fake_cpid',
+             'runs': [{'id': 'id1', 'created_at': 'date1',
+                       'passed_count': 10}]},
+            self.controller.get('fake_cpid'))
+        self.mock_parse_input.assert_called_once_with(clouds.RUNS_FILTERS)
+        self.mock_get_cloud_trend.assert_called_once_with(
+            'fake_cpid', {}, None, const.PLATFORM_TARGET)
+
+    @mock.patch('refstack.api.guidelines.get_guideline')
+    def test_get_with_guideline(self, mock_get_guideline):
+        self.mock_request.GET = {const.GUIDELINE: '2015.07',
+                                 const.TARGET: 'compute'}
+        mock_get_guideline.return_value = {'components': {'compute': {}}}
+        trend = self.controller.get('fake_cpid')
+        self.assertEqual('2015.07', trend['guideline'])
+        self.assertEqual('compute', trend['target'])
+        self.mock_get_cloud_trend.assert_called_once_with(
+            'fake_cpid', {}, '2015.07', 'compute')
+
+    @mock.patch('refstack.api.guidelines.get_guideline')
+    def test_get_unknown_target(self, mock_get_guideline):
+        self.mock_request.GET = {const.GUIDELINE: '2015.07',
+                                 const.TARGET: 'fake'}
+        mock_get_guideline.return_value = {'components': {'compute': {}}}
+        self.assertRaises(webob.exc.HTTPError,
+                          self.controller.get, 'fake_cpid')
+        self.mock_abort.assert_called_with(400, 'Unknown target: fake')
+
+    @mock.patch('refstack.api.guidelines.get_guideline')
+    def test_get_guideline_unavailable(self, mock_get_guideline):
+        self.mock_request.GET = {const.GUIDELINE: '2010.01'}
+        mock_get_guideline.side_effect = api_exc.GuidelineUnavailable(404)
+        self.assertRaises(webob.exc.HTTPError,
+                          self.controller.get, 'fake_cpid')
+        self.mock_abort.assert_called_with(404)
+
+
+class CloudsControllerTestCase(BaseControllerTestCase):
+
+    def setUp(self):
+        super(CloudsControllerTestCase, self).setUp()
+        self.controller = clouds.CloudsController()
+
+    @mock.patch('refstack.db.get_test_records_count')
+    @mock.patch('refstack.api.utils.parse_input_params')
+    def test_get_one(self, mock_parse_input, mock_get_count):
+        mock_parse_input.return_value = {}
+        mock_get_count.return_value = 3
+        self.assertEqual({'cpid': 'fake_cpid', 'runs': 3},
+                         self.controller.get_one('fake_cpid'))
+        mock_get_count.assert_called_once_with({const.CPID: 'fake_cpid'})
+
+        mock_get_count.return_value = 0
+        self.assertRaises(webob.exc.HTTPError,
+                          self.controller.get_one, 'fake_cpid')
+
+
+class ChangesControllerTestCase(BaseControllerTestCase):
+
+    def setUp(self):
+        super(ChangesControllerTestCase, self).setUp()
+        self.config_fixture = config_fixture.Config()
+        self.CONF = self.useFixture(self.config_fixture).conf
+        self.controller = changes.ChangesController()
+
+    @mock.patch('oslo_utils.timeutils.utcnow')
+    @mock.patch('refstack.db.get_changes')
+    def test_get(self, mock_get_changes, mock_utcnow):
+        self.CONF.set_override('changes_settle_seconds', 5, 'api')
+        mock_utcnow.return_value = datetime.datetime(2015, 8, 1, 0, 0, 10)
+        mock_get_changes.return_value = [
+            {'cursor': 11, 'test_id': 'id1', 'operation': 'create'},
+            {'cursor': 12, 'test_id': 'id1', 'operation': 'delete'}]
+        self.mock_request.GET = {const.SINCE: '10', const.LIMIT: '2'}
+        self.assertEqual({'changes': mock_get_changes.return_value,
+                          'cursor': 12},
+                         self.controller.get())
+        mock_get_changes.assert_called_once_with(
+            10, 2, datetime.datetime(2015, 8, 1, 0, 0, 5))
+
+        self.CONF.set_override('changes_settle_seconds', 0, 'api')
+        mock_get_changes.reset_mock()
+        mock_get_changes.return_value = []
+        self.mock_request.GET = {}
+        self.assertEqual({'changes': [], 'cursor': 0},
+                         self.controller.get())
+        mock_get_changes.assert_called_once_with(0, changes.DEFAULT_LIMIT,
+                                                 None)
+
+    def test_get_error(self):
+        self.CONF.set_override('changes_max_limit', 10, 'api')
+        for params in ({const.SINCE: 'abc'}, {const.SINCE: '-1'},
+                       {const.LIMIT: '0'}, {const.LIMIT: '11'}):
+            self.mock_request.GET = params
+            self.assertRaises(webob.exc.HTTPError, self.controller.get)
+
+
+class UploadsControllerTestCase(BaseControllerTestCase):
+
+    def setUp(self):
+        super(UploadsControllerTestCase, self).setUp()
+        self.config_fixture = config_fixture.Config()
+        self.CONF = self.useFixture(self.config_fixture).conf
+        self.controller = stats.UploadsController()
+        self.mock_parse_input = self.setup_mock(
+            'refstack.api.utils.parse_input_params', return_value={})
+        self.mock_get_upload_activity = self.setup_mock(
+            'refstack.db.get_upload_activity', return_value=['fake_bucket'])
+        self.mock_utcnow = self.setup_mock(
+            'oslo_utils.timeutils.utcnow',
+            return_value=datetime.datetime(2015, 8, 31, 12))
+
+    def test_get(self):
+        self.mock_request.GET = {}
+        self.assertEqual({'period': const.PERIOD_DAY, 'cpid': None,
+                          'uploads': ['fake_bucket']},
+                         self.controller.get())
+        self.mock_parse_input.assert_called_once_with(
+            [const.START_DATE, const.END_DATE, const.CPID])
+        self.mock_get_upload_activity.assert_called_once_with(
+            const.PERIOD_DAY, datetime.datetime(2015, 8, 2, 12),
+            datetime.datetime(2015, 8, 31, 12), None)
+
+    def test_get_with_range(self):
+        self.mock_request.GET = {const.PERIOD: const.PERIOD_HOUR}
+        self.mock_parse_input.return_value = {
+            const.START_DATE: datetime.datetime(2015, 8, 1),
+            const.END_DATE: datetime.datetime(2015, 8, 2),
+            const.CPID: 'fake_cpid'}
+        self.controller.get()
+        self.mock_get_upload_activity.assert_called_once_with(
+            const.PERIOD_HOUR, datetime.datetime(2015, 8, 1),
+            datetime.datetime(2015, 8, 2), 'fake_cpid')
+
+    def test_get_invalid_period(self):
+        self.mock_request.GET = {const.PERIOD: 'month'}
+        self.assertRaises(webob.exc.HTTPError, self.controller.get)
+        self.mock_abort.assert_called_with(400, 'Invalid period value: '
+                                                'month')
+
+    def test_get_too_many_buckets(self):
+        self.CONF.set_override('upload_activity_max_buckets', 24, 'api')
+        self.mock_request.GET = {const.PERIOD: const.PERIOD_HOUR}
+        self.mock_parse_input.return_value = {
+            const.START_DATE: datetime.datetime(2015, 8, 1),
+            const.END_DATE: datetime.datetime(2015, 8, 2)}
+        self.assertRaises(webob.exc.HTTPError, self.controller.get)
+        self.assertFalse(self.mock_get_upload_activity.called)
+
+
 class MetadataControllerTestCase(BaseControllerTestCase):
 
     def setUp(self):
         super(MetadataControllerTestCase, self).setUp()
         self.controller = results.MetadataController()
 
+    @mock.patch('refstack.db.get_test_version')
     @mock.patch('refstack.db.get_test')
-    def test_get(self, mock_db_get_test):
+    def test_get(self, mock_db_get_test, mock_get_test_version):
+        self.mock_request.headers = {}
+        mock_get_test_version.return_value = {
+            'id': 'fake_arg', 'meta_version': 0,
+            'created_at': datetime.datetime(2015, 8, 1), 'updated_at': None
+        }
         self.mock_get_user_role.return_value = const.ROLE_USER
         mock_db_get_test.return_value = {'meta': 'fake_meta'}
         self.assertEqual('fake_meta', self.controller.get('test_id'))
         mock_db_get_test.assert_called_once_with('test_id')
 
+    @mock.patch('refstack.db.get_test_meta_blob_digest')
     @mock.patch('refstack.db.get_test_meta_key')
-    def test_get_one(self, mock_db_get_test_meta_key):
+    def test_get_one(self, mock_db_get_test_meta_key,
+                     mock_get_test_meta_blob_digest):
         self.mock_get_user_role.return_value = const.ROLE_USER
+        mock_get_test_meta_blob_digest.return_value = None
         mock_db_get_test_meta_key.return_value = 42
         self.assertEqual(42, self.controller.get_one('test_id', 'answer'))
         mock_db_get_test_meta_key.assert_called_once_with('test_id', 'answer')
 
+    @mock.patch('refstack.api.blobs.iter_blob')
+    @mock.patch('refstack.db.get_test_meta_blob_digest')
+    @mock.patch('refstack.db.get_test_meta_key')
+    def test_get_one_blob(self, mock_db_get_test_meta_key,
+                          mock_get_test_meta_blob_digest, mock_iter_blob):
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        mock_get_test_meta_blob_digest.return_value = 'fake_digest'
+        result = self.controller.get_one('test_id', 'config')
+        self.assertEqual('application/octet-stream', result.content_type)
+        self.assertEqual(mock_iter_blob.return_value, result.app_iter)
+        mock_iter_blob.assert_called_once_with('fake_digest')
+        self.assertFalse(mock_db_get_test_meta_key.called)
+
+        mock_iter_blob.side_effect = blobs.BlobNotFound()
+        self.mock_abort.side_effect = webob.exc.HTTPError()
+        self.assertRaises(webob.exc.HTTPError,
+                          self.controller.get_one, 'test_id', 'config')
+        self.mock_abort.assert_called_once_with(404, mock.ANY)
+
     @mock.patch('refstack.db.save_test_meta_item')
     def test_post(self, mock_save_test_meta_item):
         self.mock_get_user_role.return_value = const.ROLE_OWNER
+        results.test_runs_cache.set('test_id', {'foo': 'bar'})
+        generation = results.listing_cache.get_generation()
         self.controller.post('test_id', 'answer')
         self.assertEqual(201, self.mock_response.status)
+        self.assertIsNone(results.test_runs_cache.get('test_id'))
+        self.assertNotEqual(generation, results.listing_cache.get_generation())
         mock_save_test_meta_item.assert_called_once_with(
             'test_id', 'answer', self.mock_request.body)
 
@@ -565,11 +1647,48 @@ class MetadataControllerTestCase(BaseControllerTestCase):
         self.assertRaises(webob.exc.HTTPError,
                           self.controller.post, 'test_id', 'answer')
 
+    @mock.patch('refstack.api.blobs.put')
+    @mock.patch('refstack.db.save_test_meta_item')
+    def test_post_blob(self, mock_save_test_meta_item, mock_put_blob):
+        self.mock_get_user_role.return_value = const.ROLE_OWNER
+        self.mock_request.body = 'x' * 4097
+        mock_put_blob.return_value = 'fake_digest'
+        self.controller.post('test_id', 'config')
+        self.assertEqual(201, self.mock_response.status)
+        mock_put_blob.assert_called_once_with('x' * 4097)
+        mock_save_test_meta_item.assert_called_once_with(
+            'test_id', 'config', None, blob_digest='fake_digest')
+
+    @mock.patch('refstack.api.blobs.put')
+    @mock.patch('refstack.db.save_test_meta_item')
+    def test_post_blob_unavailable(self, mock_save_test_meta_item,
+                                   mock_put_blob):
+        self.mock_get_user_role.return_value = const.ROLE_OWNER
+        self.mock_request.body = 'x' * 4097
+        mock_put_blob.side_effect = IOError('No such directory')
+        self.controller.post('test_id', 'config')
+        self.assertEqual(201, self.mock_response.status)
+        mock_save_test_meta_item.assert_called_once_with(
+            'test_id', 'config', 'x' * 4097)
+
+        # Value too long for the database is refused.
+        mock_save_test_meta_item.reset_mock()
+        self.mock_request.body = 'x' * (results.META_VALUE_MAX_SIZE + 1)
+        self.assertRaises(webob.exc.HTTPError,
+                          self.controller.post, 'test_id', 'config')
+        self.mock_abort.assert_called_once_with(
+            503, 'Blob store is unavailable.')
+        self.assertFalse(mock_save_test_meta_item.called)
+
     @mock.patch('refstack.db.delete_test_meta_item')
     def test_delete(self, mock_delete_test_meta_item):
         self.mock_get_user_role.return_value = const.ROLE_OWNER
+        results.test_runs_cache.set('test_id', {'foo': 'bar'})
+        generation = results.listing_cache.get_generation()
         self.controller.delete('test_id', 'answer')
         self.assertEqual(204, self.mock_response.status)
+        self.assertIsNone(results.test_runs_cache.get('test_id'))
+        self.assertNotEqual(generation, results.listing_cache.get_generation())
         mock_delete_test_meta_item.assert_called_once_with('test_id', 'answer')
 
         self.mock_get_user_role.return_value = const.ROLE_USER
@@ -578,6 +1697,42 @@ class MetadataControllerTestCase(BaseControllerTestCase):
                           self.controller.delete, 'test_id', 'answer')
 
 
+class UploadControllerTestCase(BaseControllerTestCase):
+
+    def setUp(self):
+        super(UploadControllerTestCase, self).setUp()
+        self.controller = results.UploadController()
+
+    @mock.patch('refstack.api.blobs.iter_blob')
+    @mock.patch('refstack.db.get_test_upload_digest')
+    def test_get(self, mock_get_test_upload_digest, mock_iter_blob):
+        self.mock_get_user_role.return_value = const.ROLE_OWNER
+        mock_get_test_upload_digest.return_value = 'fake_digest'
+        mock_iter_blob.return_value = iter([b'{"cpid": ', b'"foo"}'])
+        result = self.controller.get('test_id')
+        self.assertEqual('application/json', result.content_type)
+        self.assertEqual([b'{"cpid": ', b'"foo"}'], list(result.app_iter))
+        mock_get_test_upload_digest.assert_called_once_with('test_id')
+        mock_iter_blob.assert_called_once_with('fake_digest')
+
+        # Subunit stream is recognized by its first byte.
+        mock_iter_blob.return_value = iter([b'\xb3fake_stream'])
+        result = self.controller.get('test_id')
+        self.assertEqual(subunit.CONTENT_TYPE, result.content_type)
+        self.assertEqual([b'\xb3fake_stream'], list(result.app_iter))
+
+        # Raw upload is not stored.
+        mock_get_test_upload_digest.return_value = None
+        self.mock_abort.side_effect = webob.exc.HTTPError()
+        self.assertRaises(webob.exc.HTTPError, self.controller.get, 'test_id')
+        self.mock_abort.assert_called_once_with(404, mock.ANY)
+
+    def test_get_not_owner(self):
+        self.mock_get_user_role.return_value = const.ROLE_USER
+        self.mock_abort.side_effect = webob.exc.HTTPError()
+        self.assertRaises(webob.exc.HTTPError, self.controller.get, 'test_id')
+
+
 class PublicKeysControllerTestCase(BaseControllerTestCase):
 
     def setUp(self):
@@ -15,6 +15,8 @@
 
 """Tests for API's utils"""
 
+import datetime
+
 import mock
 from oslo_config import fixture as config_fixture
 from oslo_utils import timeutils
@@ -187,6 +189,38 @@ class APIUtilsTestCase(base.BaseTestCase):
 
         mock_get_input.assert_called_once_with(expected_params)
 
+    @mock.patch.object(api_utils, '_get_input_params_from_request')
+    def test_parse_input_params_compliant(self, mock_get_input):
+        mock_get_input.return_value = {const.COMPLIANT: '2015.07:compute'}
+        self.assertEqual({const.COMPLIANT: ('2015.07', 'compute')},
+                         api_utils.parse_input_params(mock.Mock()))
+
+        mock_get_input.return_value = {const.COMPLIANT: '2015.07'}
+        self.assertEqual({const.COMPLIANT: ('2015.07', 'platform')},
+                         api_utils.parse_input_params(mock.Mock()))
+
+        mock_get_input.return_value = {const.COMPLIANT: ':compute'}
+        self.assertRaises(api_exc.ParseInputsError,
+                          api_utils.parse_input_params, mock.Mock())
+
+    @mock.patch.object(api_utils, '_get_input_params_from_request')
+    def test_parse_input_params_sort(self, mock_get_input):
+        mock_get_input.return_value = {const.COMPLIANT: '2015.07',
+                                       const.SORT: 'compliance'}
+        self.assertEqual({const.COMPLIANT: ('2015.07', 'platform'),
+                          const.SORT: 'compliance'},
+                         api_utils.parse_input_params(mock.Mock()))
+
+        mock_get_input.return_value = {const.COMPLIANT: '2015.07',
+                                       const.SORT: 'cpid'}
+        self.assertRaises(api_exc.ParseInputsError,
+                          api_utils.parse_input_params, mock.Mock())
+
+        # Runs are sorted by compliance with the guideline they comply.
+        mock_get_input.return_value = {const.SORT: 'compliance'}
+        self.assertRaises(api_exc.ParseInputsError,
+                          api_utils.parse_input_params, mock.Mock())
+
     def test_calculate_pages_number_full_pages(self):
         # expected pages number: 20/10 = 2
         page_number = api_utils._calculate_pages_number(10, 20)
@@ -199,6 +233,36 @@ class APIUtilsTestCase(base.BaseTestCase):
         page_number = api_utils._calculate_pages_number(10, 25)
         self.assertEqual(page_number, 3)
 
+    @mock.patch('pecan.request')
+    def test_get_page_number_with_per_page(self, mock_request):
+        mock_request.GET = {const.PAGE: '5'}
+        self.assertEqual((5, 5), api_utils.get_page_number(100, 20))
+        self.assertRaises(api_exc.ParseInputsError,
+                          api_utils.get_page_number, 100, 50)
+
+    @mock.patch('pecan.request')
+    def test_get_per_page(self, mock_request):
+        self.CONF.set_override('results_per_page', 20, 'api')
+        self.CONF.set_override('results_max_per_page', 100, 'api')
+        mock_request.GET = {}
+        self.assertEqual(20, api_utils.get_per_page())
+        mock_request.GET = {const.PER_PAGE: '100'}
+        self.assertEqual(100, api_utils.get_per_page())
+        for per_page in ('0', '101', 'abc'):
+            mock_request.GET = {const.PER_PAGE: per_page}
+            self.assertRaises(api_exc.ParseInputsError,
+                              api_utils.get_per_page)
+
+    @mock.patch('pecan.request')
+    def test_get_fields(self, mock_request):
+        mock_request.GET = {}
+        self.assertIsNone(api_utils.get_fields(['id', 'meta']))
+        mock_request.GET = {const.FIELDS: 'id, meta,'}
+        self.assertEqual(['id', 'meta'], api_utils.get_fields(['id', 'meta']))
+        mock_request.GET = {const.FIELDS: 'id,results'}
+        self.assertRaises(api_exc.ParseInputsError,
+                          api_utils.get_fields, ['id', 'meta'])
+
     @mock.patch('pecan.request')
     def test_get_page_number_page_number_is_none(self, mock_request):
         per_page = 20
@@ -298,6 +362,54 @@ class APIUtilsTestCase(base.BaseTestCase):
         self.assertEqual(parse.parse_qs(parse.urlparse(new_url)[4]),
                          {'foo': ['bar'], '?': ['42']})
 
+    def test_get_test_run_etag(self):
+        version = {'id': 'fake_id', 'meta_version': 2}
+        self.assertEqual('fake_id-2', api_utils.get_test_run_etag(version))
+        self.assertEqual('fake_id-2-owner',
+                         api_utils.get_test_run_etag(version,
+                                                     const.ROLE_OWNER))
+
+    def test_get_content_etag(self):
+        self.assertEqual(api_utils.get_content_etag({'a': 1, 'b': [2]}),
+                         api_utils.get_content_etag({'b': [2], 'a': 1}))
+        self.assertNotEqual(api_utils.get_content_etag({'a': 1}),
+                            api_utils.get_content_etag({'a': 2}))
+
+    @mock.patch('pecan.abort', side_effect=exc.HTTPNotModified)
+    @mock.patch('pecan.response')
+    @mock.patch('pecan.request')
+    def test_check_not_modified(self, mock_request, mock_response,
+                                mock_abort):
+        last_modified = datetime.datetime(2015, 8, 4, 11, 2, 17)
+        mock_request.headers = {}
+        api_utils.check_not_modified('fake-etag', last_modified)
+        mock_response.headers.update.assert_called_once_with({
+            'ETag': '"fake-etag"',
+            'Vary': 'Cookie',
+            'Last-Modified': 'Tue, 04 Aug 2015 11:02:17 GMT'
+        })
+        self.assertFalse(mock_abort.called)
+
+        mock_request.headers = {'If-None-Match': '"other", W/"fake-etag"'}
+        self.assertRaises(exc.HTTPNotModified,
+                          api_utils.check_not_modified, 'fake-etag')
+
+        mock_request.headers = {'If-None-Match': '"other"',
+                                'If-Modified-Since':
+                                    'Tue, 04 Aug 2015 11:02:17 GMT'}
+        api_utils.check_not_modified('fake-etag', last_modified)
+
+        mock_request.headers = {'If-Modified-Since':
+                                'Tue, 04 Aug 2015 11:02:17 GMT'}
+        self.assertRaises(exc.HTTPNotModified,
+                          api_utils.check_not_modified, 'fake-etag',
+                          last_modified)
+
+        mock_request.headers = {'If-Modified-Since':
+                                'Tue, 04 Aug 2015 11:02:16 GMT'}
+        api_utils.check_not_modified('fake-etag', last_modified)
+        self.assertEqual(2, mock_abort.call_count)
+
     def test_get_token(self):
         token = api_utils.get_token(42)
         self.assertRegexpMatches(token, "[a-z]{42}")
@@ -330,6 +442,35 @@ class APIUtilsTestCase(base.BaseTestCase):
         mock_get_user.side_effect = mock_db.NotFound('User')
         self.assertEqual(False, api_utils.is_authenticated())
 
+    @mock.patch.object(api_utils, 'is_authenticated')
+    @mock.patch.object(api_utils, 'get_user_public_keys')
+    def test_get_user_roles(self, mock_get_user_public_keys,
+                            mock_is_authenticated):
+        tests_meta = {
+            'unsigned': {},
+            'shared': {const.PUBLIC_KEY: 'other key',
+                       const.SHARED_TEST_RUN: 'true'},
+            'private': {const.PUBLIC_KEY: 'other key'},
+            'own': {const.PUBLIC_KEY: 'fake key'},
+        }
+        mock_is_authenticated.return_value = False
+        self.assertEqual({'unsigned': const.ROLE_USER,
+                          'shared': const.ROLE_USER,
+                          'private': None,
+                          'own': None},
+                         api_utils.get_user_roles(tests_meta))
+        self.assertFalse(mock_get_user_public_keys.called)
+
+        mock_is_authenticated.return_value = True
+        mock_get_user_public_keys.return_value = [{'format': 'fake',
+                                                   'pubkey': 'key'}]
+        self.assertEqual({'unsigned': const.ROLE_USER,
+                          'shared': const.ROLE_USER,
+                          'private': None,
+                          'own': const.ROLE_OWNER},
+                         api_utils.get_user_roles(tests_meta))
+        mock_get_user_public_keys.assert_called_once_with()
+
     @mock.patch('pecan.abort', side_effect=exc.HTTPError)
     @mock.patch('refstack.db.get_test_meta_key')
     @mock.patch.object(api_utils, 'is_authenticated')
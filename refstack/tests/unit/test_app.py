@@ -177,6 +177,7 @@ class SetupAppTestCase(base.BaseTestCase):
         self.config_fixture = config_fixture.Config()
         self.CONF = self.useFixture(self.config_fixture).conf
 
+    @mock.patch('refstack.api.compliance.start_background_check')
     @mock.patch('pecan.hooks')
     @mock.patch.object(app, 'JSONErrorHook')
     @mock.patch.object(app, 'CORSHook')
@@ -185,7 +186,8 @@ class SetupAppTestCase(base.BaseTestCase):
     @mock.patch('refstack.api.app.SessionMiddleware')
     @mock.patch('refstack.api.utils.get_token', return_value='42')
     def test_setup_app(self, get_token, session_middleware, make_app, os_join,
-                       json_error_hook, cors_hook, pecan_hooks):
+                       json_error_hook, cors_hook, pecan_hooks,
+                       start_background_check):
 
         self.CONF.set_override('app_dev_mode',
                                True,
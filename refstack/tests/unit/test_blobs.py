@@ -0,0 +1,73 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for content-addressed blob store."""
+
+import gzip
+import hashlib
+import os
+
+import fixtures
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+from refstack.api import blobs
+
+
+class BlobsTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(BlobsTestCase, self).setUp()
+        self.path = self.useFixture(fixtures.TempDir()).path
+        self.CONF = self.useFixture(config_fixture.Config()).conf
+        self.CONF.set_override('blob_dir', self.path, 'api')
+        self.addCleanup(setattr, blobs, '_backend', None)
+        blobs._backend = None
+
+    def test_put(self):
+        data = b'{"results": []}' * 100
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertEqual(digest, blobs.put(data))
+        file_name = os.path.join(self.path, digest[:2], digest[2:4],
+                                 digest + '.gz')
+        self.assertLess(os.path.getsize(file_name), len(data))
+        with gzip.open(file_name, 'rb') as blob_file:
+            self.assertEqual(data, blob_file.read())
+
+        # Equal blobs are stored once.
+        mtime = os.path.getmtime(file_name)
+        self.assertEqual(digest, blobs.put(data.decode('utf-8')))
+        self.assertEqual(mtime, os.path.getmtime(file_name))
+        self.assertTrue(blobs.get_backend().exists(digest))
+
+    def test_iter_blob(self):
+        data = os.urandom(1000)
+        digest = blobs.put(data)
+        chunks = list(blobs.iter_blob(digest, chunk_size=300))
+        self.assertEqual([300, 300, 300, 100],
+                         [len(chunk) for chunk in chunks])
+        self.assertEqual(data, b''.join(chunks))
+
+    def test_iter_blob_not_found(self):
+        self.assertRaises(blobs.BlobNotFound, blobs.iter_blob, 'a' * 64)
+        self.assertRaises(blobs.BlobNotFound, blobs.iter_blob, '../../etc')
+
+    def test_get_backend(self):
+        self.assertIsInstance(blobs.get_backend(), blobs.FileBackend)
+        self.assertIs(blobs.get_backend(), blobs.get_backend())
+
+        blobs._backend = None
+        self.CONF.set_override('blob_backend', 'fake', 'api')
+        self.assertRaises(ValueError, blobs.get_backend)
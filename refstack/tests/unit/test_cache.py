@@ -0,0 +1,166 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for server-side cache."""
+
+import os
+
+import fixtures
+import mock
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+from refstack.api import cache
+
+
+class LRUDictTestCase(base.BaseTestCase):
+
+    def test_lru(self):
+        lru = cache.LRUDict(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        self.assertEqual(1, lru.get('a'))
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(1, lru.get('a'))
+        self.assertEqual(3, lru.get('c'))
+        self.assertEqual(2, len(lru))
+        self.assertEqual([1, 3], lru.values())
+        lru.delete('a')
+        self.assertEqual('default', lru.get('a', 'default'))
+        lru.clear()
+        self.assertEqual(0, len(lru))
+
+
+class CacheTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(CacheTestCase, self).setUp()
+        self.config_fixture = config_fixture.Config()
+        self.CONF = self.useFixture(self.config_fixture).conf
+        self.cache_dir = self.useFixture(fixtures.TempDir()).path
+        self.CONF.set_override('cache_dir', self.cache_dir, 'api')
+
+    def test_memory_cache(self):
+        test_cache = cache.Cache('fake')
+        self.assertIsNone(test_cache.get('key'))
+        test_cache.set('key', {'foo': 'bar'}, version=1)
+        self.assertEqual({'foo': 'bar'}, test_cache.get('key', version=1))
+        self.assertIsNone(test_cache.get('key', version=2))
+        test_cache.delete('key')
+        self.assertIsNone(test_cache.get('key', version=1))
+        self.assertEqual({'hits': 1, 'misses': 3, 'hit_rate': 0.25,
+                          'size': 0}, test_cache.stats())
+
+    def test_file_cache(self):
+        self.CONF.set_override('cache_backend', 'file', 'api')
+        writer = cache.Cache('fake')
+        reader = cache.Cache('fake')
+        writer.set('key', {'foo': 'bar'}, version=1)
+        self.assertEqual({'foo': 'bar'}, reader.get('key', version=1))
+
+        writer.set('key', {'foo': 'baz'}, version=2)
+        self.assertEqual({'foo': 'baz'}, reader.get('key', version=2))
+
+        writer.delete('key')
+        reader.clear()
+        self.assertIsNone(reader.get('key', version=2))
+
+    def test_file_cache_size(self):
+        self.CONF.set_override('cache_backend', 'file', 'api')
+        self.CONF.set_override('cache_size', 2, 'api')
+        test_cache = cache.Cache('fake')
+        path = os.path.join(self.cache_dir, 'fake')
+        for mtime, key in enumerate(('a', 'b', 'c')):
+            test_cache.set(key, key)
+            os.utime(test_cache.backend._get_file_name(key), (mtime, mtime))
+        test_cache.bump_generation()
+        self.assertEqual(3, len(os.listdir(path)))
+        test_cache.set('d', 'd')
+        # Generation file is not an entry.
+        self.assertEqual(3, len(os.listdir(path)))
+        test_cache.clear()
+        self.assertIsNone(test_cache.get('a'))
+        self.assertIsNone(test_cache.get('b'))
+        self.assertEqual('c', test_cache.get('c'))
+        self.assertEqual('d', test_cache.get('d'))
+
+    @mock.patch('time.time')
+    def test_file_cache_stale(self, mock_time):
+        self.CONF.set_override('cache_backend', 'file', 'api')
+        mock_time.return_value = 1000
+        test_cache = cache.Cache('fake')
+        test_cache.set('old', 'value', version=1)
+        test_cache.set('expired', 'value', ttl=10)
+        test_cache.clear()
+        mock_time.return_value = 1010
+        self.assertIsNone(test_cache.get('old', version=2))
+        self.assertIsNone(test_cache.get('expired'))
+        self.assertEqual([], os.listdir(os.path.join(self.cache_dir,
+                                                     'fake')))
+
+    @mock.patch('time.time')
+    def test_ttl(self, mock_time):
+        mock_time.return_value = 1000
+        test_cache = cache.Cache('fake')
+        test_cache.set('key', 'value', ttl=10)
+        mock_time.return_value = 1009
+        self.assertEqual('value', test_cache.get('key'))
+        mock_time.return_value = 1010
+        self.assertIsNone(test_cache.get('key'))
+
+    def test_memory_generation(self):
+        writer = cache.Cache('fake')
+        reader = cache.Cache('fake')
+        self.assertEqual(0, reader.get_generation())
+        reader.set('key', 'value', version=reader.get_generation())
+        writer.bump_generation()
+        self.assertEqual(2, writer.bump_generation())
+        # Workers share generation even if they share no entries.
+        self.assertEqual(2, reader.get_generation())
+        self.assertIsNone(reader.get('key', version=reader.get_generation()))
+
+    def test_file_generation(self):
+        self.CONF.set_override('cache_backend', 'file', 'api')
+        writer = cache.Cache('fake')
+        reader = cache.Cache('fake')
+        self.assertEqual(0, reader.get_generation())
+        writer.bump_generation()
+        self.assertEqual(2, writer.bump_generation())
+        self.assertEqual(2, reader.get_generation())
+
+    def test_generation_unavailable(self):
+        self.CONF.set_override('cache_dir',
+                               os.path.join(self.cache_dir, 'file'), 'api')
+        open(os.path.join(self.cache_dir, 'file'), 'w').close()
+        test_cache = cache.Cache('fake')
+        self.assertIsNone(test_cache.bump_generation())
+        self.assertEqual(0, test_cache.get_generation())
+
+    def test_invalid_backend(self):
+        self.CONF.set_override('cache_backend', 'fake', 'api')
+        self.assertRaises(ValueError, cache.Cache('fake').get, 'key')
+
+    def test_get_cache(self):
+        self.assertIs(cache.get_cache('fake'), cache.get_cache('fake'))
+        self.assertIsNot(cache.get_cache('fake'), cache.get_cache('other'))
+
+    def test_set_stats_headers(self):
+        test_cache = mock.Mock()
+        test_cache.stats.return_value = {'hit_rate': 0.5}
+        response = mock.Mock(headers={})
+        cache.set_stats_headers(response, test_cache, hit=True)
+        self.assertEqual({'X-Cache': 'HIT', 'X-Cache-Hit-Rate': '0.500'},
+                         response.headers)
@@ -0,0 +1,144 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for compliance evaluation of test runs."""
+
+import os
+
+import fixtures
+import mock
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+from refstack.api import compliance
+from refstack.api import exceptions as api_exc
+
+GUIDELINE = {
+    'schema': '1.2',
+    'platform': {'required': ['compute']},
+    'components': {'compute': {'required': ['compute-servers']}},
+    'capabilities': {
+        'compute-servers': {'tests': ['test_a', 'test_b'],
+                            'flagged': ['test_b']}}}
+
+
+class ComplianceTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(ComplianceTestCase, self).setUp()
+        patcher = mock.patch('refstack.api.guidelines.get_guideline')
+        self.mock_get_guideline = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_get_guideline.return_value = GUIDELINE
+        patcher = mock.patch.object(compliance.listing_cache,
+                                    'bump_generation')
+        self.mock_bump_generation = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_evaluate(self):
+        records = compliance.evaluate(GUIDELINE, '2015.07', ['test_a'])
+        self.assertEqual(
+            [{'guideline': '2015.07', 'target': 'compute',
+              'required_pass_percent': 50.0,
+              'non_flag_pass_percent': 100.0, 'passed': True},
+             {'guideline': '2015.07', 'target': 'platform',
+              'required_pass_percent': 50.0,
+              'non_flag_pass_percent': 100.0, 'passed': True}],
+            records)
+
+        records = compliance.evaluate(GUIDELINE, '2015.07', ['test_b'])
+        self.assertFalse(records[0]['passed'])
+        self.assertEqual(0.0, records[0]['non_flag_pass_percent'])
+
+    def test_evaluate_without_required_tests(self):
+        guideline = dict(GUIDELINE, components={
+            'compute': {'required': ['compute-servers']},
+            'object': {'required': []}})
+        records = compliance.evaluate(guideline, '2015.07', ['test_a'])
+        record = [record for record in records
+                  if record['target'] == 'object'][0]
+        # Compliance is not applicable rather than passed.
+        self.assertIsNone(record['passed'])
+        self.assertIsNone(record['required_pass_percent'])
+
+    @mock.patch('refstack.db.save_test_compliance')
+    @mock.patch('refstack.db.get_test_results')
+    @mock.patch('refstack.api.guidelines.list_guidelines')
+    def test_evaluate_test(self, mock_list_guidelines, mock_get_test_results,
+                           mock_save_test_compliance):
+        mock_list_guidelines.return_value = ['2015.04', '2015.07']
+        mock_get_test_results.return_value = [{'name': 'test_a'}]
+        self.mock_get_guideline.side_effect = [
+            api_exc.GuidelineUnavailable(404), GUIDELINE]
+
+        records = compliance.evaluate_test('fake_id')
+        self.assertEqual(['2015.07', '2015.07'],
+                         [record['guideline'] for record in records])
+        mock_get_test_results.assert_called_once_with('fake_id')
+        mock_save_test_compliance.assert_called_once_with('fake_id', records)
+
+        mock_list_guidelines.side_effect = api_exc.GuidelineUnavailable(500)
+        self.assertEqual([], compliance.evaluate_test('fake_id'))
+        self.assertEqual(1, mock_save_test_compliance.call_count)
+
+    @mock.patch.object(compliance, 'evaluate_test')
+    @mock.patch('refstack.db.get_test_ids_without_compliance')
+    @mock.patch('refstack.api.guidelines.list_guidelines')
+    def test_evaluate_new_guidelines(self, mock_list_guidelines,
+                                     mock_get_test_ids, mock_evaluate_test):
+        mock_list_guidelines.return_value = ['2015.04', '2015.07']
+        self.mock_get_guideline.side_effect = [ValueError(), GUIDELINE]
+        mock_get_test_ids.side_effect = [['id1', 'id2'], []]
+        compliance.evaluate_new_guidelines()
+        mock_get_test_ids.assert_called_with('2015.07', compliance.BATCH_SIZE)
+        self.assertEqual([mock.call('id1', versions=['2015.07']),
+                          mock.call('id2', versions=['2015.07'])],
+                         mock_evaluate_test.call_args_list)
+        # Listing pages are invalidated once per batch.
+        self.mock_bump_generation.assert_called_once_with()
+
+    @mock.patch.object(compliance, 'evaluate_test', return_value=[])
+    @mock.patch('refstack.db.get_test_ids_without_compliance')
+    @mock.patch('refstack.api.guidelines.list_guidelines')
+    def test_evaluate_new_guidelines_unavailable(self, mock_list_guidelines,
+                                                 mock_get_test_ids,
+                                                 mock_evaluate_test):
+        mock_list_guidelines.return_value = ['2015.07']
+        mock_get_test_ids.return_value = ['id1', 'id2']
+        compliance.evaluate_new_guidelines()
+        mock_evaluate_test.assert_called_once_with('id1',
+                                                   versions=['2015.07'])
+        self.mock_bump_generation.assert_called_once_with()
+
+    def test_lock_checks(self):
+        conf = self.useFixture(config_fixture.Config()).conf
+        path = self.useFixture(fixtures.TempDir()).path
+        conf.set_override('compliance_check_lock_file',
+                          os.path.join(path, 'compliance.lock'), 'api')
+        lock_file = compliance._lock_checks()
+        self.assertIsNotNone(lock_file)
+        self.addCleanup(lock_file.close)
+        # Lock is held by another open file, as by another worker.
+        self.assertIsNone(compliance._lock_checks())
+
+        lock_file.close()
+        lock_file = compliance._lock_checks()
+        self.assertIsNotNone(lock_file)
+        lock_file.close()
+
+        conf.set_override('compliance_check_lock_file',
+                          os.path.join(path, 'missing', 'compliance.lock'),
+                          'api')
+        self.assertIsNone(compliance._lock_checks())
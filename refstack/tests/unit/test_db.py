@@ -16,15 +16,19 @@
 """Tests for database."""
 
 import base64
+import collections
+import datetime
 import hashlib
 import six
 import mock
 from oslo_config import fixture as config_fixture
+from oslo_db import exception as db_exc
 from oslotest import base
 import sqlalchemy.orm
 
 from refstack import db
 from refstack.api import constants as api_const
+from refstack.api import outcomes
 from refstack.db.sqlalchemy import api
 from refstack.db.sqlalchemy import models
 
@@ -37,6 +41,21 @@ class DBAPITestCase(base.BaseTestCase):
         db.store_results('fake_results')
         mock_store_results.assert_called_once_with('fake_results')
 
+    @mock.patch.object(api, 'get_changes')
+    def test_get_changes(self, mock_get_changes):
+        db.get_changes(10, 100, 'until')
+        mock_get_changes.assert_called_once_with(10, 100, 'until')
+
+    @mock.patch.object(api, 'store_results_batch')
+    def test_store_results_batch(self, mock_store_results_batch):
+        db.store_results_batch(['fake_run'])
+        mock_store_results_batch.assert_called_once_with(['fake_run'])
+
+    @mock.patch.object(api, 'reset_engine')
+    def test_reset_engine(self, mock_reset_engine):
+        db.reset_engine()
+        mock_reset_engine.assert_called_once_with()
+
     @mock.patch.object(api, 'get_test')
     def test_get_test(self, mock_get_test):
         db.get_test(12345)
@@ -45,13 +64,117 @@ class DBAPITestCase(base.BaseTestCase):
     @mock.patch.object(api, 'get_test_results')
     def test_get_test_results(self, mock_get_test_results):
         db.get_test_results(12345)
-        mock_get_test_results.assert_called_once_with(12345)
+        mock_get_test_results.assert_called_once_with(12345, None)
+
+    @mock.patch.object(api, 'get_results_of_tests')
+    def test_get_results_of_tests(self, mock_get_results_of_tests):
+        db.get_results_of_tests(['id1', 'id2'])
+        mock_get_results_of_tests.assert_called_once_with(['id1', 'id2'])
+
+    @mock.patch.object(api, 'iter_test_records')
+    def test_iter_test_records(self, mock_iter_test_records):
+        db.iter_test_records({}, ('date', 'id'), True, 10)
+        mock_iter_test_records.assert_called_once_with(
+            {}, ('date', 'id'), True, 10)
+
+    @mock.patch.object(api, 'get_latest_test_ids')
+    def test_get_latest_test_ids(self, mock_get_latest_test_ids):
+        db.get_latest_test_ids({})
+        mock_get_latest_test_ids.assert_called_once_with({})
+
+    @mock.patch.object(api, 'save_test_signature')
+    def test_save_test_signature(self, mock_save_test_signature):
+        db.save_test_signature('id', [1, 2], ['bucket'])
+        mock_save_test_signature.assert_called_once_with(
+            'id', [1, 2], ['bucket'])
+
+    @mock.patch.object(api, 'get_test_signature')
+    def test_get_test_signature(self, mock_get_test_signature):
+        db.get_test_signature('id')
+        mock_get_test_signature.assert_called_once_with('id')
+
+    @mock.patch.object(api, 'get_similar_test_candidates')
+    def test_get_similar_test_candidates(self, mock_get_candidates):
+        db.get_similar_test_candidates('id', ['bucket'], {}, 10)
+        mock_get_candidates.assert_called_once_with('id', ['bucket'], {}, 10)
+
+    @mock.patch.object(api, 'get_test_ids_without_signature')
+    def test_get_test_ids_without_signature(self, mock_get_test_ids):
+        db.get_test_ids_without_signature(10)
+        mock_get_test_ids.assert_called_once_with(10)
+
+    @mock.patch.object(api, 'rebuild_upload_rollups')
+    def test_rebuild_upload_rollups(self, mock_rebuild_upload_rollups):
+        db.rebuild_upload_rollups()
+        mock_rebuild_upload_rollups.assert_called_once_with()
+
+    @mock.patch.object(api, 'get_upload_activity')
+    def test_get_upload_activity(self, mock_get_upload_activity):
+        db.get_upload_activity('day', 'start', 'end', 'cpid')
+        mock_get_upload_activity.assert_called_once_with(
+            'day', 'start', 'end', 'cpid')
+
+    @mock.patch.object(api, 'get_cloud_trend')
+    def test_get_cloud_trend(self, mock_get_cloud_trend):
+        db.get_cloud_trend('cpid', {}, '2015.07', 'platform')
+        mock_get_cloud_trend.assert_called_once_with(
+            'cpid', {}, '2015.07', 'platform')
+
+    @mock.patch.object(api, 'get_latest_test_records')
+    def test_get_latest_test_records(self, mock_get_latest_test_records):
+        db.get_latest_test_records(1, 20, {})
+        mock_get_latest_test_records.assert_called_once_with(1, 20, {})
+
+    @mock.patch.object(api, 'get_latest_test_records_count')
+    def test_get_latest_test_records_count(self, mock_get_count):
+        db.get_latest_test_records_count({})
+        mock_get_count.assert_called_once_with({})
+
+    @mock.patch.object(api, 'get_test_pass_rates')
+    def test_get_test_pass_rates(self, mock_get_test_pass_rates):
+        db.get_test_pass_rates()
+        mock_get_test_pass_rates.assert_called_once_with()
+
+    @mock.patch.object(api, 'get_population')
+    def test_get_population(self, mock_get_population):
+        db.get_population()
+        mock_get_population.assert_called_once_with()
+
+    @mock.patch.object(api, 'rebuild_test_pass_rates')
+    def test_rebuild_test_pass_rates(self, mock_rebuild_test_pass_rates):
+        db.rebuild_test_pass_rates()
+        mock_rebuild_test_pass_rates.assert_called_once_with()
+
+    @mock.patch.object(api, 'save_test_compliance')
+    def test_save_test_compliance(self, mock_save_test_compliance):
+        db.save_test_compliance(12345, [])
+        mock_save_test_compliance.assert_called_once_with(12345, [])
+
+    @mock.patch.object(api, 'get_test_compliance')
+    def test_get_test_compliance(self, mock_get_test_compliance):
+        db.get_test_compliance(12345)
+        mock_get_test_compliance.assert_called_once_with(12345)
+
+    @mock.patch.object(api, 'get_test_ids_without_compliance')
+    def test_get_test_ids_without_compliance(self, mock_db):
+        db.get_test_ids_without_compliance('2015.07', 10)
+        mock_db.assert_called_once_with('2015.07', 10)
 
     @mock.patch.object(api, 'get_test_records')
     def test_get_test_records(self, mock_db):
         filters = mock.Mock()
         db.get_test_records(1, 2, filters)
-        mock_db.assert_called_once_with(1, 2, filters)
+        mock_db.assert_called_once_with(1, 2, filters, None)
+
+    @mock.patch.object(api, 'get_test_fields')
+    def test_get_test_fields(self, mock_db):
+        db.get_test_fields('id', ['created_at'])
+        mock_db.assert_called_once_with('id', ['created_at'])
+
+    @mock.patch.object(api, 'get_test_fields_of_tests')
+    def test_get_test_fields_of_tests(self, mock_db):
+        db.get_test_fields_of_tests(['id'], ['created_at'])
+        mock_db.assert_called_once_with(['id'], ['created_at'])
 
     @mock.patch.object(api, 'get_test_records_count')
     def test_get_test_records_count(self, mock_db):
@@ -177,7 +300,15 @@ class DBBackendTestCase(base.BaseTestCase):
         test_result = mock_test_result.return_value
         test_result.save = mock.Mock()
 
-        test_id = api.store_results(fake_tests_result)
+        with mock.patch.object(api, '_update_test_pass_counts') as mock_upd, \
+                mock.patch.object(api, '_refresh_latest_runs') as mock_ref, \
+                mock.patch.object(api, '_update_upload_rollups') as mock_rol:
+            test_id = api.store_results(fake_tests_result)
+        mock_rol.assert_called_once_with(session, 'foo', test.created_at,
+                                         False, 1)
+        mock_upd.assert_called_once_with(
+            session, 'foo', ['tempest.some.test', 'tempest.test'], 1)
+        mock_ref.assert_called_once_with(session, 'foo', [])
 
         mock_test.assert_called_once_with()
         mock_get_session.assert_called_once_with()
@@ -188,9 +319,332 @@ class DBBackendTestCase(base.BaseTestCase):
         self.assertEqual(test.cpid, fake_tests_result['cpid'])
         self.assertEqual(test.duration_seconds,
                          fake_tests_result['duration_seconds'])
+        self.assertEqual(2, test.passed_count)
+        self.assertIsNone(test.upload_digest)
         self.assertEqual(mock_test_result.call_count,
                          len(fake_tests_result['results']))
 
+    @mock.patch.object(api, '_update_upload_rollups')
+    @mock.patch.object(api, '_refresh_latest_runs')
+    @mock.patch.object(api, '_update_test_pass_counts')
+    @mock.patch.object(api, '_get_test_name_ids')
+    @mock.patch.object(api, 'get_session')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_store_results_with_outcomes(self, mock_models, mock_get_session,
+                                         mock_get_test_name_ids,
+                                         mock_update_test_pass_counts,
+                                         mock_refresh_latest_runs,
+                                         mock_update_upload_rollups):
+        results = [{'name': 'test_b', 'status': 'fail', 'duration': 2.5},
+                   {'name': 'test_a', 'duration': 1.5},
+                   {'name': 'test_c', 'status': 'skip'}]
+        mock_get_test_name_ids.return_value = {'test_a': 7, 'test_b': 3,
+                                               'test_c': 5}
+        session = mock_get_session.return_value
+        api.store_results({'cpid': 'foo', 'duration_seconds': 10,
+                           'results': results})
+        test = mock_models.Test.return_value
+        self.assertEqual(1, test.passed_count)
+        mock_models.TestResults.assert_called_once_with()
+        self.assertEqual('test_a', mock_models.TestResults.return_value.name)
+        mock_update_test_pass_counts.assert_called_once_with(
+            session, 'foo', ['test_a'], 1)
+
+        test_outcomes = mock_models.TestOutcomes.return_value
+        session.add.assert_any_call(test_outcomes)
+        self.assertEqual(
+            [(3, 'fail', 2.5), (5, 'skip', None), (7, 'pass', 1.5)],
+            outcomes.decode(test_outcomes.name_ids, test_outcomes.statuses,
+                            test_outcomes.durations))
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_test_name_ids(self, mock_get_session, mock_models):
+        session = mock_get_session.return_value
+        mock_models.TestName.__table__ = mock.Mock()
+        query = session.query.return_value
+        query.filter.side_effect = [[('test_a', 1)], [('test_b', 2)]]
+        self.assertEqual({'test_a': 1, 'test_b': 2},
+                         api._get_test_name_ids(['test_a', 'test_b']))
+        session.execute.assert_called_once_with(
+            mock_models.TestName.__table__.insert.return_value,
+            [{'name': 'test_b'}])
+
+        # Names are read again after they are added by concurrent upload.
+        session.execute.reset_mock()
+        session.execute.side_effect = [db_exc.DBDuplicateEntry(), None]
+        query.filter.side_effect = [[('test_a', 1)], [('test_a', 1)],
+                                    [('test_b', 2)]]
+        self.assertEqual({'test_a': 1, 'test_b': 2},
+                         api._get_test_name_ids(['test_a', 'test_b']))
+        self.assertEqual(2, session.execute.call_count)
+        self.assertEqual({}, api._get_test_name_ids([]))
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_update_test_pass_counts_upload(self, mock_models):
+        session = mock.Mock()
+        cloud_counts = mock_models.TestCloudPassCount
+        rates = mock_models.TestPassRate
+        counts_query = mock.Mock()
+        counts_query.filter_by.return_value.filter.return_value = [
+            ('test_a', 2)]
+        rates_query = mock.Mock()
+        rates_query.filter.return_value = [('test_a',), ('test_b',)]
+        session.query = mock.Mock(side_effect=lambda *args: {
+            (cloud_counts.name, cloud_counts.pass_count): counts_query,
+            (rates.name,): rates_query,
+        }.get(args, mock.MagicMock()))
+
+        api._update_test_pass_counts(
+            session, 'cpid', ['test_a', 'test_b', 'test_c'], 1)
+
+        cloud_counts.assert_has_calls(
+            [mock.call(name='test_b', cpid='cpid', pass_count=1),
+             mock.call(name='test_c', cpid='cpid', pass_count=1)],
+            any_order=True)
+        rates.assert_called_once_with(name='test_c', pass_count=1,
+                                      cpid_count=1)
+        self.assertEqual(3, session.add.call_count)
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_update_test_pass_counts_delete(self, mock_models):
+        session = mock.Mock()
+        cloud_counts = mock_models.TestCloudPassCount
+        rates = mock_models.TestPassRate
+        counts_query = mock.Mock()
+        counts_query.filter_by.return_value.filter.return_value = [
+            ('test_a', 2), ('test_b', 1)]
+        rates_query = mock.Mock()
+        rates_query.filter.return_value = [('test_a',), ('test_b',)]
+        rates.pass_count.__le__ = mock.Mock(return_value='fake_clause')
+        deleted_query = mock.MagicMock()
+        session.query = mock.Mock(side_effect=lambda *args: {
+            (cloud_counts.name, cloud_counts.pass_count): counts_query,
+            (rates.name,): rates_query,
+        }.get(args, deleted_query))
+
+        api._update_test_pass_counts(
+            session, 'cpid', ['test_a', 'test_b', 'test_c'], -1)
+
+        self.assertFalse(session.add.called)
+        cloud_counts.name.in_.assert_any_call(set(['test_b']))
+        cloud_counts.name.in_.assert_any_call(set(['test_a']))
+        rates.name.in_.assert_any_call(set(['test_a', 'test_b']))
+        rates.name.in_.assert_any_call(set(['test_b']))
+        deleted_query.filter.return_value.filter.assert_called_with(
+            'fake_clause')
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_update_test_pass_counts_delete_missing(self, mock_models):
+        session = mock.MagicMock()
+        cloud_counts = mock_models.TestCloudPassCount
+        rates = mock_models.TestPassRate
+        counts_query = mock.Mock()
+        counts_query.filter_by.return_value.filter.return_value = [
+            ('test_a', 2)]
+        rates_query = mock.Mock()
+        rates_query.filter.return_value = []
+        rates.pass_count.__le__ = mock.Mock(return_value='fake_clause')
+        session.query = mock.Mock(side_effect=lambda *args: {
+            (cloud_counts.name, cloud_counts.pass_count): counts_query,
+            (rates.name,): rates_query,
+        }.get(args, mock.MagicMock()))
+
+        # Tests without pass rates are not counted as passed.
+        api._update_test_pass_counts(session, 'cpid', ['test_a'], -1)
+        self.assertFalse(session.add.called)
+        self.assertFalse(rates.called)
+
+    @mock.patch.object(api, '_store_results')
+    @mock.patch.object(api, '_get_test_name_ids')
+    def test_store_results_retry(self, mock_get_test_name_ids,
+                                 mock_store_results):
+        mock_store_results.side_effect = [db_exc.DBDuplicateEntry(), 'id1']
+        results = {'results': [{'name': 'test_a'}]}
+        self.assertEqual('id1', api.store_results(results))
+        mock_store_results.assert_called_with(results, [{'name': 'test_a'}],
+                                              None)
+        self.assertEqual(2, mock_store_results.call_count)
+        self.assertFalse(mock_get_test_name_ids.called)
+
+    @mock.patch.object(api, '_delete_test')
+    def test_delete_test_retry(self, mock_delete_test):
+        mock_delete_test.side_effect = [db_exc.DBDeadlock(), None]
+        api.delete_test('id1')
+        self.assertEqual(2, mock_delete_test.call_count)
+
+        mock_delete_test.side_effect = api.NotFound()
+        self.assertRaises(api.NotFound, api.delete_test, 'id1')
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_save_test_signature(self, mock_get_session, mock_models):
+        session = mock_get_session.return_value
+        api.save_test_signature('id', [1, 2], ['b1', 'b2'])
+        session.begin.assert_called_once_with()
+        self.assertEqual(2, session.query.return_value.filter_by
+                         .return_value.delete.call_count)
+        mock_models.TestSignature.assert_called_once_with(
+            test_id='id', signature='1,2')
+        mock_models.TestSignatureBucket.assert_has_calls([
+            mock.call(test_id='id', bucket='b1'),
+            mock.call(test_id='id', bucket='b2')])
+        self.assertEqual(3, session.add.call_count)
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_test_signature(self, mock_get_session, mock_models):
+        scalar = mock_get_session.return_value.query.return_value\
+            .filter_by.return_value.scalar
+        scalar.return_value = '1,2'
+        self.assertEqual([1, 2], api.get_test_signature('id'))
+        scalar.return_value = ''
+        self.assertEqual([], api.get_test_signature('id'))
+        scalar.return_value = None
+        self.assertIsNone(api.get_test_signature('id'))
+
+    @mock.patch.object(api, '_apply_filters_for_query')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_similar_test_candidates(self, mock_get_session,
+                                         mock_models, mock_apply):
+        session = mock_get_session.return_value
+        shared = session.query.return_value.filter.return_value\
+            .filter.return_value.group_by.return_value.subquery.return_value
+        query = mock_apply.return_value.join.return_value.order_by\
+            .return_value
+        query.limit.return_value = [('id2', 'date', '3,4')]
+        self.assertEqual(
+            [{'id': 'id2', 'created_at': 'date', 'signature': [3, 4]}],
+            api.get_similar_test_candidates('id1', ['b1'], {}, 10))
+        mock_models.TestSignatureBucket.bucket.in_.assert_called_once_with(
+            ['b1'])
+        session.query.return_value.filter.return_value.filter.return_value\
+            .group_by.assert_called_once_with(
+                mock_models.TestSignatureBucket.test_id)
+        mock_apply.return_value.join.return_value.order_by\
+            .assert_called_once_with(shared.c.shared_count.desc.return_value,
+                                     mock_models.Test.id)
+        query.limit.assert_called_once_with(10)
+
+    def test_get_bucket(self):
+        created_at = datetime.datetime(2015, 8, 20, 13, 45, 10)
+        self.assertEqual(datetime.datetime(2015, 8, 20, 13),
+                         api._get_bucket(created_at, api_const.PERIOD_HOUR))
+        self.assertEqual(datetime.datetime(2015, 8, 20),
+                         api._get_bucket(created_at, api_const.PERIOD_DAY))
+        self.assertEqual(datetime.datetime(2015, 8, 17),
+                         api._get_bucket(created_at, api_const.PERIOD_WEEK))
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_update_upload_rollups(self, mock_models):
+        session = mock.Mock()
+        rollups = mock_models.UploadRollup
+        session.query.return_value.filter_by.return_value.update\
+            .side_effect = [1, 0]
+        created_at = datetime.datetime(2015, 8, 20, 13, 45)
+
+        api._update_upload_rollups(session, 'cpid', created_at, True, 1)
+
+        session.query.return_value.filter_by.assert_has_calls([
+            mock.call(period=api_const.PERIOD_HOUR, cpid='cpid',
+                      bucket=datetime.datetime(2015, 8, 20, 13),
+                      signed=True),
+            mock.call(period=api_const.PERIOD_DAY, cpid='cpid',
+                      bucket=datetime.datetime(2015, 8, 20), signed=True)],
+            any_order=True)
+        rollups.assert_called_once_with(
+            period=api_const.PERIOD_DAY, cpid='cpid',
+            bucket=datetime.datetime(2015, 8, 20), signed=True, count=1)
+        self.assertEqual(1, session.add.call_count)
+
+        session.reset_mock()
+        session.query.return_value.filter_by.return_value.update\
+            .side_effect = None
+        session.query.return_value.filter_by.return_value.update\
+            .return_value = 0
+        api._update_upload_rollups(session, 'cpid', created_at, True, -1)
+        self.assertFalse(session.add.called)
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_upload_activity(self, mock_get_session, mock_models):
+        session = mock_get_session.return_value
+        bucket = mock_models.UploadRollup.bucket
+        bucket.__ge__ = mock.Mock(return_value='fake_clause')
+        bucket.__le__ = mock.Mock(return_value='fake_clause')
+        query = session.query.return_value.filter_by.return_value\
+            .filter.return_value.filter.return_value
+        query.group_by.return_value.__iter__.return_value = [
+            (datetime.datetime(2015, 8, 17), True, 2),
+            (datetime.datetime(2015, 8, 18), False, 1),
+            (datetime.datetime(2015, 8, 25), False, 4)]
+
+        activity = api.get_upload_activity(
+            api_const.PERIOD_WEEK, datetime.datetime(2015, 8, 19),
+            datetime.datetime(2015, 8, 31, 12))
+
+        self.assertEqual(
+            [{'bucket': datetime.datetime(2015, 8, 17), 'signed': 2,
+              'unsigned': 1},
+             {'bucket': datetime.datetime(2015, 8, 24), 'signed': 0,
+              'unsigned': 4},
+             {'bucket': datetime.datetime(2015, 8, 31), 'signed': 0,
+              'unsigned': 0}],
+            activity)
+        session.query.return_value.filter_by.assert_called_once_with(
+            period=api_const.PERIOD_DAY)
+        query.group_by.assert_called_once_with(
+            mock_models.UploadRollup.bucket, mock_models.UploadRollup.signed)
+
+        # Rollups of a single cloud are filtered by its id.
+        query.filter_by.return_value.group_by.return_value\
+            .__iter__.return_value = []
+        api.get_upload_activity(
+            api_const.PERIOD_DAY, datetime.datetime(2015, 8, 19),
+            datetime.datetime(2015, 8, 20), 'fake_cpid')
+        query.filter_by.assert_called_once_with(cpid='fake_cpid')
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_rebuild_upload_rollups(self, mock_get_session, mock_models):
+        session = mock_get_session.return_value
+        session.query.return_value.outerjoin.return_value.yield_per\
+            .return_value = [
+                ('cpid1', datetime.datetime(2015, 8, 20, 13, 5), None),
+                ('cpid1', datetime.datetime(2015, 8, 20, 13, 50), 'id2'),
+                ('cpid2', datetime.datetime(2015, 8, 20, 14, 5), None)]
+        self.assertEqual(3, api.rebuild_upload_rollups())
+        session.begin.assert_called_once_with()
+        session.query.return_value.delete.assert_called_once_with()
+        mock_models.UploadRollup.assert_any_call(
+            period=api_const.PERIOD_DAY, cpid='cpid1',
+            bucket=datetime.datetime(2015, 8, 20), signed=False, count=1)
+        mock_models.UploadRollup.assert_any_call(
+            period=api_const.PERIOD_HOUR, cpid='cpid1',
+            bucket=datetime.datetime(2015, 8, 20, 13), signed=True,
+            count=1)
+        # Hourly and daily rollups of two clouds.
+        self.assertEqual(6, session.add.call_count)
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_rebuild_test_pass_rates(self, mock_get_session, mock_models):
+        session = mock_get_session.return_value
+        session.query.return_value.join.return_value\
+            .group_by.return_value = [('test_a', 'cpid1', 2),
+                                      ('test_a', 'cpid2', 1),
+                                      ('test_b', 'cpid1', 1)]
+        self.assertEqual(2, api.rebuild_test_pass_rates())
+        session.begin.assert_called_once_with()
+        self.assertEqual(2, session.query.return_value.delete.call_count)
+        mock_models.TestPassRate.assert_has_calls(
+            [mock.call(name='test_a', pass_count=3, cpid_count=2),
+             mock.call(name='test_b', pass_count=1, cpid_count=1)],
+            any_order=True)
+        self.assertEqual(3, mock_models.TestCloudPassCount.call_count)
+        self.assertEqual(5, session.add.call_count)
+
     @mock.patch.object(api, 'get_session')
     @mock.patch('refstack.db.sqlalchemy.models.Test')
     @mock.patch.object(api, '_to_dict', side_effect=lambda x, *args: x)
@@ -219,17 +673,81 @@ class DBBackendTestCase(base.BaseTestCase):
 
     @mock.patch('refstack.db.sqlalchemy.api.models')
     @mock.patch.object(api, 'get_session')
-    def test_delete_test(self, mock_get_session, mock_models):
+    @mock.patch.object(api, '_to_dict', side_effect=lambda x: x)
+    def test_get_test_version(self, mock_to_dict, mock_get_session,
+                              mock_models):
+        session = mock_get_session.return_value
+        query = session.query.return_value
+        version = query.filter_by.return_value.first.return_value
+        self.assertEqual(version, db.get_test_version('fake_id'))
+        session.query.assert_called_once_with(mock_models.Test.id,
+                                              mock_models.Test.meta_version,
+                                              mock_models.Test.created_at,
+                                              mock_models.Test.updated_at)
+        query.filter_by.assert_called_once_with(id='fake_id')
+
+        query.filter_by.return_value.first.return_value = None
+        self.assertRaises(db.NotFound, db.get_test_version, 'fake_id')
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_test_upload_digest(self, mock_get_session, mock_models):
+        session = mock_get_session.return_value
+        query = session.query.return_value
+        query.filter_by.return_value.first.return_value = ('fake_digest',)
+        self.assertEqual('fake_digest', db.get_test_upload_digest('fake_id'))
+        session.query.assert_called_once_with(mock_models.Test.upload_digest)
+        query.filter_by.assert_called_once_with(id='fake_id')
+
+        query.filter_by.return_value.first.return_value = None
+        self.assertRaises(db.NotFound, db.get_test_upload_digest, 'fake_id')
+
+    @mock.patch.object(api, '_update_upload_rollups')
+    @mock.patch.object(api, '_refresh_latest_runs')
+    @mock.patch.object(api, '_update_test_pass_counts')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_delete_test(self, mock_get_session, mock_models,
+                         mock_update_test_pass_counts,
+                         mock_refresh_latest_runs,
+                         mock_update_upload_rollups):
         session = mock_get_session.return_value
         test_query = mock.Mock()
         test_meta_query = mock.Mock()
         test_results_query = mock.Mock()
+        test_names_query = mock.Mock()
+        test_names_query.filter_by.return_value = [('test_a',)]
+        test_compliance_query = mock.Mock()
+        latest_run_query = mock.Mock()
+        test_outcomes_query = mock.Mock()
+        test_meta_keys_query = mock.Mock()
+        test_meta_keys_query.filter_by.return_value.filter.return_value = [
+            (api_const.PUBLIC_KEY,)]
         session.query = mock.Mock(side_effect={
             mock_models.Test: test_query,
             mock_models.TestMeta: test_meta_query,
-            mock_models.TestResults: test_results_query
+            mock_models.TestMeta.meta_key: test_meta_keys_query,
+            mock_models.TestResults: test_results_query,
+            mock_models.TestResults.name: test_names_query,
+            mock_models.TestCompliance: test_compliance_query,
+            mock_models.LatestRun: latest_run_query,
+            mock_models.TestSignature: mock.Mock(),
+            mock_models.TestSignatureBucket: mock.Mock(),
+            mock_models.TestOutcomes: test_outcomes_query
         }.get)
         db.delete_test('fake_id')
+        test = test_query.filter_by.return_value.first.return_value
+        mock_update_test_pass_counts.assert_called_once_with(
+            session, test.cpid, ['test_a'], -1)
+        latest_run_query.filter_by.assert_called_once_with(
+            test_id='fake_id')
+        latest_run_query.filter_by.return_value.delete\
+            .assert_called_once_with()
+        pubkey = test_meta_query.filter_by.return_value.first.return_value
+        mock_refresh_latest_runs.assert_called_once_with(
+            session, test.cpid, [pubkey.value])
+        mock_update_upload_rollups.assert_called_once_with(
+            session, test.cpid, test.created_at, True, -1)
         session.begin.assert_called_once_with()
         test_query.filter_by.return_value.first\
             .assert_called_once_with()
@@ -237,8 +755,19 @@ class DBBackendTestCase(base.BaseTestCase):
             .assert_called_once_with()
         test_results_query.filter_by.return_value.delete\
             .assert_called_once_with()
+        test_compliance_query.filter_by.return_value.delete\
+            .assert_called_once_with()
+        test_outcomes_query.filter_by.return_value.delete\
+            .assert_called_once_with()
+        change = mock_models.TestChange.return_value
+        self.assertEqual(api_const.CHANGE_DELETE, change.operation)
+        self.assertFalse(change.public)
         session.delete.assert_called_once_with(
             test_query.filter_by.return_value.first.return_value)
+        change = mock_models.TestChange.return_value
+        session.add.assert_called_once_with(change)
+        self.assertEqual(('fake_id', api_const.CHANGE_DELETE),
+                         (change.test_id, change.operation))
 
         mock_get_session.return_value = mock.MagicMock()
         session = mock_get_session.return_value
@@ -262,6 +791,100 @@ class DBBackendTestCase(base.BaseTestCase):
             .first.return_value = None
         self.assertEqual(24, db.get_test_meta_key('fake_id', 'fake_key', 24))
 
+    @mock.patch.object(api, '_get_test_names_of_ids')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_test_outcomes(self, mock_get_session, mock_models,
+                               mock_get_test_names_of_ids):
+        session = mock_get_session.return_value
+        query = session.query.return_value.filter_by.return_value
+        query.first.return_value = outcomes.encode(
+            [(1, 'pass', 1.5), (2, 'fail', 3.0), (3, 'skip', None)])
+        mock_get_test_names_of_ids.return_value = {
+            1: 'test_c', 2: 'test_b', 3: 'test_a'}
+        self.assertEqual(
+            [{'name': 'test_a', 'status': 'skip', 'duration': None},
+             {'name': 'test_b', 'status': 'fail', 'duration': 3.0},
+             {'name': 'test_c', 'status': 'pass', 'duration': 1.5}],
+            db.get_test_outcomes('fake_id'))
+        session.query.return_value.filter_by.assert_called_with(
+            test_id='fake_id')
+
+        mock_get_test_names_of_ids.return_value = {2: 'test_b'}
+        self.assertEqual(
+            [{'name': 'test_b', 'status': 'fail', 'duration': 3.0}],
+            db.get_test_outcomes('fake_id', 'fail'))
+        mock_get_test_names_of_ids.assert_called_with(session, [2])
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_test_outcomes_without_outcomes(self, mock_get_session,
+                                                mock_models):
+        session = mock_get_session.return_value
+        query = session.query.return_value.filter_by.return_value
+        query.first.return_value = None
+        query.order_by.return_value = [('test_a',), ('test_b',)]
+        self.assertEqual(
+            [{'name': 'test_a', 'status': 'pass', 'duration': None},
+             {'name': 'test_b', 'status': 'pass', 'duration': None}],
+            db.get_test_outcomes('fake_id'))
+        self.assertEqual([], db.get_test_outcomes('fake_id', 'fail'))
+
+    @mock.patch.object(api, '_get_test_names_of_ids')
+    @mock.patch.object(api, '_apply_filters_for_query')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_slowest_tests(self, mock_get_session, mock_models,
+                               mock_apply, mock_get_test_names_of_ids):
+        session = mock_get_session.return_value
+        mock_apply.return_value.order_by.return_value.limit.return_value = [
+            ('id1', 'created1'), ('id2', 'created2')]
+        query = session.query.return_value.filter.return_value
+        query.yield_per.return_value = [
+            outcomes.encode([(1, 'pass', 1.0), (2, 'fail', 10.0),
+                             (3, 'pass', None)]),
+            outcomes.encode([(1, 'pass', 3.0), (3, 'pass', 5.0)]),
+        ]
+        mock_get_test_names_of_ids.return_value = {2: 'test_b',
+                                                   3: 'test_c'}
+        # Unknown durations are not aggregated.
+        self.assertEqual(
+            [{'name': 'test_b', 'runs': 1, 'mean_duration': 10.0,
+              'max_duration': 10.0},
+             {'name': 'test_c', 'runs': 1, 'mean_duration': 5.0,
+              'max_duration': 5.0}],
+            db.get_slowest_tests({'cpid': 'foo'}, 2, 10))
+        mock_get_test_names_of_ids.assert_called_once_with(session, [2, 3])
+        mock_apply.assert_called_once_with(session.query.return_value,
+                                           {'cpid': 'foo'})
+        mock_apply.return_value.order_by.return_value.limit\
+            .assert_called_once_with(10)
+        session.query.return_value.filter.assert_called_once_with(
+            mock_models.TestOutcomes.test_id.in_.return_value)
+        mock_models.TestOutcomes.test_id.in_.assert_called_once_with(
+            ['id1', 'id2'])
+
+        # No outcomes are read without matching test runs.
+        mock_apply.return_value.order_by.return_value.limit.return_value = []
+        session.query.reset_mock()
+        self.assertEqual([], db.get_slowest_tests({'cpid': 'foo'}, 2, 10))
+        self.assertEqual(1, session.query.call_count)
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_test_meta_blob_digest(self, mock_get_session, mock_models):
+        session = mock_get_session.return_value
+        query = session.query.return_value
+        query.filter_by.return_value.filter_by.return_value\
+            .scalar.return_value = 'fake_digest'
+        self.assertEqual('fake_digest',
+                         db.get_test_meta_blob_digest('fake_id', 'fake_key'))
+        session.query.assert_called_once_with(
+            mock_models.TestMeta.blob_digest)
+        query.filter_by.assert_called_once_with(test_id='fake_id')
+        query.filter_by.return_value.filter_by.assert_called_once_with(
+            meta_key='fake_key')
+
     @mock.patch('refstack.db.sqlalchemy.api.models')
     @mock.patch.object(api, 'get_session')
     def test_save_test_meta_item(self, mock_get_session, mock_models):
@@ -277,6 +900,13 @@ class DBBackendTestCase(base.BaseTestCase):
         self.assertEqual(42, mock_meta_item.value)
         session.begin.assert_called_once_with()
         mock_meta_item.save.assert_called_once_with(session)
+        session.query.assert_any_call(mock_models.Test)
+        session.query.return_value.filter_by.assert_any_call(id='fake_id')
+        session.query.return_value.filter_by.return_value.update.\
+            assert_called_once_with(
+                {mock_models.Test.meta_version:
+                 mock_models.Test.meta_version + 1},
+                synchronize_session=False)
 
         session.query.return_value\
             .filter_by.return_value\
@@ -288,6 +918,43 @@ class DBBackendTestCase(base.BaseTestCase):
         self.assertEqual('fake_id', mock_meta_item.test_id)
         self.assertEqual('fake_key', mock_meta_item.meta_key)
         self.assertEqual(42, mock_meta_item.value)
+        self.assertIsNone(mock_meta_item.blob_digest)
+
+        # Value kept in blob store is saved as digest only.
+        db.save_test_meta_item('fake_id', 'fake_key', 42, 'fake_digest')
+        self.assertIsNone(mock_meta_item.value)
+        self.assertEqual('fake_digest', mock_meta_item.blob_digest)
+
+    @mock.patch.object(api, '_refresh_latest_runs')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_save_test_meta_item_visibility(self, mock_get_session,
+                                            mock_models,
+                                            mock_refresh_latest_runs):
+        session = mock_get_session.return_value
+        session.query.return_value.filter_by.return_value\
+            .scalar.return_value = 'fake_cpid'
+        db.save_test_meta_item('fake_id', 'fake_key', 42)
+        self.assertFalse(mock_refresh_latest_runs.called)
+
+        db.save_test_meta_item('fake_id', api_const.SHARED_TEST_RUN, 'true')
+        mock_refresh_latest_runs.assert_called_once_with(session,
+                                                         'fake_cpid', [])
+
+        # Latest runs signed by both old and new public key are refreshed.
+        mock_refresh_latest_runs.reset_mock()
+        session.query.return_value.filter_by.return_value\
+            .filter_by.return_value.first.return_value.value = 'old_key'
+        db.save_test_meta_item('fake_id', api_const.PUBLIC_KEY, 'new_key')
+        mock_refresh_latest_runs.assert_called_once_with(
+            session, 'fake_cpid', ['old_key', 'new_key'])
+
+    @mock.patch.object(api, '_save_test_meta_item')
+    def test_save_test_meta_item_retry(self, mock_save_test_meta_item):
+        mock_save_test_meta_item.side_effect = [db_exc.DBDuplicateEntry(),
+                                                None]
+        db.save_test_meta_item('fake_id', api_const.SHARED_TEST_RUN, 'true')
+        self.assertEqual(2, mock_save_test_meta_item.call_count)
 
     @mock.patch('refstack.db.sqlalchemy.api.models')
     @mock.patch.object(api, 'get_session')
@@ -309,6 +976,404 @@ class DBBackendTestCase(base.BaseTestCase):
         self.assertRaises(db.NotFound,
                           db.delete_test_meta_item, 'fake_id', 'fake_key')
 
+    @mock.patch.object(api, 'get_results_of_tests')
+    @mock.patch.object(api, '_apply_filters_for_query')
+    @mock.patch.object(api, 'get_session')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_iter_test_records(self, mock_models, mock_get_session,
+                               mock_apply, mock_get_results_of_tests):
+        session = mock_get_session.return_value
+        query = mock_apply.return_value.order_by.return_value.yield_per
+        query.return_value = iter([('id1', 'date1', 10, 'cpid1'),
+                                   ('id2', 'date2', 20, 'cpid2'),
+                                   ('id3', 'date3', 30, 'cpid3')])
+        session.query.return_value.filter.side_effect = [
+            [('id1', 'key', 'value', None)], []]
+        mock_get_results_of_tests.side_effect = lambda test_ids: dict(
+            (test_id, ['test_' + test_id]) for test_id in test_ids)
+
+        tests = list(api.iter_test_records({'cpid': 'fake'}, None,
+                                           with_results=True, batch_size=2))
+        self.assertEqual(
+            {'id': 'id1', 'created_at': 'date1', 'duration_seconds': 10,
+             'cpid': 'cpid1', 'meta': {'key': 'value'},
+             'results': ['test_id1']}, tests[0])
+        self.assertEqual(['id1', 'id2', 'id3'],
+                         [test['id'] for test in tests])
+        mock_get_results_of_tests.assert_has_calls(
+            [mock.call(['id1', 'id2']), mock.call(['id3'])])
+        query.assert_called_once_with(2)
+        mock_apply.assert_called_once_with(session.query.return_value,
+                                           {'cpid': 'fake'})
+
+        mock_apply.reset_mock()
+        session.query.return_value.filter.side_effect = None
+        mock_models.Test.created_at.__gt__ = mock.Mock()
+        mock_models.Test.id.__gt__ = mock.Mock()
+        query.return_value = iter([])
+        with mock.patch.object(api, 'sa') as mock_sa:
+            self.assertEqual(
+                [], list(api.iter_test_records({}, ('date', 'id'))))
+        session.query.return_value.filter.assert_called_with(
+            mock_sa.or_.return_value)
+        mock_apply.assert_called_once_with(
+            session.query.return_value.filter.return_value, {})
+
+    @mock.patch.object(api, '_update_upload_rollups')
+    @mock.patch.object(api, '_update_test_pass_counts')
+    @mock.patch.object(api, '_refresh_latest_runs')
+    @mock.patch.object(api, 'get_session')
+    def test_store_results_batch(self, mock_get_session, mock_refresh,
+                                 mock_update_counts, mock_update_rollups):
+        session = mock_get_session.return_value
+        session.query.return_value.filter.return_value = [('id1',)]
+        runs = [
+            {'id': 'id1', 'cpid': 'cpid1', 'created_at': 'date1',
+             'duration_seconds': 1, 'meta': {}, 'results': []},
+            {'id': 'id2', 'cpid': 'cpid1', 'created_at': 'date2',
+             'duration_seconds': 2, 'results': [{'name': 'test_a'}],
+             'meta': collections.OrderedDict([
+                 (api_const.PUBLIC_KEY, 'key'),
+                 ('big', {api_const.META_BLOB: 'digest'})])},
+            {'id': 'id2', 'cpid': 'cpid1', 'created_at': 'date2',
+             'duration_seconds': 2, 'meta': {}, 'results': []},
+        ]
+        self.assertEqual(['id2'], api.store_results_batch(runs))
+        self.assertEqual(4, session.execute.call_count)
+        test_rows = session.execute.call_args_list[0][0][1]
+        self.assertEqual([{'id': 'id2', 'cpid': 'cpid1',
+                           'created_at': 'date2', 'duration_seconds': 2,
+                           'passed_count': 1}], test_rows)
+        self.assertEqual(
+            [{'test_id': 'id2', 'meta_key': api_const.PUBLIC_KEY,
+              'value': 'key', 'blob_digest': None},
+             {'test_id': 'id2', 'meta_key': 'big', 'value': None,
+              'blob_digest': 'digest'}],
+            session.execute.call_args_list[2][0][1])
+        self.assertEqual(
+            [{'test_id': 'id2', 'operation': api_const.CHANGE_CREATE,
+              'public': False}],
+            session.execute.call_args_list[3][0][1])
+        mock_refresh.assert_called_once_with(session, 'cpid1', {'key'})
+        mock_update_counts.assert_called_once_with(session, 'cpid1',
+                                                   ['test_a'], 1)
+        mock_update_rollups.assert_called_once_with(session, 'cpid1',
+                                                    'date2', True, 1)
+
+        session.execute.reset_mock()
+        session.query.return_value.filter.return_value = [('id1',),
+                                                          ('id2',)]
+        self.assertEqual([], api.store_results_batch(runs))
+        self.assertFalse(session.execute.called)
+
+    @mock.patch.object(api, 'get_session')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_get_changes(self, mock_models, mock_get_session):
+        session = mock_get_session.return_value
+        query = session.query.return_value.filter.return_value\
+            .filter.return_value.order_by.return_value.limit.return_value
+        query.all.return_value = [
+            (11, 'id1', 'create', datetime.datetime(2015, 8, 1)),
+            (12, 'id1', 'delete', datetime.datetime(2015, 8, 2)),
+            (13, 'id2', 'create', datetime.datetime(2015, 8, 1))]
+        mock_models.TestChange._id.__gt__ = mock.Mock()
+
+        self.assertEqual([11, 12, 13], [change['cursor'] for change
+                                        in api.get_changes(10, 3)])
+        mock_models.TestChange.public.is_.assert_called_with(True)
+        session.query.return_value.filter.return_value.filter\
+            .return_value.order_by.return_value.limit.assert_called_with(3)
+        self.assertEqual(
+            [{'cursor': 11, 'test_id': 'id1', 'operation': 'create',
+              'created_at': datetime.datetime(2015, 8, 1)}],
+            api.get_changes(10, 3, datetime.datetime(2015, 8, 1, 12)))
+
+    def test_is_public_meta(self):
+        self.assertTrue(api._is_public_meta({}))
+        self.assertFalse(api._is_public_meta({api_const.PUBLIC_KEY: 'key'}))
+        self.assertTrue(api._is_public_meta([api_const.PUBLIC_KEY,
+                                             api_const.SHARED_TEST_RUN]))
+
+    @mock.patch.object(api, '_log_change')
+    @mock.patch.object(api, '_is_public')
+    def test_log_meta_change(self, mock_is_public, mock_log_change):
+        session = mock.Mock()
+        mock_is_public.return_value = False
+        api._log_meta_change(session, 'fake_id', False)
+        mock_log_change.assert_called_once_with(
+            session, 'fake_id', api_const.CHANGE_UPDATE, False)
+
+        # Unshared run leaves public runs, owner sees an update.
+        mock_log_change.reset_mock()
+        api._log_meta_change(session, 'fake_id', True)
+        self.assertEqual(
+            [mock.call(session, 'fake_id', api_const.CHANGE_UPDATE, False),
+             mock.call(session, 'fake_id', api_const.CHANGE_DELETE, True)],
+            mock_log_change.call_args_list)
+
+        mock_log_change.reset_mock()
+        mock_is_public.return_value = True
+        api._log_meta_change(session, 'fake_id', False)
+        self.assertEqual(
+            [mock.call(session, 'fake_id', api_const.CHANGE_UPDATE, False),
+             mock.call(session, 'fake_id', api_const.CHANGE_CREATE, True)],
+            mock_log_change.call_args_list)
+
+    @mock.patch.object(api, '_store_results_batch')
+    def test_store_results_batch_retry(self, mock_store_results_batch):
+        mock_store_results_batch.side_effect = [db_exc.DBDeadlock(),
+                                                ['id1']]
+        self.assertEqual(['id1'], api.store_results_batch(['run']))
+        self.assertEqual(2, mock_store_results_batch.call_count)
+
+        mock_store_results_batch.side_effect = db_exc.DBDuplicateEntry()
+        self.assertRaises(db_exc.DBDuplicateEntry,
+                          api.store_results_batch, ['run'])
+
+    @mock.patch.object(api, 'get_session')
+    @mock.patch('refstack.db.sqlalchemy.models.TestResults')
+    def test_get_results_of_tests(self, mock_test_results, mock_get_session):
+        session = mock_get_session.return_value
+        session.query.return_value.filter.return_value.all.return_value = [
+            ('id1', 'test_a'), ('id1', 'test_b')]
+        self.assertEqual({'id1': ['test_a', 'test_b'], 'id2': []},
+                         api.get_results_of_tests(['id1', 'id2']))
+        mock_test_results.test_id.in_.assert_called_once_with(['id1', 'id2'])
+
+        session.query.reset_mock()
+        self.assertEqual({}, api.get_results_of_tests([]))
+        self.assertFalse(session.query.called)
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_test_fields(self, mock_get_session, mock_models):
+        session = mock_get_session.return_value
+        first = session.query.return_value.filter_by.return_value.first
+        first.return_value = ('id1', 'date1', 10)
+        session.query.return_value.filter.return_value = [
+            ('id1', 'key', 'value', None), ('id1', 'big', None, 'digest')]
+
+        self.assertEqual(
+            {'duration_seconds': 10,
+             'meta': {'key': 'value', 'big': {'blob': 'digest'}}},
+            api.get_test_fields('id1', ['duration_seconds', 'meta']))
+        session.query.assert_any_call(mock_models.Test.id,
+                                      mock_models.Test.created_at,
+                                      mock_models.Test.duration_seconds)
+        self.assertFalse(mock_models.TestResults.called)
+
+        first.return_value = None
+        self.assertRaises(api.NotFound, api.get_test_fields, 'id1', ['id'])
+
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_test_fields_of_tests(self, mock_get_session, mock_models):
+        self.assertEqual({}, api.get_test_fields_of_tests([], ['id']))
+        self.assertFalse(mock_get_session.called)
+
+        session = mock_get_session.return_value
+        session.query.return_value.filter.return_value.all.return_value = [
+            ('id1', 'date1', 'cpid1'), ('id2', 'date2', 'cpid2')]
+        self.assertEqual(
+            {'id1': {'id': 'id1', 'cpid': 'cpid1'},
+             'id2': {'id': 'id2', 'cpid': 'cpid2'}},
+            api.get_test_fields_of_tests(['id1', 'id2', 'id3'], ['cpid']))
+        mock_models.Test.id.in_.assert_called_once_with(['id1', 'id2', 'id3'])
+        self.assertEqual(1, session.query.call_count)
+
+    @mock.patch.object(api, '_apply_filters_for_query')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    @mock.patch.object(api, 'get_session')
+    def test_get_test_records_with_fields(self, mock_get_session,
+                                          mock_models, mock_apply):
+        session = mock_get_session.return_value
+        mock_apply.return_value.order_by.return_value.offset.return_value\
+            .limit.return_value.all.return_value = [('id1', 'date1'),
+                                                    ('id2', 'date2')]
+        self.assertEqual([{'created_at': 'date1'}, {'created_at': 'date2'}],
+                         api.get_test_records(1, 10, {}, ['created_at']))
+        session.query.assert_called_once_with(mock_models.Test.id,
+                                              mock_models.Test.created_at)
+
+    @mock.patch.object(api, '_apply_filters_for_query')
+    @mock.patch.object(api, 'get_session')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_get_cloud_trend(self, mock_models, mock_get_session,
+                             mock_apply):
+        session = mock_get_session.return_value
+        mock_apply.return_value.order_by.return_value = [
+            ('id1', 'date1', 10), ('id2', 'date2', 12)]
+        self.assertEqual(
+            [{'id': 'id1', 'created_at': 'date1', 'passed_count': 10},
+             {'id': 'id2', 'created_at': 'date2', 'passed_count': 12}],
+            api.get_cloud_trend('cpid', {}))
+        mock_apply.assert_called_once_with(session.query.return_value,
+                                           {api_const.CPID: 'cpid'})
+        self.assertFalse(session.query.return_value.outerjoin.called)
+
+        mock_apply.reset_mock()
+        mock_apply.return_value.order_by.return_value = [
+            ('id1', 'date1', 10, 50.0, False)]
+        self.assertEqual(
+            [{'id': 'id1', 'created_at': 'date1', 'passed_count': 10,
+              'required_pass_percent': 50.0, 'compliant': False}],
+            api.get_cloud_trend('cpid', {}, '2015.07', 'platform'))
+        mock_apply.assert_called_once_with(
+            session.query.return_value.outerjoin.return_value,
+            {api_const.CPID: 'cpid'})
+        mock_models.TestCompliance.guideline.__eq__.assert_called_with(
+            '2015.07')
+
+    @mock.patch.object(api, 'get_session')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_get_latest_test_ids(self, mock_models, mock_get_session):
+        session = mock_get_session.return_value
+        session.query.return_value.join.return_value\
+            .filter.return_value.order_by.return_value = [('id3',), ('id2',)]
+        self.assertEqual(['id3', 'id2'], api.get_latest_test_ids({}))
+        session.query.assert_called_once_with(mock_models.Test.id)
+        mock_models.LatestRun.visibility.__eq__.assert_called_once_with(
+            api_const.VISIBILITY_PUBLIC)
+
+    @mock.patch.object(api, '_to_dict')
+    @mock.patch.object(api, 'get_session')
+    @mock.patch.object(api, 'orm')
+    @mock.patch.object(api, 'sa')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_get_latest_test_records(self, mock_models, mock_sa, mock_orm,
+                                     mock_get_session, mock_to_dict):
+        session = mock_get_session.return_value
+        query = session.query.return_value.join.return_value\
+            .filter.return_value.filter.return_value.filter.return_value
+        newer = mock_orm.aliased.return_value
+        newer.run_created_at.__gt__ = mock.Mock()
+        newer.test_id.__gt__ = mock.Mock()
+        filters = {api_const.SIGNED: True, api_const.USER_PUBKEYS: ['key']}
+        result = api.get_latest_test_records(2, 10, filters)
+
+        mock_models.LatestRun.visibility.__eq__.assert_called_once_with(
+            api_const.VISIBILITY_SIGNED)
+        pubkey_hashes = [hashlib.md5(b'key').hexdigest()]
+        mock_models.LatestRun.pubkey_hash.in_.assert_called_once_with(
+            pubkey_hashes)
+        mock_orm.aliased.assert_called_once_with(mock_models.LatestRun)
+        mock_orm.aliased.return_value.pubkey_hash.in_\
+            .assert_called_once_with(pubkey_hashes)
+        query.order_by.return_value.offset.assert_called_once_with(10)
+        query.order_by.return_value.offset.return_value.limit\
+            .assert_called_once_with(10)
+        mock_to_dict.assert_called_once_with(
+            query.order_by.return_value.offset.return_value.limit
+            .return_value.all.return_value)
+        self.assertEqual(mock_to_dict.return_value, result)
+
+    @mock.patch.object(api, 'get_session')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_get_latest_test_records_count(self, mock_models,
+                                           mock_get_session):
+        session = mock_get_session.return_value
+        query = session.query.return_value.join.return_value\
+            .filter.return_value
+        query.count.return_value = 3
+        self.assertEqual(3, api.get_latest_test_records_count({}))
+
+    @mock.patch.object(api, '_filter_by_visibility')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_refresh_latest_runs(self, mock_models, mock_filter):
+        session = mock.Mock()
+        runs = mock_filter.return_value.order_by.return_value
+        runs.first.return_value = ('id2', 'created_at')
+        query = session.query.return_value.filter_by.return_value
+        signed_runs = query.join.return_value.filter.return_value\
+            .filter.return_value.order_by.return_value
+        signed_runs.first.return_value = None
+        public_latest = mock.Mock()
+        signed_latest = mock.Mock()
+        query.first.side_effect = [public_latest, signed_latest]
+
+        api._refresh_latest_runs(session, 'fake_cpid', ['key'])
+
+        mock_filter.assert_called_once_with(query,
+                                            api_const.VISIBILITY_PUBLIC)
+        mock_models.TestMeta.value.__eq__.assert_called_once_with('key')
+        session.query.return_value.filter_by.assert_has_calls([
+            mock.call(cpid='fake_cpid',
+                      visibility=api_const.VISIBILITY_PUBLIC,
+                      pubkey_hash=''),
+            mock.call(cpid='fake_cpid',
+                      visibility=api_const.VISIBILITY_SIGNED,
+                      pubkey_hash=hashlib.md5(b'key').hexdigest())],
+            any_order=True)
+        self.assertEqual('id2', public_latest.test_id)
+        self.assertEqual('created_at', public_latest.run_created_at)
+        public_latest.save.assert_called_once_with(session)
+        session.delete.assert_called_once_with(signed_latest)
+
+    @mock.patch.object(api, '_filter_by_visibility')
+    @mock.patch('refstack.db.sqlalchemy.api.models')
+    def test_refresh_latest_runs_new_cloud(self, mock_models, mock_filter):
+        session = mock.Mock()
+        runs = mock_filter.return_value.order_by.return_value
+        runs.first.return_value = None
+        query = session.query.return_value.filter_by.return_value
+        signed_runs = query.join.return_value.filter.return_value\
+            .filter.return_value.order_by.return_value
+        signed_runs.first.return_value = ('id1', 'created_at')
+        query.first.return_value = None
+
+        api._refresh_latest_runs(session, 'fake_cpid', ['key'])
+
+        latest = mock_models.LatestRun.return_value
+        mock_models.LatestRun.assert_called_once_with()
+        self.assertEqual('fake_cpid', latest.cpid)
+        self.assertEqual(api_const.VISIBILITY_SIGNED, latest.visibility)
+        self.assertEqual(hashlib.md5(b'key').hexdigest(), latest.pubkey_hash)
+        self.assertEqual('id1', latest.test_id)
+        latest.save.assert_called_once_with(session)
+        self.assertFalse(session.delete.called)
+
+    @mock.patch.object(api, 'get_session')
+    @mock.patch('refstack.db.sqlalchemy.models.TestCompliance')
+    def test_save_test_compliance(self, mock_test_compliance,
+                                  mock_get_session):
+        session = mock_get_session.return_value
+        record = {'guideline': '2015.07', 'target': 'platform',
+                  'required_pass_percent': 50.0,
+                  'non_flag_pass_percent': 100.0, 'passed': True}
+        api.save_test_compliance('fake_id', [record])
+
+        session.begin.assert_called_once_with()
+        session.query.assert_called_once_with(mock_test_compliance)
+        session.query.return_value.filter_by.assert_called_once_with(
+            test_id='fake_id')
+        session.query.return_value.filter_by.return_value\
+            .filter.return_value.delete\
+            .assert_called_once_with(synchronize_session=False)
+        compliance = mock_test_compliance.return_value
+        self.assertEqual('fake_id', compliance.test_id)
+        self.assertEqual('platform', compliance.target)
+        self.assertTrue(compliance.passed)
+        compliance.save.assert_called_once_with(session)
+
+    @mock.patch.object(api, '_save_test_compliance')
+    def test_save_test_compliance_retry(self, mock_save_test_compliance):
+        mock_save_test_compliance.side_effect = [db_exc.DBDuplicateEntry(),
+                                                 None]
+        api.save_test_compliance('fake_id', [])
+        self.assertEqual(2, mock_save_test_compliance.call_count)
+
+    @mock.patch.object(api, 'get_session')
+    @mock.patch('refstack.db.sqlalchemy.models.Test')
+    def test_get_test_ids_without_compliance(self, mock_test,
+                                             mock_get_session):
+        session = mock_get_session.return_value
+        session.query.return_value.filter.return_value\
+            .limit.return_value.all.return_value = [('id1',), ('id2',)]
+        self.assertEqual(['id1', 'id2'],
+                         api.get_test_ids_without_compliance('2015.07', 10))
+        session.query.return_value.filter.return_value.limit\
+            .assert_called_once_with(10)
+
     @mock.patch.object(api, 'get_session')
     @mock.patch('refstack.db.sqlalchemy.models.TestResults')
     def test_get_test_results(self, mock_test_result, mock_get_session):
@@ -332,6 +1397,11 @@ class DBBackendTestCase(base.BaseTestCase):
         filter_by.all.assert_called_once_with()
         self.assertEqual(expected_result, actual_result)
 
+        filter_by.filter.return_value.all.return_value = []
+        self.assertEqual([], api.get_test_results(test_id, 'tempest.a_b'))
+        mock_test_result.name.like.assert_called_once_with(
+            'tempest.a!_b%', escape='!')
+
     @mock.patch('refstack.db.sqlalchemy.models.Test')
     @mock.patch('refstack.db.sqlalchemy.models.TestMeta')
     def test_apply_filters_for_query_unsigned(self, mock_meta,
@@ -453,6 +1523,25 @@ class DBBackendTestCase(base.BaseTestCase):
         ordered_query.offset.assert_called_once_with(per_page)
         query_with_offset.limit.assert_called_once_with(per_page)
 
+    @mock.patch.object(api, '_apply_filters_for_query')
+    @mock.patch.object(api, 'get_session')
+    @mock.patch('refstack.db.sqlalchemy.models.Test')
+    @mock.patch.object(api, 'orm')
+    def test_get_test_records_sorted_by_compliance(
+            self, mock_orm, mock_model, mock_get_session, mock_apply):
+        filters = {api_const.COMPLIANT: ('2015.07', 'platform'),
+                   api_const.SORT: api_const.SORT_COMPLIANCE}
+        compliance = mock_orm.aliased.return_value
+        joined_query = mock_apply.return_value.join.return_value
+        api.get_test_records(1, 20, filters)
+        mock_orm.aliased.assert_called_once_with(models.TestCompliance)
+        self.assertEqual(compliance,
+                         mock_apply.return_value.join.call_args[0][0])
+        joined_query.order_by.assert_called_once_with(
+            compliance.required_pass_percent.desc())
+        joined_query.order_by.return_value.order_by.assert_called_once_with(
+            mock_model.created_at.desc())
+
     @mock.patch.object(api, '_apply_filters_for_query')
     @mock.patch.object(api, 'get_session')
     @mock.patch('refstack.db.sqlalchemy.models.Test')
@@ -0,0 +1,186 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for publish-subscribe of server-sent events."""
+
+import os
+
+import fixtures
+import mock
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+from refstack.api import events
+
+
+class EventBusTestCase(base.BaseTestCase):
+
+    def test_deliver(self):
+        bus = events.EventBus(2)
+        subscription = bus.subscribe()
+        slow_subscription = bus.subscribe()
+        for event_id in (1, 2):
+            bus.deliver(events.Event(event_id, 'upload', {}))
+        self.assertEqual(1, subscription.get(0).id)
+        bus.deliver(events.Event(3, 'upload', {}))
+        self.assertTrue(slow_subscription.closed)
+        self.assertFalse(subscription.closed)
+        self.assertEqual([2, 3], [subscription.get(0).id,
+                                  subscription.get(0).id])
+        self.assertIsNone(subscription.get(0))
+
+        bus.unsubscribe(subscription)
+        bus.deliver(events.Event(4, 'upload', {}))
+        self.assertIsNone(subscription.get(0))
+        self.assertEqual([3, 4], [event.id for event in bus.recent])
+
+    def test_max_subscribers(self):
+        bus = events.EventBus(2, max_subscribers=1)
+        self.assertFalse(bus.is_full())
+        subscription = bus.subscribe()
+        self.assertTrue(bus.is_full())
+        self.assertIsNone(bus.subscribe())
+        bus.unsubscribe(subscription)
+        self.assertIsNotNone(bus.subscribe())
+
+    def test_to_sse(self):
+        event = events.Event(5, 'upload', {'id': 'id1'})
+        self.assertEqual(b'id: 5\nevent: upload\ndata: {"id": "id1"}\n\n',
+                         event.to_sse())
+
+
+class MemoryRelayTestCase(base.BaseTestCase):
+
+    def test_replay(self):
+        relay = events.MemoryRelay(events.EventBus(10))
+        for data in ('a', 'b', 'c'):
+            relay.publish('upload', data)
+        self.assertEqual(['b', 'c'],
+                         [event.data for event in relay.replay(1)])
+        self.assertEqual([], relay.replay(3))
+        self.assertIsNone(relay.replay(4))
+
+
+class FileRelayTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(FileRelayTestCase, self).setUp()
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'events.log')
+        self.relay = events.FileRelay(events.EventBus(10), self.path, 200)
+
+    def test_publish_and_replay(self):
+        self.assertEqual([], self.relay.replay(0))
+        self.relay.publish('upload', {'id': 'id1'})
+        self.relay.publish('upload', {'id': 'id2'})
+        replayed = self.relay.replay(0)
+        self.assertEqual([{'id': 'id1'}, {'id': 'id2'}],
+                         [event.data for event in replayed])
+        self.assertEqual(os.path.getsize(self.path), replayed[-1].id)
+        self.assertEqual([{'id': 'id2'}],
+                         [event.data for event in
+                          self.relay.replay(replayed[0].id)])
+        self.assertIsNone(self.relay.replay(replayed[-1].id + 1))
+
+    def test_publish_truncated(self):
+        self.relay.publish('upload', 'a' * 200)
+        first_id = self.relay.replay(0)[0].id
+        self.relay.publish('upload', 'b')
+        # File is truncated, ids of later events are still greater.
+        self.assertLess(os.path.getsize(self.path), 100)
+        self.assertIsNone(self.relay.replay(first_id))
+        start_id, end_id = self.relay._get_ids()
+        self.assertGreater(start_id, first_id)
+        replayed = self.relay.replay(start_id)
+        self.assertEqual(['b'], [event.data for event in replayed])
+        self.assertEqual(end_id, replayed[0].id)
+        self.assertEqual([], self.relay.replay(end_id))
+
+    def test_read_without_header(self):
+        with open(self.path, 'w') as events_file:
+            events_file.write('{"name": "upload", "data": "a"}\n')
+        self.assertEqual([('a', os.path.getsize(self.path))],
+                         [(event.data, event.id)
+                          for event in self.relay.read(0)])
+
+    def test_read_partial_line(self):
+        self.relay.publish('upload', 'a')
+        with open(self.path, 'a') as events_file:
+            events_file.write('{"name": "upload"')
+        self.assertEqual(['a'], [event.data
+                                 for event in self.relay.read(0)])
+
+
+class StreamTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(StreamTestCase, self).setUp()
+        self.CONF = self.useFixture(config_fixture.Config()).conf
+        self.CONF.set_override('events_heartbeat_seconds', 0, 'api')
+        self.relay = events.MemoryRelay(events.EventBus(10))
+        self.useFixture(fixtures.MockPatchObject(events, '_relay',
+                                                 self.relay))
+
+    def test_iter_stream(self):
+        events.publish('upload', 'a')
+        events.publish('upload', 'b')
+        stream = events.iter_stream('1')
+        self.assertEqual(b'retry: 3000\n\n', next(stream))
+        self.assertEqual(b'id: 2\nevent: upload\ndata: "b"\n\n',
+                         next(stream))
+        self.assertEqual(b': heartbeat\n\n', next(stream))
+        events.publish('upload', 'c')
+        self.assertEqual(b'id: 3\nevent: upload\ndata: "c"\n\n',
+                         next(stream))
+        stream.close()
+        self.assertEqual(set(), self.relay.bus._subscriptions)
+
+    @mock.patch('time.time')
+    def test_iter_stream_max_seconds(self, mock_time):
+        self.CONF.set_override('events_stream_max_seconds', 10, 'api')
+        mock_time.return_value = 100
+        stream = events.iter_stream()
+        next(stream)
+        self.assertEqual(b': heartbeat\n\n', next(stream))
+        mock_time.return_value = 110
+        self.assertRaises(StopIteration, next, stream)
+        self.assertEqual(set(), self.relay.bus._subscriptions)
+
+    def test_iter_stream_too_many(self):
+        self.relay.bus.max_subscribers = 1
+        stream = events.iter_stream()
+        next(stream)
+        self.assertTrue(events.is_stream_limit_reached())
+        self.assertEqual([], list(events.iter_stream()))
+        stream.close()
+        self.assertFalse(events.is_stream_limit_reached())
+
+    def test_iter_stream_without_last_event(self):
+        events.publish('upload', 'a')
+        for last_event_id in (None, 'fake', '5'):
+            stream = events.iter_stream(last_event_id)
+            next(stream)
+            self.assertEqual(b': heartbeat\n\n', next(stream))
+            stream.close()
+
+    @mock.patch.object(events, '_relay', None)
+    def test_get_relay(self):
+        self.assertIsInstance(events.get_relay(), events.FileRelay)
+        events._relay = None
+        self.CONF.set_override('events_backend', 'memory', 'api')
+        self.assertIsInstance(events.get_relay(), events.MemoryRelay)
+        events._relay = None
+        self.CONF.set_override('events_backend', 'fake', 'api')
+        self.assertRaises(ValueError, events.get_relay)
@@ -0,0 +1,81 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for streaming export of test runs."""
+
+import datetime
+import json
+
+import mock
+from oslotest import base
+
+from refstack.api import export
+
+
+class ExportTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(ExportTestCase, self).setUp()
+        self.tests = [
+            {'id': 'id1', 'created_at': datetime.datetime(2015, 8, 1, 1),
+             'duration_seconds': 10, 'cpid': 'cpid1',
+             'meta': {'key': 'value'},
+             'results': ['test_a', 'test_b']},
+            {'id': 'id2', 'created_at': datetime.datetime(2015, 8, 2),
+             'duration_seconds': 20, 'cpid': 'cpid2', 'meta': {},
+             'results': []},
+        ]
+
+    def test_cursor(self):
+        cursor = export.encode_cursor(self.tests[0])
+        self.assertEqual((datetime.datetime(2015, 8, 1, 1), 'id1'),
+                         export.decode_cursor(cursor))
+        for cursor in ('fake', 'WyJmYWtlIl0=', '{}'):
+            self.assertRaises(ValueError, export.decode_cursor, cursor)
+
+    @mock.patch('refstack.db.iter_test_records')
+    def test_iter_export_ndjson(self, mock_iter_test_records):
+        mock_iter_test_records.return_value = iter(self.tests)
+        cursor = export.encode_cursor(self.tests[0])
+        lines = list(export.iter_export({'cpid': 'fake'}, cursor=cursor,
+                                        with_results=True))
+        self.assertEqual(2, len(lines))
+        record = json.loads(lines[0].decode('utf-8'))
+        self.assertEqual(['test_a', 'test_b'], record['results'])
+        self.assertNotIn('cpid', record)
+        self.assertEqual('2015-08-01 01:00:00', record['created_at'])
+        self.assertEqual(('id1',), export.decode_cursor(record['cursor'])[1:])
+        mock_iter_test_records.assert_called_once_with(
+            {'cpid': 'fake'}, (datetime.datetime(2015, 8, 1, 1), 'id1'),
+            True, export.BATCH_SIZE)
+
+    @mock.patch('refstack.db.iter_test_records')
+    def test_iter_export_csv(self, mock_iter_test_records):
+        mock_iter_test_records.return_value = iter(self.tests[:1])
+        lines = list(export.iter_export({}, export.CSV, with_results=True,
+                                        with_cpid=True))
+        self.assertEqual(
+            b'id,cpid,created_at,duration_seconds,meta,results,cursor\r\n',
+            lines[0])
+        self.assertTrue(lines[1].startswith(
+            b'id1,cpid1,2015-08-01 01:00:00,10,"{""key"": ""value""}",'
+            b'test_a test_b,'))
+        mock_iter_test_records.assert_called_once_with(
+            {}, None, True, export.BATCH_SIZE)
+
+    def test_iter_export_error(self):
+        self.assertRaises(ValueError, export.iter_export, {}, 'xml')
+        self.assertRaises(ValueError, export.iter_export, {},
+                          cursor='fake')
@@ -0,0 +1,296 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for guideline files retrieval."""
+
+import json
+import os
+
+import fixtures
+import mock
+from oslo_config import fixture as config_fixture
+from oslotest import base
+import requests
+
+from refstack.api import exceptions as api_exc
+from refstack.api import guidelines
+
+
+class CapabilitiesStoreTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(CapabilitiesStoreTestCase, self).setUp()
+        self.config_fixture = config_fixture.Config()
+        self.CONF = self.useFixture(self.config_fixture).conf
+        self.CONF.set_override('cache_dir',
+                               self.useFixture(fixtures.TempDir()).path,
+                               'api')
+        self.store = guidelines.CapabilitiesStore()
+        patcher = mock.patch('requests.get')
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_get.return_value = mock.Mock(status_code=200,
+                                               content=b'{"foo": "bar"}')
+
+    def test_fetch(self):
+        result = self.store.fetch('http://fake.url')
+        self.assertEqual((200, b'{"foo": "bar"}', guidelines.MISS),
+                         (result.status_code, result.body,
+                          result.cache_state))
+
+        result = self.store.fetch('http://fake.url')
+        self.assertEqual(guidelines.HIT, result.cache_state)
+        self.mock_get.assert_called_once_with('http://fake.url', timeout=10)
+
+        other_store = guidelines.CapabilitiesStore()
+        result = other_store.fetch('http://fake.url')
+        self.assertEqual(guidelines.HIT, result.cache_state)
+        self.assertEqual({'hits': 1, 'misses': 1, 'hit_rate': 0.5},
+                         self.store.stats())
+
+    def test_fetch_error(self):
+        self.mock_get.return_value = mock.Mock(status_code=404)
+        self.assertEqual(404, self.store.fetch('http://fake.url').status_code)
+
+        self.mock_get.side_effect = requests.exceptions.RequestException()
+        self.assertRaises(requests.exceptions.RequestException,
+                          self.store.fetch, 'http://fake.url')
+
+    def test_fetch_stale_on_error(self):
+        self.store.fetch('http://fake.url')
+        self.CONF.set_override('capabilities_cache_max_stale', 0, 'api')
+
+        self.mock_get.return_value = mock.Mock(status_code=503)
+        result = self.store.fetch('http://fake.url')
+        self.assertEqual((200, b'{"foo": "bar"}', guidelines.STALE),
+                         (result.status_code, result.body,
+                          result.cache_state))
+
+        self.mock_get.side_effect = requests.exceptions.RequestException()
+        result = self.store.fetch('http://fake.url')
+        self.assertEqual(guidelines.STALE, result.cache_state)
+
+        self.mock_get.side_effect = requests.exceptions.Timeout()
+        result = self.store.fetch('http://fake.url')
+        self.assertEqual(guidelines.STALE, result.cache_state)
+
+    @mock.patch('threading.Thread')
+    def test_fetch_refresh_in_background(self, mock_thread):
+        self.store.fetch('http://fake.url')
+        self.CONF.set_override('capabilities_cache_ttl', 0, 'api')
+
+        result = self.store.fetch('http://fake.url')
+        self.assertEqual(guidelines.STALE, result.cache_state)
+        mock_thread.assert_called_once_with(target=self.store._refresh,
+                                            args=('http://fake.url',))
+        mock_thread.return_value.start.assert_called_once_with()
+
+        # Refresh is claimed already, so it is not started twice.
+        other_store = guidelines.CapabilitiesStore()
+        other_store.fetch('http://fake.url')
+        self.assertEqual(1, mock_thread.call_count)
+
+        self.mock_get.return_value = mock.Mock(status_code=200,
+                                               content=b'{"foo": "baz"}')
+        self.store._refresh('http://fake.url')
+        self.assertEqual(b'{"foo": "baz"}',
+                         self.store.get('http://fake.url')[0])
+        self.store.fetch('http://fake.url')
+        self.assertEqual(2, mock_thread.call_count)
+
+    def test_set_fetch_headers(self):
+        response = mock.Mock(headers={})
+        result = guidelines.FetchResult(200, b'', guidelines.HIT, 42.5)
+        guidelines.set_fetch_headers(response, result)
+        self.assertEqual('HIT', response.headers['X-Cache'])
+        self.assertEqual('42', response.headers['Age'])
+        self.assertIn('X-Cache-Hit-Rate', response.headers)
+
+
+class LocalGuidelinesTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(LocalGuidelinesTestCase, self).setUp()
+        self.path = self.useFixture(fixtures.TempDir()).path
+        self._write('2015.03.json', b'{"foo": "bar"}')
+        self._write('2015.next.json', b'{}')
+        self._write('2015.04.json', b'not json')
+
+    def _write(self, name, body):
+        with open(os.path.join(self.path, name), 'wb') as cap_file:
+            cap_file.write(body)
+
+    def test_scan(self):
+        local = guidelines.LocalGuidelines(self.path)
+        self.assertEqual(['2015.03.json'], local.list_files())
+        self.assertEqual(b'{"foo": "bar"}',
+                         local.get_file_bytes('2015.03.json'))
+        self.assertEqual({'foo': 'bar'}, local.get_file_json('2015.03.json'))
+        self.assertIsNone(local.get_file_bytes('2010.03.json'))
+        self.assertFalse(local.scan())
+
+        self._write('2015.05.json', b'{"baz": 1}')
+        os.remove(os.path.join(self.path, '2015.03.json'))
+        self.assertTrue(local.scan())
+        self.assertEqual(['2015.05.json'], local.list_files())
+        self.assertEqual({'baz': 1}, local.get_file_json('2015.05.json'))
+
+    def test_get_local_guidelines(self):
+        conf = self.useFixture(config_fixture.Config()).conf
+        self.assertIsNone(guidelines.get_local_guidelines())
+        conf.set_override('capabilities_dir', self.path, 'api')
+        conf.set_override('capabilities_dir_poll_interval', 0, 'api')
+        local = guidelines.get_local_guidelines()
+        self.assertEqual(['2015.03.json'], local.list_files())
+        self.assertIs(local, guidelines.get_local_guidelines())
+
+
+class TestIndexTestCase(base.BaseTestCase):
+
+    GUIDELINE_1_2 = {
+        'schema': '1.2',
+        'platform': {'required': ['compute', 'object']},
+        'components': {
+            'compute': {'required': ['compute-servers'],
+                        'advisory': ['compute-images'],
+                        'deprecated': [], 'removed': []},
+            'object': {'required': [], 'advisory': ['compute-servers'],
+                       'deprecated': [], 'removed': []}},
+        'capabilities': {
+            'compute-servers': {'tests': ['test_a', 'test_b'],
+                                'flagged': ['test_b']},
+            'compute-images': {'tests': ['test_b'], 'flagged': []}}}
+
+    GUIDELINE_1_3 = {
+        'schema': '1.3',
+        'platform': {'required': ['compute']},
+        'components': {
+            'compute': {'required': ['compute-servers'],
+                        'advisory': [], 'deprecated': [], 'removed': []}},
+        'capabilities': {
+            'compute-servers': {
+                'tests': {'test_a': {'idempotent_id': 'id-1'},
+                          'test_b': {'idempotent_id': 'id-2',
+                                     'flagged': {'reason': 'Bug'}}}}}}
+
+    def test_get_target_capabilities(self):
+        self.assertEqual({'compute-servers': 'required',
+                          'compute-images': 'advisory'},
+                         guidelines.get_target_capabilities(
+                             self.GUIDELINE_1_2, 'platform'))
+        self.assertEqual({'compute-servers': 'advisory'},
+                         guidelines.get_target_capabilities(
+                             self.GUIDELINE_1_2, 'object'))
+        self.assertEqual({}, guidelines.get_target_capabilities(
+            self.GUIDELINE_1_2, 'network'))
+
+    def test_build_test_index_1_2(self):
+        index = guidelines.build_test_index(self.GUIDELINE_1_2, '2015.03')
+        self.assertEqual(
+            [{'capability': 'compute-servers', 'guideline': '2015.03',
+              'flagged': False,
+              'status': {'compute': 'required', 'object': 'advisory',
+                         'platform': 'required'}}],
+            index['test_a'])
+        self.assertEqual(
+            [{'capability': 'compute-images', 'guideline': '2015.03',
+              'flagged': False,
+              'status': {'compute': 'advisory', 'platform': 'advisory'}},
+             {'capability': 'compute-servers', 'guideline': '2015.03',
+              'flagged': True,
+              'status': {'compute': 'required', 'object': 'advisory',
+                         'platform': 'required'}}],
+            sorted(index['test_b'], key=lambda entry: entry['capability']))
+
+    def test_build_test_index_1_3(self):
+        index = guidelines.build_test_index(self.GUIDELINE_1_3, '2016.01')
+        self.assertEqual(['test_a', 'test_b'], sorted(index))
+        self.assertFalse(index['test_a'][0]['flagged'])
+        self.assertTrue(index['test_b'][0]['flagged'])
+        self.assertEqual({'compute': 'required', 'platform': 'required'},
+                         index['test_b'][0]['status'])
+
+    def test_build_test_index_unsupported_schema(self):
+        self.assertRaises(ValueError, guidelines.build_test_index,
+                          {'schema': '1.1'}, '2015.03')
+
+    def test_get_test_index(self):
+        path = self.useFixture(fixtures.TempDir()).path
+        conf = self.useFixture(config_fixture.Config()).conf
+        conf.set_override('capabilities_dir', path, 'api')
+        conf.set_override('capabilities_dir_poll_interval', 0, 'api')
+        with open(os.path.join(path, '2016.01.json'), 'w') as cap_file:
+            json.dump(self.GUIDELINE_1_3, cap_file)
+
+        index = guidelines.get_test_index('2016.01')
+        self.assertEqual(['test_a', 'test_b'], sorted(index))
+        self.assertIs(index, guidelines.get_test_index('2016.01'))
+        self.assertEqual(self.GUIDELINE_1_3,
+                         guidelines.get_guideline('2016.01'))
+        self.assertRaises(api_exc.GuidelineUnavailable,
+                          guidelines.get_test_index, '2010.01')
+
+    def test_get_test_capabilities(self):
+        index = guidelines.build_test_index(self.GUIDELINE_1_2, '2015.03')
+        self.assertEqual(
+            {'test_b': ['compute-images', 'compute-servers']},
+            guidelines.get_test_capabilities(index, ['test_b', 'test_c']))
+
+    def test_get_target_tests(self):
+        self.assertEqual(set(['test_a', 'test_b']),
+                         guidelines.get_target_tests(self.GUIDELINE_1_2,
+                                                     'platform', 'required'))
+        self.assertEqual(set(['test_b']),
+                         guidelines.get_target_tests(self.GUIDELINE_1_2,
+                                                     'platform', 'advisory'))
+
+    def test_build_report(self):
+        report = guidelines.build_report(self.GUIDELINE_1_2,
+                                         ['test_a', 'test_c'])
+        self.assertEqual(
+            {'caps': [{'id': 'compute-servers',
+                       'passed_tests': ['test_a'],
+                       'not_passed_tests': ['test_b'],
+                       'passed_flagged': [],
+                       'not_passed_flagged': ['test_b']}],
+             'count': 2, 'passed_count': 1,
+             'flag_pass_count': 0, 'flag_fail_count': 1},
+            report['caps']['required'])
+        advisory_caps = report['caps']['advisory']['caps']
+        self.assertEqual(['compute-images'],
+                         [cap['id'] for cap in advisory_caps])
+        self.assertEqual(50.0, report['required_pass_percent'])
+        self.assertEqual(1, report['total_required_fail_count'])
+        self.assertEqual(1, report['total_required_flag_count'])
+        self.assertEqual(1, report['total_non_flag_count'])
+        self.assertEqual(1, report['non_flag_pass_count'])
+        self.assertEqual(100.0, report['non_flag_required_pass_percent'])
+
+        report = guidelines.build_report(self.GUIDELINE_1_2, [], 'object')
+        self.assertEqual(0, report['caps']['required']['count'])
+        self.assertEqual(2, report['caps']['advisory']['count'])
+        self.assertIsNone(report['required_pass_percent'])
+
+    def test_build_report_1_3(self):
+        report = guidelines.build_report(self.GUIDELINE_1_3, ['test_b'])
+        required = report['caps']['required']
+        self.assertEqual(['test_b'], required['caps'][0]['passed_flagged'])
+        self.assertEqual(1, required['flag_pass_count'])
+
+    def test_build_report_error(self):
+        self.assertRaises(ValueError, guidelines.build_report,
+                          self.GUIDELINE_1_2, [], 'network')
+        self.assertRaises(ValueError, guidelines.build_report,
+                          {'schema': '1.1'}, [])
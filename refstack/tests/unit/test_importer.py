@@ -0,0 +1,142 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for bulk import of test runs."""
+
+import datetime
+import json
+import os
+
+import fixtures
+import mock
+from oslotest import base
+
+from refstack.api import exceptions as api_exc
+from refstack.api import export
+from refstack.api import importer
+
+RUN = {'cpid': 'cpid1', 'duration_seconds': 10,
+       'results': [{'name': 'test_a'}]}
+
+
+class ImporterTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(ImporterTestCase, self).setUp()
+        self.tmp_dir = self.useFixture(fixtures.TempDir()).path
+
+    def test_parse_run(self):
+        run = importer.parse_run(json.dumps(RUN))
+        self.assertEqual('cpid1', run['cpid'])
+        self.assertEqual({}, run['meta'])
+        self.assertEqual(run['id'], importer.parse_run(json.dumps(RUN))['id'])
+
+        record = {'id': 'b5c6d4a6-3dbc-4b79-8f5c-0b3a1b14c6f7',
+                  'created_at': '2015-08-01 01:00:00.5',
+                  'cpid': 'cpid1', 'duration_seconds': 10,
+                  'meta': {'key': 'value'}, 'results': ['test_a'],
+                  'cursor': 'fake'}
+        run = importer.parse_run(json.dumps(record))
+        self.assertEqual('b5c6d4a6-3dbc-4b79-8f5c-0b3a1b14c6f7', run['id'])
+        self.assertEqual(datetime.datetime(2015, 8, 1, 1, 0, 0, 500000),
+                         run['created_at'])
+        self.assertEqual([{'name': 'test_a'}], run['results'])
+        self.assertEqual({'key': 'value'}, run['meta'])
+
+    def test_parse_run_invalid(self):
+        for record in ('{', '[]', '{"cpid": "cpid1"}',
+                       json.dumps(dict(RUN, results=[])),
+                       json.dumps(dict(RUN, meta={'key': 1})),
+                       json.dumps(dict(RUN, meta={'key': {'blob': 'fake'}})),
+                       json.dumps(dict(RUN, meta={'key': {'fake': 'a' * 64}})),
+                       json.dumps(dict(RUN, id='fake')),
+                       json.dumps(dict(RUN, created_at='fake'))):
+            self.assertRaises(api_exc.ValidationError,
+                              importer.parse_run, record)
+
+    @mock.patch('refstack.db.iter_test_records')
+    def test_parse_exported_run(self, mock_iter_test_records):
+        meta = {'key': 'value', 'big': {'blob': 'a' * 64}}
+        mock_iter_test_records.return_value = [
+            {'id': 'b5c6d4a6-3dbc-4b79-8f5c-0b3a1b14c6f7',
+             'created_at': datetime.datetime(2015, 8, 1, 1),
+             'duration_seconds': 10, 'cpid': 'cpid1', 'meta': dict(meta),
+             'results': ['test_a']}]
+        lines = list(export.iter_export({}, with_results=True,
+                                        with_cpid=True))
+        run = importer.parse_run(lines[0].decode('utf-8'))
+        self.assertEqual('b5c6d4a6-3dbc-4b79-8f5c-0b3a1b14c6f7', run['id'])
+        self.assertEqual(datetime.datetime(2015, 8, 1, 1),
+                         run['created_at'])
+        self.assertEqual(meta, run['meta'])
+        self.assertEqual([{'name': 'test_a'}], run['results'])
+
+    def test_read_runs(self):
+        for name in ('2.json', '1.json', 'notes.txt'):
+            with open(os.path.join(self.tmp_dir, name), 'w') as f:
+                f.write(name)
+        self.assertEqual([(0, '1.json'), (1, '2.json')],
+                         list(importer.read_runs(self.tmp_dir)))
+
+        path = os.path.join(self.tmp_dir, 'runs.ndjson')
+        with open(path, 'w') as f:
+            f.write('{"a": 1}\n\n{"b": 2}\n')
+        self.assertEqual([(0, '{"a": 1}\n'), (2, '{"b": 2}\n')],
+                         list(importer.read_runs(path)))
+
+    def test_checkpoint(self):
+        checkpoint = os.path.join(self.tmp_dir, 'checkpoint')
+        self.assertIsNone(importer.read_checkpoint(checkpoint))
+        importer.write_checkpoint(checkpoint, 42)
+        self.assertEqual(42, importer.read_checkpoint(checkpoint))
+
+    @mock.patch('refstack.db.store_results_batch')
+    def test_import_batch(self, mock_store_results_batch):
+        mock_store_results_batch.return_value = ['id1']
+        batch = [(3, json.dumps(RUN)), (4, '{'),
+                 (5, json.dumps(dict(RUN, cpid='cpid2')))]
+        self.assertEqual({'position': 5, 'stored': 1, 'duplicates': 1,
+                          'invalid': 1},
+                         importer.import_batch(batch))
+        runs = mock_store_results_batch.call_args[0][0]
+        self.assertEqual(['cpid1', 'cpid2'], [run['cpid'] for run in runs])
+
+        mock_store_results_batch.reset_mock()
+        importer.import_batch([(6, '{')])
+        self.assertFalse(mock_store_results_batch.called)
+
+    @mock.patch('multiprocessing.Pool')
+    def test_import_runs(self, mock_pool):
+        mock_pool.return_value.imap.side_effect = \
+            lambda func, batches: [func(batch) for batch in batches]
+        path = os.path.join(self.tmp_dir, 'runs.ndjson')
+        checkpoint = path + '.checkpoint'
+        with open(path, 'w') as f:
+            for cpid in ('cpid1', 'cpid2', 'cpid3'):
+                f.write(json.dumps(dict(RUN, cpid=cpid)) + '\n')
+        importer.write_checkpoint(checkpoint, 0)
+
+        with mock.patch('refstack.db.store_results_batch',
+                        side_effect=lambda runs: [run['id'] for run in runs]
+                        ) as mock_store_results_batch:
+            totals = importer.import_runs(path, workers=3, batch_size=1,
+                                          checkpoint=checkpoint)
+        self.assertEqual(2, totals['stored'])
+        self.assertEqual(0, totals['invalid'])
+        self.assertIn('runs_per_second', totals)
+        self.assertEqual(2, mock_store_results_batch.call_count)
+        self.assertEqual(2, importer.read_checkpoint(checkpoint))
+        mock_pool.assert_called_once_with(3, initializer=mock.ANY)
+        mock_pool.return_value.close.assert_called_once_with()
@@ -0,0 +1,89 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for interoperability matrix."""
+
+from oslotest import base
+
+from refstack.api import matrix
+
+GUIDELINE = {
+    'schema': '1.2',
+    'platform': {'required': ['compute']},
+    'components': {'compute': {'required': ['cap-a'],
+                               'advisory': ['cap-b']}},
+    'capabilities': {
+        'cap-a': {'tests': ['test_a', 'test_b'], 'flagged': ['test_b']},
+        'cap-b': {'tests': ['test_c'], 'flagged': []},
+        'cap-c': {'tests': ['test_d'], 'flagged': []}}}
+
+RUNS = [('run1', ['test_a', 'test_c', 'test_x']),
+        ('run2', ['test_b', 'test_c']),
+        ('run3', [])]
+
+
+class MatrixTestCase(base.BaseTestCase):
+
+    def test_catalog(self):
+        catalog = matrix.TestCatalog(['test_b', 'test_a', 'test_b'])
+        self.assertEqual(['test_a', 'test_b'], catalog.tests)
+        self.assertEqual(0b10, catalog.to_bits(['test_b', 'test_x']))
+        self.assertEqual(0b11, catalog.to_bits(['test_a', 'test_b']))
+        self.assertEqual(0, catalog.to_bits([]))
+        self.assertEqual({1}, catalog.to_positions(['test_b', 'test_x']))
+
+        catalog = matrix.TestCatalog('test_%02d' % i for i in range(20))
+        self.assertEqual(1 << 19 | 1 << 8 | 1,
+                         catalog.to_bits(['test_19', 'test_08', 'test_00']))
+
+    def test_build_matrix_capabilities(self):
+        result = matrix.build_matrix(RUNS, GUIDELINE)
+        self.assertEqual({'runs': ['run1', 'run2', 'run3'],
+                          'columns': ['cap-a', 'cap-b'],
+                          'matrix': [[True, True],
+                                     [False, True],
+                                     [False, False]],
+                          'pass_counts': [1, 2]},
+                         result)
+
+    def test_build_matrix_tests(self):
+        result = matrix.build_matrix(RUNS, GUIDELINE, columns=matrix.TESTS)
+        self.assertEqual(['test_a', 'test_b', 'test_c'], result['columns'])
+        self.assertEqual([True, False, True], result['matrix'][0])
+
+        result = matrix.build_matrix(RUNS[:2], columns=matrix.TESTS)
+        self.assertEqual(['test_a', 'test_b', 'test_c', 'test_x'],
+                         result['columns'])
+        self.assertEqual([[True, False, True, True],
+                          [False, True, True, False]], result['matrix'])
+        self.assertEqual([1, 1, 2, 1], result['pass_counts'])
+
+    def test_build_matrix_empty(self):
+        result = matrix.build_matrix([], GUIDELINE)
+        self.assertEqual([0, 0], result['pass_counts'])
+
+    def test_build_matrix_error(self):
+        self.assertRaises(ValueError, matrix.build_matrix, RUNS)
+        self.assertRaises(ValueError, matrix.build_matrix, RUNS, GUIDELINE,
+                          columns='runs')
+        self.assertRaises(ValueError, matrix.build_matrix, RUNS, GUIDELINE,
+                          target='network')
+
+    def test_to_csv(self):
+        result = matrix.build_matrix(RUNS[:2], GUIDELINE)
+        self.assertEqual('test_id,cap-a,cap-b\r\n'
+                         'run1,1,1\r\n'
+                         'run2,0,1\r\n',
+                         matrix.to_csv(result))
@@ -0,0 +1,95 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for search of tests by name."""
+
+from oslotest import base
+
+from refstack.api import cache
+from refstack.api import name_index
+from refstack.tests import unit
+
+TESTS = ['tempest.api.compute.servers.test_create',
+         'tempest.api.compute.servers.test_delete',
+         'tempest.api.identity.test_tokens',
+         'tempest.api.volume.test_volumes_create']
+
+
+class NameIndexTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(NameIndexTestCase, self).setUp()
+        self.index = name_index.NameIndex()
+        self.index.add(TESTS)
+
+    def test_add(self):
+        self.index.add(TESTS[:2] + ['tempest.api.a'])
+        self.assertEqual(5, len(self.index))
+
+    def test_find_by_prefix(self):
+        self.assertEqual(TESTS[:2],
+                         self.index.find_by_prefix('tempest.api.compute'))
+        self.assertEqual(TESTS, self.index.find_by_prefix('tempest'))
+        self.assertEqual([], self.index.find_by_prefix('tempest.scenario'))
+        self.assertEqual([], self.index.find_by_prefix('zzz'))
+
+    def test_find_containing(self):
+        self.assertEqual(
+            set([TESTS[0], TESTS[3]]),
+            set(self.index.find_containing('create')))
+        self.assertEqual([TESTS[2]], self.index.find_containing('oke'))
+        self.assertEqual([], self.index.find_containing('network'))
+        # Short substring would be searched in the whole catalog.
+        self.assertRaises(ValueError, self.index.find_containing, 'ok')
+
+
+class FilterTestsTestCase(unit.RefstackBaseTestCase):
+
+    def setUp(self):
+        super(FilterTestsTestCase, self).setUp()
+        index = name_index.NameIndex()
+        index.add(['tempest.api.compute.other_test'])
+        self.setup_mock('refstack.api.name_index._INDEX', new=index)
+        self.setup_mock('refstack.api.name_index._RUN_NAMES',
+                        new=cache.LRUDict(1))
+
+    def test_filter_tests(self):
+        self.assertEqual(
+            TESTS[:2],
+            name_index.filter_tests('id', TESTS, 'tempest.api.compute'))
+        self.assertEqual(
+            [TESTS[0], TESTS[3]],
+            name_index.filter_tests('id', TESTS, contains='create'))
+        self.assertEqual(
+            [TESTS[0]],
+            name_index.filter_tests('id', TESTS, 'tempest.api.compute',
+                                    'create'))
+
+    def test_filter_tests_cached_run(self):
+        name_index.filter_tests('id', TESTS, 'tempest')
+        self.assertEqual(
+            [TESTS[2]],
+            name_index.filter_tests('id', None, 'tempest.api.identity'))
+
+    def test_filter_tests_rebuilt_catalog(self):
+        self.setup_mock('refstack.api.name_index.CATALOG_MAX_SIZE', new=4)
+        name_index.filter_tests('id1', TESTS[:2], 'tempest')
+        # Catalog is rebuilt from names of cached runs only.
+        self.assertEqual(
+            TESTS[2:],
+            name_index.filter_tests('id2', TESTS[2:], 'tempest'))
+        self.assertEqual(2, len(name_index._INDEX))
+        self.assertEqual(
+            TESTS[:2], name_index.filter_tests('id1', TESTS[:2], 'tempest'))
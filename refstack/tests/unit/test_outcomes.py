@@ -0,0 +1,49 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for columnar encoding of test outcomes."""
+
+from oslotest import base
+
+from refstack.api import outcomes
+
+
+class OutcomesTestCase(base.BaseTestCase):
+
+    def test_encode(self):
+        name_ids, statuses, durations = outcomes.encode(
+            [(1, outcomes.PASS, 0.5), (70000, outcomes.FAIL, 12.25),
+             (70001, outcomes.SKIP, None)])
+        self.assertEqual(12, len(name_ids))
+        self.assertEqual(b'\x00\x01\x02', statuses)
+        self.assertEqual(12, len(durations))
+        self.assertEqual(
+            [(1, outcomes.PASS, 0.5), (70000, outcomes.FAIL, 12.25),
+             (70001, outcomes.SKIP, None)],
+            outcomes.decode(name_ids, statuses, durations))
+        self.assertEqual([], outcomes.decode(*outcomes.encode([])))
+
+    def test_get_status(self):
+        self.assertEqual(outcomes.PASS, outcomes.get_status({'name': 'a'}))
+        self.assertTrue(outcomes.is_passed({'name': 'a', 'status': 'pass'}))
+        self.assertFalse(outcomes.is_passed({'name': 'a', 'status': 'fail'}))
+
+    def test_has_outcomes(self):
+        self.assertFalse(outcomes.has_outcomes([]))
+        self.assertFalse(outcomes.has_outcomes([{'name': 'a', 'uuid': 'b'}]))
+        self.assertTrue(outcomes.has_outcomes([{'name': 'a'},
+                                               {'name': 'b', 'duration': 1}]))
+        self.assertTrue(outcomes.has_outcomes([{'name': 'a',
+                                                'status': 'skip'}]))
@@ -0,0 +1,105 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for similarity index of test runs."""
+
+import mock
+from oslotest import base
+
+from refstack.api import similarity
+
+TESTS = ['tempest.test_%s' % i for i in range(200)]
+
+
+class SimilarityTestCase(base.BaseTestCase):
+
+    def test_get_signature(self):
+        signature = similarity.get_signature(TESTS)
+        self.assertEqual(similarity.NUM_HASHES, len(signature))
+        self.assertEqual(signature,
+                         similarity.get_signature(reversed(TESTS)))
+        self.assertEqual([], similarity.get_signature([]))
+
+    def test_estimate_similarity(self):
+        signature = similarity.get_signature(TESTS)
+        self.assertEqual(1.0, similarity.estimate_similarity(signature,
+                                                             signature))
+        half = similarity.get_signature(TESTS[:100] + ['other_%s' % i
+                                                       for i in range(100)])
+        self.assertTrue(0.15 < similarity.estimate_similarity(
+            signature, half) < 0.55)
+        disjoint = similarity.get_signature(['other_%s' % i
+                                             for i in range(200)])
+        self.assertTrue(similarity.estimate_similarity(signature,
+                                                       disjoint) < 0.1)
+
+    def test_get_buckets(self):
+        signature = similarity.get_signature(TESTS)
+        buckets = similarity.get_buckets(signature)
+        self.assertEqual(similarity.NUM_BANDS, len(set(buckets)))
+        close = similarity.get_signature(TESTS[:-2])
+        self.assertTrue(set(buckets) & set(similarity.get_buckets(close)))
+
+    @mock.patch('refstack.db.save_test_signature')
+    @mock.patch('refstack.db.get_test_results')
+    def test_index_test(self, mock_get_test_results,
+                        mock_save_test_signature):
+        mock_get_test_results.return_value = [{'name': 'test_a'}]
+        signature = similarity.index_test('id')
+        mock_get_test_results.assert_called_once_with('id')
+        mock_save_test_signature.assert_called_once_with(
+            'id', signature, similarity.get_buckets(signature))
+
+        mock_save_test_signature.reset_mock()
+        self.assertEqual([], similarity.index_test('id', []))
+        mock_save_test_signature.assert_called_once_with('id', [], [])
+
+    @mock.patch.object(similarity, 'index_test')
+    @mock.patch('refstack.db.get_test_ids_without_signature')
+    def test_index_new_tests(self, mock_get_test_ids, mock_index_test):
+        mock_get_test_ids.side_effect = [['id1', 'id2'], ['id3'], []]
+        self.assertEqual(3, similarity.index_new_tests())
+        mock_index_test.assert_has_calls([mock.call('id1'),
+                                          mock.call('id2'),
+                                          mock.call('id3')])
+
+    @mock.patch('refstack.db.get_similar_test_candidates')
+    @mock.patch('refstack.db.get_test_signature')
+    def test_find_similar(self, mock_get_test_signature,
+                          mock_get_candidates):
+        signature = similarity.get_signature(TESTS)
+        mock_get_test_signature.return_value = signature
+        mock_get_candidates.return_value = [
+            {'id': 'id2', 'created_at': 'date2',
+             'signature': similarity.get_signature(TESTS[:100])},
+            {'id': 'id3', 'created_at': 'date3', 'signature': signature},
+            {'id': 'id4', 'created_at': 'date4',
+             'signature': similarity.get_signature(TESTS[:150])}]
+        similar = similarity.find_similar('id1', 2, {}, 100)
+        self.assertEqual(['id3', 'id4'], [run['id'] for run in similar])
+        self.assertEqual(1.0, similar[0]['similarity'])
+        mock_get_candidates.assert_called_once_with(
+            'id1', similarity.get_buckets(signature), {}, 100)
+
+    @mock.patch('refstack.db.get_similar_test_candidates')
+    @mock.patch.object(similarity, 'index_test')
+    @mock.patch('refstack.db.get_test_signature')
+    def test_find_similar_not_indexed(self, mock_get_test_signature,
+                                      mock_index_test, mock_get_candidates):
+        mock_get_test_signature.return_value = None
+        mock_index_test.return_value = []
+        self.assertEqual([], similarity.find_similar('id1', 2, {}, 100))
+        mock_index_test.assert_called_once_with('id1')
+        self.assertFalse(mock_get_candidates.called)
@@ -0,0 +1,139 @@
+# Copyright (c) 2015 Mirantis, Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for parser of subunit v2 streams."""
+
+import io
+import struct
+import zlib
+
+from oslotest import base
+
+from refstack.api import subunit
+
+
+def _number(value):
+    if value < 0x40:
+        return struct.pack('>B', value)
+    elif value < 0x4000:
+        return struct.pack('>H', value | 0x4000)
+    elif value < 0x400000:
+        return struct.pack('>I', value | 0x800000)[1:]
+    return struct.pack('>I', value | 0xc0000000)
+
+
+def _string(value):
+    data = value.encode('utf-8')
+    return _number(len(data)) + data
+
+
+def make_packet(test_id=None, status=0, timestamp=None, tags=None,
+                attachment=None):
+    """Encode packet of subunit v2 stream."""
+    flags = subunit.VERSION | status
+    body = b''
+    if timestamp is not None:
+        flags |= subunit.FLAG_TIMESTAMP
+        body += struct.pack('>I', int(timestamp)) + _number(
+            int(round(timestamp % 1 * 1e9)))
+    if test_id is not None:
+        flags |= subunit.FLAG_TEST_ID
+        body += _string(test_id)
+    if tags:
+        flags |= subunit.FLAG_TAGS
+        body += _number(len(tags)) + b''.join(_string(tag) for tag in tags)
+    if attachment is not None:
+        flags |= subunit.FLAG_MIME_TYPE | subunit.FLAG_FILE_CONTENT
+        body += (_string('text/plain') + _string('pythonlogging') +
+                 _number(len(attachment)) + attachment)
+    length = 3 + len(body) + 4
+    length += len(_number(length + len(_number(length))))
+    data = (struct.pack('>BH', subunit.SIGNATURE, flags) +
+            _number(length) + body)
+    return data + struct.pack('>I', zlib.crc32(data) & 0xffffffff)
+
+
+class SubunitTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(SubunitTestCase, self).setUp()
+        test_a = ('tempest.api.test_a.TestA.test_a'
+                  '[id-8e0ab8e0-0f8c-4d9c-9c21-0e45b1b3b2a1,smoke]')
+        self.stream = b''.join([
+            make_packet(test_a, 2, 1441101600.25, tags=['worker-0']),
+            make_packet(test_a, 0, 1441101601, attachment=b'log' * 10000),
+            make_packet(test_a, subunit.STATUS_SUCCESS, 1441101620),
+            make_packet('tempest.api.test_b', 6, 1441101630),
+            make_packet('tempest.api.test_c', subunit.STATUS_SUCCESS,
+                        1441101640.4),
+            # Test reported again is collected once.
+            make_packet(test_a, subunit.STATUS_SUCCESS, 1441101641),
+        ])
+
+    def test_iter_packets(self):
+        packets = list(subunit.iter_packets(io.BytesIO(self.stream)))
+        self.assertEqual(6, len(packets))
+        self.assertEqual('tempest.api.test_b', packets[3].test_id)
+        self.assertEqual(6, packets[3].status)
+        self.assertAlmostEqual(1441101600.25, packets[0].timestamp)
+
+    def test_iter_packets_malformed(self):
+        corrupted = bytearray(self.stream)
+        corrupted[12] ^= 0xff
+        for stream in (self.stream[:-1], b'\x00' + self.stream[1:],
+                       bytes(corrupted)):
+            self.assertRaises(ValueError, list,
+                              subunit.iter_packets(io.BytesIO(stream)))
+
+    def test_parse_results(self):
+        self.assertEqual(
+            {'duration_seconds': 41,
+             'results': [{'name': 'tempest.api.test_a.TestA.test_a',
+                          'uuid': '8e0ab8e0-0f8c-4d9c-9c21-0e45b1b3b2a1',
+                          'status': 'pass', 'duration': 19.75},
+                         {'name': 'tempest.api.test_b', 'status': 'fail'},
+                         {'name': 'tempest.api.test_c', 'status': 'pass'}]},
+            subunit.parse_results(io.BytesIO(self.stream)))
+
+    def test_parse_results_retried(self):
+        stream = b''.join([
+            make_packet('tempest.api.test_a', subunit.STATUS_FAIL, 10),
+            make_packet('tempest.api.test_a', 2, 20),
+            make_packet('tempest.api.test_a', subunit.STATUS_SUCCESS, 22),
+            make_packet('tempest.api.test_b', subunit.STATUS_SKIP, 23),
+            make_packet('tempest.api.test_c', 7, 24),
+        ])
+        # Test passed on retry is passed, expected failure is skipped.
+        self.assertEqual(
+            [{'name': 'tempest.api.test_a', 'status': 'pass', 'duration': 2},
+             {'name': 'tempest.api.test_b', 'status': 'skip'}],
+            subunit.parse_results(io.BytesIO(stream))['results'])
+        self.assertEqual({'duration_seconds': 0, 'results': []},
+                         subunit.parse_results(io.BytesIO(b'')))
+
+    def test_split_test_id(self):
+        self.assertEqual(('tempest.test_a', None),
+                         subunit.split_test_id('tempest.test_a'))
+        self.assertEqual(('tempest.test_a', None),
+                         subunit.split_test_id('tempest.test_a[smoke]'))
+        self.assertEqual(
+            ('tempest.test_a', '8e0ab8e0-0f8c-4d9c-9c21-0e45b1b3b2a1'),
+            subunit.split_test_id('tempest.test_a[gate,'
+                                  'id-8e0ab8e0-0f8c-4d9c-9c21-0e45b1b3b2a1]'))
+
+    def test_is_stream(self):
+        self.assertTrue(subunit.is_stream(self.stream))
+        self.assertFalse(subunit.is_stream(b'{"cpid": "foo"}'))
+        self.assertFalse(subunit.is_stream(b''))
@@ -148,6 +148,54 @@ class TestResultValidatorTestCase(base.BaseTestCase):
                           self.validator.validate,
                           wrong_request)
 
+    def test_validation_with_outcomes(self):
+        request = mock.Mock()
+        request.headers = {}
+        request.body = json.dumps({
+            'cpid': 'foo', 'duration_seconds': 10,
+            'results': [{'name': 'test_a', 'status': 'pass', 'duration': 1},
+                        {'name': 'test_b', 'status': 'skip'}]})
+        self.validator.validate(request)
+
+        # At least one test must pass.
+        request.body = json.dumps({
+            'cpid': 'foo', 'duration_seconds': 10,
+            'results': [{'name': 'test_a', 'status': 'fail'}]})
+        self.assertRaises(api_exc.ValidationError,
+                          self.validator.validate, request)
+
+        for result in ({'name': 'test_a', 'status': 'broken'},
+                       {'name': 'test_a', 'duration': -1},
+                       {'status': 'pass'}):
+            request.body = json.dumps({
+                'cpid': 'foo', 'duration_seconds': 10,
+                'results': [{'name': 'test_b'}, result]})
+            self.assertRaises(api_exc.ValidationError,
+                              self.validator.validate, request)
+
+    def test_validate_subunit(self):
+        request = mock.Mock()
+        request.body = b'\xb3fake_stream'
+        request.headers = {}
+        self.validator.validate_subunit(request, self.FAKE_JSON)
+
+        self.assertRaises(api_exc.ValidationError,
+                          self.validator.validate_subunit,
+                          request, self.FAKE_JSON_WITH_EMPTY_RESULTS)
+        self.assertRaises(api_exc.ValidationError,
+                          self.validator.validate_subunit,
+                          request, {'cpid': 'foo'})
+
+    @mock.patch('jsonschema.validate')
+    def test_validate_subunit_with_broken_signature(self, mock_validate):
+        request = mock.Mock()
+        request.body = b'\xb3fake_stream'
+        request.headers = {'X-Signature': 'not hex',
+                           'X-Public-Key': 'fake-key'}
+        self.assertRaises(api_exc.ValidationError,
+                          self.validator.validate_subunit,
+                          request, self.FAKE_JSON)
+
     @mock.patch('jsonschema.validate')
     def test_validation_with_broken_signature(self, mock_validate):
         if six.PY3: